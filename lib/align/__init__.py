@@ -5,3 +5,4 @@ from .aligned_face import (AlignedFace, _EXTRACT_RATIOS, get_adjusted_center,  #
                            get_matrix_scaling,  get_centered_size, PoseEstimate, transform_image)
 from .alignments import Alignments  # noqa
 from .detected_face import BlurMask, DetectedFace, Mask, update_legacy_png_header  # noqa
+from .manifest import FacesetManifest  # noqa
@@ -5,7 +5,7 @@ from dataclasses import dataclass, field
 import logging
 import sys
 from threading import Lock
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 
 import cv2
@@ -278,6 +278,27 @@ class _FaceCache:  # pylint:disable=too-many-instance-attributes
         """
         return self._locks[name]
 
+    def __getstate__(self) -> Dict[str, Any]:
+        """ Drop the thread locks, which cannot be pickled, when pickling the cache.
+
+        Returns
+        -------
+        dict
+            The cached items without the thread locks
+        """
+        return {key: val for key, val in self.__dict__.items() if key != "_locks"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """ Restore the cached items and create new thread locks when unpickling the cache.
+
+        Parameters
+        ----------
+        state: dict
+            The cached items without the thread locks
+        """
+        self.__dict__.update(state)
+        self.__post_init__()
+
 
 class AlignedFace():
     """ Class to align a face.
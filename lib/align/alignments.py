@@ -13,6 +13,9 @@ import numpy as np
 from lib.serializer import get_serializer, get_serializer_from_filename
 from lib.utils import FaceswapError
 
+from .columnar import ColumnarAlignmentsData, is_columnar_file, save_columnar
+from .journal import AlignmentsJournal
+
 if sys.version_info < (3, 8):
     from typing_extensions import TypedDict
 else:
@@ -83,6 +86,12 @@ class Alignments():
     Additionally it can also hold video meta information (timestamp and whether a frame is a
     key frame.)
 
+    The alignments can be stored in one of two formats. The standard format is a compressed
+    serialized dictionary which is loaded into memory in its entirety. The columnar format (see
+    :mod:`lib.align.columnar`) is memory-mapped, with each frame only being loaded when it is
+    accessed. The format of the loaded file is detected automatically and retained when the file
+    is saved. It can be changed with :attr:`storage`.
+
     Parameters
     ----------
     folder: str
@@ -98,8 +107,11 @@ class Alignments():
         self._serializer = get_serializer("compressed")
         self._file = self._get_location(folder, filename)
         self._meta = None
+        self._columnar = False
+        self._journal: Optional[AlignmentsJournal] = None
         self._data = self._load()
-        self._update_legacy()
+        if not self._columnar:
+            self._update_legacy()
         self._hashes_to_frame = {}
         self._hashes_to_alignment = {}
         self._thumbnails = Thumbnails(self)
@@ -117,7 +129,10 @@ class Alignments():
     @property
     def faces_count(self):
         """ int: The total number of faces that appear in the alignments :attr:`data`. """
-        retval = sum(len(val["faces"]) for val in self._data.values())
+        if isinstance(self._data, ColumnarAlignmentsData):
+            retval = self._data.faces_count()
+        else:
+            retval = sum(len(val["faces"]) for val in self._data.values())
         logger.trace(retval)
         return retval
 
@@ -128,9 +143,25 @@ class Alignments():
 
     @property
     def data(self):
-        """ dict: The loaded alignments :attr:`file` in dictionary form. """
+        """ dict: The loaded alignments :attr:`file` in dictionary form. For columnar alignments
+        files this is a :class:`~lib.align.columnar.ColumnarAlignmentsData` object, which
+        behaves as a dictionary but only loads each frame when it is accessed. """
         return self._data
 
+    @property
+    def storage(self):
+        """ str: The format that the alignments will be saved in. Either `"standard"` for the
+        compressed serialized dictionary or `"columnar"` for the memory-mapped columnar format.
+        Setting this value changes the format that the file is written in on the next call to
+        :func:`save`. """
+        return "columnar" if self._columnar else "standard"
+
+    @storage.setter
+    def storage(self, value):
+        assert value in ("standard", "columnar"), f"Invalid alignments storage: '{value}'"
+        logger.debug("Setting alignments storage: '%s'", value)
+        self._columnar = value == "columnar"
+
     @property
     def have_alignments_file(self):
         """ bool: ``True`` if an alignments file exists at location :attr:`file` otherwise
@@ -185,6 +216,8 @@ class Alignments():
     def mask_summary(self):
         """ dict: The mask type names stored in the alignments :attr:`data` as key with the number
         of faces which possess the mask type as value. """
+        if isinstance(self._data, ColumnarAlignmentsData):
+            return self._data.mask_summary()
         masks = {}
         for val in self._data.values():
             for face in val["faces"]:
@@ -201,10 +234,11 @@ class Alignments():
         retval = dict(pts_time=None, keyframes=None)
         pts_time = []
         keyframes = []
+        columnar = isinstance(self._data, ColumnarAlignmentsData)
         for idx, key in enumerate(sorted(self.data)):
-            if "video_meta" not in self.data[key]:
+            meta = self._data.video_meta(key) if columnar else self.data[key].get("video_meta")
+            if meta is None:
                 return retval
-            meta = self.data[key]["video_meta"]
             pts_time.append(meta["pts_time"])
             if meta["keyframe"]:
                 keyframes.append(idx)
@@ -281,6 +315,14 @@ class Alignments():
             raise FaceswapError(f"Error: Alignments file not found at {self._file}")
 
         logger.info("Reading alignments from: '%s'", self._file)
+        if is_columnar_file(self._file):
+            data = ColumnarAlignmentsData(self._file)
+            self._columnar = True
+            self._meta = data.meta
+            self._version = self._meta["version"]
+            logger.debug("Loaded columnar alignments")
+            return data
+
         data = self._serializer.load(self._file)
         self._meta = data.get("__meta__", dict(version=1.0))
         self._version = self._meta["version"]
@@ -293,11 +335,69 @@ class Alignments():
         the location :attr:`file`. """
         logger.debug("Saving alignments")
         logger.info("Writing alignments to: '%s'", self._file)
-        data = dict(__meta__=dict(version=self._version),
-                    __data__=self._data)
+        meta = dict(version=self._version)
+        if self._columnar:
+            save_columnar(self._file, self._data, meta)
+            if self._journal is not None:
+                self._journal.remove()
+            logger.debug("Saved alignments")
+            return
+        if isinstance(self._data, ColumnarAlignmentsData):
+            # Converting from columnar storage, so load every frame into a standard dictionary
+            columnar = self._data
+            self._data = dict(columnar.items())
+            columnar.close()
+            self._thumbnails = Thumbnails(self)
+        data = dict(__meta__=meta, __data__=self._data)
         self._serializer.save(self._file, data)
+        if self._journal is not None:
+            self._journal.remove()
         logger.debug("Saved alignments")
 
+    def open_journal(self):
+        """ Start recording frames added with :func:`journal_frame` to an append-only journal
+        alongside the alignments :attr:`file`.
+
+        If a journal exists from an interrupted process, its frames are first recovered into
+        :attr:`data` and compacted into the alignments :attr:`file`. The journal is removed each
+        time the alignments are saved.
+
+        Returns
+        -------
+        int
+            The number of frames recovered from an existing journal
+        """
+        self._journal = AlignmentsJournal(self._file)
+        recovered = 0
+        for frame_name, frame in self._journal.read():
+            self._data[frame_name] = frame
+            recovered += 1
+        if recovered:
+            logger.info("Recovered %s frames from interrupted alignments journal: '%s'",
+                        recovered, self._journal.filename)
+            self.save()
+        return recovered
+
+    def journal_frame(self, frame_name):
+        """ Append a frame from :attr:`data` to the journal opened with :func:`open_journal`.
+
+        Writing a frame to the journal only requires that frame to be serialized, so it is
+        significantly cheaper than re-saving the entire alignments :attr:`file`.
+
+        Parameters
+        ----------
+        frame_name: str
+            The frame name to write to the journal. This should be the base name of the frame, not
+            the full path
+        """
+        assert self._journal is not None, "Journal must be opened prior to journaling frames"
+        self._journal.append(frame_name, self._data[frame_name])
+
+    def sync_journal(self):
+        """ Commit all frames written to the journal to disk. """
+        if self._journal is not None:
+            self._journal.sync()
+
     def backup(self):
         """ Create a backup copy of the alignments :attr:`file`.
 
@@ -314,7 +414,14 @@ class Alignments():
         split = os.path.splitext(src)
         dst = split[0] + "_" + now + split[1]
         logger.info("Backing up original alignments to '%s'", dst)
+        reopen = (isinstance(self._data, ColumnarAlignmentsData)
+                  and self._data.filename == os.path.abspath(src))
+        if reopen:
+            # The memory-mapped file must be released prior to moving it
+            self._data.close()
         os.rename(src, dst)
+        if reopen:
+            self._data.open(os.path.abspath(dst))
         logger.debug("Backed up alignments")
 
     def save_video_meta_data(self, pts_time, keyframes):
@@ -481,10 +588,13 @@ class Alignments():
             ``True`` if all faces in the current alignments possess the given ``mask_type``
             otherwise ``False``
         """
-        retval = any([(face.get("mask", None) is not None and
-                       face["mask"].get(mask_type, None) is not None)
-                      for val in self._data.values()
-                      for face in val["faces"]])
+        if isinstance(self._data, ColumnarAlignmentsData):
+            retval = mask_type in self._data.mask_summary()
+        else:
+            retval = any([(face.get("mask", None) is not None and
+                           face["mask"].get(mask_type, None) is not None)
+                          for val in self._data.values()
+                          for face in val["faces"]])
         logger.debug(retval)
         return retval
 
@@ -644,7 +754,8 @@ class Alignments():
         frame_fullname: str
             The full path (folder and filename) for the yielded frame
         """
-        for frame_fullname, val in self._data.items():
+        for frame_fullname in self._data:
+            val = self._data.get(frame_fullname)
             frame_name = os.path.splitext(frame_fullname)[0]
             face_count = len(val["faces"])
             logger.trace("Yielding: (frame: '%s', faces: %s, frame_fullname: '%s')",
@@ -839,6 +950,8 @@ class Thumbnails():
     def has_thumbnails(self):
         """ bool: ``True`` if all faces in the alignments file contain thumbnail images
         otherwise ``False``. """
+        if isinstance(self._alignments_dict, ColumnarAlignmentsData):
+            return self._alignments_dict.has_thumbnails()
         retval = all(np.any(face.get("thumb"))
                      for frame in self._alignments_dict.values()
                      for face in frame["faces"])
@@ -860,7 +973,8 @@ class Thumbnails():
         :class:`numpy.ndarray`
             The encoded jpg thumbnail
         """
-        retval = self._alignments_dict[self._frame_list[frame_index]]["faces"][face_index]["thumb"]
+        frame = self._alignments_dict.get(self._frame_list[frame_index])
+        retval = frame["faces"][face_index]["thumb"]
         logger.trace("frame index: %s, face_index: %s, thumb shape: %s",
                      frame_index, face_index, retval.shape)
         return retval
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+""" Columnar storage backend for Faceswap alignments files.
+
+The standard alignments file is a zlib compressed pickle of the full alignments dictionary, so
+the whole file must be decompressed and unpickled into memory before any frame can be accessed.
+
+The columnar format stores the per face bounding boxes and landmarks, and the per frame video
+meta information, in contiguous arrays. Masks and thumbnails are stored raw in a separate blob
+section that is addressed by an offset table. The file is memory-mapped on load and frames are only
+decoded into the standard alignments dictionary format when they are accessed.
+
+File layout::
+
+    MAGIC | blobs | arrays | header (pickle) | header offset (uint64) | header length (uint64)
+"""
+import logging
+import mmap
+import os
+import pickle
+import struct
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"FSACOLv1"
+_FOOTER = struct.Struct("<QQ")
+_ALIGN = 64
+
+# Bit flags for the standard keys that exist within a face's alignment dictionary
+_KEYS = dict(x=1, w=2, y=4, h=8, landmarks_xy=16, mask=32, thumb=64)
+# Mask entry state for a face
+_MASK_DICT, _MASK_NONE = 0, 1
+
+
+def is_columnar_file(filename: str) -> bool:
+    """ Check whether an alignments file is stored in the columnar format.
+
+    Parameters
+    ----------
+    filename: str
+        Full path to the alignments file to check
+
+    Returns
+    -------
+    bool
+        ``True`` if the file exists and is a columnar alignments file otherwise ``False``
+    """
+    if not os.path.isfile(filename):
+        return False
+    with open(filename, "rb") as in_file:
+        return in_file.read(len(_MAGIC)) == _MAGIC
+
+
+def _is_standard_mask(mask: Any) -> bool:
+    """ Check whether a face's mask entry can be stored in the columnar mask table.
+
+    Parameters
+    ----------
+    mask: dict
+        The `mask` dictionary from a face's alignments
+
+    Returns
+    -------
+    bool
+        ``True`` if every mask within the dictionary holds exactly the standard mask keys with the
+        expected types
+    """
+    if not isinstance(mask, dict):
+        return False
+    for name, item in mask.items():
+        if (not isinstance(name, str) or not isinstance(item, dict)
+                or set(item) != {"mask", "affine_matrix", "interpolator", "stored_size",
+                                 "stored_centering"}
+                or not isinstance(item["mask"], bytes)
+                or not isinstance(item["affine_matrix"], np.ndarray)
+                or item["affine_matrix"].shape != (2, 3)
+                or item["affine_matrix"].dtype != "float64"
+                or not isinstance(item["interpolator"], (int, np.integer))
+                or not isinstance(item["stored_size"], (int, np.integer))
+                or not isinstance(item["stored_centering"], str)):
+            return False
+    return True
+
+
+class _ColumnarWriter():
+    """ Streams alignments frames to a columnar alignments file.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to the file to write
+    """
+    def __init__(self, filename: str) -> None:
+        self._file = open(filename, "wb")  # pylint:disable=consider-using-with
+        self._file.write(_MAGIC)
+        self._offset = len(_MAGIC)
+        self._strings: Dict[str, Dict[str, int]] = dict(mask=dict(), centering=dict())
+
+        self._frames: List[str] = []
+        self._face_start = [0]
+        self._frame_meta: List[Tuple[bool, float, bool]] = []
+        self._frame_extra: Dict[int, dict] = {}
+
+        self._face_keys: List[int] = []
+        self._boxes: List[Tuple[int, int, int, int]] = []
+        self._landmarks: List[np.ndarray] = []
+        self._thumbs: List[Tuple[int, int, int, int]] = []
+        self._face_extra: Dict[int, dict] = {}
+
+        self._mask_start = [0]
+        self._mask_state: List[int] = []
+        self._masks: List[Tuple[int, int, int, int, int, int]] = []
+        self._mask_affine: List[np.ndarray] = []
+
+    def _write_blob(self, data: bytes) -> Tuple[int, int]:
+        """ Write raw data to the blob section of the file.
+
+        Parameters
+        ----------
+        data: bytes
+            The data to write
+
+        Returns
+        -------
+        tuple
+            The (`offset`, `length`) of the data within the file
+        """
+        offset = self._offset
+        self._file.write(data)
+        self._offset += len(data)
+        return offset, len(data)
+
+    def _string_id(self, table: str, value: str) -> int:
+        """ Obtain the index of a string held within one of the header's string tables.
+
+        Parameters
+        ----------
+        table: str
+            The name of the string table
+        value: str
+            The string to obtain the index for
+
+        Returns
+        -------
+        int
+            The index of the string within the table
+        """
+        return self._strings[table].setdefault(value, len(self._strings[table]))
+
+    def add_frame(self, frame_name: str, frame: dict) -> None:
+        """ Add a frame to the file.
+
+        Parameters
+        ----------
+        frame_name: str
+            The name of the frame
+        frame: dict
+            The frame's alignments in the standard alignments dictionary format
+        """
+        frame_idx = len(self._frames)
+        self._frames.append(frame_name)
+        extra = {key: val for key, val in frame.items() if key not in ("faces", "video_meta")}
+
+        meta = frame.get("video_meta")
+        if (isinstance(meta, dict) and set(meta) == {"pts_time", "keyframe"}
+                and isinstance(meta["pts_time"], (float, int))
+                and isinstance(meta["keyframe"], bool)):
+            self._frame_meta.append((True, float(meta["pts_time"]), meta["keyframe"]))
+        else:
+            if "video_meta" in frame:
+                extra["video_meta"] = meta
+            self._frame_meta.append((False, 0.0, False))
+        if extra:
+            self._frame_extra[frame_idx] = extra
+
+        for face in frame["faces"]:
+            self._add_face(face)
+        self._face_start.append(len(self._face_keys))
+
+    def _add_face(self, face: dict) -> None:
+        """ Add a face to the columns, storing masks and thumbnails in the blob section.
+
+        Parameters
+        ----------
+        face: dict
+            The face's alignments in the standard alignments dictionary format
+        """
+        face_idx = len(self._face_keys)
+        flags = 0
+        extra = {}
+        box = [0, 0, 0, 0]
+        for key, val in face.items():
+            if key in ("x", "y", "w", "h") and isinstance(val, (int, np.integer)):
+                box["xywh".index(key)] = int(val)
+            elif (key == "landmarks_xy" and isinstance(val, np.ndarray)
+                  and val.shape == (68, 2) and val.dtype == "float32"):
+                pass
+            elif key == "mask" and (val is None or _is_standard_mask(val)):
+                pass
+            elif (key == "thumb" and isinstance(val, np.ndarray) and val.dtype == "uint8"
+                  and val.ndim in (1, 2)):
+                pass
+            else:
+                extra[key] = val
+                continue
+            flags |= _KEYS[key]
+
+        self._boxes.append((box[0], box[1], box[2], box[3]))
+        self._landmarks.append(face["landmarks_xy"] if flags & _KEYS["landmarks_xy"]
+                               else np.zeros((68, 2), dtype="float32"))
+
+        if flags & _KEYS["thumb"]:
+            thumb = face["thumb"]
+            offset, length = self._write_blob(thumb.tobytes())
+            self._thumbs.append((offset, length, thumb.shape[0],
+                                 thumb.shape[1] if thumb.ndim == 2 else -1))
+        else:
+            self._thumbs.append((0, -1, 0, 0))
+
+        mask = face.get("mask") if flags & _KEYS["mask"] else None
+        self._mask_state.append(_MASK_NONE if mask is None else _MASK_DICT)
+        for name, item in (mask or {}).items():
+            offset, length = self._write_blob(item["mask"])
+            self._masks.append((offset,
+                                length,
+                                self._string_id("mask", name),
+                                int(item["interpolator"]),
+                                int(item["stored_size"]),
+                                self._string_id("centering", item["stored_centering"])))
+            self._mask_affine.append(item["affine_matrix"])
+        self._mask_start.append(len(self._masks))
+
+        self._face_keys.append(flags)
+        if extra:
+            self._face_extra[face_idx] = extra
+
+    def close(self, meta: dict) -> None:
+        """ Write the column arrays and the header to the file, and close it.
+
+        Parameters
+        ----------
+        meta: dict
+            The alignments file meta information to store in the header
+        """
+        num_faces = len(self._face_keys)
+        frame_meta = np.array(self._frame_meta, dtype="float64").reshape(-1, 3)
+        columns = dict(
+            face_start=np.array(self._face_start, dtype="int64"),
+            has_video_meta=frame_meta[:, 0].astype("bool"),
+            pts_time=frame_meta[:, 1],
+            keyframe=frame_meta[:, 2].astype("bool"),
+            face_keys=np.array(self._face_keys, dtype="uint8"),
+            boxes=np.array(self._boxes, dtype="int64").reshape(num_faces, 4),
+            landmarks=(np.stack(self._landmarks) if self._landmarks
+                       else np.zeros((0, 68, 2), dtype="float32")),
+            thumbs=np.array(self._thumbs, dtype="int64").reshape(num_faces, 4),
+            mask_start=np.array(self._mask_start, dtype="int64"),
+            mask_state=np.array(self._mask_state, dtype="uint8"),
+            masks=np.array(self._masks, dtype="int64").reshape(len(self._masks), 6),
+            mask_affine=(np.stack(self._mask_affine) if self._mask_affine
+                         else np.zeros((0, 2, 3), dtype="float64")))
+
+        sections = {}
+        for name, array in columns.items():
+            padding = -self._offset % _ALIGN
+            self._file.write(b"\0" * padding)
+            self._offset += padding
+            array = np.ascontiguousarray(array)
+            sections[name] = (self._offset, array.dtype.str, array.shape)
+            self._write_blob(array.tobytes())
+
+        header = pickle.dumps(dict(meta=meta,
+                                   frames=self._frames,
+                                   sections=sections,
+                                   mask_names=list(self._strings["mask"]),
+                                   centerings=list(self._strings["centering"]),
+                                   frame_extra=self._frame_extra,
+                                   face_extra=self._face_extra),
+                              protocol=pickle.HIGHEST_PROTOCOL)
+        offset, length = self._write_blob(header)
+        self._file.write(_FOOTER.pack(offset, length))
+        self._file.close()
+        logger.debug("Written columnar alignments: (frames: %s, faces: %s, masks: %s)",
+                     len(self._frames), num_faces, len(self._masks))
+
+
+class _ColumnarStore():
+    """ Read only, memory-mapped access to a columnar alignments file.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to the columnar alignments file
+    """
+    def __init__(self, filename: str) -> None:
+        self._filename = os.path.abspath(filename)
+        with open(filename, "rb") as in_file:
+            self._mmap = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a columnar alignments file: '{filename}'")
+        offset, length = _FOOTER.unpack(self._mmap[-_FOOTER.size:])
+        header = pickle.loads(self._mmap[offset:offset + length])
+        self.meta: dict = header["meta"]
+        self.frames: List[str] = header["frames"]
+        self.mask_names: List[str] = header["mask_names"]
+        self._centerings: List[str] = header["centerings"]
+        self.frame_extra: Dict[int, dict] = header["frame_extra"]
+        self.face_extra: Dict[int, dict] = header["face_extra"]
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.frombuffer(self._mmap,
+                                dtype=dtype,
+                                count=int(np.prod(shape)),
+                                offset=offset).reshape(shape)
+            for name, (offset, dtype, shape) in header["sections"].items()}
+        logger.debug("Opened columnar alignments: (file: '%s', frames: %s, faces: %s)",
+                     filename, len(self.frames), len(self.columns["face_keys"]))
+
+    @property
+    def filename(self) -> str:
+        """ str: The absolute path to the file that this store reads from """
+        return self._filename
+
+    def close(self) -> None:
+        """ Release the memory-mapped file. """
+        self.columns = {}
+        self._mmap.close()
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """ Read raw data from the blob section of the file.
+
+        Parameters
+        ----------
+        offset: int
+            The offset of the data within the file
+        length: int
+            The length of the data
+
+        Returns
+        -------
+        bytes
+            The requested data
+        """
+        return self._mmap[offset:offset + length]
+
+    def decode_face(self, index: int) -> dict:
+        """ Decode a face into the standard alignments dictionary format.
+
+        Parameters
+        ----------
+        index: int
+            The row index of the face to decode
+
+        Returns
+        -------
+        dict
+            The face's alignments
+        """
+        cols = self.columns
+        flags = int(cols["face_keys"][index])
+        face: Dict[str, Any] = {}
+        for key, value in zip("xwyh", cols["boxes"][index, [0, 2, 1, 3]].tolist()):
+            if flags & _KEYS[key]:
+                face[key] = value
+        if flags & _KEYS["landmarks_xy"]:
+            face["landmarks_xy"] = cols["landmarks"][index].copy()
+        if flags & _KEYS["mask"]:
+            face["mask"] = self._decode_masks(index)
+        if flags & _KEYS["thumb"]:
+            offset, length, rows, columns = cols["thumbs"][index].tolist()
+            thumb = np.frombuffer(self._read(offset, length), dtype="uint8").copy()
+            face["thumb"] = thumb if columns < 0 else thumb.reshape(rows, columns)
+        face.update(self.face_extra.get(index, {}))
+        return face
+
+    def _decode_masks(self, index: int) -> Optional[dict]:
+        """ Decode the masks for a face.
+
+        Parameters
+        ----------
+        index: int
+            The row index of the face to decode the masks for
+
+        Returns
+        -------
+        dict or ``None``
+            The face's masks in the standard alignments format
+        """
+        cols = self.columns
+        if cols["mask_state"][index] == _MASK_NONE:
+            return None
+        retval = {}
+        for row in range(int(cols["mask_start"][index]), int(cols["mask_start"][index + 1])):
+            offset, length, name, interpolator, size, centering = cols["masks"][row].tolist()
+            retval[self.mask_names[name]] = dict(mask=self._read(offset, length),
+                                                 affine_matrix=cols["mask_affine"][row].copy(),
+                                                 interpolator=interpolator,
+                                                 stored_size=size,
+                                                 stored_centering=self._centerings[centering])
+        return retval
+
+    def decode_frame(self, index: int) -> dict:
+        """ Decode a frame into the standard alignments dictionary format.
+
+        Parameters
+        ----------
+        index: int
+            The row index of the frame to decode
+
+        Returns
+        -------
+        dict
+            The frame's alignments
+        """
+        cols = self.columns
+        start, end = cols["face_start"][index:index + 2].tolist()
+        frame: Dict[str, Any] = {}
+        if cols["has_video_meta"][index]:
+            frame["video_meta"] = dict(pts_time=float(cols["pts_time"][index]),
+                                       keyframe=bool(cols["keyframe"][index]))
+        frame["faces"] = [self.decode_face(idx) for idx in range(start, end)]
+        frame.update(self.frame_extra.get(index, {}))
+        return frame
+
+
+class ColumnarAlignmentsData(MutableMapping):  # pylint:disable=too-many-ancestors
+    """ A lazily decoded, dictionary-like view of a columnar alignments file.
+
+    Behaves as the standard alignments ``{frame_name: {"faces": [...]}}`` dictionary. A frame is
+    decoded the first time it is accessed by key, and is then held in memory so that any changes
+    made to it are persisted. :func:`get` decodes frames without holding them, so should be used
+    for read only access to frames.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to the columnar alignments file
+    """
+    def __init__(self, filename: str) -> None:
+        logger.debug("Initializing %s: (filename: '%s')", self.__class__.__name__, filename)
+        self._store: Optional[_ColumnarStore] = None
+        self._rows: Dict[str, Optional[int]] = {}
+        self._cache: Dict[str, dict] = {}
+        self.open(filename)
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def meta(self) -> dict:
+        """ dict: The alignments file meta information stored in the file """
+        assert self._store is not None
+        return self._store.meta
+
+    @property
+    def filename(self) -> Optional[str]:
+        """ str: The absolute path to the backing file or ``None`` if it is closed """
+        return None if self._store is None else self._store.filename
+
+    def open(self, filename: str) -> None:
+        """ Open the columnar alignments file that backs this data.
+
+        Any frames that have been accessed are kept, so this can be used to swap the backing file
+        for one that has been saved from this data.
+
+        Parameters
+        ----------
+        filename: str
+            The full path to the columnar alignments file
+        """
+        self.close()
+        self._store = _ColumnarStore(filename)
+        rows: Dict[str, Optional[int]] = {name: idx for idx, name in enumerate(self._store.frames)}
+        if self._rows:
+            # Frames that do not exist in the new file must already be held in memory
+            assert all(name in rows or name in self._cache for name in self._rows)
+            rows = {name: rows.get(name) for name in self._rows}
+        self._rows = rows
+
+    def close(self) -> None:
+        """ Release the backing file. Frames that have not been accessed become unavailable
+        until :func:`open` is called. """
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def __getitem__(self, key: str) -> dict:
+        if key not in self._cache:
+            self._cache[key] = self._decode(key)
+        return self._cache[key]
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self._rows.setdefault(key, None)
+        self._cache[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._rows[key]
+        self._cache.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def _decode(self, key: str) -> dict:
+        """ Decode a frame from the backing file.
+
+        Parameters
+        ----------
+        key: str
+            The frame name to decode
+
+        Returns
+        -------
+        dict
+            The decoded frame
+        """
+        row = self._rows[key]
+        assert row is not None and self._store is not None
+        return self._store.decode_frame(row)
+
+    def get(self, key, default=None):
+        """ Obtain a frame without holding it in memory. Any changes made to the returned frame
+        will not be persisted unless the frame has previously been accessed by key.
+
+        Parameters
+        ----------
+        key: str
+            The frame name to obtain
+        default: object, optional
+            The value to return if the frame does not exist. Default: ``None``
+
+        Returns
+        -------
+        dict
+            The frame's alignments
+        """
+        if key in self._cache:
+            return self._cache[key]
+        if key not in self._rows:
+            return default
+        return self._decode(key)
+
+    def _stored_rows(self) -> np.ndarray:
+        """ Obtain the frame rows that are read directly from the columns.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The rows of the frames that have not been accessed, and so are unchanged from the
+            backing file
+        """
+        return np.array([row for key, row in self._rows.items()
+                         if row is not None and key not in self._cache], dtype="int64")
+
+    def _stored_faces(self) -> np.ndarray:
+        """ Obtain a mask over all face rows for faces within frames that have not been
+        accessed.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Boolean mask of face rows that are unchanged from the backing file
+        """
+        assert self._store is not None
+        frames = np.zeros(len(self._store.frames), dtype="bool")
+        frames[self._stored_rows()] = True
+        return np.repeat(frames, np.diff(self._store.columns["face_start"]))
+
+    def faces_count(self) -> int:
+        """ Obtain the total number of faces in the alignments.
+
+        Returns
+        -------
+        int
+            The total number of faces in the alignments
+        """
+        assert self._store is not None
+        retval = int(self._stored_faces().sum())
+        return retval + sum(len(frame["faces"]) for frame in self._cache.values())
+
+    def mask_summary(self) -> Dict[str, int]:
+        """ Obtain the mask type names stored in the alignments with the number of faces which
+        possess the mask type.
+
+        Returns
+        -------
+        dict
+            The mask type name as key with the number of faces with the mask type as value
+        """
+        assert self._store is not None
+        cols = self._store.columns
+        stored = self._stored_faces()
+        has_mask = (cols["face_keys"] & _KEYS["mask"]).astype("bool")
+        in_columns = stored & has_mask
+        retval: Dict[str, int] = {}
+
+        # Faces whose masks are not in the mask table either have no mask or a non-standard mask
+        # held with the face's extra keys
+        other = np.nonzero(stored & ~has_mask)[0]
+        faces = [self._store.face_extra[idx] for idx in other
+                 if self._store.face_extra.get(idx, {}).get("mask") is not None]
+        no_mask = (int((in_columns & (cols["mask_state"] == _MASK_NONE)).sum())
+                   + len(other) - len(faces))
+        faces.extend(face for frame in self._cache.values() for face in frame["faces"])
+        for face in faces:
+            if face.get("mask", None) is None:
+                no_mask += 1
+                continue
+            for key in face["mask"]:
+                retval[key] = retval.get(key, 0) + 1
+        if no_mask:
+            retval["none"] = no_mask
+
+        mask_faces = np.repeat(np.arange(len(cols["face_keys"])), np.diff(cols["mask_start"]))
+        names = cols["masks"][:, 2][in_columns[mask_faces]]
+        for name, count in zip(*np.unique(names, return_counts=True)):
+            key = self._store.mask_names[name]
+            retval[key] = retval.get(key, 0) + int(count)
+        return retval
+
+    def video_meta(self, key: str) -> Optional[dict]:
+        """ Obtain the video meta information for a frame.
+
+        Parameters
+        ----------
+        key: str
+            The frame name to obtain the video meta information for
+
+        Returns
+        -------
+        dict or ``None``
+            The `pts_time` and `keyframe` for the frame or ``None`` if the frame does not hold
+            video meta information
+        """
+        if key in self._cache or self._rows[key] is None:
+            return self[key].get("video_meta")
+        assert self._store is not None
+        row = self._rows[key]
+        cols = self._store.columns
+        if cols["has_video_meta"][row]:
+            return dict(pts_time=float(cols["pts_time"][row]),
+                        keyframe=bool(cols["keyframe"][row]))
+        return self._store.frame_extra.get(row, {}).get("video_meta")
+
+    def has_thumbnails(self) -> bool:
+        """ Check whether all faces hold a thumbnail image.
+
+        Returns
+        -------
+        bool
+            ``True`` if all faces in the alignments contain thumbnail images otherwise ``False``
+        """
+        assert self._store is not None
+        stored = self._stored_faces()
+        thumbs = (self._store.columns["face_keys"] & _KEYS["thumb"]).astype("bool")
+        in_extra = [idx for idx in np.nonzero(stored & ~thumbs)[0]
+                    if "thumb" in self._store.face_extra.get(idx, {})]
+        if (stored & ~thumbs).sum() != len(in_extra):
+            return False
+        faces = [self._store.face_extra[idx] for idx in in_extra]
+        faces.extend(face for frame in self._cache.values() for face in frame["faces"])
+        return all(np.any(face.get("thumb")) for face in faces)
+
+
+def save_columnar(filename: str, data: MutableMapping, meta: dict) -> None:
+    """ Save alignments data to a columnar alignments file.
+
+    The file is written to a temporary location and moved into place once complete. If the data
+    is backed by the file being written to, it is re-opened from the newly written file.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to the file to save
+    data: dict or :class:`ColumnarAlignmentsData`
+        The alignments data to save
+    meta: dict
+        The alignments file meta information
+    """
+    logger.debug("Saving columnar alignments: '%s'", filename)
+    tmp_file = f"{filename}~"
+    writer = _ColumnarWriter(tmp_file)
+    for key in data:
+        writer.add_frame(key, data.get(key))
+    writer.close(meta)
+
+    if isinstance(data, ColumnarAlignmentsData):
+        data.close()
+    os.replace(tmp_file, filename)
+    if isinstance(data, ColumnarAlignmentsData):
+        data.open(filename)
@@ -135,6 +135,12 @@ class DetectedFace():
         assert self.top is not None and self.height is not None
         return self.top + self.height
 
+    @property
+    def compressed_training_masks(self) -> Optional[Tuple[bytes, Tuple[int, int, int]]]:
+        """ tuple or ``None``: The compressed combined training masks and their shape, as stored by
+        :func:`store_training_masks`. ``None`` if no training masks are stored """
+        return self._training_masks
+
     def add_mask(self,
                  name: str,
                  mask: np.ndarray,
@@ -238,6 +244,26 @@ class DetectedFace():
         combined = np.concatenate(valid, axis=-1)
         self._training_masks = (compress(combined), combined.shape)
 
+    def store_compressed_training_masks(self,
+                                        masks: Optional[Tuple[bytes, Tuple[int, int, int]]],
+                                        delete_masks: bool = False) -> None:
+        """ Store combined training masks that have already been compressed by
+        :func:`store_training_masks`, without decompressing them.
+
+        Parameters
+        ----------
+        masks: tuple or ``None``
+            The compressed combined training masks and their shape, as obtained from
+            :attr:`compressed_training_masks`
+        delete_masks: bool, optional
+            ``True`` to delete any of the :class:`Mask` objects owned by this detected face. Use to
+            free up unrequired memory usage. Default: ``False``
+        """
+        if delete_masks:
+            del self.mask
+            self.mask = {}
+        self._training_masks = masks
+
     def get_training_masks(self) -> Optional[np.ndarray]:
         """ Obtain the decompressed combined training masks.
 
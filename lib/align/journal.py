@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+""" Append-only journal of frames added to an alignments file.
+
+Saving an alignments file re-serializes every frame that it holds, so periodically saving a
+growing alignments file has a cost that increases with every save. The journal instead holds each
+frame as a separate record appended to a log file alongside the alignments file, so that only new
+frames need to be written. The journal is compacted into the alignments file when the alignments
+are saved, and any frames held in the journal of an interrupted process can be recovered.
+
+Each record is laid out as::
+
+    payload length (uint32) | payload crc32 (uint32) | payload (compressed (frame name, frame))
+"""
+import logging
+import os
+import struct
+import zlib
+
+from typing import Generator, Optional, Tuple, TYPE_CHECKING
+
+from lib.serializer import get_serializer
+
+if TYPE_CHECKING:
+    from io import BufferedWriter
+
+logger = logging.getLogger(__name__)
+
+_RECORD = struct.Struct("<II")
+
+
+class AlignmentsJournal():
+    """ An append-only, crash tolerant log of frames added to an alignments file.
+
+    Parameters
+    ----------
+    alignments_file: str
+        The full path to the alignments file that this journal belongs to. The journal is stored
+        alongside this file with an additional `.journal` extension
+    """
+    def __init__(self, alignments_file: str) -> None:
+        logger.debug("Initializing %s: (alignments_file: '%s')",
+                     self.__class__.__name__, alignments_file)
+        self._filename = f"{alignments_file}.journal"
+        self._serializer = get_serializer("compressed")
+        self._file: Optional["BufferedWriter"] = None
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def filename(self) -> str:
+        """ str: The full path to the journal file """
+        return self._filename
+
+    @property
+    def exists(self) -> bool:
+        """ bool: ``True`` if a journal file exists on disk otherwise ``False`` """
+        return os.path.isfile(self._filename)
+
+    def read(self) -> Generator[Tuple[str, dict], None, None]:
+        """ Read the frames held in an existing journal, in the order that they were written.
+
+        Reading stops at the first incomplete or corrupt record, which will exist if the process
+        writing the journal was interrupted part way through a write.
+
+        Yields
+        ------
+        frame_name: str
+            The name of the frame
+        frame: dict
+            The frame's alignments in the standard alignments dictionary format
+        """
+        if not self.exists:
+            return
+        with open(self._filename, "rb") as in_file:
+            data = in_file.read()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            length, crc = _RECORD.unpack_from(data, offset)
+            payload = data[offset + _RECORD.size:offset + _RECORD.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                logger.warning("Discarding incomplete alignments journal record at byte %s of "
+                               "'%s'", offset, self._filename)
+                break
+            frame_name, frame = self._serializer.unmarshal(payload)
+            yield frame_name, frame
+            offset += _RECORD.size + length
+
+    def append(self, frame_name: str, frame: dict) -> None:
+        """ Append a frame to the end of the journal.
+
+        The record is handed to the operating system once written, so it survives the writing
+        process exiting unexpectedly. Call :func:`sync` to ensure that written records also survive
+        a system failure.
+
+        Parameters
+        ----------
+        frame_name: str
+            The name of the frame
+        frame: dict
+            The frame's alignments in the standard alignments dictionary format
+        """
+        if self._file is None:
+            self._file = open(self._filename, "ab")  # pylint:disable=consider-using-with
+        payload = self._serializer.marshal((frame_name, frame))
+        self._file.write(_RECORD.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+    def sync(self) -> None:
+        """ Commit all records that have been written to the journal to disk. """
+        if self._file is None:
+            return
+        os.fsync(self._file.fileno())
+        logger.trace("Synced alignments journal: '%s'", self._filename)  # type:ignore
+
+    def remove(self) -> None:
+        """ Close and delete the journal. Called once the journal's frames have been saved to the
+        alignments file. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.exists:
+            os.remove(self._filename)
+            logger.debug("Removed alignments journal: '%s'", self._filename)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+""" Persistent on-disk index of the Faceswap PNG header information for a folder of faces.
+
+Opening a large face folder requires the PNG header of every face to be read and parsed. The
+faceset manifest holds the information that is commonly required from these headers in a single
+sidecar file within the face folder, so that subsequent opens of the folder only need to read the
+headers of faces that have been added or changed since the manifest was last updated. Scores
+calculated for faces by the sort tool can also be stored in the manifest, so that they are only
+calculated once for each face.
+"""
+import logging
+import os
+
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from lib.image import read_image_meta_batch
+from lib.serializer import get_serializer
+
+from .aligned_face import AlignedFace
+
+if TYPE_CHECKING:
+    from .alignments import PNGHeaderDict, PNGHeaderSourceDict
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_NAME = ".fs_manifest"
+_MANIFEST_VERSION = 2
+
+
+class FacesetManifest():
+    """ The Faceswap PNG header information for every face in a folder, held in a single,
+    incrementally updated, sidecar file.
+
+    For each ``.png`` file in the folder the manifest holds the file's size and modification time,
+    the face's bounding box, landmarks, pose and source information, and the names of the masks
+    stored in the face's header. The mask data itself is not held in the manifest. Any named scores
+    that have been stored for a face are discarded when the face is changed.
+
+    On load, the size and modification time of every file in the folder is checked against the
+    manifest. Only the headers of files that have been added or changed are read, and the updated
+    manifest is atomically written back to the folder. If the folder is not writable, the manifest
+    is still created, but only held in memory.
+
+    Parameters
+    ----------
+    folder: str
+        The full path to a folder of Faceswap extracted faces
+    """
+    def __init__(self, folder: str) -> None:
+        logger.debug("Initializing %s: (folder: '%s')", self.__class__.__name__, folder)
+        self._folder = folder
+        self._filename = os.path.join(folder, f"{_MANIFEST_NAME}.pickle")
+        self._serializer = get_serializer("pickle")
+
+        self._index: Dict[str, int] = {}
+        self._data = self._empty_data()
+        self._update()
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def folder(self) -> str:
+        """ str: The full path to the folder that this manifest indexes """
+        return self._folder
+
+    @property
+    def filenames(self) -> List[str]:
+        """ list: The sorted file names (without path) of every png file in the folder """
+        return self._data["filenames"]
+
+    def __len__(self) -> int:
+        return len(self._data["filenames"])
+
+    def __contains__(self, filename: str) -> bool:
+        return os.path.basename(filename) in self._index
+
+    @classmethod
+    def _empty_data(cls) -> dict:
+        """ Obtain the column layout of the manifest populated with no faces.
+
+        Returns
+        -------
+        dict
+            The manifest columns. `filenames`, `sources` and `masks` are lists, `scores` is a
+            dictionary of score name to a list of scores, all other columns are
+            :class:`numpy.ndarray` with one row per face
+        """
+        return dict(version=_MANIFEST_VERSION,
+                    filenames=[],
+                    sizes=np.zeros((0, ), dtype="int64"),
+                    mtimes=np.zeros((0, ), dtype="int64"),
+                    boxes=np.zeros((0, 4), dtype="int64"),
+                    landmarks=np.zeros((0, 68, 2), dtype="float32"),
+                    pose=np.zeros((0, 2), dtype="float32"),
+                    sources=[],
+                    masks=[],
+                    scores={})
+
+    def _load(self) -> None:
+        """ Load the existing manifest from disk, if one exists and is of the current version. """
+        if not os.path.isfile(self._filename):
+            logger.debug("No existing manifest: '%s'", self._filename)
+            return
+        try:
+            data = self._serializer.load(self._filename)
+        except Exception as err:  # pylint:disable=broad-except
+            logger.warning("Unable to read faceset manifest '%s'. It will be re-created. "
+                           "Original error: %s", self._filename, str(err))
+            return
+        if not isinstance(data, dict) or data.get("version") != _MANIFEST_VERSION:
+            logger.debug("Discarding outdated manifest: '%s'", self._filename)
+            return
+        self._data = data
+
+    def _scan_folder(self) -> Dict[str, Tuple[int, int]]:
+        """ Obtain the size and modification time of every png file in the folder.
+
+        Returns
+        -------
+        dict
+            The file name (without path) as key with a tuple of (`size`, `modification time`) as
+            value
+        """
+        retval = {}
+        with os.scandir(self._folder) as entries:
+            for entry in entries:
+                if (entry.name.startswith(".")
+                        or os.path.splitext(entry.name)[-1].lower() != ".png"
+                        or not entry.is_file()):
+                    continue
+                stat = entry.stat()
+                retval[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        logger.debug("Scanned %s png files in '%s'", len(retval), self._folder)
+        return retval
+
+    def _update(self) -> None:
+        """ Load the manifest and bring it up to date with the current contents of the folder,
+        reading the headers of any new or modified files and saving the manifest if it has
+        changed. """
+        self._load()
+        stats = self._scan_folder()
+        data = self._data
+
+        keep = [idx for idx, (fname, size, mtime) in enumerate(zip(data["filenames"],
+                                                                   data["sizes"].tolist(),
+                                                                   data["mtimes"].tolist()))
+                if stats.get(fname) == (size, mtime)]
+        kept = set(data["filenames"][idx] for idx in keep)
+        stale = sorted(fname for fname in stats if fname not in kept)
+        removed = len(data["filenames"]) - len(keep)
+        logger.debug("Manifest status: (unchanged: %s, new or modified: %s, removed: %s)",
+                     len(keep), len(stale), removed)
+
+        if stale or removed:
+            new = self._read_headers(stale, stats)
+            self._data = self._merge(keep, new)
+            self._save()
+        self._index = {fname: idx for idx, fname in enumerate(self._data["filenames"])}
+
+    def _read_headers(self,
+                      filenames: List[str],
+                      stats: Dict[str, Tuple[int, int]]) -> dict:
+        """ Read the PNG headers of the given files into manifest columns.
+
+        Parameters
+        ----------
+        filenames: list
+            The file names (without path) of the files to read the headers from
+        stats: dict
+            The file name as key with a tuple of (`size`, `modification time`) as value
+
+        Returns
+        -------
+        dict
+            The manifest columns for the given files
+        """
+        retval = self._empty_data()
+        if not filenames:
+            return retval
+        count = len(filenames)
+        retval["filenames"] = filenames
+        retval["sizes"] = np.array([stats[fname][0] for fname in filenames], dtype="int64")
+        retval["mtimes"] = np.array([stats[fname][1] for fname in filenames], dtype="int64")
+        retval["boxes"] = np.zeros((count, 4), dtype="int64")
+        retval["landmarks"] = np.zeros((count, 68, 2), dtype="float32")
+        retval["pose"] = np.zeros((count, 2), dtype="float32")
+        retval["sources"] = [None for _ in range(count)]
+        retval["masks"] = [[] for _ in range(count)]
+        index = {fname: idx for idx, fname in enumerate(filenames)}
+
+        if count > 1000:
+            logger.info("Updating faceset manifest for %s faces: '%s'", count, self._folder)
+        for fullpath, meta in read_image_meta_batch([os.path.join(self._folder, fname)
+                                                     for fname in filenames]):
+            itxt = meta.get("itxt", {})
+            if "alignments" not in itxt or "source" not in itxt:
+                logger.trace("No faceswap header: '%s'", fullpath)  # type:ignore
+                continue
+            idx = index[os.path.basename(fullpath)]
+            alignments = itxt["alignments"]
+            landmarks = np.array(alignments["landmarks_xy"], dtype="float32")
+            pose = AlignedFace(landmarks).pose
+            retval["boxes"][idx] = (alignments["x"], alignments["y"],
+                                    alignments["w"], alignments["h"])
+            retval["landmarks"][idx] = landmarks
+            retval["pose"][idx] = (pose.pitch, pose.yaw)
+            retval["sources"][idx] = itxt["source"]
+            retval["masks"][idx] = sorted(alignments.get("mask", {}))
+        return retval
+
+    def _merge(self, keep: List[int], new: dict) -> dict:
+        """ Merge the unchanged rows of the currently loaded manifest with newly read rows.
+
+        Parameters
+        ----------
+        keep: list
+            The row indices of the currently loaded manifest that are unchanged
+        new: dict
+            The manifest columns for new or modified files
+
+        Returns
+        -------
+        dict
+            The merged manifest columns, sorted by file name
+        """
+        old = self._data
+        filenames = [old["filenames"][idx] for idx in keep] + new["filenames"]
+        order = sorted(range(len(filenames)), key=filenames.__getitem__)
+        retval = dict(version=_MANIFEST_VERSION, filenames=[filenames[idx] for idx in order])
+        for key in ("sizes", "mtimes", "boxes", "landmarks", "pose"):
+            retval[key] = np.concatenate([old[key][keep], new[key]])[order]
+        for key in ("sources", "masks"):
+            merged = [old[key][idx] for idx in keep] + new[key]
+            retval[key] = [merged[idx] for idx in order]
+        retval["scores"] = {}
+        for name, scores in old["scores"].items():
+            merged = [scores[idx] for idx in keep] + [None for _ in new["filenames"]]
+            retval["scores"][name] = [merged[idx] for idx in order]
+        return retval
+
+    def _save(self) -> None:
+        """ Atomically write the manifest to the face folder. Failure to write is not fatal, as
+        the manifest will just be re-created on next load. """
+        tmp_file = f"{self._filename}~"
+        try:
+            self._serializer.save(tmp_file, self._data)
+            os.replace(tmp_file, self._filename)
+        except Exception as err:  # pylint:disable=broad-except
+            logger.warning("Unable to save faceset manifest to '%s'. Original error: %s",
+                           self._folder, str(err))
+            return
+        logger.debug("Saved manifest: '%s' (%s faces)", self._filename, len(self))
+
+    def _row(self, filename: str) -> Optional[int]:
+        """ Obtain the row of a face that has a valid Faceswap header.
+
+        Parameters
+        ----------
+        filename: str
+            The full path or file name of the face
+
+        Returns
+        -------
+        int or ``None``
+            The row index of the face, or ``None`` if the file does not exist in the manifest or
+            does not contain a valid Faceswap header
+        """
+        idx = self._index.get(os.path.basename(filename))
+        if idx is None or self._data["sources"][idx] is None:
+            return None
+        return idx
+
+    def get_source(self, filename: str) -> Optional["PNGHeaderSourceDict"]:
+        """ Obtain the source information from a face's PNG header.
+
+        Parameters
+        ----------
+        filename: str
+            The full path or file name of the face
+
+        Returns
+        -------
+        dict or ``None``
+            A copy of the `source` section of the face's PNG header or ``None`` if the face does
+            not contain a valid Faceswap header
+        """
+        idx = self._row(filename)
+        return None if idx is None else dict(self._data["sources"][idx])
+
+    def get_metadata(self, filename: str) -> Optional["PNGHeaderDict"]:
+        """ Obtain the information from a face's PNG header, without any stored mask data.
+
+        Parameters
+        ----------
+        filename: str
+            The full path or file name of the face
+
+        Returns
+        -------
+        dict or ``None``
+            The PNG header information in the same format as held in the face's header, with an
+            empty `mask` dictionary, or ``None`` if the face does not contain a valid Faceswap
+            header
+        """
+        idx = self._row(filename)
+        if idx is None:
+            return None
+        left, top, width, height = (int(val) for val in self._data["boxes"][idx])
+        return dict(alignments=dict(x=left,
+                                    y=top,
+                                    w=width,
+                                    h=height,
+                                    landmarks_xy=self._data["landmarks"][idx].copy(),
+                                    mask={}),
+                    source=dict(self._data["sources"][idx]))
+
+    def get_pose(self, filename: str) -> Optional[Tuple[float, float]]:
+        """ Obtain the estimated pose of a face.
+
+        Parameters
+        ----------
+        filename: str
+            The full path or file name of the face
+
+        Returns
+        -------
+        tuple or ``None``
+            The (`pitch`, `yaw`) of the face in euler angles, or ``None`` if the face does not
+            contain a valid Faceswap header
+        """
+        idx = self._row(filename)
+        if idx is None:
+            return None
+        pitch, yaw = self._data["pose"][idx]
+        return float(pitch), float(yaw)
+
+    def get_mask_names(self, filename: str) -> List[str]:
+        """ Obtain the names of the masks stored in a face's PNG header.
+
+        Parameters
+        ----------
+        filename: str
+            The full path or file name of the face
+
+        Returns
+        -------
+        list
+            The names of the masks stored in the face's header. An empty list if there are no
+            masks or the face does not contain a valid Faceswap header
+        """
+        idx = self._row(filename)
+        return [] if idx is None else list(self._data["masks"][idx])
+
+    def get_scores(self, name: str, filenames: List[str]) -> List[Optional[Any]]:
+        """ Obtain the stored scores of the given name for the given faces.
+
+        Parameters
+        ----------
+        name: str
+            The name of the scores to obtain
+        filenames: list
+            The full paths or file names of the faces to obtain scores for
+
+        Returns
+        -------
+        list
+            The stored score for each face. ``None`` for faces that do not have a stored score
+        """
+        scores = self._data["scores"].get(name)
+        if scores is None:
+            return [None for _ in filenames]
+        indices = [self._index.get(os.path.basename(fname)) for fname in filenames]
+        return [None if idx is None else scores[idx] for idx in indices]
+
+    def set_scores(self, name: str, scores: Dict[str, Any]) -> None:
+        """ Store scores of the given name for faces and save the manifest.
+
+        Parameters
+        ----------
+        name: str
+            The name of the scores to store
+        scores: dict
+            The full path or file name of each face mapped to its score. Faces that do not exist
+            in the manifest are ignored
+        """
+        stored = self._data["scores"].setdefault(name, [None for _ in range(len(self))])
+        updated = 0
+        for fname, score in scores.items():
+            idx = self._index.get(os.path.basename(fname))
+            if idx is None:
+                continue
+            stored[idx] = score
+            updated += 1
+        logger.debug("Storing %s '%s' scores", updated, name)
+        if updated:
+            self._save()
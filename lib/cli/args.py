@@ -337,6 +337,22 @@ class ExtractConvertArgs(FaceSwapArgs):
             group=_("Data"),
             help=_("Optional path to an alignments file. Leave blank if the alignments file is "
                    "at the default location.")))
+        argument_list.append(dict(
+            opts=("-vd", "--video-decoders"),
+            action=Slider,
+            min_max=(1, 16),
+            rounding=1,
+            type=int,
+            dest="video_decoders",
+            default=1,
+            group=_("settings"),
+            help=_("The number of processes to decode an input video with. Values above 1 split "
+                   "the video into segments and decode them in parallel, which can speed up "
+                   "processing when decoding the video is the bottleneck. Frames are "
+                   "still processed in order. NB: Each additional decoder buffers frames ahead "
+                   "of processing, so RAM usage will increase (up to approximately 1GB in total). "
+                   "If the video has not been scanned previously it will be scanned once to "
+                   "locate the key frames. Ignored if the input is a folder of images.")))
         return argument_list
 
 
@@ -577,12 +593,15 @@ class ExtractArgs(ExtractConvertArgs):
             dest="save_interval",
             default=0,
             group=_("output"),
-            help=_("Automatically save the alignments file after a set amount of frames. By "
-                   "default the alignments file is only saved at the end of the extraction "
-                   "process. NB: If extracting in 2 passes then the alignments file will only "
-                   "start to be saved out during the second pass. WARNING: Don't interrupt the "
-                   "script when writing the file because it might get corrupted. Set to 0 to "
-                   "turn off")))
+            help=_("Commit extracted alignments to disk after a set amount of frames. Each "
+                   "extracted frame is appended to a journal alongside the alignments file, "
+                   "which is merged into the alignments file at the end of the extraction "
+                   "process. If extraction is interrupted, the frames held in the journal are "
+                   "recovered the next time extraction is run for the same alignments file, and "
+                   "those frames are skipped. This option forces the journal to be written to "
+                   "disk after the given number of frames, so that it also survives a system "
+                   "crash. NB: If extracting in 2 passes then the journal will only start to be "
+                   "written during the second pass. Set to 0 to turn off")))
         argument_list.append(dict(
             opts=("-dl", "--debug-landmarks"),
             action="store_true",
@@ -614,6 +633,22 @@ class ExtractArgs(ExtractConvertArgs):
             default=False,
             group=_("settings"),
             help=_("Skip frames that already have detected faces in the alignments file")))
+        argument_list.append(dict(
+            opts=("-tm", "--telemetry"),
+            action=Slider,
+            min_max=(0, 300),
+            rounding=5,
+            type=int,
+            dest="telemetry",
+            default=0,
+            group=_("settings"),
+            help=_("Record how long each stage of the extraction pipeline (loading images, the "
+                   "input, predict and output threads of each plugin and saving faces) spends "
+                   "working and waiting, along with its throughput, how full its batches are and "
+                   "how full the queues between stages are. A summary is written, as JSON lines, "
+                   "to a file named '<alignments>_telemetry.jsonl' alongside the alignments file "
+                   "at this interval in seconds, and a report naming the stage that limits "
+                   "extraction speed is shown when extraction completes. Set to 0 to turn off")))
         argument_list.append(dict(
             opts=("-ssf", "--skip-saving-faces"),
             action="store_true",
@@ -844,6 +879,17 @@ class ConvertArgs(ExtractConvertArgs):
                    "Setting this to 0 will use the maximum available. No matter what you set "
                    "this to, it will never attempt to use more processes than are available on "
                    "your system. If singleprocess is enabled this setting will be ignored.")))
+        argument_list.append(dict(
+            opts=("-pp", "--patch-processes"),
+            action="store_true",
+            dest="patch_processes",
+            default=False,
+            group=_("settings"),
+            help=_("Patch the swapped faces onto frames in separate processes rather than "
+                   "threads. Frames are passed between processes in shared memory and are still "
+                   "written in order. This allows the conversion to make use of many more CPU "
+                   "cores, at the cost of higher system RAM usage. The number of processes is set "
+                   "by the jobs option (-j). Not supported on Windows.")))
         argument_list.append(dict(
             opts=("-t", "--trainer"),
             type=str.lower,
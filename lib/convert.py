@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 """ Converter for Faceswap """
 
+import atexit
 import logging
+import multiprocessing as mp
+import queue as Queue
 import sys
+import traceback
 from dataclasses import dataclass
-from typing import Callable, cast, List, Optional, Tuple, TYPE_CHECKING, Union
+from typing import Callable, cast, Dict, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import cv2
 import numpy as np
 
+from lib.multithreading import has_process_support, MultiThread, SharedMemoryRing
 from plugins.plugin_loader import PluginLoader
 
 if sys.version_info < (3, 8):
@@ -100,6 +105,7 @@ class Converter():
 
         self._scale = arguments.output_scale / 100
         self._adjustments = Adjustments()
+        self._log_once = False
 
         self._load_plugins()
         logger.debug("Initialized %s", self.__class__.__name__)
@@ -110,6 +116,21 @@ class Converter():
         process """
         return self._args
 
+    @property
+    def output_size(self) -> int:
+        """ int: The size of the face, in pixels, that is output from the Faceswap model """
+        return self._output_size
+
+    @property
+    def _roi_compatible(self) -> bool:
+        """ bool: ``True`` if the swapped faces can be composited onto the frame within the
+        region that each face covers only. Sharpening is sized relative to the full frame, and
+        transparent and scaled output requires the full frame as floating point, so these fall back
+        to compositing the full frame. """
+        return (not self._draw_transparent
+                and self._scale == 1
+                and self._adjustments.sharpening is None)
+
     def reinitialize(self, config: "FaceswapConfig") -> None:
         """ Reinitialize this :class:`Converter`.
 
@@ -186,7 +207,6 @@ class Converter():
         """
         logger.debug("Starting convert process. (in_queue: %s, out_queue: %s)",
                      in_queue, out_queue)
-        log_once = False
         while True:
             inbound: Union[Literal["EOF"], "ConvertItem", List["ConvertItem"]] = in_queue.get()
             if inbound == "EOF":
@@ -200,24 +220,43 @@ class Converter():
             items = inbound if isinstance(inbound, list) else [inbound]
             for item in items:
                 logger.trace("Patch queue got: '%s'", item.inbound.filename)  # type: ignore
-                try:
-                    image = self._patch_image(item)
-                except Exception as err:  # pylint: disable=broad-except
-                    # Log error and output original frame
-                    logger.error("Failed to convert image: '%s'. Reason: %s",
-                                 item.inbound.filename, str(err))
-                    image = item.inbound.image
-
-                    loglevel = logger.trace if log_once else logger.warning  # type: ignore
-                    loglevel("Convert error traceback:", exc_info=True)
-                    log_once = True
-                    # UNCOMMENT THIS CODE BLOCK TO PRINT TRACEBACK ERRORS
-                    # import sys; import traceback
-                    # exc_info = sys.exc_info(); traceback.print_exception(*exc_info)
+                image = self.patch(item)
                 logger.trace("Out queue put: %s", item.inbound.filename)  # type: ignore
                 out_queue.put((item.inbound.filename, image))
         logger.debug("Completed convert process")
 
+    def patch(self, item: "ConvertItem") -> Union[np.ndarray, List[bytes]]:
+        """ Patch the swapped faces for a single item onto its frame.
+
+        If patching fails, the error is logged and the original frame is returned.
+
+        Parameters
+        ----------
+        item: :class:`~scripts.convert.ConvertItem`
+            The output from :class:`scripts.convert.Predictor`. Contains detected faces from the
+            Faceswap model as well as the frame to be patched.
+
+        Returns
+        -------
+        :class: `numpy.ndarray` or pre-encoded image output
+            The final frame ready for writing by a :mod:`plugins.convert.writer` plugin
+        """
+        try:
+            image = self._patch_image(item)
+        except Exception as err:  # pylint: disable=broad-except
+            # Log error and output original frame
+            logger.error("Failed to convert image: '%s'. Reason: %s",
+                         item.inbound.filename, str(err))
+            image = item.inbound.image
+
+            loglevel = logger.trace if self._log_once else logger.warning  # type: ignore
+            loglevel("Convert error traceback:", exc_info=True)
+            self._log_once = True
+            # UNCOMMENT THIS CODE BLOCK TO PRINT TRACEBACK ERRORS
+            # import sys; import traceback
+            # exc_info = sys.exc_info(); traceback.print_exception(*exc_info)
+        return image
+
     def _patch_image(self, predicted: "ConvertItem") -> Union[np.ndarray, List[bytes]]:
         """ Patch a swapped face onto a frame.
 
@@ -237,14 +276,17 @@ class Converter():
 
         """
         logger.trace("Patching image: '%s'", predicted.inbound.filename)  # type: ignore
-        frame_size = (predicted.inbound.image.shape[1], predicted.inbound.image.shape[0])
-        new_image, background = self._get_new_image(predicted, frame_size)
-        patched_face = self._post_warp_adjustments(background, new_image)
-        patched_face = self._scale_image(patched_face)
-        patched_face *= 255.0
-        patched_face = np.rint(patched_face,
-                               out=np.empty(patched_face.shape, dtype="uint8"),
-                               casting='unsafe')
+        if self._roi_compatible:
+            patched_face = self._patch_regions(predicted)
+        else:
+            frame_size = (predicted.inbound.image.shape[1], predicted.inbound.image.shape[0])
+            new_image, background = self._get_new_image(predicted, frame_size)
+            patched_face = self._post_warp_adjustments(background, new_image)
+            patched_face = self._scale_image(patched_face)
+            patched_face *= 255.0
+            patched_face = np.rint(patched_face,
+                                   out=np.empty(patched_face.shape, dtype="uint8"),
+                                   casting='unsafe')
         if self._writer_pre_encode is None:
             retval: Union[np.ndarray, List[bytes]] = patched_face
         else:
@@ -281,6 +323,37 @@ class Converter():
         background = predicted.inbound.image / np.array(255.0, dtype="float32")
         placeholder[:, :, :3] = background
 
+        for new_face, matrix, interpolator in self._get_warp_faces(predicted):
+            # Warp face with the mask
+            cv2.warpAffine(new_face,
+                           matrix,
+                           frame_size,
+                           placeholder,
+                           flags=cv2.WARP_INVERSE_MAP | interpolator,
+                           borderMode=cv2.BORDER_TRANSPARENT)
+
+        logger.trace("Got filename: '%s'. (placeholders: %s)",  # type: ignore
+                     predicted.inbound.filename, placeholder.shape)
+
+        return placeholder, background
+
+    def _get_warp_faces(self,
+                        predicted: "ConvertItem") -> List[Tuple[np.ndarray, np.ndarray, int]]:
+        """ Apply the pre-warp adjustments to each of the swapped faces in a frame.
+
+        Parameters
+        ----------
+        predicted: :class:`~scripts.convert.ConvertItem`
+            The output from :class:`scripts.convert.Predictor`.
+
+        Returns
+        -------
+        list
+            A tuple for each face in the frame containing the adjusted swapped face with its mask
+            in the alpha channel, the matrix for warping the face into the frame and the
+            interpolator to use for the warp
+        """
+        retval = []
         for new_face, detected_face, reference_face in zip(predicted.swapped_faces,
                                                            predicted.inbound.detected_faces,
                                                            predicted.reference_faces):
@@ -292,19 +365,108 @@ class Converter():
                                                   detected_face,
                                                   reference_face,
                                                   predicted_mask)
+            retval.append((new_face, reference_face.adjusted_matrix, interpolator))
+        return retval
 
-            # Warp face with the mask
-            cv2.warpAffine(new_face,
-                           reference_face.adjusted_matrix,
-                           frame_size,
-                           placeholder,
-                           flags=cv2.WARP_INVERSE_MAP | interpolator,
-                           borderMode=cv2.BORDER_TRANSPARENT)
+    @classmethod
+    def _get_regions(cls,
+                     faces: List[Tuple[np.ndarray, np.ndarray, int]],
+                     frame_size: Tuple[int, int]
+                     ) -> List[Tuple[Tuple[int, int, int, int],
+                                     List[Tuple[np.ndarray, np.ndarray, int]]]]:
+        """ Obtain the regions of the frame that the swapped faces will be warped into.
 
-        logger.trace("Got filename: '%s'. (placeholders: %s)",  # type: ignore
-                     predicted.inbound.filename, placeholder.shape)
+        Faces whose regions overlap are merged into a single region, so that they are composited
+        onto the frame together, in the same way as for a full frame.
 
-        return placeholder, background
+        Parameters
+        ----------
+        faces: list
+            The adjusted faces, their warp matrices and interpolators as returned from
+            :func:`_get_warp_faces`
+        frame_size: tuple
+            The (`width`, `height`) of the frame in pixels
+
+        Returns
+        -------
+        list
+            The (`left`, `top`, `right`, `bottom`) region of the frame and the faces to be
+            warped into it for each region. Faces which fall outside of the frame are not returned
+        """
+        regions: List[Tuple[Tuple[int, int, int, int],
+                            List[Tuple[np.ndarray, np.ndarray, int]]]] = []
+        for face in faces:
+            height, width = face[0].shape[:2]
+            corners = np.array([[0, 0, 1], [width, 0, 1], [width, height, 1], [0, height, 1]],
+                               dtype="float64")
+            points = corners @ cv2.invertAffineTransform(face[1]).T
+            # Pad by 2 pixels either side for the interpolator's support
+            left, top = np.maximum(np.floor(points.min(axis=0)).astype("int64") - 2, 0)
+            right, bottom = np.minimum(np.ceil(points.max(axis=0)).astype("int64") + 2,
+                                       frame_size)
+            if right <= left or bottom <= top:
+                continue
+            region = (int(left), int(top), int(right), int(bottom))
+            items = [face]
+            idx = 0
+            while idx < len(regions):
+                other, other_items = regions[idx]
+                if (region[0] < other[2] and other[0] < region[2]
+                        and region[1] < other[3] and other[1] < region[3]):
+                    region = (min(region[0], other[0]), min(region[1], other[1]),
+                              max(region[2], other[2]), max(region[3], other[3]))
+                    items = other_items + items
+                    del regions[idx]
+                    idx = 0
+                    continue
+                idx += 1
+            regions.append((region, items))
+        return regions
+
+    def _patch_regions(self, predicted: "ConvertItem") -> np.ndarray:
+        """ Patch the swapped faces onto a frame, compositing only within the regions of the frame
+        that the faces cover.
+
+        The output matches compositing the full frame, but floating point conversion and blending
+        is only performed for the pixels around each face, with the result written straight back
+        into a copy of the original uint8 frame.
+
+        Parameters
+        ----------
+        predicted: :class:`~scripts.convert.ConvertItem`
+            The output from :class:`scripts.convert.Predictor`.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The uint8 frame with the swapped faces patched onto it
+        """
+        faces = self._get_warp_faces(predicted)
+        frame = predicted.inbound.image.copy()
+        frame_size = (frame.shape[1], frame.shape[0])
+
+        for (left, top, right, bottom), items in self._get_regions(faces, frame_size):
+            roi = frame[top:bottom, left:right]
+            background = roi / np.array(255.0, dtype="float32")
+            placeholder = np.zeros((bottom - top, right - left, 4), dtype="float32")
+            placeholder[:, :, :3] = background
+            for new_face, matrix, interpolator in items:
+                # Move the matrix origin to the top left of the region
+                matrix = matrix.copy()
+                matrix[:, 2] += matrix[:, :2] @ np.array([left, top], dtype=matrix.dtype)
+                cv2.warpAffine(new_face,
+                               matrix,
+                               (right - left, bottom - top),
+                               placeholder,
+                               flags=cv2.WARP_INVERSE_MAP | interpolator,
+                               borderMode=cv2.BORDER_TRANSPARENT)
+            patched = self._post_warp_adjustments(background, placeholder)
+            patched *= 255.0
+            np.rint(patched, out=roi, casting="unsafe")
+
+        logger.trace("Patched regions: '%s'. (regions: %s)",  # type: ignore
+                     predicted.inbound.filename, len(faces))
+        return frame
 
     def _pre_warp_adjustments(self,
                               new_face: np.ndarray,
@@ -451,3 +613,315 @@ class Converter():
         logger.trace("resized frame: %s", frame.shape)  # type: ignore
         np.clip(frame, 0.0, 1.0, out=frame)
         return frame
+
+
+_ArraySpec = Tuple[Tuple[int, ...], str]
+# The maximum number of swapped faces in a frame that will be passed through shared memory. Frames
+# with more faces are passed to the worker processes through the task queue
+_SLOT_FACES = 4
+
+
+def _slot_view(buffer: np.ndarray, offset: int, spec: _ArraySpec) -> np.ndarray:
+    """ Obtain an array view into a region of a shared memory slot.
+
+    Parameters
+    ----------
+    buffer: :class:`numpy.ndarray`
+        The flat uint8 buffer for a shared memory slot
+    offset: int
+        The offset, in bytes, of the start of the array within the slot
+    spec: tuple
+        The (`shape`, `dtype`) of the array
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The requested view into the shared memory slot
+    """
+    shape, dtype = spec
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return buffer[offset:offset + size].view(dtype).reshape(shape)
+
+
+def _aligned_size(array: np.ndarray) -> int:
+    """ Obtain the number of bytes that an array takes in a shared memory slot, rounded up so
+    that the next array in the slot starts on a 64 byte boundary.
+
+    Parameters
+    ----------
+    array: :class:`numpy.ndarray`
+        The array to obtain the size for
+
+    Returns
+    -------
+    int
+        The size of the array, in bytes, within a shared memory slot
+    """
+    return -(-array.nbytes // 64) * 64
+
+
+def _patch_worker(converter: Converter,
+                  ring: SharedMemoryRing,
+                  tasks: "mp.Queue",
+                  results: "mp.Queue") -> None:
+    """ The target for each worker process launched by :class:`PatchPool`.
+
+    Receives tasks from the task queue, patches the frame and puts the patched frame to the results
+    queue. Frames held in a shared memory slot are patched in place within that slot.
+
+    Parameters
+    ----------
+    converter: :class:`Converter`
+        The worker's copy of the converter to patch frames with
+    ring: :class:`lib.multithreading.SharedMemoryRing`
+        The shared memory slots that hold frames and swapped faces
+    tasks: :class:`multiprocessing.Queue`
+        Queue holding the (`sequence number`, `slot`, `array specifications`, `item`) to patch.
+        The array specifications are ``None`` if the arrays are held within the item
+    results: :class:`multiprocessing.Queue`
+        Queue to put the (`sequence number`, `slot`, `in slot`, `output`) to. If `in slot` is
+        ``True`` then `output` is the (`shape`, `dtype`) of the patched frame held in the slot
+    """
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, specs, item = task
+            buffer = ring(slot)[0]
+            if specs is not None:
+                item.inbound.set_image(_slot_view(buffer, 0, specs[0]))
+                item.swapped_faces = _slot_view(buffer,
+                                                _aligned_size(item.inbound.image),
+                                                specs[1])
+            output = converter.patch(item)
+            in_slot = (specs is not None
+                       and isinstance(output, np.ndarray)
+                       and output.nbytes <= buffer.nbytes)
+            if in_slot:
+                spec = (output.shape, output.dtype.str)
+                _slot_view(buffer, 0, spec)[...] = output
+                output = spec
+            del item
+            results.put((seq, slot, in_slot, output))
+    except Exception:  # pylint:disable=broad-except
+        results.put(traceback.format_exc())
+
+
+class PatchPool():
+    """ Patches swapped faces onto frames in a pool of worker processes.
+
+    Patching is predominantly numpy and OpenCV work interleaved with Python, so it does not scale
+    well across threads. This pool runs :func:`Converter.patch` in separate processes. Frames and
+    swapped faces are handed to the workers through a ring of shared memory slots. Only the
+    remaining, lightweight, item data is pickled. Patched frames are returned to the caller in the
+    order that they were received.
+
+    Parameters
+    ----------
+    converter: :class:`Converter`
+        The converter to patch frames with
+    processes: int
+        The number of worker processes to launch
+
+    Notes
+    -----
+    The worker processes are forked from the calling process when the first frame is received,
+    as the shared memory slots are sized from that frame. Each worker therefore holds its own copy
+    of the converter with the plugins loaded by :func:`Converter._load_plugins`, and neither the
+    converter nor its plugins need to be picklable. Use
+    :func:`lib.multithreading.has_process_support` to check that the running system can launch
+    the pool.
+    """
+    def __init__(self, converter: Converter, processes: int) -> None:
+        logger.debug("Initializing %s: (converter: %s, processes: %s)",
+                     self.__class__.__name__, converter, processes)
+        assert has_process_support(), "Process based patching is not supported"
+        self._converter = converter
+        self._process_count = processes
+        self._context = mp.get_context("fork")
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+
+        self._ring: Optional[SharedMemoryRing] = None
+        self._processes: List[mp.process.BaseProcess] = []
+        self._free_slots: Queue.Queue = Queue.Queue()
+        self._filenames: Dict[int, str] = {}
+        self._total: Optional[int] = None
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def _start(self, item: "ConvertItem") -> None:
+        """ Allocate the shared memory slots and launch the worker processes.
+
+        Each slot is sized to hold the given item's frame alongside up to 4 swapped faces, or the
+        patched output frame, whichever is larger. Items that do not fit within a slot are passed
+        to the workers through the task queue.
+
+        Parameters
+        ----------
+        item: :class:`~scripts.convert.ConvertItem`
+            The first item received for patching
+        """
+        height, width = item.inbound.image.shape[:2]
+        scale = max(1.0, self._converter.cli_arguments.output_scale / 100)
+        # Swapped faces are float32 with an optional predicted mask channel
+        face_size = self._converter.output_size ** 2 * 4 * np.dtype("float32").itemsize
+        capacity = max(_aligned_size(item.inbound.image) + (face_size + 64) * _SLOT_FACES,
+                       int(height * width * 4 * scale * scale) + 64)
+        slots = self._process_count * 2
+        logger.debug("Starting patch pool: (slots: %s, capacity: %s)", slots, capacity)
+        self._ring = SharedMemoryRing([((capacity, ), "uint8")], slots)
+        for slot in range(slots):
+            self._free_slots.put(slot)
+
+        self._processes = [self._context.Process(target=_patch_worker,
+                                                 name=f"patch_{idx}",
+                                                 args=(self._converter,
+                                                       self._ring,
+                                                       self._tasks,
+                                                       self._results),
+                                                 daemon=True)
+                           for idx in range(self._process_count)]
+        for process in self._processes:
+            process.start()
+        atexit.register(self.close)
+
+    def _put_task(self, seq: int, item: "ConvertItem", collector: MultiThread) -> None:
+        """ Copy an item's frame and swapped faces into a free shared memory slot and put the
+        item to the task queue.
+
+        Parameters
+        ----------
+        seq: int
+            The sequence number of the item
+        item: :class:`~scripts.convert.ConvertItem`
+            The item to be patched
+        collector: :class:`lib.multithreading.MultiThread`
+            The thread collecting results, to be checked for errors whilst waiting for a free slot
+        """
+        assert self._ring is not None
+        while True:
+            try:
+                slot = self._free_slots.get(timeout=1)
+                break
+            except Queue.Empty:
+                collector.check_and_raise_error()
+        buffer = self._ring(slot)[0]
+        image = item.inbound.image
+        faces = np.asarray(item.swapped_faces)
+        specs: Optional[Tuple[_ArraySpec, _ArraySpec]] = None
+        if _aligned_size(image) + faces.nbytes <= buffer.nbytes:
+            specs = ((image.shape, image.dtype.str), (faces.shape, faces.dtype.str))
+            _slot_view(buffer, 0, specs[0])[...] = image
+            _slot_view(buffer, _aligned_size(image), specs[1])[...] = faces
+            item.inbound.remove_image()
+            item.swapped_faces = np.array([])
+        item.feed_faces = []  # Not required for patching
+        self._filenames[seq] = item.inbound.filename
+        self._tasks.put((seq, slot, specs, item))
+
+    def _get_result(self) -> Optional[Tuple[int, Union[np.ndarray, List[bytes]]]]:
+        """ Obtain the next completed result from the worker processes, copying it out of its
+        shared memory slot and releasing the slot.
+
+        Returns
+        -------
+        tuple or ``None``
+            The (`sequence number`, `patched frame`) or ``None`` if no result was received
+            within 1 second
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurred within a worker process or a worker process has exited
+        """
+        assert self._ring is not None
+        try:
+            result = self._results.get(timeout=1)
+        except Queue.Empty:
+            if not all(process.is_alive() for process in self._processes):
+                raise RuntimeError("A patch worker process has exited unexpectedly")  # noqa
+            return None
+        if isinstance(result, str):
+            raise RuntimeError(f"Error in patch worker process:\n{result}")
+        seq, slot, in_slot, output = result
+        if in_slot:
+            output = _slot_view(self._ring(slot)[0], 0, output).copy()
+        self._free_slots.put(slot)
+        return seq, output
+
+    def _collect(self, out_queue: "EventQueue") -> None:
+        """ Collect the patched frames from the worker processes and put them to the out queue in
+        the order that they were received.
+
+        Parameters
+        ----------
+        out_queue: :class:`~lib.queue_manager.EventQueue`
+            The queue to place patched frames into for writing
+        """
+        logger.debug("Starting patch collector")
+        pending: Dict[int, Union[np.ndarray, List[bytes]]] = {}
+        next_seq = 0
+        while self._total is None or next_seq < self._total:
+            result = self._get_result()
+            if result is None:
+                continue
+            pending[result[0]] = result[1]
+            while next_seq in pending:
+                out_queue.put((self._filenames.pop(next_seq), pending.pop(next_seq)))
+                next_seq += 1
+        logger.debug("Patch collector complete: %s frames", next_seq)
+
+    def process(self, in_queue: "EventQueue", out_queue: "EventQueue") -> None:
+        """ Main convert process. A drop in replacement for :func:`Converter.process` which
+        performs the patching in the worker processes.
+
+        Parameters
+        ----------
+        in_queue: :class:`~lib.queue_manager.EventQueue`
+            The output from :class:`scripts.convert.Predictor`. Contains detected faces from the
+            Faceswap model as well as the frame to be patched.
+        out_queue: :class:`~lib.queue_manager.EventQueue`
+            The queue to place patched frames into for writing by one of Faceswap's
+            :mod:`plugins.convert.writer` plugins.
+        """
+        logger.debug("Starting patch pool process. (in_queue: %s, out_queue: %s)",
+                     in_queue, out_queue)
+        collector: Optional[MultiThread] = None
+        seq = 0
+        while True:
+            inbound: Union[Literal["EOF"], "ConvertItem", List["ConvertItem"]] = in_queue.get()
+            if inbound == "EOF":
+                logger.debug("EOF Received")
+                break
+            items = inbound if isinstance(inbound, list) else [inbound]
+            for item in items:
+                if collector is None:
+                    self._start(item)
+                    collector = MultiThread(self._collect, out_queue, name="patch_collector")
+                    collector.start()
+                logger.trace("Patch pool got: '%s'", item.inbound.filename)  # type: ignore
+                self._put_task(seq, item, collector)
+                seq += 1
+
+        self._total = seq
+        if collector is not None:
+            collector.join()
+        self.close()
+        logger.debug("Completed patch pool process")
+
+    def close(self) -> None:
+        """ Shut down the worker processes and release the shared memory """
+        if not self._processes:
+            return
+        logger.debug("Closing %s", self.__class__.__name__)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        assert self._ring is not None
+        self._ring.close()
@@ -3,6 +3,8 @@
 
 import logging
 
+import numpy as np
+
 from lib.align import AlignedFace
 from lib.vgg_face import VGGFace
 from lib.image import read_image
@@ -105,11 +107,12 @@ class FaceFilter():
 
     def get_filter_encodings(self):
         """ Return filter face encodings from Keras VGG Face """
-        for filename, face in self.filters.items():
-            logger.debug("Getting encodings for: '%s'", filename)
-            encodings = self.vgg_face.predict(face["face"])
-            logger.debug("Filter Filename: %s, encoding shape: %s", filename, encodings.shape)
-            face["encoding"] = encodings
+        logger.debug("Getting encodings for: %s", list(self.filters))
+        encodings = self.vgg_face.predict(np.array([face["face"]
+                                                    for face in self.filters.values()]))
+        for (filename, face), encoding in zip(self.filters.items(), encodings):
+            logger.debug("Filter Filename: %s, encoding shape: %s", filename, encoding.shape)
+            face["encoding"] = encoding
             del face["face"]
 
     def check(self, image, detected_face):
@@ -127,10 +130,48 @@ class FaceFilter():
         bool
             ``True`` if the face matches a filter otherwise ``False``
         """
-        logger.trace("Checking face with FaceFilter")
+        return self.check_faces(image, [detected_face])[0]
+
+    def check_faces(self, image, detected_faces):
+        """ Check all of the extracted faces for a frame, obtaining the encodings for the faces
+        in a single batch
+
+        Parameters
+        ----------
+        image: :class:`numpy.ndarray`
+            The original frame that contains the faces to be checked
+        detected_faces: list
+            The :class:`lib.align.DetectedFace` objects for the faces to be checked
+
+        Returns
+        -------
+        list
+            ``True`` for each face that matches a filter otherwise ``False``
+        """
+        if not detected_faces:
+            return []
+        logger.trace("Checking %s face(s) with FaceFilter", len(detected_faces))
+        feed = np.array([AlignedFace(face.landmarks_xy,
+                                     image=image,
+                                     size=224,
+                                     centering="legacy").face
+                         for face in detected_faces])
+        return [self._check_encoding(encoding) for encoding in self.vgg_face.predict(feed)]
+
+    def _check_encoding(self, encodings):
+        """ Check the encoding for an extracted face against the filters
+
+        Parameters
+        ----------
+        encodings: :class:`numpy.ndarray`
+            The encoding of the face to be checked
+
+        Returns
+        -------
+        bool
+            ``True`` if the face matches a filter otherwise ``False``
+        """
         distances = {"filter": list(), "nfilter": list()}
-        feed = AlignedFace(detected_face.landmarks_xy, image=image, size=224, centering="legacy")
-        encodings = self.vgg_face.predict(feed.face)
         for filt in self.filters.values():
             similarity = self.vgg_face.find_cosine_similiarity(filt["encoding"], encodings)
             distances[filt["type"]].append(similarity)
@@ -1,17 +1,20 @@
 #!/usr/bin python3
 """ Utilities for working with images and videos """
 
+import io
 import logging
 import re
 import subprocess
 import os
 import struct
 import sys
+import threading
 
 from ast import literal_eval
 from bisect import bisect
 from concurrent import futures
-from typing import Optional
+from queue import Full as QueueFull, Queue
+from typing import Any, Dict, Generator, IO, List, Optional, Tuple
 from zlib import crc32
 
 import cv2
@@ -33,6 +36,56 @@ logger = logging.getLogger(__name__)  # pylint:disable=invalid-name
 
 # <<< IMAGE IO >>> #
 
+def _ffmpeg_fps(fps: float) -> str:
+    """ Obtain the frame rate to pass to ffmpeg's fps filter, adjusting drop-frame rates (i.e
+    23.98, 29.97 and 59.94) to their exact fractional values.
+
+    Parameters
+    ----------
+    fps: float
+        The frame rate of the video as reported by ffmpeg
+
+    Returns
+    -------
+    str
+        The frame rate to use for ffmpeg's fps filter
+    """
+    rounded_fps = round(fps, 0)
+    if 0.01 < rounded_fps - fps < 0.10:  # 0.90 - 0.99
+        new_fps = f"{int(rounded_fps * 1000)}/1001"
+        logger.debug("Adjusting drop-frame fps: %s to %s", fps, new_fps)
+        return new_fps
+    return str(fps)
+
+
+def _parse_showinfo(output: str) -> Optional[Tuple[int, float, bool]]:
+    """ Parse a line output from ffmpeg's showinfo filter.
+
+    Parameters
+    ----------
+    output: str
+        A line of output from ffmpeg
+
+    Returns
+    -------
+    tuple or ``None``
+        The frame number, pts_time and whether the frame is a key frame, if the line holds frame
+        information, otherwise ``None``
+    """
+    if "iskey" not in output:
+        return None
+    logger.trace("Keyframe line: %s", output)  # type:ignore
+    line = re.split(r"\s+|:\s*", output)
+    try:
+        pts_time = float(line[line.index("pts_time") + 1])
+        frame_no = int(line[line.index("n") + 1])
+    except (IndexError, ValueError):
+        # Lines can be truncated if ffmpeg is terminated whilst writing
+        logger.debug("Unable to parse showinfo output: '%s'", output)
+        return None
+    return frame_no, pts_time, "iskey:1" in output
+
+
 class FfmpegReader(imageio.plugins.ffmpeg.FfmpegFormat.Reader):  # type:ignore
     """ Monkey patch imageio ffmpeg to use keyframes whilst seeking """
     def __init__(self, format, request):
@@ -77,13 +130,7 @@ class FfmpegReader(imageio.plugins.ffmpeg.FfmpegFormat.Reader):  # type:ignore
         # respectively). The solutions to round these values is hacky at best, so:
         # TODO find a more robust method for extracting/handling drop-frame rates.
 
-        fps = self._meta["fps"]
-        rounded_fps = round(fps, 0)
-        if 0.01 < rounded_fps - fps < 0.10:  # 0.90 - 0.99
-            new_fps = f"{int(rounded_fps * 1000)}/1001"
-            logger.debug("Adjusting drop-frame fps: %s to %s", fps, new_fps)
-            fps = new_fps
-
+        fps = _ffmpeg_fps(self._meta["fps"])
         cmd = [im_ffm.get_ffmpeg_exe(),
                "-hide_banner",
                "-copyts",
@@ -109,14 +156,12 @@ class FfmpegReader(imageio.plugins.ffmpeg.FfmpegFormat.Reader):  # type:ignore
             output = process.stdout.readline().strip()
             if output == "" and process.poll() is not None:
                 break
-            if "iskey" not in output:
+            info = _parse_showinfo(output)
+            if info is None:
                 continue
-            logger.trace("Keyframe line: %s", output)
-            line = re.split(r"\s+|:\s*", output)
-            pts_time = float(line[line.index("pts_time") + 1])
-            frame_no = int(line[line.index("n") + 1])
+            frame_no, pts_time, is_key = info
             frame_pts.append(pts_time)
-            if "iskey:1" in output:
+            if is_key:
                 key_frames.append(frame_no)
 
             logger.trace("pts_time: %s, frame_no: %s", pts_time, frame_no)
@@ -391,7 +436,8 @@ def read_image_meta(filename):
     -------
     dict
         The output dictionary will contain the `width` and `height` of the png image as well as any
-        `itxt` information.
+        `itxt` information. If `itxt` information exists then the format version of the header is
+        also returned in `itxt_version` (``0`` for the legacy text format).
     Example
     -------
     >>> image_file = "/path/to/image.png"
@@ -430,7 +476,7 @@ def read_image_meta(filename):
             elif field == b"iTXt":
                 keyword, value = infile.read(length).split(b"\0", 1)
                 if keyword == b"faceswap":
-                    retval["itxt"] = literal_eval(value[4:].decode("utf-8"))
+                    retval["itxt"], retval["itxt_version"] = _decode_png_meta(value[4:])
                     break
                 else:
                     logger.trace("Skipping iTXt chunk: '%s'", keyword.decode("latin-1", "ignore"))
@@ -481,13 +527,228 @@ def read_image_meta_batch(filenames):
             yield retval
 
 
+# Binary PNG header format. The faceswap iTXt payload starts with a magic marker and a format
+# version, followed by a tagged encoding of the metadata dictionary. Numeric (nested) lists are
+# stored as raw little-endian arrays and byte strings (i.e. compressed masks) are stored raw.
+# Legacy headers hold `str(dict)` and always start with "{", so cannot collide with the marker.
+_PNG_META_MAGIC = b"FSHD"
+_PNG_META_VERSION = 1
+_STRUCT_VERSION = struct.Struct(">B")
+_STRUCT_LENGTH = struct.Struct(">I")
+_STRUCT_INT = struct.Struct(">q")
+_STRUCT_FLOAT = struct.Struct(">d")
+_STRUCT_ARRAY = struct.Struct(">cB")
+_ARRAY_DTYPES = {b"f": np.dtype("<f4"), b"d": np.dtype("<f8"), b"q": np.dtype("<i8")}
+
+
+def _is_uniform(value, dtype):
+    """ Check that every item in a (nested) list is of exactly the given python type, so that
+    storing the list as an array does not alter the types returned on decode.
+
+    Parameters
+    ----------
+    value: list or tuple
+        The (nested) list to check
+    dtype: type
+        The python type (``int`` or ``float``) that every item must be
+
+    Returns
+    -------
+    bool
+        ``True`` if every item in the list is of the given type
+    """
+    return all(_is_uniform(item, dtype) if isinstance(item, list) else type(item) is dtype
+               for item in value)
+
+
+def _to_meta_array(value):
+    """ Obtain a numeric list as a numpy array for storing in binary form, if possible.
+
+    Parameters
+    ----------
+    value: list
+        The list to attempt to convert
+
+    Returns
+    -------
+    tuple or ``None``
+        The dtype code and the array to be stored, or ``None`` if the list cannot be stored as
+        an array without loss of type information
+    """
+    try:
+        array = np.asarray(value)
+    except ValueError:  # Ragged lists
+        return None
+    if array.ndim == 0 or array.size == 0 or array.dtype.kind not in "fi":
+        return None
+    if array.dtype.kind == "i":
+        return (b"q", array) if _is_uniform(value, int) else None
+    if not _is_uniform(value, float):
+        return None
+    single = array.astype("float32")
+    return (b"f", single) if np.array_equal(single, array) else (b"d", array)
+
+
+def _encode_meta_item(item, out):
+    """ Recursively encode a metadata item into the binary PNG header format.
+
+    Parameters
+    ----------
+    item: object
+        The item to encode. Can be ``None``, `bool`, `int`, `float`, `str`, `bytes`, `list`,
+        `tuple`, `dict` or :class:`numpy.ndarray` as well as numpy scalars
+    out: bytearray
+        The buffer to write the encoded item to
+    """
+    # pylint:disable=too-many-branches
+    if isinstance(item, np.generic):
+        item = item.item()
+    if item is None:
+        out += b"N"
+    elif isinstance(item, bool):
+        out += b"T" if item else b"F"
+    elif isinstance(item, int):
+        out += b"i" + _STRUCT_INT.pack(item)
+    elif isinstance(item, float):
+        out += b"d" + _STRUCT_FLOAT.pack(item)
+    elif isinstance(item, str):
+        encoded = item.encode("utf-8", "strict")
+        out += b"s" + _STRUCT_LENGTH.pack(len(encoded)) + encoded
+    elif isinstance(item, (bytes, bytearray)):
+        out += b"b" + _STRUCT_LENGTH.pack(len(item)) + item
+    elif isinstance(item, np.ndarray):
+        _encode_meta_item(item.tolist(), out)
+    elif isinstance(item, dict):
+        out += b"m" + _STRUCT_LENGTH.pack(len(item))
+        for key, value in item.items():
+            _encode_meta_item(key, out)
+            _encode_meta_item(value, out)
+    elif isinstance(item, (list, tuple)):
+        array = _to_meta_array(item) if isinstance(item, list) else None
+        if array is None:
+            out += (b"l" if isinstance(item, list) else b"t") + _STRUCT_LENGTH.pack(len(item))
+            for value in item:
+                _encode_meta_item(value, out)
+        else:
+            code, data = array
+            out += b"a" + _STRUCT_ARRAY.pack(code, data.ndim)
+            out += struct.pack(f">{data.ndim}I", *data.shape)
+            out += data.astype(_ARRAY_DTYPES[code], copy=False).tobytes()
+    else:
+        raise ValueError(f"Unsupported type for png header: {type(item)}")
+
+
+def _decode_meta_item(data, offset):
+    """ Recursively decode an item from the binary PNG header format.
+
+    Parameters
+    ----------
+    data: bytes
+        The full binary header payload
+    offset: int
+        The position within the payload that the item to decode starts at
+
+    Returns
+    -------
+    object
+        The decoded item
+    int
+        The position within the payload immediately after the decoded item
+    """
+    # pylint:disable=too-many-return-statements
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == b"N":
+        return None, offset
+    if tag in (b"T", b"F"):
+        return tag == b"T", offset
+    if tag == b"i":
+        return _STRUCT_INT.unpack_from(data, offset)[0], offset + _STRUCT_INT.size
+    if tag == b"d":
+        return _STRUCT_FLOAT.unpack_from(data, offset)[0], offset + _STRUCT_FLOAT.size
+    if tag == b"a":
+        code, ndim = _STRUCT_ARRAY.unpack_from(data, offset)
+        offset += _STRUCT_ARRAY.size
+        shape = struct.unpack_from(f">{ndim}I", data, offset)
+        offset += ndim * _STRUCT_LENGTH.size
+        dtype = _ARRAY_DTYPES[code]
+        count = int(np.prod(shape))
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+        return array.tolist(), offset + count * dtype.itemsize
+
+    length = _STRUCT_LENGTH.unpack_from(data, offset)[0]
+    offset += _STRUCT_LENGTH.size
+    if tag == b"s":
+        return bytes(data[offset:offset + length]).decode("utf-8"), offset + length
+    if tag == b"b":
+        return bytes(data[offset:offset + length]), offset + length
+    if tag == b"m":
+        retval = {}
+        for _ in range(length):
+            key, offset = _decode_meta_item(data, offset)
+            retval[key], offset = _decode_meta_item(data, offset)
+        return retval, offset
+    if tag in (b"l", b"t"):
+        items = []
+        for _ in range(length):
+            item, offset = _decode_meta_item(data, offset)
+            items.append(item)
+        return (items if tag == b"l" else tuple(items)), offset
+    raise ValueError(f"Invalid item in png header: {tag!r}")
+
+
+def encode_png_meta(metadata):
+    """ Encode a metadata dictionary into the binary Faceswap PNG header format.
+
+    Parameters
+    ----------
+    metadata: dict
+        The dictionary to encode
+
+    Returns
+    -------
+    bytes
+        The versioned, binary encoded metadata for storing in the Faceswap PNG header
+    """
+    retval = bytearray(_PNG_META_MAGIC + _STRUCT_VERSION.pack(_PNG_META_VERSION))
+    _encode_meta_item(metadata, retval)
+    return bytes(retval)
+
+
+def _decode_png_meta(payload: bytes) -> Tuple[Any, int]:
+    """ Decode a Faceswap PNG header payload, in either the binary or legacy text format.
+
+    Parameters
+    ----------
+    payload: bytes
+        The faceswap iTXt chunk's text field
+
+    Returns
+    -------
+    dict
+        The decoded metadata
+    int
+        The header format version. ``0`` for the legacy text format
+    """
+    if not payload.startswith(_PNG_META_MAGIC):
+        return literal_eval(payload.decode("utf-8")), 0
+
+    offset = len(_PNG_META_MAGIC)
+    version = _STRUCT_VERSION.unpack_from(payload, offset)[0]
+    if version > _PNG_META_VERSION:
+        raise ValueError(f"PNG header version {version} is not supported. Please update "
+                         "Faceswap.")
+    return _decode_meta_item(payload, offset + _STRUCT_VERSION.size)[0], version
+
+
 def pack_to_itxt(metadata):
     """ Pack the given metadata dictionary to a PNG iTXt header field.
 
     Parameters
     ----------
     metadata: dict or bytes
-        The dictionary to write to the header. Can be pre-encoded as utf-8.
+        The dictionary to write to the header in the binary header format. Can be pre-encoded
+        with :func:`encode_png_meta`, or as utf-8 for the legacy format.
 
     Returns
     -------
@@ -495,7 +756,7 @@ def pack_to_itxt(metadata):
         A byte encoded PNG iTXt field, including chunk header and CRC
     """
     if not isinstance(metadata, bytes):
-        metadata = str(metadata).encode("utf-8", "strict")
+        metadata = encode_png_meta(metadata)
     key = "faceswap".encode("latin-1", "strict")
 
     chunk = key + b"\0\0\0\0\0" + metadata
@@ -513,7 +774,7 @@ def update_existing_metadata(filename, metadata):
     filename: str
         The full path to the face to be updated
     metadata: dict or bytes
-        The dictionary to write to the header. Can be pre-encoded as utf-8.
+        The dictionary to write to the header. Can be pre-encoded with :func:`encode_png_meta`.
     """
 
     tmp_filename = filename + "~"
@@ -592,7 +853,7 @@ def png_write_meta(png, data):
     png: bytes
         The bytes encoded png file to write header data to
     data: dict or bytes
-        The dictionary to write to the header. Can be pre-encoded as utf-8.
+        The dictionary to write to the header. Can be pre-encoded with :func:`encode_png_meta`.
 
     Notes
     -----
@@ -640,7 +901,7 @@ def png_read_meta(png):
         pointer += 8
         keyword, value = png[pointer:pointer + length].split(b"\0", 1)
         if keyword == b"faceswap":
-            retval = literal_eval(value[4:].decode("utf-8"))
+            retval = _decode_png_meta(value[4:])[0]
             break
         logger.trace("Skipping iTXt chunk: '%s'", keyword.decode("latin-1", "ignore"))
         pointer += length + 4
@@ -831,6 +1092,338 @@ def count_frames(filename, fast=False):
     return frames
 
 
+class VideoReader():
+    """ Read frames from a video file through a direct pipe from an ffmpeg subprocess.
+
+    Frames are requested from ffmpeg in BGR format, so no channel swap is required, and are read
+    straight from the pipe into contiguous arrays. A key frame seek index is built whilst a video
+    is read from start to finish, or can be provided from an alignments file (see
+    :attr:`lib.align.Alignments.video_meta_data`), so that random access and reads from any
+    position only need to seek to the previous key frame and decode forward from there.
+
+    Parameters
+    ----------
+    filename: str
+        Full path to the video to read frames from
+    ring_size: int, optional
+        If ``0`` each frame is read into a newly allocated array which belongs to the caller. A
+        positive value reads frames into a ring of this many preallocated buffers, which saves an
+        allocation per frame, but a frame is only valid until `ring_size` further frames have been
+        read. Default: ``0``
+    video_meta_data: dict, optional
+        An existing seek index for the video, with the keys `pts_time` holding the presentation
+        time stamp of each frame and `keyframes` holding the frame index of each key frame.
+        ``None`` to build the index on first read. Default: ``None``
+
+    Example
+    -------
+    >>> reader = VideoReader("/path/to/video.mp4")
+    >>> for index, frame in reader.read(start=100, stop=200):
+    >>>     <do processing>
+    >>> reader.close()
+    """
+    def __init__(self,
+                 filename: str,
+                 ring_size: int = 0,
+                 video_meta_data: Optional[Dict[str, Optional[list]]] = None) -> None:
+        logger.debug("Initializing %s: (filename: '%s', ring_size: %s, video_meta_data: %s)",
+                     self.__class__.__name__, filename, ring_size,
+                     None if video_meta_data is None else {k: None if v is None else len(v)
+                                                           for k, v in video_meta_data.items()})
+        self._filename = filename
+        self._meta = self._get_meta()
+        width, height = self._meta["size"]
+        self._shape = (height, width, 3)
+        self._ring = None if not ring_size else np.empty((ring_size, *self._shape), dtype="uint8")
+        self._ring_index = 0
+
+        self._index: Optional[Dict[str, list]] = None
+        if video_meta_data and all(video_meta_data.get(key) is not None
+                                   for key in ("pts_time", "keyframes")):
+            self._index = dict(pts_time=list(video_meta_data["pts_time"] or []),
+                               keyframes=list(video_meta_data["keyframes"] or []))
+
+        self._process: Optional[subprocess.Popen] = None
+        self._info_thread: Optional[threading.Thread] = None
+        self._frame_info: Optional[List[Tuple[int, float, bool]]] = None
+        self._position = 0  # The index of the next frame output by the ffmpeg process
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def fps(self) -> float:
+        """ float: The frame rate of the video """
+        return self._meta["fps"]
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """ tuple: The (`height`, `width`, `channels`) shape of frames read from the video """
+        return self._shape
+
+    @property
+    def video_meta_data(self) -> Dict[str, Optional[list]]:
+        """ dict: The seek index for the video, in the format used by
+        :func:`lib.align.Alignments.save_video_meta_data`. Holds the keys `pts_time` and
+        `keyframes`, which are ``None`` if the index has not yet been built. """
+        if self._index is None:
+            return dict(pts_time=None, keyframes=None)
+        return dict(self._index)
+
+    def _get_meta(self) -> Dict[str, Any]:
+        """ Obtain the size, frame rate and duration of the video from ffmpeg.
+
+        Returns
+        -------
+        dict
+            The video meta information as reported by :mod:`imageio_ffmpeg`
+        """
+        reader = im_ffm.read_frames(self._filename, pix_fmt="bgr24")
+        meta = next(reader)
+        reader.close()
+        logger.debug("Video meta: %s", meta)
+        return meta
+
+    def build_index(self) -> Dict[str, list]:
+        """ Scan the video to build the seek index if it does not already exist.
+
+        Returns
+        -------
+        dict
+            The `pts_time` and `keyframes` seek index for the video
+        """
+        if self._index is None:
+            logger.debug("Building seek index for '%s'", self._filename)
+            reader = imageio.get_reader(self._filename, "ffmpeg")
+            _, self._index = reader.get_frame_info()
+            reader.close()
+        return dict(self._index)
+
+    def _collect_frame_info(self, stream: IO[str]) -> None:
+        """ Collect the pts time and key frame flag for each frame from ffmpeg's showinfo filter
+        output. Run in a background thread whilst reading from the start of the video.
+
+        Parameters
+        ----------
+        stream: :class:`io.TextIOWrapper`
+            The stderr stream of the ffmpeg process
+        """
+        assert self._frame_info is not None
+        for output in stream:
+            info = _parse_showinfo(output.strip())
+            if info is not None:
+                self._frame_info.append(info)
+
+    def _start(self, index: int) -> None:
+        """ Launch the ffmpeg process outputting frames from the given frame index.
+
+        Seeks to the key frame preceding the requested frame and discards frames until the
+        requested frame is reached. When reading from the beginning of a video without a seek
+        index, the index is collected from the frames output.
+
+        Parameters
+        ----------
+        index: int
+            The frame index to start reading from
+        """
+        self.close()
+        collect = self._index is None and index == 0
+        skip = 0
+        cmd = [im_ffm.get_ffmpeg_exe(), "-hide_banner", "-nostats"]
+        if index > 0:
+            seek_index = self.build_index()
+            key_frame = seek_index["keyframes"][max(bisect(seek_index["keyframes"], index) - 1,
+                                                    0)]
+            skip = index - key_frame
+            cmd.extend(["-ss", f"{seek_index['pts_time'][key_frame]:.06f}"])
+        if collect:
+            cmd.append("-copyts")
+        # Frames are output at the video's own rate, as imageio does, so that frame numbers match
+        # existing alignments on variable frame rate videos
+        cmd.extend(["-loglevel", "info" if collect else "error",
+                    "-i", self._filename,
+                    "-an", "-sn",
+                    "-vcodec", "rawvideo",
+                    "-f", "image2pipe",
+                    "-pix_fmt", "bgr24",
+                    "-"])
+        if collect:
+            # The seek index is collected from a second output with the same frame rate filter
+            # as :func:`build_index` uses
+            cmd.extend(["-vf", f"fps=fps={_ffmpeg_fps(self.fps)},showinfo",
+                        "-an", "-sn",
+                        "-f", "null",
+                        "-"])
+        logger.debug("FFMPEG Command: '%s'", " ".join(cmd))
+        self._process = subprocess.Popen(cmd,  # pylint:disable=consider-using-with
+                                         stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE if collect else subprocess.DEVNULL,
+                                         universal_newlines=False)
+        if collect:
+            self._frame_info = []
+            stream = io.TextIOWrapper(self._process.stderr, errors="replace")
+            self._info_thread = threading.Thread(target=self._collect_frame_info,
+                                                 args=(stream, ),
+                                                 daemon=True)
+            self._info_thread.start()
+        self._position = index - skip
+        scratch = np.empty(self._shape, dtype="uint8")
+        while self._position < index and self._read_into(scratch):
+            self._position += 1
+
+    def _seek(self, index: int) -> None:
+        """ Position the reader at the given frame index.
+
+        Reads forward from the current position if the requested frame is ahead of it and no key
+        frame lies between them, otherwise seeks to the key frame preceding the requested frame.
+
+        Parameters
+        ----------
+        index: int
+            The index of the frame to position the reader at
+        """
+        if self._process is not None and self._position == index:
+            return
+        if self._process is not None and self._index is not None and index > self._position:
+            key_frames = self._index["keyframes"]
+            if bisect(key_frames, index) != bisect(key_frames, self._position):
+                self.close()
+        if self._process is None or index < self._position:
+            self._start(index)
+        scratch = np.empty(self._shape, dtype="uint8")
+        while self._position < index and self._read_into(scratch):
+            self._position += 1
+
+    def _read_into(self, buffer: np.ndarray) -> bool:
+        """ Read the next frame output from ffmpeg into the given buffer.
+
+        Parameters
+        ----------
+        buffer: :class:`numpy.ndarray`
+            The contiguous uint8 array to read the frame into
+
+        Returns
+        -------
+        bool
+            ``True`` if a frame was read, ``False`` if the end of the video has been reached
+        """
+        assert self._process is not None and self._process.stdout is not None
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < view.nbytes:
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                if filled:
+                    logger.warning("Incomplete frame read from video '%s' at frame %s",
+                                   self._filename, self._position)
+                return False
+            filled += count
+        return True
+
+    def _next_buffer(self) -> np.ndarray:
+        """ Obtain the buffer to read the next frame into.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The next slot of the ring buffer, or a newly allocated array if a ring is not in use
+        """
+        if self._ring is None:
+            return np.empty(self._shape, dtype="uint8")
+        retval = self._ring[self._ring_index]
+        self._ring_index = (self._ring_index + 1) % self._ring.shape[0]
+        return retval
+
+    def _end_of_video(self) -> None:
+        """ Store the seek index collected whilst reading the full video. """
+        if self._frame_info is None:
+            return
+        assert self._process is not None and self._info_thread is not None
+        self._process.wait()
+        self._info_thread.join()
+        if len(self._frame_info) == self._position:
+            self._index = dict(pts_time=[info[1] for info in self._frame_info],
+                               keyframes=[idx for idx, info in enumerate(self._frame_info)
+                                          if info[2]])
+            logger.debug("Collected seek index: (frames: %s, keyframes: %s)",
+                         self._position, len(self._index["keyframes"]))
+        else:
+            logger.debug("Discarding seek index. Frame info count (%s) does not match frame "
+                         "count (%s)", len(self._frame_info), self._position)
+        self._frame_info = None
+
+    def read(self,
+             start: int = 0,
+             stop: Optional[int] = None) -> Generator[Tuple[int, np.ndarray], None, None]:
+        """ Read consecutive frames from the video.
+
+        Parameters
+        ----------
+        start: int, optional
+            The index of the first frame to read. Default: ``0``
+        stop: int, optional
+            The index of the frame to stop reading at (exclusive) or ``None`` to read to the end
+            of the video. Default: ``None``
+
+        Yields
+        ------
+        index: int
+            The index of the frame within the video
+        frame: :class:`numpy.ndarray`
+            The BGR frame
+        """
+        self._seek(start)
+        while stop is None or self._position < stop:
+            frame = self._next_buffer()
+            if not self._read_into(frame):
+                self._end_of_video()
+                break
+            index = self._position
+            self._position += 1
+            yield index, frame
+
+    def get_frame(self, index: int) -> np.ndarray:
+        """ Obtain a single frame from the video.
+
+        Reads forward from the current position if the requested frame is ahead of it and no key
+        frame lies between them, otherwise seeks to the key frame preceding the requested frame.
+
+        Parameters
+        ----------
+        index: int
+            The index of the frame to obtain
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The requested BGR frame
+
+        Raises
+        ------
+        IndexError
+            If the requested frame does not exist in the video
+        """
+        retval = next((frame for _, frame in self.read(index, index + 1)), None)
+        if retval is None:
+            raise IndexError(f"Frame {index} does not exist in video '{self._filename}'")
+        return retval
+
+    def close(self) -> None:
+        """ Terminate any running ffmpeg process. """
+        if self._process is None:
+            return
+        logger.debug("Closing ffmpeg process")
+        if self._process.poll() is None:
+            self._process.terminate()
+        assert self._process.stdout is not None
+        self._process.stdout.close()
+        self._process.wait()
+        if self._info_thread is not None:
+            self._info_thread.join()
+            self._info_thread = None
+        self._frame_info = None
+        self._process = None
+
+
 class ImageIO():
     """ Perform disk IO for images or videos in a background thread.
 
@@ -947,6 +1540,15 @@ class ImagesLoader(ImageIO):
         If the number of images that the loader will encounter is already known, it can be passed
         in here to skip the image counting step, which can save time at launch. Set to ``None`` if
         the count is not already known. Default: ``None``
+    video_meta_data: dict, optional
+        Existing video meta information containing the pts_time and iskey flags for the given
+        video. Used for seeking within the video. Providing this means that the video does not
+        need to be scanned again. Set to ``None`` if the video is to be scanned. Default: ``None``
+    decoders: int, optional
+        The number of ffmpeg processes to decode a video with. Values greater than 1 split the
+        video into key frame aligned segments which are decoded in parallel and returned in frame
+        order. Requires the video's seek index, which is built by scanning the video if it has not
+        been provided. Ignored for folders of images. Default: ``1``
 
     Examples
     --------
@@ -962,13 +1564,19 @@ class ImagesLoader(ImageIO):
                  queue_size=8,
                  fast_count=True,
                  skip_list=None,
-                 count=None):
+                 count=None,
+                 video_meta_data=None,
+                 decoders=1):
         logger.debug("Initializing %s: (path: %s, queue_size: %s, fast_count: %s, skip_list: %s, "
-                     "count: %s)", self.__class__.__name__, path, queue_size, fast_count,
-                     skip_list, count)
+                     "count: %s, video_meta_data: %s, decoders: %s)", self.__class__.__name__,
+                     path, queue_size, fast_count, skip_list, count, video_meta_data, decoders)
 
         super().__init__(path, queue_size=queue_size)
+        self._video_meta_data = dict() if video_meta_data is None else video_meta_data
+        self._decoders = max(1, decoders)
+        self._buffer_mb = 1024
         self._skip_list = set() if skip_list is None else set(skip_list)
+        self._frame_ranges = None
         self._is_video = self._check_for_video()
         self._fps = self._get_fps()
 
@@ -985,9 +1593,13 @@ class ImagesLoader(ImageIO):
 
     @property
     def process_count(self):
-        """ int: The number of images or video frames to be processed (IE the total count less
-        items that are to be skipped from the :attr:`skip_list`)"""
-        return self._count - len(self._skip_list)
+        """ int: The number of images or video frames to be processed (IE the total count, or the
+        number of frames within any :attr:`frame_ranges`, less items that are to be skipped from
+        the :attr:`skip_list`)"""
+        if self._frame_ranges is None:
+            return self._count - len(self._skip_list)
+        return sum(1 for start, end in self._frame_ranges for idx in range(start, end + 1)
+                   if idx not in self._skip_list)
 
     @property
     def is_video(self):
@@ -1007,6 +1619,19 @@ class ImagesLoader(ImageIO):
         then this is a list of dummy filenames as corresponding to an alignments file """
         return self._file_list
 
+    @property
+    def video_meta_data(self):
+        """ dict: For videos contains the keys `pts_time` holding a list of time stamps for each
+        frame and `keyframes` holding the frame index of each key frame.
+
+        Notes
+        -----
+        Only populated if the input is a video, and either the meta data was provided, the video
+        has been loaded in full or the single frame reader is being used, otherwise returns an
+        empty dictionary.
+        """
+        return self._video_meta_data
+
     def add_skip_list(self, skip_list):
         """ Add a skip list to this :class:`ImagesLoader`
 
@@ -1019,6 +1644,71 @@ class ImagesLoader(ImageIO):
         logger.debug(skip_list)
         self._skip_list = set(skip_list)
 
+    def add_frame_ranges(self, frame_ranges):
+        """ Limit loading to the given ranges of frames for this :class:`ImagesLoader`.
+
+        Frames outside of the ranges are never read. For videos, the reader seeks to the key
+        frame preceding the start of each range and stops at the end of it, so a seek index is
+        required (see :func:`add_video_meta_data`). If one has not been provided, the video will
+        be scanned once to build it.
+
+        Parameters
+        ----------
+        frame_ranges: list
+            A list of (`start`, `end`) tuples of the frame indices to load, inclusive
+        """
+        retval = []
+        for start, end in sorted(frame_ranges):
+            start, end = max(start, 0), min(end, self._count - 1)
+            if end < start:
+                continue
+            if retval and start <= retval[-1][1] + 1:
+                retval[-1] = (retval[-1][0], max(end, retval[-1][1]))
+                continue
+            retval.append((start, end))
+        logger.debug("Adding frame ranges: %s", retval)
+        self._frame_ranges = retval
+
+    def _get_read_ranges(self, start=0, stop=None):
+        """ Obtain the ranges of frames that are to be read within the given span of frames.
+
+        Parameters
+        ----------
+        start: int, optional
+            The first frame index of the span. Default: `0`
+        stop: int, optional
+            The frame index to end the span at (exclusive) or ``None`` for the final frame.
+            Default: ``None``
+
+        Returns
+        -------
+        list
+            The (`start`, `stop`) frame indices of each range to be read. `stop` is exclusive and
+            is ``None`` for a range that should be read to the end of the source
+        """
+        if self._frame_ranges is None:
+            return [(start, stop)]
+        stop = self._count if stop is None else stop
+        retval = [(max(start, rng_start), min(stop, rng_end + 1))
+                  for rng_start, rng_end in self._frame_ranges]
+        return [rng for rng in retval if rng[0] < rng[1]]
+
+    def add_video_meta_data(self, video_meta_data):
+        """ Add an existing seek index for a video source to this :class:`ImagesLoader`, so that
+        the video does not need to be scanned for segment-parallel decoding.
+
+        Parameters
+        ----------
+        video_meta_data: dict
+            The video meta information, as returned from
+            :attr:`lib.align.Alignments.video_meta_data`. Ignored if any values are ``None``
+        """
+        if not self._is_video or any(val is None for val in video_meta_data.values()):
+            return
+        logger.debug("Adding video meta data: %s", {key: len(val)
+                                                    for key, val in video_meta_data.items()})
+        self._video_meta_data = video_meta_data
+
     def _check_for_video(self):
         """ Check whether the input is a video
 
@@ -1126,18 +1816,178 @@ class ImagesLoader(ImageIO):
             The loaded video frame.
         """
         logger.debug("Loading frames from video: '%s'", self.location)
-        reader = imageio.get_reader(self.location, "ffmpeg")
-        for idx, frame in enumerate(reader):
-            if idx in self._skip_list:
-                logger.trace("Skipping frame %s due to skip list", idx)
+        if self._decoders > 1:
+            yield from self._from_video_segments()
+            return
+        reader = VideoReader(self.location, video_meta_data=self._video_meta_data)
+        for start, stop in self._get_read_ranges():
+            for idx, frame in reader.read(start, stop):
+                if idx in self._skip_list:
+                    logger.trace("Skipping frame %s due to skip list", idx)
+                    continue
+                filename = self._dummy_video_framename(idx)
+                logger.trace("Loading video frame: '%s'", filename)
+                yield filename, frame
+        if all(val is not None for val in reader.video_meta_data.values()):
+            self._video_meta_data = reader.video_meta_data
+        reader.close()
+
+    @classmethod
+    def _get_segments(cls, keyframes, frame_count, max_frames):
+        """ Split a video into segments for parallel decoding.
+
+        Each segment holds at most `max_frames` frames, so that a decoder can buffer the whole of
+        its next segment whilst the segments ahead of it are output. Consecutive short groups of
+        pictures are merged into a single segment. Groups of pictures that are longer than
+        `max_frames` are split evenly, with segments that start between key frames seeking to the
+        preceding key frame and discarding frames up to the start of the segment.
+
+        Parameters
+        ----------
+        keyframes: list
+            The frame index of each key frame in the video
+        frame_count: int
+            The number of frames in the video
+        max_frames: int
+            The maximum number of frames to place in each segment
+
+        Returns
+        -------
+        list
+            The (`start`, `stop`) frame indices for each segment
+        """
+        bounds = sorted({0, frame_count}.union(key for key in keyframes if 0 < key < frame_count))
+        retval = []
+        start = 0
+        for gop_start, gop_end in zip(bounds, bounds[1:]):
+            if gop_end - start <= max_frames:  # Merge into the current segment
                 continue
-            # Convert to BGR for cv2 compatibility
-            frame = frame[:, :, ::-1]
-            filename = self._dummy_video_framename(idx)
-            logger.trace("Loading video frame: '%s'", filename)
-            yield filename, frame
+            if gop_start > start:
+                retval.append((start, gop_start))
+            splits = -(-(gop_end - gop_start) // max_frames)
+            starts = [gop_start + (gop_end - gop_start) * idx // splits for idx in range(splits)]
+            retval.extend(zip(starts, starts[1:]))
+            start = starts[-1]
+        retval.append((start, None))
+        logger.debug("Video segments: (max_frames: %s, segments: %s)", max_frames, len(retval))
+        return retval
+
+    def _put_segment_item(self, out_queue, item, stop_event):
+        """ Put an item to a segment decoder's output queue, waiting for space until either the
+        item is put or loading is stopped.
+
+        Parameters
+        ----------
+        out_queue: :class:`queue.Queue`
+            The decoder's output queue
+        item: tuple or ``None``
+            The (`frame index`, `frame`) to put to the queue, or ``None`` for the end of a segment
+        stop_event: :class:`threading.Event`
+            Event that is set if the frames are no longer being consumed
+
+        Returns
+        -------
+        bool
+            ``True`` if the item was put to the queue, ``False`` if loading has been stopped
+        """
+        while not (stop_event.is_set() or self._queue.shutdown.is_set()):
+            try:
+                out_queue.put(item, True, 1)
+                return True
+            except QueueFull:
+                continue
+        logger.debug("Stopping segment decoder")
+        return False
+
+    def _decode_segments(self, segments, out_queue, stop_event):
+        """ Decode a set of video segments in a background thread.
+
+        Parameters
+        ----------
+        segments: list
+            The (`start`, `stop`) frame indices of each segment to decode
+        out_queue: :class:`queue.Queue`
+            The queue to put the decoded frames to. Each segment is terminated with ``None``
+        stop_event: :class:`threading.Event`
+            Event that is set if the frames are no longer being consumed
+        """
+        reader = VideoReader(self.location, video_meta_data=self._video_meta_data)
+        for segment in segments:
+            for start, stop in self._get_read_ranges(*segment):
+                for idx, frame in reader.read(start, stop):
+                    if idx in self._skip_list:
+                        logger.trace("Skipping frame %s due to skip list", idx)
+                        continue
+                    if not self._put_segment_item(out_queue, (idx, frame), stop_event):
+                        reader.close()
+                        return
+            if not self._put_segment_item(out_queue, None, stop_event):
+                break
         reader.close()
 
+    def _from_video_segments(self):
+        """ Generator for loading frames from a video, decoding segments of the video in
+        parallel.
+
+        Segments are assigned to decoders in turn, and each decoder's frames are read back segment
+        by segment, so frames are output in frame order.
+
+        Yields
+        ------
+        filename: str
+            The dummy filename of the loaded video frame.
+        image: numpy.ndarray
+            The loaded video frame.
+        """
+        if any(self._video_meta_data.get(key) is None for key in ("pts_time", "keyframes")):
+            logger.info("Analyzing video for parallel decoding...")
+            self._video_meta_data = VideoReader(self.location).build_index()
+        keyframes = self._video_meta_data["keyframes"]
+        frame_count = len(self._video_meta_data["pts_time"])
+        reader = VideoReader(self.location, video_meta_data=self._video_meta_data)
+        frame_size = int(np.prod(reader.shape))
+        reader.close()
+        # Each decoder buffers up to a full segment ahead of the frame being output, so that all
+        # of the decoders can work whilst the buffered segments are output
+        max_frames = max(1, self._buffer_mb * 1024 * 1024 // (frame_size * self._decoders))
+        segments = [segment for segment in self._get_segments(keyframes, frame_count, max_frames)
+                    if self._get_read_ranges(*segment)]
+
+        decoders = min(self._decoders, len(segments))
+        queues = [Queue(maxsize=max_frames + 1) for _ in range(decoders)]
+        stop_event = threading.Event()
+        threads = [MultiThread(self._decode_segments,
+                               segments[idx::decoders],
+                               queues[idx],
+                               stop_event,
+                               name=f"{self.__class__.__name__}_decoder_{idx}")
+                   for idx in range(decoders)]
+        for thread in threads:
+            thread.start()
+        logger.debug("Decoding video with %s decoders", decoders)
+
+        try:
+            for idx in range(len(segments)):
+                segment_queue = queues[idx % decoders]
+                while True:
+                    try:
+                        item = segment_queue.get(True, 1)
+                    except QueueEmpty:
+                        for thread in threads:
+                            thread.check_and_raise_error()
+                        continue
+                    if item is None:
+                        break
+                    frame_idx, frame = item
+                    filename = self._dummy_video_framename(frame_idx)
+                    logger.trace("Loading video frame: '%s'", filename)
+                    yield filename, frame
+        finally:
+            # Release any decoders that are waiting to put frames if output stopped early
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
     def _dummy_video_framename(self, index):
         """ Return a dummy filename for video files
 
@@ -1168,7 +2018,10 @@ class ImagesLoader(ImageIO):
             The loaded image.
         """
         logger.debug("Loading frames from folder: '%s'", self.location)
-        for idx, filename in enumerate(self.file_list):
+        indices = [idx for start, stop in self._get_read_ranges()
+                   for idx in range(start, len(self.file_list) if stop is None else stop)]
+        for idx in indices:
+            filename = self.file_list[idx]
             if idx in self._skip_list:
                 logger.trace("Skipping frame %s due to skip list")
                 continue
@@ -1295,30 +2148,14 @@ class SingleFrameLoader(ImagesLoader):
     def __init__(self, path, video_meta_data=None):
         logger.debug("Initializing %s: (path: %s, video_meta_data: %s)",
                      self.__class__.__name__, path, video_meta_data)
-        self._video_meta_data = dict() if video_meta_data is None else video_meta_data
         self._reader = None
-        super().__init__(path, queue_size=1, fast_count=False)
-
-    @property
-    def video_meta_data(self):
-        """ dict: For videos contains the keys `frame_pts` holding a list of time stamps for each
-        frame and `keyframes` holding the frame index of each key frame.
-
-        Notes
-        -----
-        Only populated if the input is a video and single frame reader is being used, otherwise
-        returns ``None``.
-        """
-        return self._video_meta_data
+        super().__init__(path, queue_size=1, fast_count=False, video_meta_data=video_meta_data)
 
     def _get_count_and_filelist(self, fast_count, count):
         if self._is_video:
-            self._reader = imageio.get_reader(self.location, "ffmpeg")
-            self._reader.use_patch = True
-            count, video_meta_data = self._reader.get_frame_info(
-                frame_pts=self._video_meta_data.get("pts_time", None),
-                keyframes=self._video_meta_data.get("keyframes", None))
-            self._video_meta_data = video_meta_data
+            self._reader = VideoReader(self.location, video_meta_data=self._video_meta_data)
+            self._video_meta_data = self._reader.build_index()
+            count = len(self._video_meta_data["pts_time"])
         super()._get_count_and_filelist(fast_count, count)
 
     def image_from_index(self, index):
@@ -1339,16 +2176,15 @@ class SingleFrameLoader(ImagesLoader):
 
         Notes
         -----
-        Retrieving frames from video files can be slow as the whole video file needs to be
-        iterated to retrieve the requested frame. If a frame has already been retrieved, then
-        retrieving frames of a higher index will be quicker than retrieving frames of a lower
-        index, as iteration needs to start from the beginning again when navigating backwards.
+        Frames are retrieved from video files by seeking to the key frame preceding the requested
+        frame and decoding forward from there. Retrieving the frame following the previously
+        retrieved frame only requires that single frame to be decoded.
 
         We do not use a background thread for this task, as it is assumed that requesting an image
         by index will be done when required.
         """
         if self.is_video:
-            image = self._reader.get_data(index)[..., ::-1]
+            image = self._reader.get_frame(index)
             filename = self._dummy_video_framename(index)
         else:
             filename = self.file_list[index]
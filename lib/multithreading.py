@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 """ Multithreading/processing utils for faceswap """
 
+import atexit
 import logging
+import multiprocessing as mp
 from multiprocessing import cpu_count
 
 import queue as Queue
+import random
 import sys
 import threading
+import traceback
 from types import TracebackType
 from typing import Any, Callable, Dict, Generator, List, Tuple, Type, Optional, Set, Union
 
+import numpy as np
+
+if sys.version_info >= (3, 8):
+    from multiprocessing import shared_memory
+
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 _ErrorType = Optional[Union[Tuple[Type[BaseException], BaseException, TracebackType],
                             Tuple[Any, Any, Any]]]
 _THREAD_NAMES: Set[str] = set()
+_ArraySpec = Tuple[Tuple[int, ...], str]
 
 
 def total_cpus():
@@ -289,3 +299,250 @@ class BackgroundGenerator(MultiThread):
                 logger.debug("Got EOF OR NONE in BackgroundGenerator")
                 break
             yield next_item
+
+
+def has_process_support() -> bool:
+    """ Check whether the running system supports the process based background generators.
+
+    Process based generators fork the calling process, so that the objects producing the data
+    do not need to be picklable, and hand results back through shared memory, which requires
+    Python 3.8 or later.
+
+    Returns
+    -------
+    bool
+        ``True`` if process based background generators can be used otherwise ``False``
+    """
+    return sys.version_info >= (3, 8) and "fork" in mp.get_all_start_methods()
+
+
+class SharedMemoryRing():
+    """ A ring of pre-allocated slots in shared memory for handing batches of arrays between
+    processes without pickling them.
+
+    Each slot holds one array for each of the given array specifications. Slots are referenced
+    by their integer index, so only the index needs to be passed between processes.
+
+    Parameters
+    ----------
+    specs: list
+        A list of (`shape`, `dtype`) tuples for each array that a single slot should hold
+    slots: int
+        The number of slots to allocate in the ring
+    """
+    def __init__(self, specs: List[_ArraySpec], slots: int) -> None:
+        logger.debug("Initializing %s: (specs: %s, slots: %s)",
+                     self.__class__.__name__, specs, slots)
+        self._specs = specs
+        self._memory = [[shared_memory.SharedMemory(create=True,
+                                                    size=max(1, int(np.prod(shape)) *
+                                                             np.dtype(dtype).itemsize))
+                         for shape, dtype in specs]
+                        for _ in range(slots)]
+        self._arrays = [[np.ndarray(shape, dtype=dtype, buffer=mem.buf)
+                         for (shape, dtype), mem in zip(specs, slot)]
+                        for slot in self._memory]
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def slots(self) -> int:
+        """ int: The number of slots in the ring """
+        return len(self._memory)
+
+    def __call__(self, slot: int) -> List[np.ndarray]:
+        """ Obtain the arrays held in the requested slot.
+
+        Parameters
+        ----------
+        slot: int
+            The index of the slot to obtain the arrays for
+
+        Returns
+        -------
+        list
+            The :class:`numpy.ndarray` objects, backed by shared memory, for the requested slot
+        """
+        return self._arrays[slot]
+
+    def close(self) -> None:
+        """ Release and unlink all of the shared memory held by the ring. """
+        logger.debug("Closing %s", self.__class__.__name__)
+        self._arrays = []
+        for slot in self._memory:
+            for mem in slot:
+                mem.close()
+                mem.unlink()
+        self._memory = []
+
+
+def _process_worker(generator: Callable,
+                    args: Tuple,
+                    kwargs: Dict[str, Any],
+                    ring: SharedMemoryRing,
+                    free_slots: "mp.Queue",
+                    ready_slots: "mp.Queue",
+                    seed: int) -> None:
+    """ The target for each worker process launched by :class:`BackgroundProcessGenerator`.
+
+    Seeds the random number generators for the worker, then runs the generator, writing each
+    item into a free slot of the shared memory ring and putting the slot index to the ready queue.
+
+    Parameters
+    ----------
+    generator: callable
+        The generator to run in the worker process
+    args: tuple
+        The argument tuple for generator invocation
+    kwargs: dict
+        Keyword arguments for the generator invocation
+    ring: :class:`SharedMemoryRing`
+        The shared memory ring to write results into
+    free_slots: :class:`multiprocessing.Queue`
+        Queue holding the indices of slots that are available for writing
+    ready_slots: :class:`multiprocessing.Queue`
+        Queue to put the indices of populated slots to
+    seed: int
+        The seed for this worker's random number generators
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        for item in generator(*args, **kwargs):
+            slot = free_slots.get()
+            if slot is None:
+                break
+            for dst, src in zip(ring(slot), item):
+                dst[...] = src
+            ready_slots.put(slot)
+    except Exception:  # pylint:disable=broad-except
+        ready_slots.put(traceback.format_exc())
+
+
+class BackgroundProcessGenerator():
+    """ Run a generator in multiple worker processes, handing the results back to the calling
+    process through pre-allocated shared memory.
+
+    Each item yielded by the generator must be a sequence of :class:`numpy.ndarray` objects that
+    match the shapes and datatypes given in :attr:`specs`. Items are returned in the order that
+    they complete, so the generator should not rely on ordering across workers.
+
+    Parameters
+    ----------
+    generator: callable
+        The generator to run in the worker processes
+    specs: list
+        A list of (`shape`, `dtype`) tuples for each array that the generator yields
+    processes: int
+        The number of worker processes to launch
+    prefetch: int, optional
+        The number of items to hold ready for consumption. Default: 2
+    seed: int, optional
+        The base seed for the random number generators. Each worker is seeded with this value plus
+        its worker index, so that the data produced by each worker is deterministic. Default: 0
+    args: tuple, Optional
+        The argument tuple for generator invocation. Default: ``None``.
+    kwargs: dict, Optional
+        keyword arguments for the generator invocation. Default: ``None``.
+
+    Notes
+    -----
+    Workers are forked from the calling process, so the generator and its arguments do not need
+    to be picklable. Use :func:`has_process_support` to check that the running system can launch
+    process based generators.
+
+    The arrays yielded from :func:`iterator` are views into shared memory. They remain valid
+    until the next item is requested from the iterator, at which point the slot is handed back to
+    the workers for re-use.
+    """
+    def __init__(self,
+                 generator: Callable,
+                 specs: List[_ArraySpec],
+                 processes: int,
+                 prefetch: int = 2,
+                 seed: int = 0,
+                 args: Optional[Tuple] = None,
+                 kwargs: Optional[Dict[str, Any]] = None) -> None:
+        logger.debug("Initializing %s: (generator: %s, specs: %s, processes: %s, prefetch: %s, "
+                     "seed: %s)", self.__class__.__name__, generator, specs, processes, prefetch,
+                     seed)
+        assert has_process_support(), "Process based generators are not supported"
+        context = mp.get_context("fork")
+        self._ring = SharedMemoryRing(specs, max(prefetch, processes) + 1)
+        self._free_slots = context.Queue()
+        self._ready_slots = context.Queue()
+        for slot in range(self._ring.slots):
+            self._free_slots.put(slot)
+
+        name = getattr(generator, "__name__", "worker")
+        self._processes = [context.Process(target=_process_worker,
+                                           name=f"{name}_{idx}",
+                                           args=(generator,
+                                                 args or tuple(),
+                                                 kwargs or {},
+                                                 self._ring,
+                                                 self._free_slots,
+                                                 self._ready_slots,
+                                                 seed + idx),
+                                           daemon=True)
+                           for idx in range(processes)]
+        for process in self._processes:
+            process.start()
+        atexit.register(self.close)
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def _get_ready_slot(self) -> int:
+        """ Obtain the index of the next populated slot, checking that the workers are still
+        alive whilst waiting.
+
+        Returns
+        -------
+        int
+            The index of the next populated slot in the shared memory ring
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurred within a worker process, or all of the worker processes have
+            exited
+        """
+        while True:
+            try:
+                retval = self._ready_slots.get(timeout=5)
+            except Queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    raise RuntimeError("All background worker processes have exited")
+                continue
+            if isinstance(retval, str):
+                logger.error("Caught exception in background process")
+                self.close()
+                raise RuntimeError(f"Error in background process:\n{retval}")
+            return retval
+
+    def iterator(self) -> Generator[List[np.ndarray], None, None]:
+        """ Iterate items out of the shared memory ring
+
+        Yields
+        ------
+        list
+            The :class:`numpy.ndarray` objects for the next item from the generator. These are
+            only valid until the next item is requested
+        """
+        held: Optional[int] = None
+        while True:
+            slot = self._get_ready_slot()
+            if held is not None:
+                self._free_slots.put(held)
+            held = slot
+            yield self._ring(slot)
+
+    def close(self) -> None:
+        """ Terminate the worker processes and release the shared memory """
+        if not self._processes:
+            return
+        logger.debug("Closing %s", self.__class__.__name__)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self._processes = []
+        self._ring.close()
@@ -6,10 +6,10 @@
 
 import logging
 import threading
-from typing import Dict
+from typing import Any, Dict, Optional
 
 from queue import Queue, Empty as QueueEmpty  # pylint: disable=unused-import; # noqa
-from time import sleep
+from time import perf_counter, sleep
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -18,6 +18,10 @@ class EventQueue(Queue):
     """ Standard Queue object with a separate global shutdown parameter indicating that the main
     process, and by extension this queue, should be shut down.
 
+    The queue also collects statistics on its use, available from :attr:`stats`: the time that
+    callers have spent blocked putting items to and getting items from the queue, and a histogram
+    of the time that the queue has spent holding each number of items.
+
     Parameters
     ----------
     shutdown_event: :class:`threading.Event`
@@ -28,12 +32,108 @@ class EventQueue(Queue):
     def __init__(self, shutdown_event: threading.Event, maxsize: int = 0) -> None:
         super().__init__(maxsize=maxsize)
         self._shutdown = shutdown_event
+        self._counts = dict(put=0, get=0)
+        self._blocked = dict(put=0.0, get=0.0)
+        self._occupancy: Dict[int, float] = {}
+        self._last_change = perf_counter()
 
     @property
     def shutdown(self) -> threading.Event:
         """ :class:`threading.Event`: The global shutdown event """
         return self._shutdown
 
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """ dict: The statistics collected for the queue since it was created or
+        :func:`reset_stats` was last called. The `maxsize` of the queue, the number of `puts` and
+        `gets`, the total time in seconds that callers were blocked in `put_wait` and `get_wait`,
+        the `mean_occupancy` of the queue and the `occupancy` histogram of seconds spent holding
+        each number of items """
+        with self.mutex:
+            self._record_occupancy()
+            occupancy = dict(sorted(self._occupancy.items()))
+            total = sum(occupancy.values())
+            return dict(maxsize=self.maxsize,
+                        puts=self._counts["put"],
+                        gets=self._counts["get"],
+                        put_wait=self._blocked["put"],
+                        get_wait=self._blocked["get"],
+                        mean_occupancy=(sum(depth * secs for depth, secs in occupancy.items())
+                                        / total if total else 0.0),
+                        occupancy=occupancy)
+
+    def reset_stats(self) -> None:
+        """ Reset the statistics collected for the queue. """
+        with self.mutex:
+            self._counts = dict(put=0, get=0)
+            self._blocked = dict(put=0.0, get=0.0)
+            self._occupancy = {}
+            self._last_change = perf_counter()
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> None:
+        """ Put an item into the queue, recording the time spent blocked waiting for a free slot.
+
+        Parameters
+        ----------
+        item: Any
+            The item to put into the queue
+        block: bool, optional
+            ``True`` to block until a free slot is available. Default: ``True``
+        timeout: float, optional
+            The maximum number of seconds to block for. ``None`` to block until a slot is
+            available. Default: ``None``
+        """
+        start = perf_counter()
+        try:
+            super().put(item, block=block, timeout=timeout)
+        finally:
+            with self.mutex:
+                self._blocked["put"] += perf_counter() - start
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """ Remove and return an item from the queue, recording the time spent blocked waiting for
+        an item.
+
+        Parameters
+        ----------
+        block: bool, optional
+            ``True`` to block until an item is available. Default: ``True``
+        timeout: float, optional
+            The maximum number of seconds to block for. ``None`` to block until an item is
+            available. Default: ``None``
+
+        Returns
+        -------
+        Any
+            The item taken from the queue
+        """
+        start = perf_counter()
+        try:
+            return super().get(block=block, timeout=timeout)
+        finally:
+            with self.mutex:
+                self._blocked["get"] += perf_counter() - start
+
+    def _record_occupancy(self) -> None:
+        """ Add the time since the queue's size last changed to the occupancy histogram for the
+        queue's current size. Must be called whilst holding the queue's mutex. """
+        now = perf_counter()
+        depth = self._qsize()
+        self._occupancy[depth] = self._occupancy.get(depth, 0.0) + now - self._last_change
+        self._last_change = now
+
+    def _put(self, item: Any) -> None:
+        """ Record the queue's occupancy prior to adding an item to the queue """
+        self._record_occupancy()
+        self._counts["put"] += 1
+        super()._put(item)
+
+    def _get(self) -> Any:
+        """ Record the queue's occupancy prior to removing an item from the queue """
+        self._record_occupancy()
+        self._counts["get"] += 1
+        return super()._get()
+
 
 class _QueueManager():
     """ Manage :class:`EventQueue` objects for availabilty across processes.
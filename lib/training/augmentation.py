@@ -2,12 +2,13 @@
 """ Processes the augmentation of images for feeding into a Faceswap model. """
 from dataclasses import dataclass
 import logging
-from typing import Tuple, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 
 import cv2
 import numexpr as ne
 import numpy as np
 from scipy.interpolate import griddata
+from scipy.spatial import Delaunay
 
 from lib.image import batch_convert_color
 
@@ -39,14 +40,15 @@ class AugConstants:
         Shift range for transformations
     warp_maps: :class:`numpy.ndarray`
         The stacked (x, y) mappings for image warping
-    warp_pads: tuple
-        The padding to apply for image warping
-    warp_slices: slice
-        The slices for extracting a warped image
+    warp_interpolation: :class:`numpy.ndarray`
+        The matrix for linearly upsampling the 5x5 warp control grids to the cropped,
+        full size interpolation maps
     warp_lm_edge_anchors: :class:`numpy.ndarray`
         The edge anchors for landmark based warping
     warp_lm_grids: :class:`numpy.ndarray`
         The grids for landmark based warping
+    warp_lm_columns: :class:`numpy.ndarray`
+        The column (y) co-ordinate of each point in the landmark warping grids for the full batch
     """
     clahe_base_contrast: int
     clahe_chance: float
@@ -56,10 +58,10 @@ class AugConstants:
     transform_zoom: float
     transform_shift: float
     warp_maps: np.ndarray
-    warp_pad: Tuple[int, int]
-    warp_slices: slice
+    warp_interpolation: np.ndarray
     warp_lm_edge_anchors: np.ndarray
     warp_lm_grids: np.ndarray
+    warp_lm_columns: np.ndarray
 
 
 class ImageAugmentation():
@@ -91,8 +93,12 @@ class ImageAugmentation():
         # Warp args
         self._warp_scale = 5 / 256 * self._processing_size  # Normal random variable scale
         self._warp_lm_scale = 2 / 256 * self._processing_size  # Normal random variable scale
+        self._warp_lm_engine = self._config.get("warp_landmarks_engine", "piecewise_affine")
 
         self._constants = self._get_constants()
+        map_size = self._constants.warp_interpolation.shape[0]
+        self._warp_buffers = (np.empty((batchsize, 2, map_size, 5), dtype="float32"),
+                              np.empty((batchsize, 2, map_size, map_size), dtype="float32"))
         logger.debug("Initialized %s", self.__class__.__name__)
 
     def _get_constants(self) -> AugConstants:
@@ -117,7 +123,6 @@ class ImageAugmentation():
         warp_range = np.linspace(0, self._processing_size, 5, dtype='float32')
         warp_mapx = np.broadcast_to(warp_range, (self._batchsize, 5, 5)).astype("float32")
         warp_mapy = np.broadcast_to(warp_mapx[0].T, (self._batchsize, 5, 5)).astype("float32")
-        warp_pad = int(1.25 * self._processing_size)
 
         # Random Warp Landmarks
         p_mx = self._processing_size - 1
@@ -135,13 +140,46 @@ class ImageAugmentation():
                               transform_zoom=int(self._config.get("zoom_amount", 5)) / 100,
                               transform_shift=tform_shift,
                               warp_maps=np.stack((warp_mapx, warp_mapy), axis=1),
-                              warp_pad=(warp_pad, warp_pad),
-                              warp_slices=slice(warp_pad // 10, -warp_pad // 10),
+                              warp_interpolation=self._get_warp_interpolation(),
                               warp_lm_edge_anchors=edge_anchors,
-                              warp_lm_grids=grids)
+                              warp_lm_grids=grids,
+                              warp_lm_columns=np.tile(grids[1][0],
+                                                      self._batchsize * self._processing_size
+                                                      )[:, None])
         logger.debug("Initialized constants: %s", retval)
         return retval
 
+    def _get_warp_interpolation(self) -> np.ndarray:
+        """ Obtain the matrix that upsamples a 5x5 random warp control grid to the final
+        interpolation map in a single matrix multiplication.
+
+        The matrix replicates resizing the control grid with :func:`cv2.resize` (bi-linear
+        interpolation) to 125% of the processing size and then cropping the central area. As
+        bi-linear interpolation is separable, the final map for a control grid `M` is given by
+        `R @ M @ R.T`, which allows the maps for the whole batch to be calculated at once.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The (`map size`, 5) interpolation matrix
+        """
+        pad = int(1.25 * self._processing_size)
+        src = (np.arange(pad, dtype="float64") + 0.5) * (5 / pad) - 0.5
+        low = np.floor(src).astype("int64")
+        weight = src - low
+        weight[low < 0] = 0.0
+        low = np.clip(low, 0, 4)
+        weight[low >= 4] = 0.0
+        high = np.minimum(low + 1, 4)
+
+        retval = np.zeros((pad, 5), dtype="float64")
+        rows = np.arange(pad)
+        np.add.at(retval, (rows, low), 1.0 - weight)
+        np.add.at(retval, (rows, high), weight)
+        retval = retval[slice(pad // 10, -pad // 10)].astype("float32")
+        logger.debug("Warp interpolation matrix shape: %s", retval.shape)
+        return retval
+
     # <<< COLOR AUGMENTATION >>> #
     def color_adjust(self, batch: np.ndarray) -> np.ndarray:
         """ Perform color augmentation on the passed in batch.
@@ -264,7 +302,11 @@ class ImageAugmentation():
         logger.trace("Randomly flipped %s images of %s",  # type: ignore
                      len(indices), self._batchsize)
 
-    def warp(self, batch: np.ndarray, to_landmarks: bool = False, **kwargs) -> np.ndarray:
+    def warp(self,
+             batch: np.ndarray,
+             to_landmarks: bool = False,
+             out: Optional[np.ndarray] = None,
+             **kwargs) -> np.ndarray:
         """ Perform random warping on the passed in batch by one of two methods.
 
         Parameters
@@ -276,6 +318,11 @@ class ImageAugmentation():
             If ``False`` perform standard random warping of the input image. If ``True`` perform
             warping to semi-random similar corresponding landmarks from the other side. Default:
             ``False``
+        out: :class:`numpy.ndarray`, optional
+            A pre-allocated array of the same shape as :attr:`batch` to write the warped images
+            into. Every pixel is written, with areas that map outside of the source image set to
+            black, so the array does not need to be cleared between batches. If ``None`` then a
+            new array is allocated. Default: ``None``
         kwargs: dict
             If :attr:`to_landmarks` is ``True`` the following additional kwargs must be passed in:
 
@@ -291,93 +338,316 @@ class ImageAugmentation():
         :class:`numpy.ndarray`
             A 4-dimensional array of the same shape as :attr:`batch` with warping applied.
         """
+        retval = np.empty_like(batch) if out is None else out
         if to_landmarks:
-            return self._random_warp_landmarks(batch, **kwargs)
-        return self._random_warp(batch)
+            self._random_warp_landmarks(batch, retval, **kwargs)
+        else:
+            self._random_warp(batch, retval)
+        return retval
 
-    def _random_warp(self, batch: np.ndarray) -> np.ndarray:
+    def _random_warp(self, batch: np.ndarray, out: np.ndarray) -> None:
         """ Randomly warp the input batch
 
+        The interpolation maps for the whole batch are calculated in a single vectorized
+        upsample of the random control grids into pre-allocated buffers.
+
         Parameters
         ----------
         batch: :class:`numpy.ndarray`
             The batch should be a 4-dimensional array of shape (`batchsize`, `height`, `width`,
             `3`) and in `BGR` format.
-
-        Returns
-        ----------
-        :class:`numpy.ndarray`
-            A 4-dimensional array of the same shape as :attr:`batch` with warping applied.
+        out: :class:`numpy.ndarray`
+            The array to write the warped images into
         """
         logger.trace("Randomly warping batch")  # type: ignore
-        slices = self._constants.warp_slices
+        interp = self._constants.warp_interpolation
         rands = np.random.normal(size=(self._batchsize, 2, 5, 5),
                                  scale=self._warp_scale).astype("float32")
         batch_maps = ne.evaluate("m + r", local_dict=dict(m=self._constants.warp_maps, r=rands))
-        batch_interp = np.array([[cv2.resize(map_, self._constants.warp_pad)[slices, slices]
-                                  for map_ in maps]
-                                 for maps in batch_maps])
-        warped_batch = np.array([cv2.remap(image, interp[0], interp[1], cv2.INTER_LINEAR)
-                                 for image, interp in zip(batch, batch_interp)])
+        np.matmul(interp, batch_maps, out=self._warp_buffers[0])
+        np.matmul(self._warp_buffers[0], interp.T, out=self._warp_buffers[1])
+
+        for image, maps, dst in zip(batch, self._warp_buffers[1], out):
+            cv2.remap(image,
+                      maps[0],
+                      maps[1],
+                      cv2.INTER_LINEAR,
+                      dst=dst,
+                      borderMode=cv2.BORDER_CONSTANT)
+
+        logger.trace("Warped image shape: %s", out.shape)  # type: ignore
+
+    @classmethod
+    def _get_landmark_warp_points(cls,
+                                  batch_src_points: np.ndarray,
+                                  batch_dst_points: np.ndarray) -> np.ndarray:
+        """ Obtain the landmark points to use for warp-to-landmarks, excluding any jaw line or
+        eyebrow points that fall within the convex hull of the inner face of either the source or
+        destination landmarks.
+
+        The point in hull test is performed for the whole batch at once by checking the sign of
+        the cross product of each point against each edge of the (padded) convex hulls.
 
-        logger.trace("Warped image shape: %s", warped_batch.shape)  # type: ignore
-        return warped_batch
+        Parameters
+        ----------
+        batch_src_points: :class:`numpy.ndarray`
+            A batch of 68 point landmarks for the source faces in the shape (`batchsize`, `68`,
+            `2`).
+        batch_dst_points: :class:`numpy.ndarray`
+            A batch of 68 point landmarks for the destination faces in the shape (`batchsize`,
+            `68`, `2`).
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Boolean mask in the shape (`batchsize`, `76`) indicating which of the landmark points,
+            with the 8 edge anchors appended, should be used for warping
+        """
+        hulls = [cv2.convexHull(np.concatenate([src[17:], dst[17:]], axis=0))[:, 0]
+                 for src, dst in zip(batch_src_points.astype("int32"),
+                                     batch_dst_points.astype("int32"))]
+        max_len = max(len(hull) for hull in hulls)
+        # Pad with the final vertex. The resulting zero length edges pass the inclusive test
+        hulls = np.array([np.concatenate([hull, np.repeat(hull[-1:], max_len - len(hull), axis=0)])
+                          for hull in hulls]).astype("float64")
+        edges = np.roll(hulls, -1, axis=1) - hulls
+
+        points = np.concatenate([batch_src_points[:, :18], batch_dst_points[:, :18]], axis=1)
+        rel = points[:, :, None, :] - hulls[:, None, :, :]
+        cross = edges[:, None, :, 0] * rel[..., 1] - edges[:, None, :, 1] * rel[..., 0]
+        inside = np.all(cross >= 0, axis=2) | np.all(cross <= 0, axis=2)
+
+        retval = np.ones((batch_src_points.shape[0], batch_src_points.shape[1] + 8), dtype="bool")
+        retval[:, :18] = ~(inside[:, :18] | inside[:, 18:])
+        return retval
+
+    @classmethod
+    def _get_triangle_affines(cls,
+                              src_triangles: np.ndarray,
+                              dst_triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Obtain the affine transformation from each destination triangle to its source
+        triangle.
+
+        Parameters
+        ----------
+        src_triangles: :class:`numpy.ndarray`
+            The (`triangles`, `3`, `2`) source triangle vertices
+        dst_triangles: :class:`numpy.ndarray`
+            The (`triangles`, `3`, `2`) destination triangle vertices
+
+        Returns
+        -------
+        linear: :class:`numpy.ndarray`
+            The (`triangles`, `2`, `2`) linear part of each transformation. The first row is
+            multiplied by a point's x co-ordinate and the second row by its y co-ordinate
+        offset: :class:`numpy.ndarray`
+            The (`triangles`, `2`) translation part of each transformation
+        """
+        edges = dst_triangles[:, 1:] - dst_triangles[:, :1]
+        inverse = np.stack([np.stack([edges[:, 1, 1], -edges[:, 0, 1]], axis=-1),
+                            np.stack([-edges[:, 1, 0], edges[:, 0, 0]], axis=-1)], axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse /= (edges[:, 0, 0] * edges[:, 1, 1] -
+                        edges[:, 0, 1] * edges[:, 1, 0])[:, None, None]
+        linear = inverse @ (src_triangles[:, 1:] - src_triangles[:, :1])
+        offset = src_triangles[:, 0] - np.einsum("ti,tij->tj", dst_triangles[:, 0], linear)
+        return linear, offset
+
+    @classmethod
+    def _get_edge_lines(cls,
+                        start: np.ndarray,
+                        end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Obtain the lines that triangle edges lie on, as y co-ordinates over x co-ordinates.
+
+        Parameters
+        ----------
+        start: :class:`numpy.ndarray`
+            The (`triangles`, `2`) vertex that each edge starts at, with the lower x co-ordinate
+        end: :class:`numpy.ndarray`
+            The (`triangles`, `2`) vertex that each edge ends at, with the higher x co-ordinate
+
+        Returns
+        -------
+        x: :class:`numpy.ndarray`
+            The x co-ordinate of each edge's start
+        y: :class:`numpy.ndarray`
+            The y co-ordinate of each edge's start
+        slope: :class:`numpy.ndarray`
+            The change in y for each change in x along each edge. Vertical edges are given a
+            slope of `0`, so that they only take the y co-ordinate of their start
+        """
+        delta = end - start
+        vertical = delta[:, 0] <= 0
+        slope = delta[:, 1] / np.where(vertical, 1., delta[:, 0])
+        slope[vertical] = 0.
+        return start[:, 0], start[:, 1], slope
+
+    def _get_triangle_spans(self,
+                            dst_triangles: np.ndarray,
+                            images: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """ Scan convert the destination triangles, for every image in the batch at once, into
+        the spans of grid points that each triangle covers in each row of the grid.
+
+        The span of each triangle in a grid row is bounded by the triangle's longest edge (in x)
+        and one of its two shorter edges. The spans of the triangles tile each row, so every grid
+        point belongs to the last span starting at or before it. A span is added at the start of
+        each row, which is replaced by any triangle span that also starts there, so that grid
+        points before the first triangle in a row are marked as not covered.
+
+        Parameters
+        ----------
+        dst_triangles: :class:`numpy.ndarray`
+            The (`triangles`, `3`, `2`) destination triangle vertices for the whole batch
+        images: :class:`numpy.ndarray`
+            The index of the image within the batch that each triangle belongs to
+
+        Returns
+        -------
+        row: :class:`numpy.ndarray`
+            The grid row (x co-ordinate) of each span, in grid order
+        last: :class:`numpy.ndarray`
+            The final grid column (y co-ordinate) that each span covers. `-1` for spans which do
+            not belong to a triangle
+        triangle: :class:`numpy.ndarray`
+            The index of the triangle that each span belongs to
+        length: :class:`numpy.ndarray`
+            The number of grid points that take their value from each span
+        """
+        size = self._processing_size
+        vertices = np.take_along_axis(dst_triangles,
+                                      np.argsort(dst_triangles[..., 0], axis=1)[..., None],
+                                      axis=1)
+        low = np.maximum(np.ceil(vertices[:, 0, 0] - 1e-6), 0).astype("int64")
+        count = np.maximum(np.minimum(np.floor(vertices[:, 2, 0] + 1e-6), size - 1) - low + 1, 0)
+        count = count.astype("int64")
+        triangle = np.repeat(np.arange(len(dst_triangles)), count)
+        row = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count - low, count)
+
+        long_edge = self._get_edge_lines(vertices[:, 0], vertices[:, 2])
+        lower_edge = self._get_edge_lines(vertices[:, 0], vertices[:, 1])
+        upper_edge = self._get_edge_lines(vertices[:, 1], vertices[:, 2])
+        long_x, long_y, long_slope = (line[triangle] for line in long_edge)
+        lower = row < vertices[triangle, 1, 0]
+        short_x, short_y, short_slope = (np.where(lower, low_line[triangle], up_line[triangle])
+                                         for low_line, up_line in zip(lower_edge, upper_edge))
+        long_y += (row - long_x) * long_slope
+        short_y += (row - short_x) * short_slope
+        first = np.maximum(np.ceil(np.minimum(long_y, short_y) - 1e-6), 0).astype("int64")
+        last = np.minimum(np.floor(np.maximum(long_y, short_y) + 1e-6), size - 1).astype("int64")
+        valid = first <= last
+
+        num_rows = self._batchsize * size
+        row = np.concatenate([np.arange(num_rows), images[triangle[valid]] * size + row[valid]])
+        first = np.concatenate([np.zeros(num_rows, dtype="int64"), first[valid]])
+        last = np.concatenate([np.full(num_rows, -1), last[valid]])
+        triangle = np.concatenate([np.zeros(num_rows, dtype="int64"), triangle[valid]])
+
+        # Spans starting at the same grid point only share the boundary, so keep the longest
+        start = row * size + first
+        order = np.argsort(start * (size + 1) + last + 1)
+        start = start[order]
+        unique = np.append(start[1:] != start[:-1], True)
+        order = order[unique]
+        length = np.diff(np.append(start[unique], num_rows * size))
+        return row[order] % size, last[order], triangle[order], length
+
+    def _piecewise_affine_maps(self,
+                               batch_src: np.ndarray,
+                               batch_dst: np.ndarray,
+                               keep: np.ndarray) -> np.ndarray:
+        """ Obtain the linearly interpolated mappings from destination to source landmarks over
+        the full image grid, as piecewise affine transformations, for the whole batch at once.
+
+        The destination points for each image are Delaunay triangulated, in the same way as
+        :func:`scipy.interpolate.griddata`, and an affine transformation is calculated for each
+        triangle. The triangles are scan converted into the spans of grid points that they cover,
+        and the mapping for every grid point in the batch is then calculated in a single
+        vectorized operation. The output matches :func:`scipy.interpolate.griddata` with linear
+        interpolation, to floating point precision, for all grid points inside the destination
+        points' convex hull. The edge anchors are always kept, so the hull covers the full grid.
+
+        Parameters
+        ----------
+        batch_src: :class:`numpy.ndarray`
+            The (`batchsize`, `points`, `2`) source landmark points to map to
+        batch_dst: :class:`numpy.ndarray`
+            The (`batchsize`, `points`, `2`) destination landmark points to map from
+        keep: :class:`numpy.ndarray`
+            The (`batchsize`, `points`) boolean mask of the points to use for each image
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The (`batchsize`, `processing size`, `processing size`, `2`) mapping of grid points
+            to source image co-ordinates
+        """
+        num_points = batch_dst.shape[1]
+        simplices = np.concatenate([idx[Delaunay(dst[idx]).simplices] + image * num_points
+                                    for image, (dst, idx) in enumerate(
+                                        zip(batch_dst, (np.flatnonzero(mask) for mask in keep)))])
+        dst_triangles = batch_dst.reshape(-1, 2)[simplices]
+        linear, offset = self._get_triangle_affines(batch_src.reshape(-1, 2)[simplices],
+                                                    dst_triangles)
+        row, last, triangle, length = self._get_triangle_spans(dst_triangles,
+                                                               simplices[:, 0] // num_points)
+
+        # The mapping is linear in y along each span: map = (x * A[0] + offset) + y * A[1]
+        spans = np.concatenate([linear[triangle, 0] * row[:, None] + offset[triangle],
+                                linear[triangle, 1]], axis=1)
+        spans[last < 0] = np.nan
+        spans = np.repeat(spans, length, axis=0)
+        retval = ne.evaluate("b + s * y", local_dict=dict(b=spans[:, :2],
+                                                        s=spans[:, 2:],
+                                                        y=self._constants.warp_lm_columns))
+        return retval.reshape(self._batchsize,
+                              self._processing_size,
+                              self._processing_size,
+                              2)
 
     def _random_warp_landmarks(self,
                                batch: np.ndarray,
+                               out: np.ndarray,
                                batch_src_points: np.ndarray,
-                               batch_dst_points: np.ndarray) -> np.ndarray:
+                               batch_dst_points: np.ndarray) -> None:
         """ From dfaker. Warp the image to a similar set of landmarks from the opposite side
 
         batch: :class:`numpy.ndarray`
             The batch should be a 4-dimensional array of shape (`batchsize`, `height`, `width`,
             `3`) and in `BGR` format.
+        out: :class:`numpy.ndarray`
+            The array to write the warped images into
         batch_src_points :class:`numpy.ndarray`
             A batch of 68 point landmarks for the source faces. This is a 3-dimensional array in
             the shape (`batchsize`, `68`, `2`).
         batch_dst_points :class:`numpy.ndarray`
             A batch of randomly chosen closest match destination faces landmarks. This is a
             3-dimensional array in the shape (`batchsize`, `68`, `2`).
-
-        Returns
-        ----------
-        :class:`numpy.ndarray`
-            A 4-dimensional array of the same shape as :attr:`batch` with warping applied.
         """
         logger.trace("Randomly warping landmarks")  # type: ignore
         edge_anchors = self._constants.warp_lm_edge_anchors
-        grids = self._constants.warp_lm_grids
 
         batch_dst = (batch_dst_points + np.random.normal(size=batch_dst_points.shape,
                                                          scale=self._warp_lm_scale))
-
-        face_cores = [cv2.convexHull(np.concatenate([src[17:], dst[17:]], axis=0))
-                      for src, dst in zip(batch_src_points.astype("int32"),
-                                          batch_dst.astype("int32"))]
+        keep = self._get_landmark_warp_points(batch_src_points, batch_dst)
 
         batch_src = np.append(batch_src_points, edge_anchors, axis=1)
         batch_dst = np.append(batch_dst, edge_anchors, axis=1)
 
-        rem_indices = [list(set(idx for fpl in (src, dst)
-                                for idx, (pty, ptx) in enumerate(fpl)
-                                if cv2.pointPolygonTest(face_core, (pty, ptx), False) >= 0))
-                       for src, dst, face_core in zip(batch_src[:, :18, :],
-                                                      batch_dst[:, :18, :],
-                                                      face_cores)]
-        lbatch_src = [np.delete(src, idxs, axis=0) for idxs, src in zip(rem_indices, batch_src)]
-        lbatch_dst = [np.delete(dst, idxs, axis=0) for idxs, dst in zip(rem_indices, batch_dst)]
-
-        grid_z = np.array([griddata(dst, src, (grids[0], grids[1]), method="linear")
-                           for src, dst in zip(lbatch_src, lbatch_dst)])
-        maps = grid_z.reshape((self._batchsize,
-                               self._processing_size,
-                               self._processing_size,
-                               2)).astype("float32")
-        warped_batch = np.array([cv2.remap(image,
-                                           map_[..., 1],
-                                           map_[..., 0],
-                                           cv2.INTER_LINEAR,
-                                           cv2.BORDER_TRANSPARENT)
-                                 for image, map_ in zip(batch, maps)])
-        logger.trace("Warped batch shape: %s", warped_batch.shape)  # type: ignore
-        return warped_batch
+        if self._warp_lm_engine == "griddata":
+            grids = self._constants.warp_lm_grids
+            maps = np.array([griddata(dst[mask], src[mask], (grids[0], grids[1]), method="linear")
+                             for src, dst, mask in zip(batch_src, batch_dst, keep)])
+        else:
+            maps = self._piecewise_affine_maps(batch_src, batch_dst, keep)
+        maps = maps.reshape((self._batchsize,
+                             self._processing_size,
+                             self._processing_size,
+                             2)).astype("float32")
+        for image, map_, dst in zip(batch, maps, out):
+            cv2.remap(image,
+                      map_[..., 1],
+                      map_[..., 0],
+                      cv2.INTER_LINEAR,
+                      dst=dst,
+                      borderMode=cv2.BORDER_CONSTANT)
+        logger.trace("Warped batch shape: %s", out.shape)  # type: ignore
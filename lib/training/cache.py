@@ -4,6 +4,7 @@ import logging
 import os
 import sys
 
+from hashlib import sha1
 from threading import Lock
 from typing import cast, Dict, List, Optional, Tuple, TYPE_CHECKING
 
@@ -11,11 +12,13 @@ import cv2
 import numpy as np
 from tqdm import tqdm
 
-from lib.align import DetectedFace
+from lib.align import DetectedFace, FacesetManifest
 from lib.align.aligned_face import CenteringType
-from lib.image import read_image_batch, read_image_meta_batch
+from lib.image import read_image_batch
 from lib.utils import FaceswapError
 
+from .packed import CompressedMasks, PackedFaceset
+
 if sys.version_info < (3, 8):
     from typing_extensions import get_args, Literal
 else:
@@ -129,10 +132,12 @@ class _Cache():
         self._lock = Lock()
         self._cache_info = dict(cache_full=False, has_reset=False)
         self._partially_loaded: List[str] = []
+        self._pre_filled: Optional[Tuple[List[str], Literal["a", "b"]]] = None
 
         self._image_count = len(filenames)
         self._cache: Dict[str, DetectedFace] = {}
         self._aligned_landmarks: Dict[str, np.ndarray] = {}
+        self._landmark_index: Optional[LandmarkIndex] = None
         self._extract_version = 0.0
         self._size = size
 
@@ -141,6 +146,11 @@ class _Cache():
         self._config = config
         self._coverage_ratio = coverage_ratio
 
+        self._packed: Optional[PackedFaceset] = None
+        if config.get("packed_faceset", False):
+            self._packed = PackedFaceset(filenames)
+            self._load_packed()
+
         logger.debug("Initialized: %s", self.__class__.__name__)
 
     @property
@@ -165,6 +175,25 @@ class _Cache():
                                            for key, face in self._cache.items()}
         return self._aligned_landmarks
 
+    @property
+    def landmark_index(self) -> "LandmarkIndex":
+        """ :class:`LandmarkIndex`: The nearest neighbour index over this cache's aligned
+        landmarks. Built on first access, so should only be referenced once the cache has been
+        pre-filled for warp-to-landmarks. """
+        if self._landmark_index is None:
+            landmarks = self.aligned_landmarks
+            with self._lock:
+                if self._landmark_index is None:
+                    self._landmark_index = LandmarkIndex(landmarks)
+        return self._landmark_index
+
+    @property
+    def packed(self) -> Optional[PackedFaceset]:
+        """ :class:`~lib.training.packed.PackedFaceset` or ``None``: The packed faceset that
+        holds the decoded training images if the packed faceset option is enabled, otherwise
+        ``None`` """
+        return self._packed
+
     @property
     def size(self) -> int:
         """ int: The pixel size of the cropped aligned face """
@@ -202,6 +231,30 @@ class _Cache():
         """
         return [self._cache[os.path.basename(filename)] for filename in filenames]
 
+    def get_packed_batch(self, filenames: List[str]) -> np.ndarray:
+        """ Obtain a batch of images from the packed faceset.
+
+        The cache is populated from the packed faceset's metadata at creation, so this only needs
+        to check whether the opposite side has requested a reset of the cache prior to returning
+        the batch.
+
+        Parameters
+        ----------
+        filenames: list
+            List of full paths to image file names. All files must exist in :attr:`packed`
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The batch of face images loaded from the packed faceset
+        """
+        assert self._packed is not None
+        if _check_reset(self):
+            with self._lock:
+                self._reset_cache(False)
+                self._load_packed()
+        return self._packed.get_batch(filenames)
+
     def cache_metadata(self, filenames: List[str]) -> np.ndarray:
         """ Obtain the batch with metadata for items that need caching and cache DetectedFace
         objects to :attr:`_cache`.
@@ -250,11 +303,9 @@ class _Cache():
 
                 # Version Check
                 self._validate_version(meta, filename)
-                if self._partially_loaded:  # Faces already loaded for Warp-to-landmarks
+                if key in self._partially_loaded:  # Faces pre-filled without masks for WTL
                     self._partially_loaded.remove(key)
-                    detected_face = self._cache[key]
-                else:
-                    detected_face = self._load_detected_face(filename, meta["alignments"])
+                detected_face = self._load_detected_face(filename, meta["alignments"])
 
                 self._prepare_masks(filename, detected_face)
                 self._cache[key] = detected_face
@@ -269,7 +320,11 @@ class _Cache():
 
     def pre_fill(self, filenames: List[str], side: Literal["a", "b"]) -> None:
         """ When warp to landmarks is enabled, the cache must be pre-filled, as each side needs
-        access to the other side's alignments.
+        access to the other side's alignments. The nearest neighbour index over the aligned
+        landmarks is built once the cache has been filled.
+
+        The alignments are read from the face folder's :class:`lib.align.FacesetManifest`, which
+        does not hold mask data, so masks are loaded when each face is first fully cached.
 
         Parameters
         ----------
@@ -279,14 +334,15 @@ class _Cache():
             `"a"` or `"b"`. The side of the model being cached. Used for info output
         """
         with self._lock:
-            for filename, meta in tqdm(read_image_meta_batch(filenames),
-                                       desc=f"WTL: Caching Landmarks ({side.upper()})",
-                                       total=len(filenames),
-                                       leave=False):
-                if "itxt" not in meta or "alignments" not in meta["itxt"]:
+            self._pre_filled = (filenames, side)
+            manifest = FacesetManifest(os.path.dirname(filenames[0]))
+            for filename in tqdm(filenames,
+                                 desc=f"WTL: Caching Landmarks ({side.upper()})",
+                                 leave=False):
+                meta = manifest.get_metadata(filename)
+                if meta is None:
                     raise FaceswapError(f"Invalid face image found. Aborting: '{filename}'")
 
-                meta = meta["itxt"]
                 key = os.path.basename(filename)
                 # Version Check
                 self._validate_version(meta, filename)
@@ -294,6 +350,104 @@ class _Cache():
                 self._cache[key] = detected_face
                 self._partially_loaded.append(key)
 
+            self._aligned_landmarks = {key: face.aligned.landmarks
+                                       for key, face in self._cache.items()}
+            self._landmark_index = LandmarkIndex(self._aligned_landmarks)
+
+    def validate_versions(self, filenames: List[str]) -> None:
+        """ Validate the extract version of every face up front from the face folder's
+        :class:`lib.align.FacesetManifest`, rather than as each face is first cached.
+
+        When training batches are compiled in worker processes, each worker holds its own copy of
+        the cache, so any switch to legacy centering must be made in the main process, prior to
+        the workers being launched, for it to reach the trainer and the opposite side's cache.
+
+        Parameters
+        ----------
+        filenames: list
+            The list of full paths to the images to validate
+        """
+        with self._lock:
+            manifest = FacesetManifest(os.path.dirname(filenames[0]))
+            for filename in filenames:
+                meta = manifest.get_metadata(filename)
+                if meta is None:
+                    raise FaceswapError(f"Invalid face image found. Aborting: '{filename}'")
+                self._validate_version(meta, filename)
+
+    def sync_reset(self) -> None:
+        """ Reset the cache if a face centering change has been detected in the other cache.
+
+        Called in the main process prior to launching training worker processes, so that the
+        workers inherit a cache that is already consistent with the opposite side. Faces that were
+        pre-filled for warp to landmarks are pre-filled again for the new centering.
+        """
+        with self._lock:
+            if not _check_reset(self):
+                return
+            logger.debug("Syncing cache reset from opposite side")
+            self._reset_cache(False)
+            self._partially_loaded = []
+            if self._packed is not None:
+                self._load_packed()
+            pre_filled = self._pre_filled
+        if pre_filled is not None:
+            self.pre_fill(*pre_filled)
+
+    def _load_packed(self) -> None:
+        """ Populate the cache from the metadata held in the packed faceset, without reading any
+        of the face images from disk.
+
+        Training masks are loaded from the pack if they have previously been generated for the
+        current mask configuration, otherwise they are generated and stored back into the pack for
+        subsequent runs. Masks are passed between the pack and the cached faces in their
+        compressed form, so they are never all held decompressed.
+        """
+        assert self._packed is not None
+        metadata = self._packed.metadata
+        for key, meta in metadata.items():
+            self._validate_version(meta, os.path.join(self._packed.folder, key))
+
+        signature = self._mask_signature()
+        masks = self._packed.get_training_masks(signature)
+        new_masks: Dict[str, CompressedMasks] = {}
+
+        for key, meta in tqdm(metadata.items(),
+                              desc="Loading packed metadata",
+                              leave=False):
+            filename = os.path.join(self._packed.folder, key)
+            detected_face = self._load_detected_face(filename, meta["alignments"])
+            if masks is not None and key in masks:
+                detected_face.store_compressed_training_masks(masks[key], delete_masks=True)
+            else:
+                self._prepare_masks(filename, detected_face)
+                new_masks[key] = detected_face.compressed_training_masks
+            self._cache[key] = detected_face
+
+        if new_masks:
+            self._packed.store_training_masks(signature, {**(masks or {}), **new_masks})
+
+        self._partially_loaded = []
+        self._cache_info["cache_full"] = len(self._cache) == self._image_count
+        logger.debug("Populated cache from packed faceset: (faces: %s, cache_full: %s)",
+                     len(self._cache), self._cache_info["cache_full"])
+
+    def _mask_signature(self) -> str:
+        """ Obtain a string that uniquely identifies the configuration that training masks are
+        generated with, so that pre-computed masks are only re-used when they are still valid.
+
+        Returns
+        -------
+        str
+            The mask generation settings joined into a single string
+        """
+        keys = ("mask_type", "mask_blur_kernel", "mask_threshold", "penalized_mask_loss",
+                "learn_mask", "eye_multiplier", "mouth_multiplier")
+        retval = "|".join([str(self._config.get(key)) for key in keys] +
+                          [str(self._size), self._centering, str(self._coverage_ratio)])
+        logger.debug("Mask signature: '%s'", retval)
+        return retval
+
     def _validate_version(self, png_meta: "PNGHeaderDict", filename: str) -> None:
         """ Validate that there are not a mix of v1.0 extracted faces and v2.x faces.
 
@@ -344,6 +498,8 @@ class _Cache():
         self._config["centering"] = "legacy"
         self._centering = "legacy"
         self._cache = {}
+        self._aligned_landmarks = {}
+        self._landmark_index = None
         self._cache_info["cache_full"] = False
         if set_flag:
             self._cache_info["has_reset"] = True
@@ -505,3 +661,86 @@ class RingBuffer():  # pylint: disable=too-few-public-methods
         retval = self._buffer[self._index]
         self._index += 1 if self._index < self._max_index else -self._max_index
         return retval
+
+
+class LandmarkIndex():
+    """ Nearest neighbour index over a set of aligned landmarks, for finding the closest matching
+    faces from the opposite side for warp-to-landmarks.
+
+    The distance between two faces is the squared distance between their corresponding landmark
+    points. Distances are calculated from matrix products in chunks of indexed faces, so that
+    whole batches can be queried in a single call with bounded memory usage, and only the top
+    matches are kept for each chunk.
+
+    Parameters
+    ----------
+    landmarks: dict
+        The filename as key with the aligned landmarks for the face as value
+    chunk_size: int, optional
+        The number of indexed faces to compare queries against at once. Default: `4096`
+    """
+    def __init__(self, landmarks: Dict[str, np.ndarray], chunk_size: int = 4096) -> None:
+        logger.debug("Initializing %s: (landmarks: %s, chunk_size: %s)",
+                     self.__class__.__name__, len(landmarks), chunk_size)
+        self._keys = sorted(landmarks)
+        self._points = np.array([landmarks[key] for key in self._keys],
+                                dtype="float64").reshape(len(self._keys), -1)
+        self._sq_norms = np.einsum("ij,ij->i", self._points, self._points)
+        self._chunk_size = chunk_size
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def keys(self) -> List[str]:
+        """ list: The sorted filenames of the indexed faces, in index order """
+        return self._keys
+
+    @property
+    def fingerprint(self) -> str:
+        """ str: A hash of the indexed filenames and landmarks, for validating persisted query
+        results against """
+        retval = sha1("\n".join(self._keys).encode("utf-8", "surrogateescape"))
+        retval.update(np.ascontiguousarray(self._points).tobytes())
+        return retval.hexdigest()
+
+    def query(self, points: np.ndarray, count: int = 10) -> np.ndarray:
+        """ Obtain the closest indexed faces for a batch of landmarks.
+
+        Parameters
+        ----------
+        points: :class:`numpy.ndarray`
+            The batch of landmarks to query, in the shape (`num_faces`, `68`, `2`)
+        count: int, optional
+            The number of closest matches to return for each face. Default: `10`
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The indices into :attr:`keys` of the closest matches for each face, closest first, in
+            the shape (`num_faces`, `count`)
+        """
+        queries = points.reshape(len(points), -1).astype("float64")
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        count = min(count, len(self._keys))
+
+        best_dists: Optional[np.ndarray] = None
+        best_idx: Optional[np.ndarray] = None
+        for start in range(0, len(self._keys), self._chunk_size):
+            chunk = self._points[start: start + self._chunk_size]
+            dists = query_norms + self._sq_norms[None, start: start + len(chunk)] - 2 * (
+                queries @ chunk.T)
+            indices = np.broadcast_to(np.arange(start, start + len(chunk)), dists.shape)
+            if best_dists is not None and best_idx is not None:
+                dists = np.concatenate([best_dists, dists], axis=1)
+                indices = np.concatenate([best_idx, indices], axis=1)
+            if dists.shape[1] > count:
+                keep = np.argpartition(dists, count - 1, axis=1)[:, :count]
+                dists = np.take_along_axis(dists, keep, axis=1)
+                indices = np.take_along_axis(indices, keep, axis=1)
+            best_dists, best_idx = dists, indices
+
+        assert best_dists is not None and best_idx is not None
+        order = np.argsort(best_dists, axis=1)
+        retval = np.take_along_axis(best_idx, order, axis=1)
+        logger.trace("Queried landmark index: (queries: %s, results: %s)",  # type: ignore
+                     len(queries), retval.shape)
+        return retval
@@ -5,9 +5,10 @@ import logging
 import os
 import sys
 from concurrent import futures
+from hashlib import sha1
 
 from random import shuffle, choice
-from typing import cast, Dict, Generator, List, Tuple, TYPE_CHECKING, Union
+from typing import cast, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import cv2
 import numpy as np
@@ -15,7 +16,8 @@ import numexpr as ne
 from lib.align import AlignedFace, DetectedFace
 from lib.align.aligned_face import CenteringType
 from lib.image import read_image_batch
-from lib.multithreading import BackgroundGenerator
+from lib.multithreading import (BackgroundGenerator, BackgroundProcessGenerator,
+                                has_process_support)
 from lib.utils import FaceswapError
 
 from . import ImageAugmentation
@@ -228,6 +230,9 @@ class DataGenerator():
         If this is the first time a face has been loaded, then it's meta data is extracted
         from the png header and added to :attr:`_face_cache`.
 
+        If the packed faceset option is enabled, then faces are read directly from the
+        memory-mapped pack rather than being decoded from disk.
+
         Parameters
         ----------
         filenames: list
@@ -241,7 +246,10 @@ class DataGenerator():
             Batch of :class:`~lib.align.DetectedFace` objects for the given filename including the
             aligned face objects for the model output size
         """
-        if not self._face_cache.cache_full:
+        packed = self._face_cache.packed
+        if packed is not None and packed.contains(filenames):
+            raw_faces = self._face_cache.get_packed_batch(filenames)
+        elif packed is not None or not self._face_cache.cache_full:
             raw_faces = self._face_cache.cache_metadata(filenames)
         else:
             raw_faces = read_image_batch(filenames)
@@ -428,14 +436,125 @@ class TrainingDataGenerator(DataGenerator):  # pylint:disable=too-few-public-met
         self._warp_to_landmarks = (not self._no_warp
                                    and model.command_line_arguments.warp_to_landmarks)
 
-        if self._warp_to_landmarks:
+        if self._warp_to_landmarks and not self._face_cache.cache_full:
             self._face_cache.pre_fill(images, side)
+        elif (int(self._config.get("augment_processes", 0)) and has_process_support()
+              and not self._face_cache.cache_full):
+            # Legacy centering must be detected prior to the worker processes being launched
+            self._face_cache.validate_versions(images)
         self._processing = ImageAugmentation(batch_size,
                                              self._process_size,
                                              self._config)
+        self._warp_buffer = RingBuffer(batch_size,
+                                       (self._process_size, self._process_size, 3),
+                                       dtype="uint8")
         self._nearest_landmarks: Dict[str, Tuple[str, ...]] = {}
         logger.debug("Initialized %s", self.__class__.__name__)
 
+    def minibatch_ab(self, do_shuffle: bool = True) -> Generator[BatchType, None, None]:
+        """ A Background iterator to return augmented images, samples and targets.
+
+        If the `augment_processes` configuration option is greater than zero, then batches are
+        compiled in worker processes and handed back through shared memory, otherwise this is
+        identical to :func:`DataGenerator.minibatch_ab`.
+
+        Parameters
+        ----------
+        do_shuffle: bool, optional
+            Whether data should be shuffled prior to loading from disk. If true, each time the full
+            list of filenames are processed, the data will be reshuffled to make sure they are not
+            returned in the same order. Default: ``True``
+
+        Yields
+        ------
+        feed: list
+            4-dimensional array of faces to feed the training the model
+        targets: list
+            List of 4-dimensional :class:`numpy.ndarray` objects in the order and size of each
+            output of the model
+        """
+        processes = int(self._config.get("augment_processes", 0))
+        if not processes:
+            return super().minibatch_ab(do_shuffle=do_shuffle)
+        if not has_process_support():
+            logger.warning("Process based augmentation is not supported on this system. Falling "
+                           "back to thread based augmentation.")
+            return super().minibatch_ab(do_shuffle=do_shuffle)
+        logger.debug("do_shuffle: %s, processes: %s", do_shuffle, processes)
+        return self._process_minibatch(do_shuffle, processes)
+
+    def _process_minibatch(self,
+                           do_shuffle: bool,
+                           processes: int) -> Generator[BatchType, None, None]:
+        """ Launch the worker processes and yield batches from their shared memory output.
+
+        The worker processes are only launched when the first batch is requested. This ensures
+        that the face cache for the opposite side exists prior to the workers being forked, so
+        that the state shared between the sides can be resolved first (see
+        :func:`_prepare_workers`).
+
+        Parameters
+        ----------
+        do_shuffle: bool
+            Whether data should be shuffled prior to loading from disk
+        processes: int
+            The number of worker processes to launch
+
+        Yields
+        ------
+        :class:`numpy.ndarray`
+            The feed for the model for the current batch. This is only valid until the next batch
+            is requested
+        list
+            The targets for each model output for the current batch. These are only valid until
+            the next batch is requested
+        """
+        specs = [((self._batch_size, self._model_input_size, self._model_input_size, 3),
+                  "float32")]
+        specs.extend(((self._batch_size, size, size, self._total_channels), "float32")
+                     for size in self._output_sizes)
+        self._prepare_workers()
+        batcher = BackgroundProcessGenerator(self._minibatch_arrays,
+                                             specs,
+                                             processes,
+                                             prefetch=int(self._config.get("augment_prefetch",
+                                                                           2)),
+                                             seed=0 if self._side == "a" else processes,
+                                             args=(do_shuffle, ))
+        for arrays in batcher.iterator():
+            yield arrays[0], list(arrays[1:])
+
+    def _prepare_workers(self) -> None:
+        """ Resolve the state that is shared between the sides of the model in this process, prior
+        to the worker processes being forked.
+
+        Each worker holds its own copy of both sides' face caches, so a cache reset requested by
+        either side would otherwise never reach the trainer or the other side's workers. The
+        closest matches for warp-to-landmarks are also calculated here, once, rather than in every
+        worker.
+        """
+        for side in get_args(Literal["a", "b"]):
+            get_cache(side).sync_reset()
+        if self._warp_to_landmarks and not self._nearest_landmarks:
+            self._cache_closest_matches(get_cache("a" if self._side == "b" else "b"))
+
+    def _minibatch_arrays(self, do_shuffle: bool) -> Generator[List[np.ndarray], None, None]:
+        """ Flatten the output of :func:`_minibatch` into a single list of arrays for placing into
+        shared memory.
+
+        Parameters
+        ----------
+        do_shuffle: bool
+            Whether data should be shuffled prior to loading from disk
+
+        Yields
+        ------
+        list
+            The feed followed by each of the targets for the current batch
+        """
+        for feed, targets in self._minibatch(do_shuffle):
+            yield [feed, *targets]
+
     def _create_targets(self, batch: np.ndarray) -> List[np.ndarray]:
         """ Compile target images, with masks, for the model output sizes.
 
@@ -523,7 +642,7 @@ class TrainingDataGenerator(DataGenerator):  # pylint:disable=too-few-public-met
         # Random Warp
         if self._warp_to_landmarks:
             landmarks = np.array([face.aligned.landmarks for face in detected_faces])
-            batch_dst_pts = self._get_closest_match(filenames, landmarks)
+            batch_dst_pts = self._get_closest_match(filenames)
             warp_kwargs = dict(batch_src_points=landmarks, batch_dst_points=batch_dst_pts)
         else:
             warp_kwargs = {}
@@ -531,6 +650,7 @@ class TrainingDataGenerator(DataGenerator):  # pylint:disable=too-few-public-met
         warped = batch[..., :3] if self._no_warp else self._processing.warp(
             batch[..., :3],
             self._warp_to_landmarks,
+            out=self._warp_buffer(),
             **warp_kwargs)
 
         if self._model_input_size != self._process_size:
@@ -544,7 +664,7 @@ class TrainingDataGenerator(DataGenerator):  # pylint:disable=too-few-public-met
 
         return feed, targets
 
-    def _get_closest_match(self, filenames: List[str], batch_src_points: np.ndarray) -> np.ndarray:
+    def _get_closest_match(self, filenames: List[str]) -> np.ndarray:
         """ Only called if the :attr:`_warp_to_landmarks` is ``True``. Gets the closest
         matched 68 point landmarks from the opposite training set.
 
@@ -552,64 +672,115 @@ class TrainingDataGenerator(DataGenerator):  # pylint:disable=too-few-public-met
         ----------
         filenames: list
             Filenames for current batch
-        batch_src_points: :class:`np.ndarray`
-            The source landmarks for the current batch
 
         Returns
         -------
         :class:`np.ndarray`
             Randomly selected closest matches from the other side's landmarks
         """
-        logger.trace("Retrieving closest matched landmarks: (filenames: '%s', "  # type: ignore
-                     "src_points: '%s')", filenames, batch_src_points)
+        logger.trace("Retrieving closest matched landmarks: (filenames: '%s')",  # type: ignore
+                     filenames)
         lm_side: Literal["a", "b"] = "a" if self._side == "b" else "b"
         other_cache = get_cache(lm_side)
         landmarks = other_cache.aligned_landmarks
 
-        try:
-            closest_matches = [self._nearest_landmarks[os.path.basename(filename)]
-                               for filename in filenames]
-        except KeyError:
-            # Resize mismatched training image size landmarks
-            sizes = {side: cache.size for side, cache in zip((self._side, lm_side),
-                                                             (self._face_cache, other_cache))}
-            if len(set(sizes.values())) > 1:
-                scale = sizes[self._side] / sizes[lm_side]
-                landmarks = {key: lms * scale for key, lms in landmarks.items()}
-            closest_matches = self._cache_closest_matches(filenames, batch_src_points, landmarks)
+        if not self._nearest_landmarks:
+            self._cache_closest_matches(other_cache)
+        closest_matches = [self._nearest_landmarks[os.path.basename(filename)]
+                           for filename in filenames]
 
         batch_dst_points = np.array([landmarks[choice(fname)] for fname in closest_matches])
+        if self._face_cache.size != other_cache.size:
+            # Resize mismatched training image size landmarks
+            batch_dst_points = batch_dst_points * (self._face_cache.size / other_cache.size)
         logger.trace("Returning: (batch_dst_points: %s)", batch_dst_points.shape)  # type: ignore
         return batch_dst_points
 
-    def _cache_closest_matches(self,
-                               filenames: List[str],
-                               batch_src_points: np.ndarray,
-                               landmarks: Dict[str, np.ndarray]) -> List[Tuple[str, ...]]:
-        """ Cache the nearest landmarks for this batch
+    def _cache_closest_matches(self, other_cache: "_Cache") -> None:
+        """ Cache the 10 nearest landmarks from the opposite side for every face on this side.
+
+        The whole side is queried against the opposite side's landmark index in batches. The
+        results are saved into the training folder, so that they can be re-used on subsequent
+        runs if neither side's faces have changed.
 
         Parameters
         ----------
-        filenames: list
-            Filenames for current batch
-        batch_src_points: :class:`np.ndarray`
-            The source landmarks for the current batch
-        landmarks: dict
-            The destination landmarks with associated filenames
+        other_cache: :class:`~lib.training.cache._Cache`
+            The face cache for the opposite side
+        """
+        logger.debug("Caching closest matches")
+        src_index = self._face_cache.landmark_index
+        dst_index = other_cache.landmark_index
+        scale = other_cache.size / self._face_cache.size
+        fingerprint = sha1(f"{src_index.fingerprint}|{dst_index.fingerprint}|{scale}".encode(
+            "ascii")).hexdigest()
+        cache_file = os.path.join(os.path.dirname(self._images[0]), ".fs_wtl_matches.npz")
+
+        matches = self._load_closest_matches(cache_file, fingerprint)
+        if matches is None:
+            landmarks = self._face_cache.aligned_landmarks
+            points = np.array([landmarks[key] for key in src_index.keys]) * scale
+            chunk_size = 1024
+            matches = np.concatenate([dst_index.query(points[idx: idx + chunk_size])
+                                      for idx in range(0, len(points), chunk_size)])
+            self._save_closest_matches(cache_file, fingerprint, matches)
+
+        dst_keys = dst_index.keys
+        self._nearest_landmarks = {key: tuple(dst_keys[idx] for idx in row)
+                                   for key, row in zip(src_index.keys, matches)}
+        logger.debug("Cached closest matches: %s", len(self._nearest_landmarks))
+
+    @classmethod
+    def _load_closest_matches(cls, filename: str, fingerprint: str) -> Optional[np.ndarray]:
+        """ Load previously calculated closest matches from disk.
+
+        Parameters
+        ----------
+        filename: str
+            The full path to the saved closest matches file
+        fingerprint: str
+            The fingerprint of the landmarks for both sides that the matches must have been
+            generated from
+
+        Returns
+        -------
+        :class:`numpy.ndarray` or ``None``
+            The closest match indices if they exist and are valid for the given fingerprint,
+            otherwise ``None``
+        """
+        if not os.path.isfile(filename):
+            return None
+        with np.load(filename) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                logger.debug("Saved closest matches are out of date: '%s'", filename)
+                return None
+            retval = data["matches"]
+        logger.verbose("Loaded closest landmark matches: '%s'", filename)  # type: ignore
+        return retval
 
+    @classmethod
+    def _save_closest_matches(cls, filename: str, fingerprint: str, matches: np.ndarray) -> None:
+        """ Atomically save the calculated closest matches to disk.
+
+        Parameters
+        ----------
+        filename: str
+            The full path to save the closest matches to
+        fingerprint: str
+            The fingerprint of the landmarks for both sides that the matches were generated from
+        matches: :class:`numpy.ndarray`
+            The closest match indices for each face on this side
         """
-        logger.trace("Caching closest matches")  # type:ignore
-        dst_landmarks = list(landmarks.items())
-        dst_points = np.array([lm[1] for lm in dst_landmarks])
-        batch_closest_matches: List[Tuple[str, ...]] = []
-
-        for filename, src_points in zip(filenames, batch_src_points):
-            closest = (np.mean(np.square(src_points - dst_points), axis=(1, 2))).argsort()[:10]
-            closest_matches = tuple(dst_landmarks[i][0] for i in closest)
-            self._nearest_landmarks[os.path.basename(filename)] = closest_matches
-            batch_closest_matches.append(closest_matches)
-        logger.trace("Cached closest matches")  # type:ignore
-        return batch_closest_matches
+        tmp_file = f"{filename}~"
+        try:
+            with open(tmp_file, "wb") as out_file:
+                np.savez(out_file, fingerprint=np.array(fingerprint), matches=matches)
+            os.replace(tmp_file, filename)
+        except OSError as err:
+            logger.warning("Unable to save closest landmark matches to '%s': %s",
+                           filename, str(err))
+            return
+        logger.debug("Saved closest matches: '%s'", filename)
 
 
 class PreviewDataGenerator(DataGenerator):
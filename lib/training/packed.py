@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+""" Packed, memory-mapped face store for feeding the training data generators.
+
+Decoding every training face from PNG at every iteration is expensive. A packed faceset decodes
+each face in a side's training folder once, stores the raw pixels in a single memory-mapped
+``uint8`` array alongside the metadata held in each face's PNG header, and then serves batches
+by indexing the memory-mapped array directly.
+"""
+import logging
+import os
+
+from hashlib import sha1
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+from tqdm import tqdm
+
+from lib.image import read_image_batch
+from lib.serializer import get_serializer
+from lib.utils import FaceswapError
+
+if TYPE_CHECKING:
+    from lib.align.alignments import PNGHeaderDict
+
+logger = logging.getLogger(__name__)
+
+_PACK_NAME = ".fs_training_pack"
+_PACK_VERSION = 2
+
+CompressedMasks = Optional[Tuple[bytes, Tuple[int, int, int]]]
+
+
+class PackedFaceset():
+    """ A training face folder decoded once into a memory-mapped array file.
+
+    The pack is held in 3 hidden files inside the face folder:
+
+        * ``.fs_training_pack.npy`` - The decoded faces as a memory-mappable `uint8` array in the
+          format (`num_faces`, `height`, `width`, `channels`)
+        * ``.fs_training_pack.json`` - The index of filename to array row, along with the
+          fingerprint of the folder that the pack was built from
+        * ``.fs_training_pack.fsa`` - The Faceswap PNG header metadata for each face and any
+          pre-computed training masks, held in their compressed form
+
+    The pack is rebuilt automatically if the list of files in the folder, or any of their sizes or
+    modification times, no longer match the fingerprint stored with the pack.
+
+    Parameters
+    ----------
+    filenames: list
+        The full paths to all of the training images for one side. All images must reside in the
+        same folder
+    """
+    def __init__(self, filenames: List[str]) -> None:
+        logger.debug("Initializing %s: (filenames: %s)", self.__class__.__name__, len(filenames))
+        self._folder = os.path.dirname(filenames[0])
+        self._filenames = filenames
+        self._serializer = get_serializer("json")
+        self._meta_serializer = get_serializer("compressed")
+        self._fingerprint = self._get_fingerprint()
+
+        self._index: Dict[str, int] = {}
+        self._metadata: Dict[str, "PNGHeaderDict"] = {}
+        self._masks: Dict[str, Dict[str, CompressedMasks]] = {}
+        self._images: Optional[np.ndarray] = None
+
+        if not self._load():
+            self._build()
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def folder(self) -> str:
+        """ str: The full path to the folder that this pack was built from """
+        return self._folder
+
+    @property
+    def metadata(self) -> Dict[str, "PNGHeaderDict"]:
+        """ dict: The face filename as key with the Faceswap PNG header information stored in the
+        face as value """
+        return self._metadata
+
+    def _path(self, extension: str) -> str:
+        """ Obtain the full path to one of the files that make up this pack.
+
+        Parameters
+        ----------
+        extension: str
+            The file extension (without leading period) of the pack file to obtain
+
+        Returns
+        -------
+        str
+            The full path to the requested pack file
+        """
+        return os.path.join(self._folder, f"{_PACK_NAME}.{extension}")
+
+    def _get_fingerprint(self) -> str:
+        """ Obtain a fingerprint of the face folder so that a stale pack can be detected.
+
+        Returns
+        -------
+        str
+            A hash of every filename along with its size and modification time
+        """
+        fingerprint = sha1(str(_PACK_VERSION).encode("ascii"))
+        for filename in sorted(self._filenames):
+            stat = os.stat(filename)
+            fingerprint.update(f"{os.path.basename(filename)}|{stat.st_size}|"
+                               f"{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        retval = fingerprint.hexdigest()
+        logger.debug("Folder fingerprint: '%s'", retval)
+        return retval
+
+    def _load(self) -> bool:
+        """ Load an existing pack from disk, if it exists and is still valid.
+
+        Returns
+        -------
+        bool
+            ``True`` if a valid pack was loaded. ``False`` if the pack does not exist or is stale
+        """
+        index_file = self._path("json")
+        if not all(os.path.isfile(self._path(ext)) for ext in ("json", "npy", "fsa")):
+            logger.debug("No existing pack found in '%s'", self._folder)
+            return False
+
+        index = self._serializer.load(index_file)
+        if index.get("fingerprint") != self._fingerprint:
+            logger.info("Training faces have changed. Rebuilding packed faceset: '%s'",
+                        self._folder)
+            return False
+
+        self._images = np.load(self._path("npy"), mmap_mode="r")
+        self._index = {fname: idx for idx, fname in enumerate(index["filenames"])}
+        meta = self._meta_serializer.load(self._path("fsa"))
+        self._metadata = meta["metadata"]
+        self._masks = meta["masks"]
+        logger.info("Loaded packed faceset: '%s' (%s faces)", self._folder, len(self._index))
+        return True
+
+    def _build(self) -> None:
+        """ Decode every face in the folder into the memory-mapped array file and collect the
+        Faceswap PNG header metadata for each face. Files are written to temporary locations and
+        moved into place once complete, so that an interrupted build never leaves a pack that
+        will be treated as valid. """
+        filenames = sorted(self._filenames)
+        chunk_size = 256
+        images_file = self._path("npy")
+        tmp_file = f"{images_file}~"
+        images: Optional[np.ndarray] = None
+
+        for start in tqdm(range(0, len(filenames), chunk_size),
+                          desc=f"Packing faces '{os.path.basename(self._folder)}'",
+                          leave=False):
+            chunk = filenames[start: start + chunk_size]
+            batch, metadata = read_image_batch(chunk, with_metadata=True)
+            if len(batch.shape) == 1:
+                raise FaceswapError(f"There are mismatched image sizes in the folder "
+                                    f"'{self._folder}'. All training images for each side must "
+                                    "have the same dimensions.")
+            if images is None:
+                images = np.lib.format.open_memmap(tmp_file,
+                                                   mode="w+",
+                                                   dtype="uint8",
+                                                   shape=(len(filenames), *batch.shape[1:]))
+            if batch.shape[1:] != images.shape[1:]:
+                raise FaceswapError(f"There are mismatched image sizes in the folder "
+                                    f"'{self._folder}'. All training images for each side must "
+                                    "have the same dimensions.")
+            images[start: start + len(chunk)] = batch
+
+            for filename, meta in zip(chunk, metadata):
+                if not meta or "alignments" not in meta:
+                    raise FaceswapError(f"Invalid face image found. Aborting: '{filename}'")
+                self._metadata[os.path.basename(filename)] = meta
+
+        assert images is not None
+        images.flush()
+        del images
+        os.replace(tmp_file, images_file)
+
+        self._masks = {}
+        self._save_metadata()
+        self._serializer.save(f"{self._path('json')}~",
+                              dict(version=_PACK_VERSION,
+                                   fingerprint=self._fingerprint,
+                                   filenames=[os.path.basename(fname) for fname in filenames]))
+        os.replace(f"{self._path('json')}~", self._path("json"))
+
+        self._images = np.load(images_file, mmap_mode="r")
+        self._index = {os.path.basename(fname): idx for idx, fname in enumerate(filenames)}
+        logger.info("Packed faceset created: '%s' (%s faces)", self._folder, len(self._index))
+
+    def _save_metadata(self) -> None:
+        """ Atomically write the face metadata and any pre-computed training masks to disk. """
+        tmp_file = f"{self._path('fsa')}~"
+        self._meta_serializer.save(tmp_file, dict(metadata=self._metadata, masks=self._masks))
+        os.replace(tmp_file, self._path("fsa"))
+
+    def contains(self, filenames: List[str]) -> bool:
+        """ Check whether all of the given files are held within this pack.
+
+        Parameters
+        ----------
+        filenames: list
+            The full paths to the images to check
+
+        Returns
+        -------
+        bool
+            ``True`` if every file exists in the pack otherwise ``False``
+        """
+        return all(os.path.dirname(fname) == self._folder
+                   and os.path.basename(fname) in self._index
+                   for fname in filenames)
+
+    def get_batch(self, filenames: List[str]) -> np.ndarray:
+        """ Obtain a batch of decoded faces from the memory-mapped array.
+
+        Parameters
+        ----------
+        filenames: list
+            The full paths to the images to obtain. All files must exist in the pack
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The batch of faces in `BGR` order, returned in the order of :attr:`filenames`
+        """
+        assert self._images is not None
+        rows = np.array([self._index[os.path.basename(fname)] for fname in filenames])
+        retval = np.asarray(self._images[rows])
+        logger.trace("Packed batch: (filenames: %s, shape: %s)",  # type: ignore
+                     filenames, retval.shape)
+        return retval
+
+    def get_training_masks(self, signature: str) -> Optional[Dict[str, CompressedMasks]]:
+        """ Obtain pre-computed training masks for the given mask configuration.
+
+        The masks are held compressed, in the form stored by
+        :func:`lib.align.DetectedFace.store_training_masks`, so that they can be handed to each
+        face without being decompressed.
+
+        Parameters
+        ----------
+        signature: str
+            A string that uniquely identifies the configuration the masks were generated with
+
+        Returns
+        -------
+        dict or ``None``
+            The face filename as key with the compressed combined training masks and their shape
+            as value, if masks exist for the given signature, otherwise ``None``
+        """
+        retval = self._masks.get(signature)
+        logger.debug("Requested training masks: (signature: '%s', exists: %s)",
+                     signature, retval is not None)
+        return retval
+
+    def store_training_masks(self, signature: str, masks: Dict[str, CompressedMasks]) -> None:
+        """ Store pre-computed training masks for the given mask configuration and save to disk.
+
+        Only masks for the most recent configuration are held, so the pack does not keep growing
+        as the training configuration changes.
+
+        Parameters
+        ----------
+        signature: str
+            A string that uniquely identifies the configuration the masks were generated with
+        masks: dict
+            The face filename as key with the compressed combined training masks and their shape,
+            as obtained from :attr:`lib.align.DetectedFace.compressed_training_masks`, as value
+        """
+        logger.debug("Storing training masks: (signature: '%s', masks: %s)",
+                     signature, len(masks))
+        self._masks = {signature: masks}
+        self._save_metadata()
@@ -50,18 +50,19 @@ class VGGFace():
         return retval
 
     def predict(self, face):
-        """ Return encodings for given image from vgg_face """
-        if face.shape[0] != self.input_size:
-            face = self.resize_face(face)
-        blob = cv2.dnn.blobFromImage(face[..., :3],
-                                     1.0,
-                                     (self.input_size, self.input_size),
-                                     self.average_img,
-                                     False,
-                                     False)
+        """ Return encodings for given image, or batch of images, from vgg_face """
+        faces = face if face.ndim == 4 else face[None]
+        faces = [(img if img.shape[0] == self.input_size else self.resize_face(img))[..., :3]
+                 for img in faces]
+        blob = cv2.dnn.blobFromImages(faces,
+                                      1.0,
+                                      (self.input_size, self.input_size),
+                                      self.average_img,
+                                      False,
+                                      False)
         self.model.setInput(blob)
-        preds = self.model.forward("fc7")[0, :]
-        return preds
+        preds = self.model.forward("fc7")
+        return preds if face.ndim == 4 else preds[0, :]
 
     def resize_face(self, face):
         """ Resize incoming face to model_input_size """
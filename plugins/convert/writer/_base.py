@@ -4,8 +4,10 @@
 import logging
 import os
 import re
+import time
 
-from typing import Any, List, Optional
+from threading import Condition, Event
+from typing import Any, Callable, Deque, Dict, Generator, List, Optional, Set, Tuple
 
 import numpy as np
 
@@ -57,7 +59,18 @@ class Output():
 
         # Methods for making sure frames are written out in frame order
         self.re_search = re.compile(r"(\d+)(?=\.\w+$)")  # Identify frame numbers
-        self.cache: dict = {}  # Cache for when frames must be written in correct order
+        self.cache: Dict[int, Any] = {}  # Cache for when frames must be written in correct order
+        self.frame_order: Deque[int]  # Populated by stream writers
+        self._pending: Optional[Set[int]] = None  # Frames in frame_order still to be written
+        self._reorder = Condition()
+        self._reserved: Dict[int, int] = {}  # Frame numbers admitted to the cache and their size
+        self._reserved_bytes = 0
+        self._cache_bytes = 0
+        self._reorder_stats: Dict[str, float] = dict(cache_depth=0,
+                                                     peak_depth=0,
+                                                     peak_mb=0.,
+                                                     stalls=0,
+                                                     stall_time=0.)
         logger.debug("Initialized %s", self.__class__.__name__)
 
     @property
@@ -69,6 +82,25 @@ class Output():
         retval = hasattr(self, "frame_order")
         return retval
 
+    @property
+    def reorder_stats(self) -> Dict[str, float]:
+        """ dict: Metrics for the cache that holds out of order frames for stream writers.
+        `cache_depth` is the number of frames currently held, `peak_depth` and `peak_mb` the
+        maximum number of frames and megabytes held. `stalls` is the number of times that frame
+        loading was blocked waiting for space in the cache and `stall_time` the total time, in
+        seconds, spent blocked. """
+        with self._reorder:
+            return dict(self._reorder_stats)
+
+    @property
+    def _window_full(self) -> bool:
+        """ bool: ``True`` if the configured maximum number of frames or megabytes are admitted
+        to the reorder cache """
+        max_frames = self.config.get("reorder_frames", 0)
+        max_bytes = self.config.get("reorder_mb", 0) * 1024 * 1024
+        return bool((max_frames and len(self._reserved) >= max_frames)
+                    or (max_bytes and self._reserved_bytes >= max_bytes))
+
     def output_filename(self, filename: str, separate_mask: bool = False) -> List[str]:
         """ Obtain the full path for the output file, including the correct extension, for the
         given input filename.
@@ -104,6 +136,152 @@ class Output():
         logger.trace("in filename: '%s', out filename: '%s'", filename, retval)  # type:ignore
         return retval
 
+    def frame_number(self, filename: str) -> int:
+        """ Obtain the frame number from a frame's filename.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the frame, where the frame index can be extracted from
+
+        Returns
+        -------
+        int
+            The frame number of the given frame
+        """
+        re_frame = re.search(self.re_search, filename)
+        assert re_frame is not None
+        return int(re_frame.group())
+
+    def _is_pending(self, frame_no: int) -> bool:
+        """ Check whether a frame is still to be written out by a stream writer. Must be called
+        with the :attr:`_reorder` lock held.
+
+        Parameters
+        ----------
+        frame_no: int
+            The frame number to check
+
+        Returns
+        -------
+        bool
+            ``True`` if the frame exists in :attr:`frame_order` otherwise ``False``
+        """
+        if self._pending is None:
+            self._pending = set(self.frame_order)
+        return frame_no in self._pending
+
+    def _must_wait(self, frame_no: int, shutdown: Optional[Event]) -> bool:
+        """ Check whether a frame must wait for space in the reorder cache. Must be called with
+        the :attr:`_reorder` lock held.
+
+        Parameters
+        ----------
+        frame_no: int
+            The frame number that is waiting to be admitted
+        shutdown: :class:`threading.Event` or ``None``
+            An event that, if set, stops any wait for space in the cache
+
+        Returns
+        -------
+        bool
+            ``True`` if the cache is full and the frame is not the next frame to be written
+        """
+        return (self._window_full
+                and bool(self.frame_order) and self.frame_order[0] != frame_no
+                and not (shutdown is not None and shutdown.is_set()))
+
+    def reserve(self,
+                filename: str,
+                nbytes: int,
+                shutdown: Optional[Event] = None,
+                on_stall: Optional[Callable[[], None]] = None) -> None:
+        """ Reserve space in the reorder cache for a frame that is about to enter the convert
+        pipeline, blocking whilst the cache is full.
+
+        Frames are converted in parallel, so stream writers cache frames that arrive out of order.
+        Admitting a frame to the pipeline only once there is space for it bounds the cache to the
+        writer's `reorder_frames` and `reorder_mb` configuration options, pushing back on frame
+        loading, and so patching, rather than letting the cache grow without limit whilst a slow
+        frame is converted. The next frame to be written is always admitted. Frames must be
+        reserved in frame order.
+
+        Frames that have been admitted may be held back further down the pipeline (for example by
+        the predictor whilst it collects a batch of faces) until more frames arrive. As no more
+        frames can arrive whilst loading is blocked, :attr:`on_stall` is called prior to blocking
+        so that any held frames can be released.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the frame entering the pipeline
+        nbytes: int
+            The expected size of the converted frame, in bytes
+        shutdown: :class:`threading.Event`, optional
+            An event that, if set, stops any wait for space in the cache. Default: ``None``
+        on_stall: callable, optional
+            Called, without the cache lock held, when the frame must wait for space in the cache,
+            prior to waiting. Default: ``None``
+        """
+        if not self.is_stream:
+            return
+        frame_no = self.frame_number(filename)
+        with self._reorder:
+            if not self._is_pending(frame_no):
+                return
+            stalled = self._must_wait(frame_no, shutdown)
+        if stalled and on_stall is not None:
+            logger.trace("Cache full for frame %s. Releasing held frames",  # type:ignore
+                         frame_no)
+            on_stall()
+
+        with self._reorder:
+            start = None
+            while self._must_wait(frame_no, shutdown):
+                start = time.monotonic() if start is None else start
+                self._reorder.wait(timeout=1.0)
+            if start is not None:
+                self._reorder_stats["stalls"] += 1
+                self._reorder_stats["stall_time"] += time.monotonic() - start
+                logger.trace("Frame %s waited %.3fs for cache space",  # type:ignore
+                             frame_no, time.monotonic() - start)
+            self._reserved[frame_no] = nbytes
+            self._reserved_bytes += nbytes
+
+    def skip_frame(self, filename: str) -> None:
+        """ Remove a frame that will not be converted from the frames that a stream writer is
+        waiting for.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the frame that will not be converted
+        """
+        if not self.is_stream:
+            return
+        frame_no = self.frame_number(filename)
+        with self._reorder:
+            if not self._is_pending(frame_no):
+                return
+            logger.debug("Skipping frame from output: %s", frame_no)
+            assert self._pending is not None
+            self._pending.discard(frame_no)
+            self.frame_order.remove(frame_no)
+            self._release(frame_no)
+
+    def _release(self, frame_no: int) -> None:
+        """ Release the space held in the reorder cache by a frame and wake any loaders waiting
+        for space. Must be called with the :attr:`_reorder` lock held.
+
+        Parameters
+        ----------
+        frame_no: int
+            The frame number to release
+        """
+        self._reserved_bytes -= self._reserved.pop(frame_no, 0)
+        self._reorder_stats["cache_depth"] = len(self.cache)
+        self._reorder.notify_all()
+
     def cache_frame(self, filename: str, image: np.ndarray) -> None:
         """ Add the incoming converted frame to the cache ready for writing out.
 
@@ -117,12 +295,52 @@ class Output():
         image: class:`numpy.ndarray`
             The converted frame corresponding to the given filename
         """
-        re_frame = re.search(self.re_search, filename)
-        assert re_frame is not None
-        frame_no = int(re_frame.group())
-        self.cache[frame_no] = image
+        frame_no = self.frame_number(filename)
+        with self._reorder:
+            self._cache_bytes += image.nbytes - getattr(self.cache.get(frame_no), "nbytes", 0)
+            self.cache[frame_no] = image
+            if frame_no in self._reserved:
+                # Replace the expected size with the actual size of the converted frame
+                self._reserved_bytes += image.nbytes - self._reserved[frame_no]
+                self._reserved[frame_no] = image.nbytes
+            stats = self._reorder_stats
+            stats["cache_depth"] = len(self.cache)
+            stats["peak_depth"] = max(stats["peak_depth"], len(self.cache))
+            stats["peak_mb"] = max(stats["peak_mb"], self._cache_bytes / 1024 / 1024)
         logger.trace("Added to cache. Frame no: %s", frame_no)  # type: ignore
-        logger.trace("Current cache: %s", sorted(self.cache.keys()))  # type:ignore
+        logger.trace("Current cache size: %s", len(self.cache))  # type:ignore
+
+    def from_cache(self) -> Generator[Tuple[int, np.ndarray], None, None]:
+        """ Obtain any consecutive frames from the cache that are ready to be written out, in
+        frame order, releasing their space in the cache.
+
+        Yields
+        ------
+        frame_no: int
+            The frame number of the frame to be written
+        image: :class:`numpy.ndarray`
+            The converted frame to be written
+        """
+        while True:
+            with self._reorder:
+                if not self.frame_order or self.frame_order[0] not in self.cache:
+                    break
+                frame_no = self.frame_order.popleft()
+                image = self.cache.pop(frame_no)
+                self._cache_bytes -= image.nbytes
+                if self._pending is not None:
+                    self._pending.discard(frame_no)
+                self._release(frame_no)
+            yield frame_no, image
+
+    def log_reorder_stats(self) -> None:
+        """ Output the reorder cache metrics for stream writers to the log on completion. """
+        if not self.is_stream:
+            return
+        stats = self.reorder_stats
+        logger.verbose("Reorder cache: peak frames: %s, peak size: %.1fMB, "  # type:ignore
+                       "stalls: %s (%.1fs)", stats["peak_depth"], stats["peak_mb"],
+                       stats["stalls"], stats["stall_time"])
 
     def write(self, filename: str, image: Any) -> None:
         """ Override for specific frame writing method.
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """ Video output writer for faceswap.py converter """
 import os
+from collections import deque
 from math import ceil
 from subprocess import CalledProcessError, check_output, STDOUT
 from typing import cast, Generator, List, Optional, Tuple
@@ -41,7 +42,7 @@ class Writer(Output):
         self._source_video: str = source_video
         self._output_filename: str = self._get_output_filename()
         self._frame_ranges: Optional[List[Tuple[int, int]]] = frame_ranges
-        self.frame_order: List[int] = self._set_frame_order(total_count)
+        self.frame_order = deque(self._set_frame_order(total_count))
         self._output_dimensions: Optional[str] = None  # Fix dims on 1st received frame
         # Need to know dimensions of first frame, so set writer then
         self._writer: Optional[Generator[None, np.ndarray, None]] = None
@@ -263,12 +264,7 @@ class Writer(Output):
         """ Writes any consecutive frames to the video container that are ready to be output
         from the cache. """
         assert self._writer is not None
-        while self.frame_order:
-            if self.frame_order[0] not in self.cache:
-                logger.trace("Next frame not ready. Continuing")  # type: ignore
-                break
-            save_no = self.frame_order.pop(0)
-            save_image = self.cache.pop(save_no)
+        for save_no, save_image in self.from_cache():
             logger.trace("Rendering from cache. Frame no: %s", save_no)  # type: ignore
             self._writer.send(np.ascontiguousarray(save_image[:, :, ::-1]))
         logger.trace("Current cache size: %s", len(self.cache))  # type: ignore
@@ -276,4 +272,6 @@ class Writer(Output):
     def close(self) -> None:
         """ Close the ffmpeg writer and mux the audio """
         if self._writer is not None:
+            self._save_from_cache()  # Frames released by skipped frames
             self._writer.close()
+        self.log_reorder_stats()
@@ -145,4 +145,31 @@ _DEFAULTS = dict(
         datatype=bool,
         group="settings",
     ),
+    reorder_frames=dict(
+        default=128,
+        info="Frames are converted in parallel so can complete out of order, and are held in a "
+             "cache until they can be written in sequence. This is the maximum number of frames "
+             "to hold in the cache. Loading of new frames is paused whilst the cache is full. "
+             "Set to 0 for no limit.",
+        datatype=int,
+        rounding=8,
+        min_max=(0, 1024),
+        choices=[],
+        group="reorder",
+        gui_radio=False,
+        fixed=True,
+    ),
+    reorder_mb=dict(
+        default=2048,
+        info="The maximum size, in megabytes, of the cache that holds converted frames until they "
+             "can be written in sequence. Loading of new frames is paused whilst the cache is "
+             "full. Set to 0 for no limit.",
+        datatype=int,
+        rounding=256,
+        min_max=(0, 16384),
+        choices=[],
+        group="reorder",
+        gui_radio=False,
+        fixed=True,
+    ),
 )
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """ Animated GIF writer for faceswap.py converter """
 import os
+from collections import deque
 from typing import Optional, List, Tuple, TYPE_CHECKING
 
 import cv2
@@ -35,7 +36,7 @@ class Writer(Output):
                  **kwargs) -> None:
         logger.debug("total_count: %s, frame_ranges: %s", total_count, frame_ranges)
         super().__init__(output_folder, **kwargs)
-        self.frame_order: List[int] = self._set_frame_order(total_count, frame_ranges)
+        self.frame_order = deque(self._set_frame_order(total_count, frame_ranges))
         self._output_dimensions: Optional[Tuple[int, int]] = None  # Fix dims on 1st received frame
         # Need to know dimensions of first frame, so set writer then
         self._writer: Optional[imageio.plugins.pillowmulti.GIFFormat.Writer] = None
@@ -44,7 +45,8 @@ class Writer(Output):
     @property
     def _gif_params(self) -> dict:
         """ dict: The selected gif plugin configuration options. """
-        kwargs = {key: int(val) for key, val in self.config.items()}
+        kwargs = {key: int(val) for key, val in self.config.items()
+                  if not key.startswith("reorder_")}
         logger.debug(kwargs)
         return kwargs
 
@@ -156,12 +158,7 @@ class Writer(Output):
         """ Writes any consecutive frames to the GIF container that are ready to be output
         from the cache. """
         assert self._writer is not None
-        while self.frame_order:
-            if self.frame_order[0] not in self.cache:
-                logger.trace("Next frame not ready. Continuing")  # type: ignore
-                break
-            save_no = self.frame_order.pop(0)
-            save_image = self.cache.pop(save_no)
+        for save_no, save_image in self.from_cache():
             logger.trace("Rendering from cache. Frame no: %s", save_no)  # type: ignore
             self._writer.append_data(save_image[:, :, ::-1])
         logger.trace("Current cache size: %s", len(self.cache))  # type: ignore
@@ -169,4 +166,6 @@ class Writer(Output):
     def close(self) -> None:
         """ Close the GIF writer on completion. """
         if self._writer is not None:
+            self._save_from_cache()  # Frames released by skipped frames
             self._writer.close()
+        self.log_reorder_stats()
@@ -3,14 +3,20 @@
 :mod:`~plugins.extract.mask` Plugins
 """
 import logging
-from typing import Dict
+from time import perf_counter
+from typing import Dict, Optional, TYPE_CHECKING
 from tensorflow.python.framework import errors_impl as tf_errors  # pylint:disable=no-name-in-module  # noqa
 
-from lib.multithreading import MultiThread
+from lib.multithreading import has_process_support, MultiThread
 from lib.queue_manager import queue_manager
 from lib.utils import GetModel, FaceswapError
 from ._config import Config
 from .pipeline import ExtractMedia
+from .process_pool import PluginProcessPool
+
+if TYPE_CHECKING:
+    from .autotune import PluginTuner
+    from .telemetry import StageTelemetry, Telemetry
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -91,6 +97,9 @@ class Extractor():
     vram_per_batch: int
         Approximate additional VRAM used by the model for each additional batch. Used to calculate
         the :attr:`batchsize`. Be conservative to avoid OOM.
+    max_batchsize: int
+        The largest batch size that the plugin can be autotuned to. Plugins that can only process
+        a single item at a time should set this to `1`
 
     See Also
     --------
@@ -123,6 +132,7 @@ class Extractor():
         self.vram = None
         self.vram_warnings = None  # Will run at this with warnings
         self.vram_per_batch = None
+        self.max_batchsize = 64
 
         # << THE FOLLOWING ARE SET IN self.initialize METHOD >> #
         self.queue_size = 1
@@ -148,6 +158,23 @@ class Extractor():
         """ dict: The :class:`plugins.extract.pipeline.ExtractMedia` objects currently being
         processed. Stored at input for pairing back up on output of extractor process """
 
+        self._tuner: Optional["PluginTuner"] = None
+        """ :class:`~plugins.extract.autotune.PluginTuner`: The tuner measuring this plugin when
+        autotuning is enabled, otherwise ``None``. Set with :func:`set_tuner` """
+
+        self._processes = self._get_processes()
+        """ int: The number of worker processes to run this plugin's input, predict and output
+        stages in. `1` to run them in threads within the main process """
+
+        self._process_pool: Optional[PluginProcessPool] = None
+        """ :class:`~plugins.extract.process_pool.PluginProcessPool`: The pool running this
+        plugin's stages when :attr:`processes` is greater than `1`, otherwise ``None`` """
+
+        self._telemetry: Optional["Telemetry"] = None
+        """ :class:`~plugins.extract.telemetry.Telemetry`: The pipeline telemetry that this
+        plugin's threads record their timings into, or ``None`` to not record timings. Set with
+        :func:`set_telemetry` """
+
         # << THE FOLLOWING PROTECTED ATTRIBUTES ARE SET IN PLUGIN TYPE _base.py >>> #
         self._plugin_type = None
         """ str: Plugin type. ``detect`` or ``align``
@@ -155,6 +182,32 @@ class Extractor():
 
         logger.debug("Initialized _base %s", self.__class__.__name__)
 
+    @property
+    def processes(self) -> int:
+        """ int: The number of worker processes that this plugin's input, predict and output
+        stages run in. `1` if the stages run in threads within the main process """
+        return self._processes
+
+    def _get_processes(self) -> int:
+        """ Obtain the number of worker processes to run the plugin in from the plugin's
+        `processes` configuration option.
+
+        Only plugins that do not use Tensorflow expose this option, as their models can be
+        loaded in forked processes.
+
+        Returns
+        -------
+        int
+            The number of worker processes to run the plugin in, or `1` to run in threads
+        """
+        retval = self.config.get("processes", 1)
+        if retval > 1 and not has_process_support():
+            logger.warning("Running extraction plugins in separate processes is not supported on "
+                           "this system. %s will run in threads.", self.__class__.__name__)
+            retval = 1
+        logger.debug("%s processes: %s", self.__class__.__name__, retval)
+        return retval
+
     # <<< OVERIDABLE METHODS >>> #
     def init_model(self):
         """ **Override method**
@@ -349,6 +402,88 @@ class Extractor():
                 return True
         return False
 
+    # <<< TUNING METHODS >>> #
+    def set_tuner(self, tuner: "PluginTuner") -> None:
+        """ Measure this plugin's prediction throughput with the given tuner, and update the
+        plugin's batch size and queue depth as the tuner selects them.
+
+        Exposed for :mod:`~plugins.extract.pipeline` to autotune the plugin
+
+        Parameters
+        ----------
+        tuner: :class:`~plugins.extract.autotune.PluginTuner`
+            The tuner for this plugin
+        """
+        logger.debug("Setting tuner for %s: %s", self.__class__.__name__, tuner)
+        self._tuner = tuner
+
+    def set_telemetry(self, telemetry: "Telemetry") -> None:
+        """ Record the timings of each of this plugin's threads into the given telemetry.
+
+        Exposed for :mod:`~plugins.extract.pipeline` to collect telemetry for the pipeline. Must
+        be called before the plugin is initialized.
+
+        Parameters
+        ----------
+        telemetry: :class:`~plugins.extract.telemetry.Telemetry`
+            The telemetry for the pipeline that this plugin belongs to
+        """
+        logger.debug("Setting telemetry for %s: %s", self.__class__.__name__, telemetry)
+        self._telemetry = telemetry
+
+    def set_queue_size(self, queue_size: int) -> None:
+        """ Set the depth of this plugin's input and internal queues.
+
+        Exposed for :mod:`~plugins.extract.pipeline` to set tuned queue depths. Can be called
+        before or after the plugin has been initialized.
+
+        Parameters
+        ----------
+        queue_size: int
+            The maximum number of items to hold in each queue
+        """
+        logger.debug("Setting queue size for %s to %s", self.__class__.__name__, queue_size)
+        self.queue_size = queue_size
+        for name, queue in self._queues.items():
+            if name != "out":
+                queue.maxsize = queue_size
+
+    @classmethod
+    def _batch_items(cls, batch) -> int:
+        """ Obtain the number of items held in a batch.
+
+        Parameters
+        ----------
+        batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+            The batch to count
+
+        Returns
+        -------
+        int
+            The number of items in the batch
+        """
+        return len(batch.get("filename", [])) if isinstance(batch, dict) else len(batch.filename)
+
+    def _tune(self, batch, predict_time: float, wait_time: float) -> None:
+        """ Pass the measurements for a predicted batch to the :attr:`_tuner` and update the
+        batch size and queue depth if they have changed.
+
+        Parameters
+        ----------
+        batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+            The batch that has been predicted
+        predict_time: float
+            The time, in seconds, taken to predict the batch
+        wait_time: float
+            The time, in seconds, that was spent waiting to receive the batch
+        """
+        assert self._tuner is not None
+        if not self._tuner.record(self._batch_items(batch), predict_time, wait_time):
+            return
+        self.batchsize = self._tuner.batchsize
+        if self._tuner.queue_size != self.queue_size:
+            self.set_queue_size(self._tuner.queue_size)
+
     # <<< PROTECTED ACCESS METHODS >>> #
     # <<< INIT METHODS >>> #
     @classmethod
@@ -378,12 +513,17 @@ class Extractor():
             return
 
         logger.info("Initializing %s (%s)...", self.name, self._plugin_type.title())
-        self.queue_size = 1
         name = self.name.replace(" ", "_").lower()
         self._add_queues(kwargs["in_queue"],
                          kwargs["out_queue"],
                          [f"predict_{name}", f"post_{name}"])
         self._compile_threads()
+        if self._process_pool is not None:
+            # The model is loaded within each worker process
+            self._is_initialized = True
+            logger.info("Initialized %s (%s) with batchsize of %s in %s processes",
+                        self.name, self._plugin_type.title(), self.batchsize, self._processes)
+            return
         try:
             self.init_model()
         except tf_errors.UnknownError as err:
@@ -407,6 +547,7 @@ class Extractor():
             in_queue and out_queue should be previously created queue manager queues.
             queues should be a list of queue names """
         self._queues["in"] = in_queue
+        self._queues["in"].maxsize = max(self._queues["in"].maxsize, self.queue_size)
         self._queues["out"] = out_queue
         for q_name in queues:
             self._queues[q_name] = queue_manager.get_queue(
@@ -419,6 +560,9 @@ class Extractor():
         logger.debug("Compiling %s threads", self._plugin_type)
         name = self.name.replace(" ", "_").lower()
         base_name = f"{self._plugin_type}_{name}"
+        if self._processes > 1:
+            self._compile_process_threads(base_name)
+            return
         self._add_thread(f"{base_name}_input",
                          self._process_input,
                          self._queues["in"],
@@ -433,6 +577,31 @@ class Extractor():
                          self._queues["out"])
         logger.debug("Compiled %s threads: %s", self._plugin_type, self._threads)
 
+    def _compile_process_threads(self, base_name: str) -> None:
+        """ Create the :attr:`_process_pool` and compile the threads that send batches to and
+        receive batches from it into self._threads list
+
+        Parameters
+        ----------
+        base_name: str
+            The plugin type and name to prefix the thread names with
+        """
+        logger.debug("Compiling %s process threads: (processes: %s)",
+                     self._plugin_type, self._processes)
+        self._process_pool = PluginProcessPool(self, self._processes)
+        stages = {key: None if self._telemetry is None else self._telemetry.stage(
+            f"{base_name}_{key}") for key in ("input", "process", "output")}
+        self._threads.append(MultiThread(target=self._send_to_processes,
+                                         name=f"{base_name}_input",
+                                         in_queue=self._queues["in"],
+                                         stage=stages["input"]))
+        self._threads.append(MultiThread(target=self._receive_from_processes,
+                                         name=f"{base_name}_output",
+                                         out_queue=self._queues["out"],
+                                         stage=stages["output"],
+                                         process_stage=stages["process"]))
+        logger.debug("Compiled %s process threads: %s", self._plugin_type, self._threads)
+
     def _add_thread(self, name, function, in_queue, out_queue):
         """ Add a MultiThread thread to self._threads """
         logger.debug("Adding thread: (name: %s, function: %s, in_queue: %s, out_queue: %s)",
@@ -441,32 +610,49 @@ class Extractor():
                                          name=name,
                                          function=function,
                                          in_queue=in_queue,
-                                         out_queue=out_queue))
+                                         out_queue=out_queue,
+                                         stage=(None if self._telemetry is None
+                                                else self._telemetry.stage(name))))
         logger.debug("Added thread: %s", name)
 
-    def _thread_process(self, function, in_queue, out_queue):
-        """ Perform a plugin function in a thread """
+    def _thread_process(self, function, in_queue, out_queue, stage=None):
+        """ Perform a plugin function in a thread
+
+        The time spent waiting for input, processing and waiting to output each batch is recorded
+        into the given telemetry stage.
+        """
         func_name = function.__name__
         logger.debug("threading: (function: '%s')", func_name)
         while True:
+            start = perf_counter()
             if func_name == "_process_input":
-                # Process input items to batches
+                # Process input items to batches. get_batch both waits on the input queue and
+                # processes items, so the time waiting is taken from the queue's statistics
+                queue_wait = in_queue.stats["get_wait"] if stage is not None else 0.0
                 exhausted, batch = self.get_batch(in_queue)
+                wait_time = in_queue.stats["get_wait"] - queue_wait if stage is not None else 0.0
                 if exhausted:
                     # TODO Move all batch items to common dataclass. Currently migrated:
                     # Align
                     if (isinstance(batch, dict) and batch or
                             not isinstance(batch, dict) and batch.filename):
                         # Put the final batch
+                        items = self._batch_items(batch)
                         batch = function(batch)
                         out_queue.put(batch)
+                        if stage is not None:
+                            stage.record(items, perf_counter() - start - wait_time, wait_time)
                     break
             else:
                 batch = self._get_item(in_queue)
+                wait_time = perf_counter() - start
                 if batch == "EOF":
                     break
+            items = self._batch_items(batch) if stage is not None else 0
             try:
+                predict_time = perf_counter()
                 batch = function(batch)
+                predict_time = perf_counter() - predict_time
             except tf_errors.UnknownError as err:
                 if "failed to get convolution algorithm" in str(err).lower():
                     msg = ("Tensorflow raised an unknown error. This is most likely caused by a "
@@ -479,12 +665,107 @@ class Extractor():
                            "`allow_growth option to `True`.")
                     raise FaceswapError(msg) from err
                 raise err
+            if func_name == "_predict" and self._tuner is not None:
+                self._tune(batch, predict_time, wait_time)
+            put_time = 0.0
             if func_name == "_process_output":
                 # Process output items to individual items from batch
                 for item in self.finalize(batch):
+                    put_start = perf_counter()
                     out_queue.put(item)
+                    put_time += perf_counter() - put_start
             else:
+                put_start = perf_counter()
                 out_queue.put(batch)
+                put_time = perf_counter() - put_start
+            if stage is not None:
+                self._record_telemetry(stage,
+                                       func_name,
+                                       items,
+                                       perf_counter() - start,
+                                       wait_time,
+                                       put_time)
+        logger.debug("Putting EOF")
+        out_queue.put("EOF")
+
+    def _record_telemetry(self,
+                          stage: "StageTelemetry",
+                          func_name: str,
+                          items: int,
+                          total: float,
+                          wait_in: float,
+                          wait_out: float) -> None:
+        """ Record the timings for a batch that has been through one of this plugin's threads.
+
+        Parameters
+        ----------
+        stage: :class:`~plugins.extract.telemetry.StageTelemetry`
+            The telemetry for the thread that processed the batch
+        func_name: str
+            The name of the function that the thread runs
+        items: int
+            The number of items in the batch
+        total: float
+            The total time, in seconds, that the thread spent on the batch
+        wait_in: float
+            The time, in seconds, spent waiting to receive the batch
+        wait_out: float
+            The time, in seconds, spent waiting to put the batch to the next queue
+        """
+        stage.record(items,
+                     max(0.0, total - wait_in - wait_out),
+                     wait_in=wait_in,
+                     wait_out=wait_out,
+                     capacity=self.batchsize if func_name == "_predict" else 0)
+
+    def _send_to_processes(self, in_queue, stage=None):
+        """ Collect batches from the input queue and send them to the :attr:`_process_pool` """
+        assert self._process_pool is not None
+        logger.debug("Sending batches to processes")
+        while True:
+            start = perf_counter()
+            queue_wait = in_queue.stats["get_wait"] if stage is not None else 0.0
+            exhausted, batch = self.get_batch(in_queue)
+            wait_time = in_queue.stats["get_wait"] - queue_wait if stage is not None else 0.0
+            items = self._batch_items(batch)
+            if items:
+                put_start = perf_counter()
+                self._process_pool.put(batch)
+                if stage is not None:
+                    now = perf_counter()
+                    self._record_telemetry(stage,
+                                           "_process_input",
+                                           items,
+                                           now - start,
+                                           wait_time,
+                                           now - put_start)
+            if exhausted:
+                break
+        self._process_pool.put_eof()
+
+    def _receive_from_processes(self, out_queue, stage=None, process_stage=None):
+        """ Receive processed batches from the :attr:`_process_pool`, finalize them and put the
+        results to the output queue """
+        assert self._process_pool is not None
+        logger.debug("Receiving batches from processes")
+        start = perf_counter()
+        for batch, busy, wait in self._process_pool.results():
+            wait_time = perf_counter() - start
+            items = self._batch_items(batch)
+            put_time = 0.0
+            for item in self.finalize(batch):
+                put_start = perf_counter()
+                out_queue.put(item)
+                put_time += perf_counter() - put_start
+            if stage is not None and process_stage is not None:
+                self._record_telemetry(stage,
+                                       "_process_output",
+                                       items,
+                                       perf_counter() - start,
+                                       wait_time,
+                                       put_time)
+                process_stage.record(items, busy, wait_in=wait, capacity=self.batchsize)
+            start = perf_counter()
         logger.debug("Putting EOF")
         out_queue.put("EOF")
 
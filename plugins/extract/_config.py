@@ -35,6 +35,31 @@ class Config(FaceswapConfig):
                  "This option prevents Tensorflow from allocating all of the GPU VRAM at launch "
                  "but can lead to higher VRAM fragmentation and slower performance. Should only "
                  "be enabled if you are having problems running extraction.")
+        self.add_item(
+            section=section,
+            title="autotune",
+            datatype=bool,
+            default=False,
+            group="settings",
+            info="Tune the batch size and queue depth of each plugin for this machine. The "
+                 "throughput of each plugin is measured over its first batches, and its batch "
+                 "size is increased whilst throughput improves and there is enough free memory "
+                 "(VRAM for GPU plugins, system RAM for CPU plugins). The selected values are "
+                 "saved in 'config/extract_tuning.json' and used for later extractions on this "
+                 "machine without tuning again. Delete the file to re-tune. NB: The configured "
+                 "batch size for each plugin is used as the starting point, and may be exceeded. "
+                 "[Nvidia Only] GPU memory use can only be measured if 'allow_growth' is "
+                 "enabled, otherwise GPU plugins will not have their batch sizes increased.")
+        self.add_item(
+            section=section,
+            title="autotune_batches",
+            datatype=int,
+            min_max=(2, 32),
+            rounding=1,
+            default=8,
+            group="settings",
+            info="The number of batches to measure at each batch size when autotuning. Higher "
+                 "values give more reliable measurements but take longer to tune.")
         self.add_item(
             section=section,
             title="aligner_min_scale",
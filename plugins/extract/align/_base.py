@@ -187,7 +187,7 @@ class Aligner(Extractor):  # pylint:disable=abstract-method
                 self._queues["out"].put(item)
                 continue
 
-            converted_image = item.get_image_copy(self.color_format)
+            converted_image = item.get_image(self.color_format)
             for f_idx, face in enumerate(item.detected_faces):
                 batch.image.append(converted_image)
                 batch.detected_faces.append(face)
@@ -196,10 +196,7 @@ class Aligner(Extractor):  # pylint:disable=abstract-method
                 if idx == self.batchsize:
                     frame_faces = len(item.detected_faces)
                     if f_idx + 1 != frame_faces:
-                        self._rollover = ExtractMedia(
-                            item.filename,
-                            item.image,
-                            detected_faces=item.detected_faces[f_idx + 1:])
+                        self._rollover = item.split(item.detected_faces[f_idx + 1:])
                         logger.trace("Rolled over %s faces of %s to next batch "  # type:ignore
                                      "for '%s'", len(self._rollover.detected_faces), frame_faces,
                                      item.filename)
@@ -228,7 +228,9 @@ class Align(Aligner):
         pad_b = box[3] - height if box[3] > height else 0
         logger.trace("Padding: (l: %s, t: %s, r: %s, b: %s)",  # type:ignore
                      pad_l, pad_t, pad_r, pad_b)
-        padded_image = cv2.copyMakeBorder(image.copy(),
+        if not any((pad_l, pad_t, pad_r, pad_b)):
+            return image, (0, 0)
+        padded_image = cv2.copyMakeBorder(image,
                                           pad_t,
                                           pad_b,
                                           pad_l,
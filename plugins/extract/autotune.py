@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+""" Batch size and queue depth autotuning for Faceswap's extraction plugins.
+
+Each plugin's throughput is measured over its first batches, doubling the batch size while
+throughput improves and memory allows. The selected values are stored per plugin and per host so
+that later extraction runs start tuned.
+"""
+import logging
+import os
+import socket
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lib.serializer import get_serializer
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class PluginTuner():
+    """ Tunes the batch size and queue depth of a single extraction plugin from measurements of
+    its prediction thread.
+
+    Starting at the plugin's current batch size, the prediction throughput (items per second) is
+    measured over :attr:`window` full batches. The batch size is then doubled whilst throughput
+    improves, the plugin's maximum batch size has not been reached and the projected memory use
+    of the next batch size fits within the available memory. The best performing batch size is
+    then selected. If the prediction thread spent a significant amount of time waiting for input
+    at the selected batch size, the queue depth is increased.
+
+    Parameters
+    ----------
+    name: str
+        The name of the plugin being tuned, for logging
+    batchsize: int
+        The batch size to start tuning from
+    max_batchsize: int
+        The largest batch size that may be selected for the plugin
+    memory_probe: python function
+        Function taking no arguments that returns the `used` and `available` memory, in
+        megabytes, for the device that the plugin runs on
+    window: int, optional
+        The number of full batches to measure at each batch size. Default: `8`
+    """
+    _improvement = 1.05  # Minimum throughput increase to keep increasing the batch size
+    _reserve_mb = 512  # Memory to keep free when increasing the batch size
+    _starved = 0.25  # Proportion of time waiting for input that warrants a deeper queue
+
+    def __init__(self,
+                 name: str,
+                 batchsize: int,
+                 max_batchsize: int,
+                 memory_probe: Callable[[], Tuple[float, float]],
+                 window: int = 8) -> None:
+        logger.debug("Initializing %s: (name: %s, batchsize: %s, max_batchsize: %s, "
+                     "memory_probe: %s, window: %s)", self.__class__.__name__, name, batchsize,
+                     max_batchsize, memory_probe, window)
+        self._name = name
+        self._batchsize = max(1, batchsize)
+        self._max_batchsize = max(self._batchsize, max_batchsize)
+        self._memory_probe = memory_probe
+        self._window = window
+        self._queue_size = 1
+        self._warmed_up = False
+        self._samples: List[Tuple[int, float, float]] = []
+        self._results: Dict[int, Dict[str, float]] = {}
+        self._complete = False
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def batchsize(self) -> int:
+        """ int: The batch size that the plugin should currently run at """
+        return self._batchsize
+
+    @property
+    def queue_size(self) -> int:
+        """ int: The queue depth that the plugin should currently run at """
+        return self._queue_size
+
+    @property
+    def complete(self) -> bool:
+        """ bool: ``True`` if tuning has completed and :attr:`batchsize` and :attr:`queue_size`
+        hold the selected values otherwise ``False`` """
+        return self._complete
+
+    @property
+    def results(self) -> Dict[int, Dict[str, float]]:
+        """ dict: The measured `items_per_sec`, `latency` (seconds per batch), `starved`
+        (proportion of time spent waiting for input) and `memory` (megabytes in use) for each
+        batch size that has been measured """
+        return self._results
+
+    def record(self, items: int, predict_time: float, wait_time: float) -> bool:
+        """ Record the measurements for a batch that has been through the plugin's prediction
+        thread.
+
+        Only full batches are measured. The first full batch at each batch size is discarded, as
+        models may need to build for a new input shape.
+
+        Parameters
+        ----------
+        items: int
+            The number of items in the batch
+        predict_time: float
+            The time, in seconds, taken to run prediction on the batch
+        wait_time: float
+            The time, in seconds, that the prediction thread waited to receive the batch
+
+        Returns
+        -------
+        bool
+            ``True`` if the plugin's batch size or queue depth should be updated from
+            :attr:`batchsize` and :attr:`queue_size` otherwise ``False``
+        """
+        if self._complete or items != self._batchsize:
+            return False
+        if not self._warmed_up:
+            self._warmed_up = True
+            return False
+        self._samples.append((items, predict_time, wait_time))
+        if len(self._samples) < self._window:
+            return False
+        self._add_result()
+        return self._next_candidate()
+
+    def _add_result(self) -> None:
+        """ Collate the samples for the current batch size into :attr:`results` """
+        items = sum(sample[0] for sample in self._samples)
+        predict_time = sum(sample[1] for sample in self._samples)
+        wait_time = sum(sample[2] for sample in self._samples)
+        self._results[self._batchsize] = dict(
+            items_per_sec=items / max(predict_time, 1e-9),
+            latency=predict_time / len(self._samples),
+            starved=wait_time / max(wait_time + predict_time, 1e-9),
+            memory=self._memory_probe()[0])
+        self._samples = []
+        self._warmed_up = False
+        logger.debug("%s batch size %s: %s",
+                     self._name, self._batchsize, self._results[self._batchsize])
+
+    def _fits_in_memory(self, batchsize: int) -> bool:
+        """ Check whether the given batch size is projected to fit within the available memory.
+
+        The memory used by each item is estimated from the difference in memory use between the
+        previous and current batch sizes.
+
+        Parameters
+        ----------
+        batchsize: int
+            The batch size to check
+
+        Returns
+        -------
+        bool
+            ``True`` if the batch size is projected to fit in memory otherwise ``False``
+        """
+        available = self._memory_probe()[1]
+        measured = sorted(self._results)
+        per_item = 0.0
+        if len(measured) > 1:
+            per_item = max(0.0, ((self._results[measured[-1]]["memory"]
+                                  - self._results[measured[-2]]["memory"])
+                                 / (measured[-1] - measured[-2])))
+        required = per_item * (batchsize - measured[-1]) * 1.5
+        retval = available - required > self._reserve_mb
+        logger.debug("%s batch size %s: (available: %sMB, required: %sMB, fits: %s)",
+                     self._name, batchsize, available, required, retval)
+        return retval
+
+    def _next_candidate(self) -> bool:
+        """ Select the next batch size to measure, or complete tuning.
+
+        Returns
+        -------
+        bool
+            ``True`` if the batch size or queue depth has changed otherwise ``False``
+        """
+        best = max(self._results, key=lambda k: self._results[k]["items_per_sec"])
+        previous = [val["items_per_sec"]
+                    for key, val in self._results.items() if key != self._batchsize]
+        improved = (not previous or
+                    self._results[self._batchsize]["items_per_sec"]
+                    > max(previous) * self._improvement)
+        candidate = min(self._batchsize * 2, self._max_batchsize)
+        if (best == self._batchsize and improved and candidate > self._batchsize
+                and self._fits_in_memory(candidate)):
+            logger.debug("%s: Measuring batch size %s", self._name, candidate)
+            self._batchsize = candidate
+            return True
+
+        self._complete = True
+        self._batchsize = best
+        self._queue_size = 2 if self._results[best]["starved"] > self._starved else 1
+        logger.verbose("Tuned %s: (batch size: %s, queue size: %s, items per second: %.1f)",
+                       self._name, self._batchsize, self._queue_size,
+                       self._results[best]["items_per_sec"])
+        return True
+
+
+class TuningCache():
+    """ Persists the batch size and queue depth selected for each extraction plugin, per host.
+
+    Values are held in the file `extract_tuning.json` within Faceswap's config folder, keyed by
+    the host, backend and device that the values were tuned on.
+
+    Parameters
+    ----------
+    backend: str
+        The backend that Faceswap is running on
+    device: str
+        The name of the device that extraction is running on
+    """
+    def __init__(self, backend: str, device: str) -> None:
+        logger.debug("Initializing %s: (backend: %s, device: %s)",
+                     self.__class__.__name__, backend, device)
+        self._filename = os.path.join(os.path.abspath(os.path.dirname(sys.argv[0])),
+                                      "config",
+                                      "extract_tuning.json")
+        self._serializer = get_serializer("json")
+        self._host = f"{socket.gethostname()}|{backend}|{device}"
+        self._data = self._load()
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """ Load the tuned values from disk.
+
+        Returns
+        -------
+        dict
+            The tuned values for every host, or an empty dictionary if no values have been saved
+        """
+        if not os.path.exists(self._filename):
+            logger.debug("No tuning cache at '%s'", self._filename)
+            return {}
+        retval = self._serializer.load(self._filename)
+        logger.debug("Loaded tuning cache: %s", retval.get(self._host))
+        return retval
+
+    def get(self, plugin: str) -> Optional[Dict[str, float]]:
+        """ Obtain the tuned values for a plugin on this host.
+
+        Parameters
+        ----------
+        plugin: str
+            The key identifying the plugin
+
+        Returns
+        -------
+        dict or ``None``
+            The `batchsize`, `queue_size` and `items_per_sec` for the plugin or ``None`` if the
+            plugin has not been tuned on this host
+        """
+        return self._data.get(self._host, {}).get(plugin)
+
+    def save(self, plugin: str, tuner: PluginTuner) -> None:
+        """ Save the values selected by a tuner for a plugin on this host.
+
+        Parameters
+        ----------
+        plugin: str
+            The key identifying the plugin
+        tuner: :class:`PluginTuner`
+            The completed tuner for the plugin
+        """
+        values = dict(batchsize=tuner.batchsize,
+                      queue_size=tuner.queue_size,
+                      items_per_sec=round(tuner.results[tuner.batchsize]["items_per_sec"], 2))
+        logger.debug("Saving tuned values for '%s': %s", plugin, values)
+        self._data.setdefault(self._host, {})[plugin] = values
+        os.makedirs(os.path.dirname(self._filename), exist_ok=True)
+        self._serializer.save(self._filename, self._data)
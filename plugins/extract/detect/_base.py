@@ -71,6 +71,7 @@ class Detector(Extractor):  # pylint:disable=abstract-method
                          **kwargs)
         self.rotation = self._get_rotation_angles(rotation)
         self.min_size = min_size
+        self._rotation_buffer = None  # Re-used between batches to hold rotated feed images
 
         self._plugin_type = "detect"
 
@@ -202,57 +203,86 @@ class Detector(Extractor):  # pylint:disable=abstract-method
     # <<< PROTECTED ACCESS METHODS >>> #
     # <<< PREDICT WRAPPER >>> #
     def _predict(self, batch):
-        """ Wrap models predict function in rotations """
-        batch["rotmat"] = [np.array([]) for _ in range(len(batch["feed"]))]
-        found_faces = [np.array([]) for _ in range(len(batch["feed"]))]
+        """ Wrap models predict function in rotations.
+
+        The full batch is predicted upright. For each subsequent rotation angle, only the images
+        that do not yet have any faces are rotated and compacted into a smaller batch for
+        prediction, so images which have already had faces found are not processed again.
+        """
+        batch_size = len(batch["feed"])
+        initial_feed = batch["feed"]
+        batch["rotmat"] = [np.array([]) for _ in range(batch_size)]
+        found_faces = [np.array([]) for _ in range(batch_size)]
+        indices = list(range(batch_size))
         for angle in self.rotation:
-            # Rotate the batch and insert placeholders for already found faces
-            self._rotate_batch(batch, angle)
-            try:
-                batch = self.predict(batch)
-            except tf_errors.ResourceExhaustedError as err:
-                msg = ("You do not have enough GPU memory available to run detection at the "
-                       "selected batch size. You can try a number of things:"
-                       "\n1) Close any other application that is using your GPU (web browsers are "
-                       "particularly bad for this)."
-                       "\n2) Lower the batchsize (the amount of images fed into the model) by "
-                       "editing the plugin settings (GUI: Settings > Configure extract settings, "
-                       "CLI: Edit the file faceswap/config/extract.ini)."
-                       "\n3) Enable 'Single Process' mode.")
-                raise FaceswapError(msg) from err
-            except Exception as err:
-                if get_backend() == "amd":
-                    # pylint:disable=import-outside-toplevel
-                    from lib.plaidml_utils import is_plaidml_error
-                    if (is_plaidml_error(err) and (
-                            "CL_MEM_OBJECT_ALLOCATION_FAILURE" in str(err).upper() or
-                            "enough memory for the current schedule" in str(err).lower())):
-                        msg = ("You do not have enough GPU memory available to run detection at "
-                               "the selected batch size. You can try a number of things:"
-                               "\n1) Close any other application that is using your GPU (web "
-                               "browsers are particularly bad for this)."
-                               "\n2) Lower the batchsize (the amount of images fed into the "
-                               "model) by editing the plugin settings (GUI: Settings > Configure "
-                               "extract settings, CLI: Edit the file "
-                               "faceswap/config/extract.ini).")
-                        raise FaceswapError(msg) from err
-                raise
-
-            if angle != 0 and any([face.any() for face in batch["prediction"]]):
-                logger.verbose("found face(s) by rotating image %s degrees", angle)
-
-            found_faces = [face if not found.any() else found
-                           for face, found in zip(batch["prediction"], found_faces)]
-
-            if all([face.any() for face in found_faces]):
+            if angle == 0:
+                sub_batch = self._predict_batch(batch)
+                matrices = batch["rotmat"]
+            else:
+                sub_batch, matrices = self._rotate_batch(batch, initial_feed, indices, angle)
+                sub_batch = self._predict_batch(sub_batch)
+                if any(face.any() for face in sub_batch["prediction"]):
+                    logger.verbose("found face(s) by rotating image %s degrees", angle)
+
+            for idx, faces, matrix in zip(indices, sub_batch["prediction"], matrices):
+                if faces.any():
+                    found_faces[idx] = faces
+                    batch["rotmat"][idx] = matrix
+            indices = [idx for idx in indices if not found_faces[idx].any()]
+            if not indices:
                 logger.trace("Faces found for all images")
                 break
 
+        batch["feed"] = initial_feed
         batch["prediction"] = found_faces
         logger.trace("detect_prediction output: (filenames: %s, prediction: %s, rotmat: %s)",
                      batch["filename"], batch["prediction"], batch["rotmat"])
         return batch
 
+    def _predict_batch(self, batch):
+        """ Run the plugin's predict function on a batch, raising a :class:`FaceswapError` if
+        GPU memory is exhausted.
+
+        Parameters
+        ----------
+        batch: dict
+            The batch to predict faces for
+
+        Returns
+        -------
+        dict
+            The batch with ``prediction`` populated
+        """
+        try:
+            return self.predict(batch)
+        except tf_errors.ResourceExhaustedError as err:
+            msg = ("You do not have enough GPU memory available to run detection at the "
+                   "selected batch size. You can try a number of things:"
+                   "\n1) Close any other application that is using your GPU (web browsers are "
+                   "particularly bad for this)."
+                   "\n2) Lower the batchsize (the amount of images fed into the model) by "
+                   "editing the plugin settings (GUI: Settings > Configure extract settings, "
+                   "CLI: Edit the file faceswap/config/extract.ini)."
+                   "\n3) Enable 'Single Process' mode.")
+            raise FaceswapError(msg) from err
+        except Exception as err:
+            if get_backend() == "amd":
+                # pylint:disable=import-outside-toplevel
+                from lib.plaidml_utils import is_plaidml_error
+                if (is_plaidml_error(err) and (
+                        "CL_MEM_OBJECT_ALLOCATION_FAILURE" in str(err).upper() or
+                        "enough memory for the current schedule" in str(err).lower())):
+                    msg = ("You do not have enough GPU memory available to run detection at "
+                           "the selected batch size. You can try a number of things:"
+                           "\n1) Close any other application that is using your GPU (web "
+                           "browsers are particularly bad for this)."
+                           "\n2) Lower the batchsize (the amount of images fed into the "
+                           "model) by editing the plugin settings (GUI: Settings > Configure "
+                           "extract settings, CLI: Edit the file "
+                           "faceswap/config/extract.ini).")
+                    raise FaceswapError(msg) from err
+            raise
+
     # <<< DETECTION IMAGE COMPILATION METHODS >>> #
     def _compile_detection_image(self, item):
         """ Compile the detection image for feeding into the model
@@ -262,7 +292,7 @@ class Detector(Extractor):  # pylint:disable=abstract-method
         item: :class:`plugins.extract.pipeline.ExtractMedia`
             The input item from the pipeline
         """
-        image = item.get_image_copy(self.color_format)
+        image = item.get_image(self.color_format)
         scale = self._set_scale(item.image_size)
         pad = self._set_padding(item.image_size, scale)
 
@@ -373,26 +403,47 @@ class Detector(Extractor):  # pylint:disable=abstract-method
         logger.debug("Rotation Angles: %s", rotation_angles)
         return rotation_angles
 
-    def _rotate_batch(self, batch, angle):
-        """ Rotate images in a batch by given angle
-            if any faces have already been detected for a batch, store the existing rotation
-            matrix and replace the feed image with a placeholder """
-        if angle == 0:
-            # Set the initial batch so we always rotate from zero
-            batch["initial_feed"] = batch["feed"].copy()
-            return
-
-        retval = {}
-        for img, faces, rotmat in zip(batch["initial_feed"], batch["prediction"], batch["rotmat"]):
-            if faces.any():
-                image = np.zeros_like(img)
-                matrix = rotmat
-            else:
-                image, matrix = self._rotate_image_by_angle(img, angle)
-            retval.setdefault("feed", []).append(image)
-            retval.setdefault("rotmat", []).append(matrix)
-        batch["feed"] = np.array(retval["feed"], dtype="float32")
-        batch["rotmat"] = retval["rotmat"]
+    def _rotate_batch(self, batch, initial_feed, indices, angle):
+        """ Compile a batch of the given upright feed images rotated by the given angle.
+
+        The rotated images are written into a buffer that is re-used between batches, and
+        a view of only as many images as are required is fed to the model.
+
+        Parameters
+        ----------
+        batch: dict
+            The batch that is being predicted
+        initial_feed: :class:`numpy.ndarray`
+            The upright feed images for the full batch
+        indices: list
+            The indices of the images within :attr:`initial_feed` to rotate
+        angle: int
+            The angle, in degrees, to rotate the images by
+
+        Returns
+        -------
+        sub_batch: dict
+            A copy of the batch containing only the requested images, rotated
+        matrices: list
+            The rotation matrix for each image in the sub batch
+        """
+        buffer = self._rotation_buffer
+        if (buffer is None or buffer.shape[1:] != initial_feed.shape[1:]
+                or buffer.dtype != initial_feed.dtype or len(buffer) < len(indices)):
+            logger.debug("Allocating rotation buffer: (shape: %s, dtype: %s)",
+                         initial_feed.shape, initial_feed.dtype)
+            buffer = np.empty_like(initial_feed)
+            self._rotation_buffer = buffer
+
+        matrices = []
+        for buffer_idx, feed_idx in enumerate(indices):
+            buffer[buffer_idx], matrix = self._rotate_image_by_angle(initial_feed[feed_idx], angle)
+            matrices.append(matrix)
+        sub_batch = dict(batch,
+                         feed=buffer[:len(indices)],
+                         filename=[batch["filename"][idx] for idx in indices])
+        logger.trace("Rotated batch: (angle: %s, indices: %s)", angle, indices)
+        return sub_batch, matrices
 
     @staticmethod
     def _rotate_face(face, rotation_matrix):
@@ -17,6 +17,7 @@ class Detect(Detector):
         self.vram = 0  # CPU Only. Doesn't use VRAM
         self.vram_per_batch = 0
         self.batchsize = 1
+        self.max_batchsize = 1  # Predictions are only parsed for a single image
         self.confidence = self.config["confidence"] / 100
 
     def init_model(self):
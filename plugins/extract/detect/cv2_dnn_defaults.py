@@ -63,4 +63,20 @@ _DEFAULTS = dict(
         gui_radio=False,
         fixed=True,
     ),
+    processes=dict(
+        default=1,
+        info="The number of separate processes to run detection in. Each process loads its own "
+             "copy of the detector model and processes whole batches, so that the detector can "
+             "make use of multiple CPU cores without contending with the other extraction "
+             "plugins. Images are passed to the processes through shared memory. Higher values "
+             "use more system RAM. Set to 1 to run the detector within the main Faceswap process. "
+             "Not supported on Windows.",
+        datatype=int,
+        rounding=1,
+        min_max=(1, 32),
+        choices=[],
+        group="settings",
+        gui_radio=False,
+        fixed=True,
+    ),
 )
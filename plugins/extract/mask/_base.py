@@ -20,7 +20,7 @@ from tensorflow.python.framework import errors_impl as tf_errors
 
 from lib.align import AlignedFace, transform_image
 from lib.utils import get_backend, FaceswapError
-from plugins.extract._base import Extractor, ExtractMedia, logger
+from plugins.extract._base import Extractor, logger
 
 
 class Masker(Extractor):  # pylint:disable=abstract-method
@@ -120,15 +120,13 @@ class Masker(Extractor):  # pylint:disable=abstract-method
             if not item.detected_faces:
                 self._queues["out"].put(item)
                 continue
-            for f_idx, face in enumerate(item.detected_faces):
-
-                image = item.get_image_copy(self.color_format)
-                roi = np.ones((*item.image_size[:2], 1), dtype="float32")
-
-                if not self._image_is_aligned:
-                    # Add the ROI mask to image so we can get the ROI mask with a single warp
-                    image = np.concatenate([image, roi], axis=-1)
+            image = item.get_image(self.color_format)
+            roi = np.ones((*item.image_size[:2], 1), dtype="float32")
+            if not self._image_is_aligned:
+                # Add the ROI mask to image so we can get the ROI mask with a single warp
+                image = np.concatenate([image, roi], axis=-1)
 
+            for f_idx, face in enumerate(item.detected_faces):
                 feed_face = AlignedFace(face.landmarks_xy,
                                         image=image,
                                         centering=self._storage_centering,
@@ -156,10 +154,7 @@ class Masker(Extractor):  # pylint:disable=abstract-method
                 if idx == self.batchsize:
                     frame_faces = len(item.detected_faces)
                     if f_idx + 1 != frame_faces:
-                        self._rollover = ExtractMedia(
-                            item.filename,
-                            item.image,
-                            detected_faces=item.detected_faces[f_idx + 1:])
+                        self._rollover = item.split(item.detected_faces[f_idx + 1:])
                         logger.trace("Rolled over %s faces of %s to next batch for '%s'",
                                      len(self._rollover.detected_faces), frame_faces,
                                      item.filename)
@@ -26,7 +26,7 @@ class Mask(Masker):
 
     def process_input(self, batch):
         """ Compile the detected faces for prediction """
-        batch["feed"] = np.zeros((self.batchsize, self.input_size, self.input_size, 1),
+        batch["feed"] = np.zeros((len(batch["feed_faces"]), self.input_size, self.input_size, 1),
                                  dtype="float32")
         return batch
 
@@ -12,14 +12,19 @@ plugins either in parallel or in series, giving easy access to input and output.
 
 import logging
 import sys
+from functools import partial
 from typing import Any, cast, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import cv2
+import numpy as np
+import psutil
 
 from lib.gpu_stats import GPUStats
 from lib.queue_manager import EventQueue, queue_manager, QueueEmpty
 from lib.utils import get_backend
 from plugins.plugin_loader import PluginLoader
+from plugins.extract.autotune import PluginTuner, TuningCache
+from plugins.extract.telemetry import Telemetry
 
 if sys.version_info < (3, 8):
     from typing_extensions import Literal
@@ -27,7 +32,6 @@ else:
     from typing import Literal
 
 if TYPE_CHECKING:
-    import numpy as np
     from lib.align.detected_face import DetectedFace
     from plugins.extract._base import Extractor as PluginExtractor
     from plugins.extract.detect._base import Detector
@@ -88,6 +92,9 @@ class Extractor():
     image_is_aligned: bool, optional
         Used to set the :attr:`plugins.extract.mask.image_is_aligned` attribute. Indicates to the
         masker that the fed in image is an aligned face rather than a frame. Default: ``False``
+    telemetry: bool, optional
+        ``True`` to record the timings of each of the pipeline's threads into :attr:`telemetry`.
+        ``False`` to not collect telemetry. Default: ``False``
 
     Attributes
     ----------
@@ -106,13 +113,14 @@ class Extractor():
                  min_size: int = 0,
                  normalize_method:  Optional[Literal["none", "clahe", "hist", "mean"]] = None,
                  re_feed: int = 0,
-                 image_is_aligned: bool = False) -> None:
+                 image_is_aligned: bool = False,
+                 telemetry: bool = False) -> None:
         logger.debug("Initializing %s: (detector: %s, aligner: %s, masker: %s, configfile: %s, "
                      "multiprocess: %s, exclude_gpus: %s, rotate_images: %s, min_size: %s, "
-                     "normalize_method: %s, re_feed: %s, image_is_aligned: %s)",
+                     "normalize_method: %s, re_feed: %s, image_is_aligned: %s, telemetry: %s)",
                      self.__class__.__name__, detector, aligner, masker, configfile, multiprocess,
                      exclude_gpus, rotate_images, min_size, normalize_method, re_feed,
-                     image_is_aligned)
+                     image_is_aligned, telemetry)
         self._instance = _get_instance()
         maskers = [cast(Optional[str],
                    masker)] if not isinstance(masker, list) else cast(List[Optional[str]], masker)
@@ -130,10 +138,21 @@ class Extractor():
         self._is_parallel = self._set_parallel_processing(multiprocess)
         self._phases = self._set_phases(multiprocess)
         self._phase_index = 0
+        self._tuners: Dict[str, PluginTuner] = {}
+        self._tuning_cache = self._set_autotune()
+        self._telemetry = self._set_telemetry(telemetry)
         self._set_extractor_batchsize()
         self._queues = self._add_queues()
         logger.debug("Initialized %s", self.__class__.__name__)
 
+    @property
+    def telemetry(self) -> Optional[Telemetry]:
+        """ :class:`~plugins.extract.telemetry.Telemetry`: The telemetry collected from each
+        plugin's threads and the pipeline's queues. Callers can add their own stages for loading
+        input and saving output with :func:`~plugins.extract.telemetry.Telemetry.stage`.
+        ``None`` if telemetry was not requested """
+        return self._telemetry
+
     @property
     def input_queue(self) -> EventQueue:
         """ queue: Return the correct input queue depending on the current phase
@@ -275,9 +294,11 @@ class Extractor():
                     break
             except QueueEmpty:
                 continue
+            faces.release_image_cache()
             yield faces
 
         self._join_threads()
+        self._save_tuning()
         if self.final_pass:
             logger.debug("Detection Complete")
         else:
@@ -653,6 +674,121 @@ class Extractor():
                           - plugins_required) // len(gpu_plugins)
         self._set_plugin_batchsize(gpu_plugins, available_vram)
 
+    @staticmethod
+    def _get_tuning_key(plugin: "PluginExtractor") -> str:
+        """ Obtain the key that identifies a plugin's tuned values.
+
+        Parameters
+        ----------
+        plugin: :class:`~plugins.extract._base.Extractor`
+            The plugin to obtain the key for
+
+        Returns
+        -------
+        str
+            The plugin type, plugin name and input size of the plugin
+        """
+        return f"{'.'.join(plugin.__module__.split('.')[-2:])}|{plugin.input_size}"
+
+    def _get_memory(self, plugin: "PluginExtractor") -> Tuple[float, float]:
+        """ Obtain the memory in use and available for the device that a plugin runs on.
+
+        GPU plugins are measured against the VRAM of the GPU with the most free VRAM. CPU plugins,
+        and all plugins when running in CPU mode, are measured against the resident memory of the
+        Faceswap process and the system's available RAM.
+
+        Parameters
+        ----------
+        plugin: :class:`~plugins.extract._base.Extractor`
+            The plugin to obtain memory usage for
+
+        Returns
+        -------
+        used: float
+            The memory in use, in megabytes
+        available: float
+            The memory available, in megabytes
+        """
+        if plugin.vram and self._vram_stats["count"]:
+            stats = GPUStats(log=False).get_card_most_free()
+            return stats["total"] - stats["free"], stats["free"]
+        return (psutil.Process().memory_info().rss / (1024 * 1024),
+                psutil.virtual_memory().available / (1024 * 1024))
+
+    def _set_autotune(self) -> Optional[TuningCache]:
+        """ Set up autotuning of plugin batch sizes and queue depths, if it has been enabled.
+
+        Plugins which have previously been tuned on this host have their tuned values applied.
+        All other plugins that can process batches have a :class:`PluginTuner` attached to them.
+
+        Returns
+        -------
+        :class:`~plugins.extract.autotune.TuningCache` or ``None``
+            The cache of tuned values for this host, or ``None`` if autotuning is not enabled
+        """
+        plugins = self._all_plugins
+        if not plugins or not plugins[0].config.get("autotune", False):
+            logger.debug("Autotuning not enabled")
+            return None
+
+        retval = TuningCache(get_backend(), str(self._vram_stats["device"]))
+        for plugin in plugins:
+            key = self._get_tuning_key(plugin)
+            tuned = retval.get(key)
+            if tuned is not None:
+                logger.verbose("Using tuned values for %s: (batch size: %s, queue size: %s)",
+                               plugin.name, tuned["batchsize"], tuned["queue_size"])
+                plugin.batchsize = min(int(tuned["batchsize"]), plugin.max_batchsize)
+                plugin.set_queue_size(int(tuned["queue_size"]))
+                continue
+            if plugin.max_batchsize <= 1:
+                logger.debug("Plugin does not support batching. Not tuning: %s", key)
+                continue
+            if plugin.processes > 1:
+                logger.debug("Plugin runs in worker processes. Not tuning: %s", key)
+                continue
+            logger.info("Autotuning %s", plugin.name)
+            self._tuners[key] = PluginTuner(plugin.name,
+                                            plugin.batchsize,
+                                            plugin.max_batchsize,
+                                            partial(self._get_memory, plugin),
+                                            window=plugin.config["autotune_batches"])
+            plugin.set_tuner(self._tuners[key])
+        return retval
+
+    def _set_telemetry(self, enabled: bool) -> Optional[Telemetry]:
+        """ Create the pipeline's telemetry and attach it to every plugin, if it has been
+        requested.
+
+        Parameters
+        ----------
+        enabled: bool
+            ``True`` if telemetry should be collected
+
+        Returns
+        -------
+        :class:`~plugins.extract.telemetry.Telemetry` or ``None``
+            The telemetry for the pipeline, or ``None`` if telemetry has not been requested
+        """
+        if not enabled:
+            logger.debug("Telemetry not requested")
+            return None
+        retval = Telemetry()
+        for plugin in self._all_plugins:
+            plugin.set_telemetry(retval)
+        return retval
+
+    def _save_tuning(self) -> None:
+        """ Save the values selected by any plugin tuners that have completed to the tuning
+        cache. """
+        if self._tuning_cache is None:
+            return
+        for key, tuner in list(self._tuners.items()):
+            if not tuner.complete:
+                continue
+            self._tuning_cache.save(key, tuner)
+            del self._tuners[key]
+
     def set_aligner_normalization_method(self, method: Optional[Literal["none",
                                                                         "clahe",
                                                                         "hist",
@@ -750,6 +886,7 @@ class ExtractMedia():
                      detected_faces)
         self._filename = filename
         self._image: Optional["np.ndarray"] = image
+        self._image_cache: Dict[str, "np.ndarray"] = {}
         self._image_shape = cast(Tuple[int, int, int], image.shape)
         self._detected_faces: List["DetectedFace"] = ([] if detected_faces is None
                                                       else detected_faces)
@@ -803,6 +940,32 @@ class ExtractMedia():
         """
         return self._sub_folders
 
+    def get_image(self, color_format: Literal["BGR", "RGB", "GRAY"]) -> "np.ndarray":
+        """ Get the image in the requested color format.
+
+        Each color conversion is only performed once for the frame, and is shared between every
+        consumer of the frame (including any objects created with :func:`split`), so the returned
+        array is read-only. Use :func:`get_image_copy` if the image needs to be modified.
+
+        Parameters
+        ----------
+        color_format: ['BGR', 'RGB', 'GRAY']
+            The requested color format of :attr:`image`
+
+        Returns
+        -------
+        :class:`numpy.ndarray`:
+            A read-only view of :attr:`image` in the requested :attr:`color_format`
+        """
+        retval = self._image_cache.get(color_format)
+        if retval is None:
+            logger.trace("Converting frame '%s' to color format '%s'",  # type: ignore
+                         self._filename, color_format)
+            retval = getattr(self, f"_image_as_{color_format.lower()}")()
+            retval.flags.writeable = False
+            self._image_cache[color_format] = retval
+        return retval
+
     def get_image_copy(self, color_format: Literal["BGR", "RGB", "GRAY"]) -> "np.ndarray":
         """ Get a copy of the image in the requested color format.
 
@@ -818,8 +981,28 @@ class ExtractMedia():
         """
         logger.trace("Requested color format '%s' for frame '%s'",  # type: ignore
                      color_format, self._filename)
-        image = getattr(self, f"_image_as_{color_format.lower()}")()
-        return image
+        return self.get_image(color_format).copy()
+
+    def split(self, detected_faces: List["DetectedFace"]) -> "ExtractMedia":
+        """ Obtain a new object for this frame holding a subset of its detected faces. Used when
+        a frame's faces are split across batches.
+
+        The new object shares this object's :attr:`image` and color conversions, so that the
+        frame is not converted again.
+
+        Parameters
+        ----------
+        detected_faces: list
+            The :class:`~lib.align.DetectedFace` objects that the new object should hold
+
+        Returns
+        -------
+        :class:`ExtractMedia`
+            A new object for the frame with the given detected faces
+        """
+        retval = ExtractMedia(self._filename, self.image, detected_faces=detected_faces)
+        retval._image_cache = self._image_cache  # pylint:disable=protected-access
+        return retval
 
     def add_detected_faces(self, faces: List["DetectedFace"]) -> None:
         """ Add detected faces to the object. Called at the end of each extraction phase.
@@ -855,6 +1038,18 @@ class ExtractMedia():
         logger.trace("Removing image for filename: '%s'", self._filename)  # type: ignore
         del self._image
         self._image = None
+        self._image_cache = {}
+
+    def release_image_cache(self) -> None:
+        """ Release the color conversions of :attr:`image` that have been cached by
+        :func:`get_image`.
+
+        Called once the frame has left the extraction pipeline, so that only the original frame
+        is held in memory.
+        """
+        logger.trace("Releasing image cache for filename: '%s': %s",  # type: ignore
+                     self._filename, list(self._image_cache))
+        self._image_cache = {}
 
     def set_image(self, image: "np.ndarray") -> None:
         """ Add the image back into :attr:`image`
@@ -869,6 +1064,7 @@ class ExtractMedia():
         logger.trace("Reapplying image: (filename: `%s`, image shape: %s)",  # type: ignore
                      self._filename, image.shape)
         self._image = image
+        self._image_cache = {}
 
     def add_frame_metadata(self, metadata: Dict[str, Any]) -> None:
         """ Add the source frame metadata from an aligned PNG's header data.
@@ -883,28 +1079,28 @@ class ExtractMedia():
         self._frame_metadata = metadata
 
     def _image_as_bgr(self) -> "np.ndarray":
-        """ Get a copy of the source frame in BGR format.
+        """ Get the source frame in BGR format.
 
         Returns
         -------
         :class:`numpy.ndarray`:
-            A copy of :attr:`image` in BGR color format """
-        return self.image[..., :3].copy()
+            A view of :attr:`image` in BGR color format """
+        return self.image[..., :3].view()
 
     def _image_as_rgb(self) -> "np.ndarray":
-        """ Get a copy of the source frame in RGB format.
+        """ Get the source frame in RGB format.
 
         Returns
         -------
         :class:`numpy.ndarray`:
-            A copy of :attr:`image` in RGB color format """
-        return self.image[..., 2::-1].copy()
+            A converted copy of :attr:`image` in RGB color format """
+        return cv2.cvtColor(np.ascontiguousarray(self.image[..., :3]), cv2.COLOR_BGR2RGB)
 
     def _image_as_gray(self) -> "np.ndarray":
-        """ Get a copy of the source frame in gray-scale format.
+        """ Get the source frame in gray-scale format.
 
         Returns
         -------
         :class:`numpy.ndarray`:
-            A copy of :attr:`image` in gray-scale color format """
-        return cv2.cvtColor(self.image.copy(), cv2.COLOR_BGR2GRAY)
+            A converted copy of :attr:`image` in gray-scale color format """
+        return cv2.cvtColor(np.ascontiguousarray(self.image[..., :3]), cv2.COLOR_BGR2GRAY)
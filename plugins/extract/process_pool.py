@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+""" Process based execution of extraction plugins.
+
+By default each extraction plugin runs its :func:`_process_input`, :func:`_predict` and
+:func:`_process_output` stages in threads within the main process. For plugins that run on the
+CPU this means that all of the plugins contend for the GIL. :class:`PluginProcessPool` instead runs
+these stages in a pool of forked worker processes, each holding its own replica of the plugin's
+model. The arrays within each batch are handed between processes through shared memory, so only
+the lightweight remainder of each batch is pickled.
+"""
+import atexit
+import logging
+import multiprocessing as mp
+import queue as Queue
+import traceback
+from copy import copy
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from lib.multithreading import has_process_support, SharedMemoryRing
+from lib.queue_manager import queue_manager
+
+if TYPE_CHECKING:
+    from plugins.extract._base import Extractor
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+@dataclass
+class _ArrayRef:
+    """ A reference to an array held in a shared memory slot
+
+    Parameters
+    ----------
+    ring: int
+        `0` if the array is held in the input ring, `1` if it is held in the output ring
+    offset: int
+        The offset, in bytes, of the start of the array within the slot
+    shape: tuple
+        The shape of the array
+    dtype: str
+        The datatype of the array
+    """
+    ring: int
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        """ int: The size of the array in bytes """
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+def _aligned_size(nbytes: int) -> int:
+    """ Obtain the number of bytes that an array takes in a shared memory slot, rounded up so
+    that the next array in the slot starts on a 64 byte boundary.
+
+    Parameters
+    ----------
+    nbytes: int
+        The size of the array in bytes
+
+    Returns
+    -------
+    int
+        The size of the array, in bytes, within a shared memory slot
+    """
+    return -(-nbytes // 64) * 64
+
+
+def _batch_fields(batch: Any) -> Dict[str, Any]:
+    """ Obtain the fields of a batch, which is either a dictionary or a dataclass.
+
+    Parameters
+    ----------
+    batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        The batch to obtain the fields for
+
+    Returns
+    -------
+    dict
+        The batch's fields. Updating the dictionary updates the batch
+    """
+    return batch if isinstance(batch, dict) else vars(batch)
+
+
+def _batch_nbytes(batch: Any) -> int:
+    """ Obtain the size, in bytes, that the arrays in a batch take in a shared memory slot.
+
+    Parameters
+    ----------
+    batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        The batch to obtain the size for
+
+    Returns
+    -------
+    int
+        The total size of the batch's arrays in bytes
+    """
+    retval = 0
+    for value in _batch_fields(batch).values():
+        values = value if isinstance(value, list) else [value]
+        retval += sum(_aligned_size(val.nbytes) for val in values if isinstance(val, np.ndarray))
+    return retval
+
+
+def _pack(batch: Any,
+          buffer: np.ndarray,
+          ring: int,
+          aliases: Dict[int, Tuple[np.ndarray, _ArrayRef]]) -> Any:
+    """ Copy the arrays held in a batch into a shared memory slot.
+
+    Arrays that are held directly in a batch's fields, or within lists in a batch's fields, are
+    written into the slot and replaced by an :class:`_ArrayRef`. Arrays that do not fit in the
+    slot, or that hold Python objects, are left in the batch to be pickled.
+
+    Parameters
+    ----------
+    batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        The batch to pack
+    buffer: :class:`numpy.ndarray`
+        The flat uint8 buffer for the shared memory slot to pack arrays into
+    ring: int
+        The index of the ring that the slot belongs to
+    aliases: dict
+        Arrays that are already held in shared memory, keyed by their `id`, with the array and
+        its :class:`_ArrayRef` as the value. These are referenced rather than copied
+
+    Returns
+    -------
+    dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        A shallow copy of the batch with arrays replaced by :class:`_ArrayRef` objects
+    """
+    offset = 0
+    packed: Dict[int, _ArrayRef] = {}
+
+    def store(array: np.ndarray) -> Any:
+        """ Store an array in the slot and return its reference """
+        nonlocal offset
+        key = id(array)
+        if key in aliases:
+            return aliases[key][1]
+        if key in packed:
+            return packed[key]
+        if array.dtype.hasobject or offset + array.nbytes > buffer.nbytes:
+            return array
+        ref = _ArrayRef(ring, offset, array.shape, array.dtype.str)
+        buffer[offset:offset + ref.nbytes].view(ref.dtype).reshape(ref.shape)[...] = array
+        offset += _aligned_size(ref.nbytes)
+        packed[key] = ref
+        return ref
+
+    retval = copy(batch)
+    fields = _batch_fields(retval)
+    for key, value in list(fields.items()):
+        if isinstance(value, np.ndarray):
+            fields[key] = store(value)
+        elif isinstance(value, list) and any(isinstance(val, np.ndarray) for val in value):
+            fields[key] = [store(val) if isinstance(val, np.ndarray) else val for val in value]
+    return retval
+
+
+def _unpack(batch: Any,
+            buffers: List[np.ndarray],
+            copy_arrays: bool,
+            aliases: Optional[Dict[int, Tuple[np.ndarray, _ArrayRef]]] = None) -> Any:
+    """ Replace the :class:`_ArrayRef` objects in a packed batch with their arrays.
+
+    Parameters
+    ----------
+    batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        The packed batch. The batch is updated in place
+    buffers: list
+        The flat uint8 buffers for the input and output slots that the batch was packed into
+    copy_arrays: bool
+        ``True`` to copy the arrays out of shared memory, ``False`` to return views into shared
+        memory
+    aliases: dict, optional
+        If provided, the views into shared memory are added to this dictionary, so that they can
+        be referenced rather than copied when the batch is packed again. Default: ``None``
+
+    Returns
+    -------
+    dict or :class:`~plugins.extract.align._base.AlignerBatch`
+        The batch with the arrays restored
+    """
+    def load(ref: _ArrayRef) -> np.ndarray:
+        """ Load an array from its reference """
+        retval = buffers[ref.ring][ref.offset:ref.offset + ref.nbytes].view(
+            ref.dtype).reshape(ref.shape)
+        if copy_arrays:
+            return retval.copy()
+        if aliases is not None:
+            aliases[id(retval)] = (retval, ref)
+        return retval
+
+    fields = _batch_fields(batch)
+    for key, value in list(fields.items()):
+        if isinstance(value, _ArrayRef):
+            fields[key] = load(value)
+        elif isinstance(value, list) and any(isinstance(val, _ArrayRef) for val in value):
+            fields[key] = [load(val) if isinstance(val, _ArrayRef) else val for val in value]
+    return batch
+
+
+def _plugin_worker(plugin: "Extractor",
+                   rings: List[SharedMemoryRing],
+                   tasks: "mp.Queue",
+                   results: "mp.Queue") -> None:
+    """ The target for each worker process launched by :class:`PluginProcessPool`.
+
+    Loads the plugin's model, then runs each batch received from the task queue through the
+    plugin's input, predict and output stages.
+
+    Parameters
+    ----------
+    plugin: :class:`~plugins.extract._base.Extractor`
+        The worker's copy of the plugin
+    rings: list
+        The input and output :class:`lib.multithreading.SharedMemoryRing` objects
+    tasks: :class:`multiprocessing.Queue`
+        Queue holding the (`sequence number`, `slot`, `packed batch`) to process
+    results: :class:`multiprocessing.Queue`
+        Queue to put the (`sequence number`, `slot`, `packed batch`, `busy time`, `wait time`)
+        to
+    """
+    # pylint:disable=protected-access
+    try:
+        plugin.init_model()
+        while True:
+            start = perf_counter()
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, batch = task
+            buffers = [ring(slot)[0] for ring in rings]
+            aliases: Dict[int, Tuple[np.ndarray, _ArrayRef]] = {}
+            wait_time = perf_counter() - start
+            batch = _unpack(batch, buffers, False, aliases=aliases)
+            for function in (plugin._process_input, plugin._predict, plugin._process_output):
+                batch = function(batch)
+            batch = _pack(batch, buffers[1], 1, aliases)
+            del aliases
+            results.put((seq, slot, batch, perf_counter() - start - wait_time, wait_time))
+    except Exception:  # pylint:disable=broad-except
+        results.put(traceback.format_exc())
+
+
+class PluginProcessPool():
+    """ Runs the input, predict and output stages of an extraction plugin in a pool of worker
+    processes.
+
+    Batches are collected and finalized in the main process, so the plugin's
+    :func:`~plugins.extract._base.Extractor.get_batch` and
+    :func:`~plugins.extract._base.Extractor.finalize` methods are unchanged. Processed batches are
+    returned in the order that they were received.
+
+    Parameters
+    ----------
+    plugin: :class:`~plugins.extract._base.Extractor`
+        The plugin to run in worker processes
+    processes: int
+        The number of worker processes to launch
+
+    Notes
+    -----
+    The worker processes are forked from the calling process when the first batch is received, as
+    the shared memory slots are sized from that batch. Each worker loads its own copy of the
+    plugin's model, so the plugin must not share state with the main process after it has been
+    forked, and must not use a library that cannot be forked (such as Tensorflow). Use
+    :func:`lib.multithreading.has_process_support` to check that the running system can launch
+    the pool.
+    """
+    def __init__(self, plugin: "Extractor", processes: int) -> None:
+        logger.debug("Initializing %s: (plugin: %s, processes: %s)",
+                     self.__class__.__name__, plugin, processes)
+        assert has_process_support(), "Process based plugins are not supported"
+        self._plugin = plugin
+        self._process_count = processes
+        self._context = mp.get_context("fork")
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+
+        self._rings: List[SharedMemoryRing] = []
+        self._processes: List[mp.process.BaseProcess] = []
+        self._free_slots: Queue.Queue = Queue.Queue()
+        self._sent = 0
+        self._received = 0
+        self._end: Optional[int] = None
+        atexit.register(self.close)
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def _start(self, batch: Any) -> None:
+        """ Allocate the shared memory slots and launch the worker processes.
+
+        Slots are sized at twice the size of the arrays in the first batch, to allow for frames of
+        varying sizes. Arrays that do not fit within a slot are passed through the task and result
+        queues.
+
+        Parameters
+        ----------
+        batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+            The first batch received for processing
+        """
+        capacity = max(_batch_nbytes(batch) * 2, 1024 * 1024)
+        slots = self._process_count * 2
+        logger.debug("Starting plugin process pool for %s: (slots: %s, capacity: %s)",
+                     self._plugin.name, slots, capacity)
+        self._rings = [SharedMemoryRing([((capacity, ), "uint8")], slots) for _ in range(2)]
+        for slot in range(slots):
+            self._free_slots.put(slot)
+        name = self._plugin.name.replace(" ", "_").lower()
+        self._processes = [self._context.Process(target=_plugin_worker,
+                                                 name=f"{name}_{idx}",
+                                                 args=(self._plugin,
+                                                       self._rings,
+                                                       self._tasks,
+                                                       self._results),
+                                                 daemon=True)
+                           for idx in range(self._process_count)]
+        for process in self._processes:
+            process.start()
+
+    def put(self, batch: Any) -> None:
+        """ Send a batch to the worker processes, blocking until a shared memory slot is free.
+
+        Parameters
+        ----------
+        batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+            The batch output from the plugin's
+            :func:`~plugins.extract._base.Extractor.get_batch` method
+        """
+        if not self._processes:
+            self._start(batch)
+        while True:
+            try:
+                slot = self._free_slots.get(True, 1)
+                break
+            except Queue.Empty:
+                if queue_manager.shutdown.is_set():
+                    logger.debug("Shutdown signal received. Not sending batch")
+                    return
+        packed = _pack(batch, self._rings[0](slot)[0], 0, {})
+        self._tasks.put((self._sent, slot, packed))
+        self._sent += 1
+
+    def put_eof(self) -> None:
+        """ Indicate that all of the batches for the current pass have been sent. """
+        logger.debug("Batches sent: %s", self._sent)
+        self._end = self._sent
+
+    def _get_result(self) -> Tuple[int, int, Any, float, float]:
+        """ Obtain the next result from the worker processes, checking that the workers are still
+        alive whilst waiting.
+
+        Returns
+        -------
+        tuple
+            The (`sequence number`, `slot`, `packed batch`, `busy time`, `wait time`) of the
+            result, or an empty tuple if no result was received within 1 second
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurred within a worker process, or all of the worker processes have
+            exited
+        """
+        try:
+            retval = self._results.get(True, 1)
+        except Queue.Empty:
+            if self._processes and not any(process.is_alive() for process in self._processes):
+                raise RuntimeError("All extraction worker processes have exited")
+            return tuple()  # type:ignore
+        if isinstance(retval, str):
+            logger.error("Caught exception in extraction process")
+            self.close()
+            raise RuntimeError(f"Error in extraction process:\n{retval}")
+        return retval
+
+    def results(self) -> Generator[Tuple[Any, float, float], None, None]:
+        """ Obtain the processed batches for the current pass, in the order that they were sent.
+
+        Yields
+        ------
+        batch: dict or :class:`~plugins.extract.align._base.AlignerBatch`
+            The batch output from the plugin's :func:`_process_output` method
+        busy: float
+            The time, in seconds, that the worker process spent processing the batch
+        wait: float
+            The time, in seconds, that the worker process spent waiting to receive the batch
+        """
+        pending: Dict[int, Tuple[int, Any, float, float]] = {}
+        while self._end is None or self._received < self._end:
+            if queue_manager.shutdown.is_set():
+                logger.debug("Shutdown signal received. Stopping results")
+                break
+            result = self._get_result()
+            if result:
+                pending[result[0]] = result[1:]
+            while self._received in pending:
+                slot, batch, busy, wait = pending.pop(self._received)
+                buffers = [ring(slot)[0] for ring in self._rings]
+                batch = _unpack(batch, buffers, True)
+                self._free_slots.put(slot)
+                self._received += 1
+                yield batch, busy, wait
+        logger.debug("Batches received: %s", self._received)
+        self._end = None
+
+    def close(self) -> None:
+        """ Shut down the worker processes and release the shared memory """
+        if not self._processes:
+            return
+        logger.debug("Closing %s for %s", self.__class__.__name__, self._plugin.name)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        for ring in self._rings:
+            ring.close()
+        self._rings = []
@@ -89,24 +89,25 @@ class VGGFace2(Extractor):  # pylint:disable=abstract-method
         return next(self._iterator)
 
     def predict(self, batch):
-        """ Return encodings for given image from vgg_face2.
+        """ Return encodings for given image(s) from vgg_face2.
 
         Parameters
         ----------
         batch: numpy.ndarray
-            The face to be fed through the predictor. Should be in BGR channel order
+            The face, or batch of faces, to be fed through the predictor. Should be in BGR channel
+            order
 
         Returns
         -------
         numpy.ndarray
-            The encodings for the face
+            The encodings for the face, or a 2 dimensional array of encodings for a batch of faces
         """
-        face = batch
-        if face.shape[0] != self.input_size:
-            face = self._resize_face(face)
-        face = face[None, :, :, :3] - self._average_img
-        preds = self.model.predict(face)
-        return preds[0, :]
+        faces = batch if batch.ndim == 4 else batch[None]
+        if faces.shape[1] != self.input_size:
+            faces = np.array([self._resize_face(face) for face in faces])
+        faces = faces[..., :3] - self._average_img
+        preds = self.model.predict(faces, batch_size=len(faces))
+        return preds if batch.ndim == 4 else preds[0, :]
 
     def _resize_face(self, face):
         """ Resize incoming face to model_input_size.
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+""" Per-stage telemetry for Faceswap's extraction pipeline.
+
+Each thread of the extraction pipeline (the input, predict and output threads of every plugin,
+as well as the image loader and the face saver) records the time it spends working and waiting
+into a :class:`StageTelemetry` object. :class:`Telemetry` collates these, along with the
+statistics of the pipeline's queues, into a summary that can be periodically written to disk as
+JSON lines and reported at the end of a run, identifying the stage that limits the pipeline's
+throughput.
+"""
+import json
+import logging
+import threading
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from lib.queue_manager import queue_manager
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class StageTelemetry():
+    """ Collects timings for a single stage (thread) of the extraction pipeline.
+
+    All of a stage's time should be accounted for as either `busy` (processing items), `wait_in`
+    (blocked waiting to receive items) or `wait_out` (blocked waiting to pass items on), so that
+    the proportion of time that the stage is busy indicates how close it is to limiting the
+    pipeline.
+
+    Parameters
+    ----------
+    name: str
+        The name of the stage
+    """
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._lock = threading.Lock()
+        self._items = 0
+        self._batches = 0
+        self._capacity = 0
+        self._times = dict(busy=0.0, wait_in=0.0, wait_out=0.0)
+
+    @property
+    def name(self) -> str:
+        """ str: The name of the stage """
+        return self._name
+
+    def record(self,
+               items: int,
+               busy: float,
+               wait_in: float = 0.0,
+               wait_out: float = 0.0,
+               capacity: int = 0) -> None:
+        """ Record the timings for a batch of items that has been through the stage.
+
+        Parameters
+        ----------
+        items: int
+            The number of items processed
+        busy: float
+            The time, in seconds, spent processing the items
+        wait_in: float, optional
+            The time, in seconds, spent waiting to receive the items. Default: `0.0`
+        wait_out: float, optional
+            The time, in seconds, spent waiting to pass the items to the next stage. Default: `0.0`
+        capacity: int, optional
+            The batch size that the items were processed at, for calculating how full batches
+            are. `0` if the stage does not process batches. Default: `0`
+        """
+        with self._lock:
+            self._items += items
+            self._batches += 1
+            self._capacity += capacity
+            self._times["busy"] += busy
+            self._times["wait_in"] += wait_in
+            self._times["wait_out"] += wait_out
+
+    def reset(self) -> None:
+        """ Reset the stage's collected timings """
+        with self._lock:
+            self._items = 0
+            self._batches = 0
+            self._capacity = 0
+            self._times = dict(busy=0.0, wait_in=0.0, wait_out=0.0)
+
+    def summary(self) -> Dict[str, Any]:
+        """ Obtain the summary of the stage's timings.
+
+        Returns
+        -------
+        dict
+            The number of `items` and `batches` processed, the time in seconds spent `busy`,
+            waiting for input (`wait_in`) and waiting for output (`wait_out`), the stage's
+            throughput in `items_per_sec`, the proportion of time that the stage was busy
+            (`utilization`) and the mean proportion of each batch that was filled (`batch_fill`),
+            which is ``None`` for stages that do not process batches
+        """
+        with self._lock:
+            total = sum(self._times.values())
+            return dict(items=self._items,
+                        batches=self._batches,
+                        **{key: round(val, 4) for key, val in self._times.items()},
+                        items_per_sec=round(self._items / total, 2) if total else 0.0,
+                        utilization=round(self._times["busy"] / total, 4) if total else 0.0,
+                        batch_fill=(round(self._items / self._capacity, 4)
+                                    if self._capacity else None))
+
+
+class Telemetry():
+    """ Collates the telemetry of every stage and queue in the extraction pipeline.
+
+    Stages are obtained with :func:`stage`. Calling :func:`start` writes a summary of the
+    pipeline to a JSON lines file at a regular interval, and :func:`stop` writes the final summary
+    and logs a report naming the stage that limited the pipeline's throughput.
+    """
+    def __init__(self) -> None:
+        logger.debug("Initializing %s", self.__class__.__name__)
+        self._stages: Dict[str, StageTelemetry] = {}
+        self._start_time = perf_counter()
+        self._filename: Optional[str] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @property
+    def limiting_stage(self) -> Optional[str]:
+        """ str: The name of the stage that has been busy for the greatest proportion of its
+        time, and so limits the throughput of the pipeline. ``None`` if no stage has processed
+        any items """
+        stages = {name: stage.summary() for name, stage in self._stages.items()}
+        stages = {name: summary for name, summary in stages.items() if summary["items"]}
+        if not stages:
+            return None
+        return max(stages, key=lambda k: stages[k]["utilization"])
+
+    def stage(self, name: str) -> StageTelemetry:
+        """ Obtain the telemetry for a pipeline stage, creating it if it does not exist.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stage
+
+        Returns
+        -------
+        :class:`StageTelemetry`
+            The telemetry object for the requested stage
+        """
+        if name not in self._stages:
+            logger.debug("Adding telemetry stage: '%s'", name)
+            self._stages[name] = StageTelemetry(name)
+        return self._stages[name]
+
+    def reset(self) -> None:
+        """ Reset the telemetry of all stages and all managed queues. """
+        logger.debug("Resetting telemetry")
+        for stage in self._stages.values():
+            stage.reset()
+        for queue in list(queue_manager.queues.values()):
+            queue.reset_stats()
+        self._start_time = perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """ Obtain a summary of the pipeline's telemetry.
+
+        Returns
+        -------
+        dict
+            The `elapsed` time in seconds since the telemetry was created or reset, the summary of
+            each stage (see :func:`StageTelemetry.summary`), the statistics for each managed queue
+            (see :attr:`lib.queue_manager.EventQueue.stats`) and the `limiting_stage`
+        """
+        queues = {}
+        for name, queue in sorted(queue_manager.queues.items()):
+            stats = queue.stats
+            queues[name] = {key: (round(val, 4) if isinstance(val, float) else val)
+                            for key, val in stats.items() if key != "occupancy"}
+            queues[name]["occupancy"] = {str(depth): round(secs, 4)
+                                         for depth, secs in stats["occupancy"].items()}
+        return dict(elapsed=round(perf_counter() - self._start_time, 4),
+                    stages={name: stage.summary()
+                            for name, stage in sorted(self._stages.items())},
+                    queues=queues,
+                    limiting_stage=self.limiting_stage)
+
+    def start(self, filename: str, interval: float) -> None:
+        """ Write the telemetry summary to a JSON lines file at a regular interval, until
+        :func:`stop` is called.
+
+        Parameters
+        ----------
+        filename: str
+            The full path to the file to append summaries to
+        interval: float
+            The number of seconds between each summary
+        """
+        logger.debug("Starting telemetry: (filename: '%s', interval: %s)", filename, interval)
+        self._filename = filename
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._monitor, args=(interval, ))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stop writing periodic summaries, write the final summary and log the end of run
+        report. Does nothing if :func:`start` has not been called. """
+        if self._thread is None:
+            return
+        logger.debug("Stopping telemetry")
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        summary = self.summary()
+        self._write(summary, final=True)
+        self._report(summary)
+
+    def _monitor(self, interval: float) -> None:
+        """ Write the telemetry summary to disk every interval until the stop event is set.
+
+        Parameters
+        ----------
+        interval: float
+            The number of seconds between each summary
+        """
+        while not self._stop_event.wait(interval):
+            self._write(self.summary())
+
+    def _write(self, summary: Dict[str, Any], final: bool = False) -> None:
+        """ Append a summary to the telemetry file as a single line of JSON.
+
+        Parameters
+        ----------
+        summary: dict
+            The summary to write, as generated by :func:`summary`
+        final: bool, optional
+            ``True`` if this is the summary for the end of the run. Default: ``False``
+        """
+        assert self._filename is not None
+        with open(self._filename, "a", encoding="utf-8") as out_file:
+            out_file.write(json.dumps(dict(final=final, **summary)) + "\n")
+
+    @classmethod
+    def _report(cls, summary: Dict[str, Any]) -> None:
+        """ Log the end of run telemetry report.
+
+        Parameters
+        ----------
+        summary: dict
+            The final summary, as generated by :func:`summary`
+        """
+        logger.info("Extraction telemetry (%.1fs):", summary["elapsed"])
+        for name, stage in summary["stages"].items():
+            if not stage["items"]:
+                continue
+            total = max(stage["busy"] + stage["wait_in"] + stage["wait_out"], 1e-9)
+            fill = ("" if stage["batch_fill"] is None
+                    else f", batch fill: {stage['batch_fill']:.0%}")
+            logger.info("  %s: %.1f items/sec, busy: %.0f%%, waiting for input: %.0f%%, "
+                        "waiting for output: %.0f%%%s",
+                        name, stage["items_per_sec"], stage["utilization"] * 100,
+                        stage["wait_in"] / total * 100, stage["wait_out"] / total * 100, fill)
+        limiting = summary["limiting_stage"]
+        if limiting is None:
+            return
+        logger.info("Limiting stage: '%s' (busy %.0f%% of the time)",
+                    limiting, summary["stages"][limiting]["utilization"] * 100)
@@ -76,6 +76,21 @@ _DEFAULTS = dict(
         rounding=1,
         min_max=(0, 25),
         group="image augmentation"),
+    warp_landmarks_engine=dict(
+        default="piecewise_affine",
+        info="The method used to calculate the warp when 'warp-to-landmarks' is enabled. Both "
+             "methods give the same warp, so this only affects speed.\n"
+             "\n\tpiecewise_affine - Triangulates the landmarks and applies a single affine "
+             "transformation per triangle, calculating the warp for the whole batch at once. "
+             "Faster than griddata, particularly at larger model input sizes."
+             "\n\tgriddata - The original method. Interpolates the warp for each image in turn "
+             "with Scipy's griddata function.\n"
+             "NB: This is ignored if the 'warp-to-landmarks' option is not enabled",
+        datatype=str,
+        choices=["piecewise_affine", "griddata"],
+        gui_radio=True,
+        fixed=False,
+        group="image augmentation"),
     flip_chance=dict(
         default=50,
         info="Percentage chance to randomly flip each training image horizontally.\n"
@@ -123,4 +138,37 @@ _DEFAULTS = dict(
         rounding=1,
         min_max=(1, 8),
         group="color augmentation"),
+    packed_faceset=dict(
+        default=False,
+        info="Decode each side's training faces once into a memory-mapped pack file stored "
+             "inside the training folder, rather than decoding every face from disk at every "
+             "iteration. This can significantly lower CPU usage during training at the cost of "
+             "disk space (approximately the uncompressed size of all of the training images). "
+             "The pack is automatically rebuilt if the contents of the training folder change.",
+        datatype=bool,
+        fixed=False,
+        group="data loading"),
+    augment_processes=dict(
+        default=0,
+        info="The number of worker processes to use for compiling augmented training batches "
+             "for each side. At higher batch sizes augmentation can become limited by a single "
+             "CPU core. Launching worker processes allows augmentation to be spread over "
+             "multiple cores. Each worker holds its own copy of the training data cache, so "
+             "RAM usage will increase with each process launched.\nSet to 0 to compile batches "
+             "in a background thread.\nNB: This option is only supported on Linux and macOS.",
+        datatype=int,
+        rounding=1,
+        min_max=(0, 32),
+        fixed=False,
+        group="data loading"),
+    augment_prefetch=dict(
+        default=2,
+        info="The number of augmented batches to hold ready for each side when using worker "
+             "processes for augmentation. Higher values can smooth out stalls at the cost of "
+             "RAM.\nNB: This is ignored if 'augment_processes' is set to 0.",
+        datatype=int,
+        rounding=1,
+        min_max=(1, 16),
+        fixed=False,
+        group="data loading"),
 )
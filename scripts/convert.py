@@ -5,6 +5,7 @@ from dataclasses import dataclass, field
 import logging
 import re
 import os
+import shutil
 import sys
 from threading import Event
 from time import sleep
@@ -16,11 +17,11 @@ from tqdm import tqdm
 
 from scripts.fsmedia import Alignments, PostProcess, finalize
 from lib.serializer import get_serializer
-from lib.convert import Converter
+from lib.convert import Converter, PatchPool
 from lib.align import AlignedFace, DetectedFace, update_legacy_png_header
 from lib.gpu_stats import GPUStats
 from lib.image import read_image_meta_batch, ImagesLoader
-from lib.multithreading import MultiThread, total_cpus
+from lib.multithreading import has_process_support, MultiThread, total_cpus
 from lib.queue_manager import queue_manager
 from lib.utils import FaceswapError, get_backend, get_folder, get_image_paths
 from plugins.extract.pipeline import Extractor, ExtractMedia
@@ -88,13 +89,16 @@ class Convert():  # pylint:disable=too-few-public-methods
         logger.debug("Initializing %s: (args: %s)", self.__class__.__name__, arguments)
         self._args = arguments
 
-        self._images = ImagesLoader(self._args.input_dir, fast_count=True)
+        decoders = self._args.video_decoders if hasattr(self._args, "video_decoders") else 1
+        self._images = ImagesLoader(self._args.input_dir, fast_count=True, decoders=decoders)
         self._alignments = Alignments(self._args, False, self._images.is_video)
         if self._alignments.version == 1.0:
             logger.error("The alignments file format has been updated since the given alignments "
                          "file was generated. You need to update the file to proceed.")
             logger.error("To do this run the 'Alignments Tool' > 'Extract' Job.")
             sys.exit(1)
+        if self._images.is_video and (decoders > 1 or self._args.frame_ranges):
+            self._images.add_video_meta_data(self._alignments.video_meta_data)
 
         self._opts = OptionalActions(self._args, self._images.file_list, self._alignments)
 
@@ -198,12 +202,22 @@ class Convert():  # pylint:disable=too-few-public-methods
     def _get_threads(self) -> MultiThread:
         """ Get the threads for patching the converted faces onto the frames.
 
+        If process based patching has been requested, a single thread is returned which feeds a
+        :class:`lib.convert.PatchPool` of worker processes.
+
         Returns
         :class:`lib.multithreading.MultiThread`
             The threads that perform the patching of swapped faces onto the output frames
         """
         save_queue = queue_manager.get_queue("convert_out")
         patch_queue = queue_manager.get_queue("patch")
+        if getattr(self._args, "patch_processes", False) and self._pool_processes > 1:
+            if has_process_support():
+                pool = PatchPool(self._converter, self._pool_processes)
+                return MultiThread(pool.process, patch_queue, save_queue,
+                                   thread_count=1, name="patch")
+            logger.warning("Process based patching is not supported on this system. Falling "
+                           "back to thread based patching.")
         return MultiThread(self._converter.process, patch_queue, save_queue,
                            thread_count=self._pool_processes, name="patch")
 
@@ -302,7 +316,9 @@ class DiskIO():
         # For frame skipping
         self._imageidxre = re.compile(r"(\d+)(?!.*\d\.)(?=\.\w+$)")
         self._frame_ranges = self._get_frame_ranges()
+        self._copy_unchanged: List[str] = []
         self._writer = self._get_writer()
+        self._set_loader_frame_ranges()
 
         # Extractor for on the fly detection
         self._extractor = self._load_extractor()
@@ -357,6 +373,8 @@ class DiskIO():
         """ int: The total number of frames to be converted """
         if self._frame_ranges and not self._args.keep_unchanged:
             retval = sum(fr[1] - fr[0] + 1 for fr in self._frame_ranges)
+        elif self._copy_unchanged:
+            retval = self._images.count - len(self._copy_unchanged)
         else:
             retval = self._images.count
         logger.debug(retval)
@@ -422,6 +440,66 @@ class DiskIO():
         logger.debug("frame ranges: %s", retval)
         return retval
 
+    def _set_loader_frame_ranges(self) -> None:
+        """ Limit the frames that the images loader reads to the selected frame ranges.
+
+        Frames outside of the frame ranges are never read from a video or folder of images. If
+        unchanged frames are to be kept, then they must be read and written out by the selected
+        writer, unless they can be copied directly to the output folder (see
+        :func:`_get_copy_unchanged`), in which case they are copied when loading starts.
+        """
+        if not self._frame_ranges:
+            return
+        if self._args.keep_unchanged:
+            self._copy_unchanged = self._get_copy_unchanged()
+            if not self._copy_unchanged:
+                logger.debug("Unchanged frames are to be written by the writer")
+                return
+
+        if self._images.is_video:
+            ranges = [(start - 1, end - 1) for start, end in self._frame_ranges]
+        else:
+            ranges = []
+            for idx, filename in enumerate(self._images.file_list):
+                if self._check_skipframe(filename):
+                    continue
+                if ranges and ranges[-1][1] == idx - 1:
+                    ranges[-1] = (ranges[-1][0], idx)
+                else:
+                    ranges.append((idx, idx))
+        logger.debug("Loader frame ranges: %s", ranges)
+        self._images.add_frame_ranges(ranges)
+
+    def _get_copy_unchanged(self) -> List[str]:
+        """ Obtain the source images that can be copied directly to the output folder when
+        unchanged frames are to be kept.
+
+        Unchanged frames can be copied when converting from a folder of images to an image writer,
+        the output is not being scaled and every unchanged frame is already in the writer's output
+        format.
+
+        Returns
+        -------
+        list
+            The full path to the source images to copy to the output folder, or an empty list if
+            unchanged frames must be written by the writer
+        """
+        if (self._images.is_video
+                or self._writer.is_stream
+                or self._args.output_scale != 100
+                or "format" not in self._writer.config):
+            return []
+        aliases = dict(jpeg="jpg", tiff="tif")
+        out_format = self._writer.config["format"]
+        retval = [filename for filename in self._images.file_list
+                  if self._check_skipframe(filename)]
+        if any(aliases.get(ext, ext) != aliases.get(out_format, out_format)
+               for ext in set(os.path.splitext(fname)[-1][1:].lower() for fname in retval)):
+            logger.debug("Unchanged frames are not all in the output format '%s'", out_format)
+            return []
+        logger.debug("Unchanged frames to copy: %s", len(retval))
+        return retval
+
     def _load_extractor(self) -> Optional[Extractor]:
         """ Load the CV2-DNN Face Extractor Chain.
 
@@ -511,13 +589,24 @@ class DiskIO():
         """ Load frames from disk.
 
         In a background thread:
-            * Loads frames from disk.
+            * Copies unchanged frames outside of the frame ranges to the output folder, if they
+              do not need to be written by the writer
+            * Loads frames from disk, skipping frames outside of the frame ranges
+            * Waits for space in a stream writer's cache of out of order frames, telling the
+              predictor to release any frames that it is holding whilst waiting
             * Discards or passes through cli selected skipped frames
             * Pairs the frame with its :class:`~lib.align.DetectedFace` objects
             * Performs any pre-processing actions
             * Puts the frame and detected faces to the load queue
         """
         logger.debug("Load Images: Start")
+        if self._copy_unchanged:
+            logger.info("Copying %s unchanged frames...", len(self._copy_unchanged))
+        for filename in self._copy_unchanged:
+            if self._queues["load"].shutdown.is_set():
+                break
+            logger.trace("Copying unchanged frame: %s", filename)  # type:ignore
+            shutil.copyfile(filename, self._writer.output_filename(filename)[0])
         idx = 0
         for filename, image in self._images.load():
             idx += 1
@@ -527,7 +616,14 @@ class DiskIO():
             if image is None or (not image.any() and image.ndim not in (2, 3)):
                 # All black frames will return not numpy.any() so check dims too
                 logger.warning("Unable to open image. Skipping: '%s'", filename)
+                self._writer.skip_frame(filename)
                 continue
+            # Wait for space in a stream writer's cache of out of order frames. The predictor
+            # holds frames until it has a full batch, so flush it if we need to wait
+            self._writer.reserve(filename,
+                                 int(image.nbytes * (self._args.output_scale / 100) ** 2),
+                                 shutdown=self._queues["load"].shutdown,
+                                 on_stall=lambda: self._queues["load"].put("FLUSH"))
             if self._check_skipframe(filename):
                 if self._args.keep_unchanged:
                     logger.trace("Saving unchanged frame: %s", filename)  # type:ignore
@@ -894,17 +990,30 @@ class Predict():
 
         Reads from the :attr:`self._in_queue`, prepares images for prediction
         then puts the predictions back to the :attr:`self.out_queue`
+
+        Frames are held until a full batch of faces has been collected. A ``"FLUSH"`` item
+        forces the current batch through, so that frames are not held whilst the loader is
+        waiting on the writer for them to be written.
         """
         faces_seen = 0
         consecutive_no_faces = 0
         batch: List[ConvertItem] = []
         while True:
-            item: Union[Literal["EOF"], ConvertItem] = self._in_queue.get()
+            item: Union[Literal["EOF", "FLUSH"], ConvertItem] = self._in_queue.get()
             if item == "EOF":
                 logger.debug("EOF Received")
                 if batch:  # Process out any remaining items
                     self._process_batch(batch, faces_seen)
                 break
+            if item == "FLUSH":
+                logger.trace("Flush Received. Processing %s held frames",  # type:ignore
+                             len(batch))
+                if batch:
+                    self._process_batch(batch, faces_seen)
+                consecutive_no_faces = 0
+                faces_seen = 0
+                batch = []
+                continue
             logger.trace("Got from queue: '%s'", item.inbound.filename)  # type:ignore
             faces_count = len(item.inbound.detected_faces)
 
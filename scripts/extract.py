@@ -7,7 +7,8 @@ import logging
 import os
 import sys
 from argparse import Namespace
-from typing import List, Dict, Optional
+from time import perf_counter
+from typing import List, Dict, Optional, TYPE_CHECKING
 
 from tqdm import tqdm
 
@@ -17,6 +18,9 @@ from lib.utils import get_folder, _image_extensions, _video_extensions
 from plugins.extract.pipeline import Extractor, ExtractMedia
 from scripts.fsmedia import Alignments, PostProcess, finalize
 
+if TYPE_CHECKING:
+    from plugins.extract.telemetry import StageTelemetry
+
 
 tqdm.monitor_interval = 0  # workaround for TqdmSynchronisationWarning
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -59,7 +63,9 @@ class Extract():  # pylint:disable=too-few-public-methods
                                     rotate_images=self._args.rotate_images,
                                     min_size=self._args.min_size,
                                     normalize_method=normalization,
-                                    re_feed=self._args.re_feed)
+                                    re_feed=self._args.re_feed,
+                                    telemetry=(hasattr(self._args, "telemetry")
+                                               and self._args.telemetry > 0))
 
     def _get_input_locations(self) -> List[str]:
         """ Obtain the full path to input locations. Will be a list of locations if batch mode is
@@ -176,8 +182,12 @@ class _Extract():  # pylint:disable=too-few-public-methods
             self._args.output_dir)
 
         logger.info("Output Directory: %s", self._output_dir)
-        self._images = ImagesLoader(self._args.input_dir, fast_count=True)
+        decoders = self._args.video_decoders if hasattr(self._args, "video_decoders") else 1
+        self._images = ImagesLoader(self._args.input_dir, fast_count=True, decoders=decoders)
         self._alignments = Alignments(self._args, True, self._images.is_video)
+        self._alignments.open_journal()
+        if self._images.is_video and decoders > 1:
+            self._images.add_video_meta_data(self._alignments.video_meta_data)
         self._extractor = extractor
 
         self._existing_count = 0
@@ -190,8 +200,8 @@ class _Extract():  # pylint:disable=too-few-public-methods
 
     @property
     def _save_interval(self) -> Optional[int]:
-        """ int: The number of frames to be processed between each saving of the alignments file if
-        it has been provided, otherwise ``None`` """
+        """ int: The number of frames to be processed between each commit of the alignments
+        journal to disk if it has been provided, otherwise ``None`` """
         if hasattr(self._args, "save_interval"):
             return self._args.save_interval
         return None
@@ -224,7 +234,7 @@ class _Extract():  # pylint:disable=too-few-public-methods
                              filename)
                 skip_list.append(idx)
         if self._existing_count != 0:
-            logger.info("Skipping %s frames due to skip_existing/skip_existing_faces.",
+            logger.info("Skipping %s frames that have previously been extracted.",
                         self._existing_count)
         logger.debug("Adding skip list: %s", skip_list)
         self._images.add_skip_list(skip_list)
@@ -235,15 +245,75 @@ class _Extract():  # pylint:disable=too-few-public-methods
         Should only be called from  :class:`lib.cli.launcher.ScriptExecutor`
         """
         # from lib.queue_manager import queue_manager ; queue_manager.debug_monitor(3)
+        self._start_telemetry()
         self._threaded_redirector("load")
         self._run_extraction()
         for thread in self._threads:
             thread.join()
-        self._alignments.save()
+        if self._extractor.telemetry is not None:
+            self._extractor.telemetry.stop()
+        if not self._save_video_meta_data():
+            self._alignments.save()
         finalize(self._images.process_count + self._existing_count,
                  self._alignments.faces_count,
                  self._verify_output)
 
+    def _start_telemetry(self) -> None:
+        """ Reset the extraction pipeline's telemetry for this job and, if requested, start
+        writing it to a JSON lines file alongside the alignments file. """
+        telemetry = self._extractor.telemetry
+        if telemetry is None:
+            logger.debug("Telemetry not requested")
+            return
+        telemetry.reset()
+        filename = f"{os.path.splitext(self._alignments.file)[0]}_telemetry.jsonl"
+        logger.info("Writing extraction telemetry to: '%s'", filename)
+        telemetry.start(filename, self._args.telemetry)
+
+    def _get_stage(self, name: str) -> Optional[StageTelemetry]:
+        """ Obtain a telemetry stage for recording the timings of the extraction process' own
+        threads.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stage
+
+        Returns
+        -------
+        :class:`~plugins.extract.telemetry.StageTelemetry` or ``None``
+            The telemetry stage, or ``None`` if telemetry has not been requested
+        """
+        telemetry = self._extractor.telemetry
+        return None if telemetry is None else telemetry.stage(name)
+
+    def _save_video_meta_data(self) -> bool:
+        """ Store the seek index that was collected whilst reading an input video in the
+        alignments file, so that later random access to the video's frames does not require the
+        video to be scanned again.
+
+        The index is only stored if every frame of the video exists in the alignments file and it
+        does not already hold video meta data.
+
+        Returns
+        -------
+        bool
+            ``True`` if the video meta data was stored and the alignments file saved, otherwise
+            ``False``
+        """
+        meta = self._images.video_meta_data
+        if not self._images.is_video or not meta or any(val is None for val in meta.values()):
+            return False
+        if (meta["pts_time"][0] != 0
+                or self._alignments.frames_count != len(meta["pts_time"])
+                or all(val is not None for val in self._alignments.video_meta_data.values())):
+            logger.debug("Not saving video meta data. (first pts_time: %s, frames count: %s, "
+                         "video frames: %s)", meta["pts_time"][0],
+                         self._alignments.frames_count, len(meta["pts_time"]))
+            return False
+        self._alignments.save_video_meta_data(**meta)
+        return True
+
     def _threaded_redirector(self, task: str, io_args: Optional[tuple] = None) -> None:
         """ Redirect image input/output tasks to relevant queues in background thread
 
@@ -269,12 +339,19 @@ class _Extract():  # pylint:disable=too-few-public-methods
         """
         logger.debug("Load Images: Start")
         load_queue = self._extractor.input_queue
+        stage = self._get_stage("images_load")
+        start = perf_counter()
         for filename, image in self._images.load():
             if load_queue.shutdown.is_set():
                 logger.debug("Load Queue: Stop signal received. Terminating")
                 break
             item = ExtractMedia(filename, image[..., :3])
+            put_start = perf_counter()
             load_queue.put(item)
+            now = perf_counter()
+            if stage is not None:
+                stage.record(1, put_start - start, wait_out=now - put_start)
+            start = now
         load_queue.put("EOF")
         logger.debug("Load Images: Complete")
 
@@ -292,6 +369,8 @@ class _Extract():  # pylint:disable=too-few-public-methods
         """
         logger.debug("Reload Images: Start. Detected Faces Count: %s", len(detected_faces))
         load_queue = self._extractor.input_queue
+        stage = self._get_stage("images_load")
+        start = perf_counter()
         for filename, image in self._images.load():
             if load_queue.shutdown.is_set():
                 logger.debug("Reload Queue: Stop signal received. Terminating")
@@ -302,7 +381,12 @@ class _Extract():  # pylint:disable=too-few-public-methods
                 logger.warning("Couldn't find faces for: %s", filename)
                 continue
             extract_media.set_image(image)
+            put_start = perf_counter()
             load_queue.put(extract_media)
+            now = perf_counter()
+            if stage is not None:
+                stage.record(1, put_start - start, wait_out=now - put_start)
+            start = now
         load_queue.put("EOF")
         logger.debug("Reload Images: Complete")
 
@@ -327,21 +411,28 @@ class _Extract():  # pylint:disable=too-few-public-methods
             self._check_thread_error()
             ph_desc = "Extraction" if self._extractor.passes == 1 else self._extractor.phase_text
             desc = f"Running pass {phase + 1} of {self._extractor.passes}: {ph_desc}"
+            stage = self._get_stage("faces_output")
+            start = perf_counter()
             for idx, extract_media in enumerate(tqdm(self._extractor.detected_faces(),
                                                      total=self._images.process_count,
                                                      file=sys.stdout,
                                                      desc=desc,
                                                      leave=False)):
+                wait_time = perf_counter() - start
                 self._check_thread_error()
                 if is_final:
                     self._output_processing(extract_media, size)
                     self._output_faces(saver, extract_media)
                     if self._save_interval and (idx + 1) % self._save_interval == 0:
-                        self._alignments.save()
+                        self._alignments.sync_journal()
                 else:
                     extract_media.remove_image()
                     # cache extract_media for next run
                     detected_faces[extract_media.filename] = extract_media
+                now = perf_counter()
+                if stage is not None:
+                    stage.record(1, now - start - wait_time, wait_in=wait_time)
+                start = now
 
             if not is_final:
                 logger.debug("Reloading images")
@@ -427,5 +518,7 @@ class _Extract():  # pylint:disable=too-few-public-methods
                 continue
             final_faces.append(face.to_alignment())
 
-        self._alignments.data[os.path.basename(extract_media.filename)] = dict(faces=final_faces)
+        frame_name = os.path.basename(extract_media.filename)
+        self._alignments.data[frame_name] = dict(faces=final_faces)
+        self._alignments.journal_frame(frame_name)
         del extract_media
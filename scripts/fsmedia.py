@@ -757,9 +757,11 @@ class FaceFilter(PostProcessAction):
         if not self._filter:
             return
         ret_faces = []
-        for idx, detect_face in enumerate(extract_media.detected_faces):
-            check_item = detect_face["face"] if isinstance(detect_face, dict) else detect_face
-            if not self._filter.check(extract_media.image, check_item):
+        check_items = [face["face"] if isinstance(face, dict) else face
+                       for face in extract_media.detected_faces]
+        results = self._filter.check_faces(extract_media.image, check_items)
+        for idx, (detect_face, result) in enumerate(zip(extract_media.detected_faces, results)):
+            if not result:
                 logger.verbose("Skipping not recognized face: (Frame: %s Face %s)",  # type: ignore
                                extract_media.filename, idx)
                 continue
@@ -0,0 +1,3 @@
+""" Faceswap tests. Faceswap's logger class, which adds the `verbose` and `trace` levels, must be
+set before any Faceswap module creates its logger. """
+import lib.logger  # noqa pylint:disable=unused-import
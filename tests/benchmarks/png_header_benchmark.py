@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Micro-benchmark for reading Faceswap PNG face headers.
+
+Compares the time taken to parse the legacy ``str(dict)`` header format against the binary
+header format, for synthetic faces carrying a configurable number of stored masks.
+
+Usage::
+
+    python -m tests.benchmarks.png_header_benchmark [-n FACES] [-m MASKS]
+"""
+import argparse
+import timeit
+import zlib
+
+import cv2
+import numpy as np
+
+from lib.image import encode_png_meta, png_read_meta, png_write_meta
+
+
+def _get_metadata(mask_count: int) -> dict:
+    """ Generate a synthetic face header, laid out as written by the extract process.
+
+    Parameters
+    ----------
+    mask_count: int
+        The number of compressed masks to store in the header
+
+    Returns
+    -------
+    dict
+        The synthetic face header
+    """
+    landmarks = (np.random.rand(68, 2) * 512).astype("float32")
+    masks = {}
+    for idx in range(mask_count):
+        mask = np.zeros((128, 128), dtype="uint8")
+        cv2.circle(mask, (64, 64), 32 + idx * 8, 255, -1)
+        masks[f"mask_{idx}"] = dict(mask=zlib.compress(cv2.GaussianBlur(mask, (15, 15), 0)),
+                                    affine_matrix=np.random.rand(2, 3).tolist(),
+                                    interpolator=cv2.INTER_AREA,
+                                    stored_size=128,
+                                    stored_centering="face")
+    return dict(alignments=dict(x=123, w=256, y=87, h=256,
+                                landmarks_xy=landmarks.tolist(),
+                                mask=masks),
+                source=dict(alignments_version=2.2,
+                            original_filename="video_000001_0.png",
+                            face_index=0,
+                            source_filename="video_000001.png",
+                            source_is_video=True,
+                            source_frame_dims=(1080, 1920)))
+
+
+def main() -> None:
+    """ Run the benchmark and print the results """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--faces", type=int, default=10000)
+    parser.add_argument("-m", "--masks", type=int, nargs="+", default=[0, 1, 3, 6])
+    args = parser.parse_args()
+
+    image = cv2.imencode(".png", np.zeros((16, 16, 3), dtype="uint8"))[1].tobytes()
+
+    print(f"{'masks':>6}{'legacy (s)':>12}{'binary (s)':>12}{'speedup':>9}"
+          f"{'legacy (bytes)':>16}{'binary (bytes)':>16}")
+    for mask_count in args.masks:
+        metadata = _get_metadata(mask_count)
+        legacy_meta = str(metadata).encode("utf-8")
+        binary_meta = encode_png_meta(metadata)
+        legacy = png_write_meta(image, legacy_meta)
+        binary = png_write_meta(image, binary_meta)
+        assert png_read_meta(legacy) == png_read_meta(binary)
+
+        legacy_time = timeit.timeit(lambda: png_read_meta(legacy),  # pylint:disable=W0640
+                                    number=args.faces)
+        binary_time = timeit.timeit(lambda: png_read_meta(binary),  # pylint:disable=W0640
+                                    number=args.faces)
+        print(f"{mask_count:>6}{legacy_time:>12.3f}{binary_time:>12.3f}"
+              f"{legacy_time / binary_time:>9.2f}{len(legacy_meta):>16}{len(binary_meta):>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+""" Benchmark for the sort tool's pairwise comparison sorts.
+
+Compares the original pure Python nested loop implementations of sort and group by histogram and
+by landmarks (face-cnn) similarity and dissimilarity against the vectorized implementations in
+:class:`tools.sort.pairwise.PairwiseDistance`. Grouping is timed for both centroid and average
+linkage, and compared against the original average linkage implementation.
+
+The original implementations are quadratic in Python, so they are only timed for face counts up
+to `--reference-max`. Where both are run, the sort orders are checked for equality. Distances
+are totalled at a higher precision than the original implementation, so on rare occasions faces
+with near identical dissimilarity totals may be ordered differently. Centroid linkage measures
+distance to a group's centroid rather than averaging the distance to each member, so its groups
+are not expected to match the original implementation exactly.
+
+Usage::
+
+    python -m tests.benchmarks.sort_benchmark [-s SIZES [SIZES ...]] [-r REFERENCE_MAX]
+"""
+import argparse
+from time import perf_counter
+from typing import Callable, List
+
+import cv2
+import numpy as np
+
+from tools.sort.pairwise import PairwiseDistance
+
+_SIZES = (1000, 10000, 50000)
+_THRESHOLDS = dict(bhattacharyya=0.3, l1=10.0)
+
+
+def _distance(metric: str, feat1: np.ndarray, feat2: np.ndarray) -> float:
+    """ The distance between two features, as calculated by the original implementation.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    feat1: :class:`numpy.ndarray`
+        The first feature
+    feat2: :class:`numpy.ndarray`
+        The second feature
+
+    Returns
+    -------
+    float
+        The distance between the features
+    """
+    if metric == "bhattacharyya":
+        return cv2.compareHist(feat1, feat2, cv2.HISTCMP_BHATTACHARYYA)
+    return np.sum(np.absolute((feat2 - feat1).flatten()))
+
+
+def _reference_sim(metric: str, features: np.ndarray) -> List[int]:
+    """ The original greedy nearest neighbour similarity sort.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to sort
+
+    Returns
+    -------
+    list
+        The sorted indices
+    """
+    result = list(range(len(features)))
+    for i in range(len(result) - 1):
+        min_score = float("inf")
+        j_min_score = i + 1
+        for j in range(i + 1, len(result)):
+            score = _distance(metric, features[result[i]], features[result[j]])
+            if score < min_score:
+                min_score = score
+                j_min_score = j
+        result[i + 1], result[j_min_score] = result[j_min_score], result[i + 1]
+    return result
+
+
+def _reference_dissim(metric: str, features: np.ndarray) -> List[int]:
+    """ The original dissimilarity sort.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to sort
+
+    Returns
+    -------
+    list
+        The sorted indices
+    """
+    later_only = metric == "l1"  # Sort by landmark dissimilarity only totals later faces
+    scores = []
+    for i in range(len(features)):
+        start = i + 1 if later_only else 0
+        scores.append(sum(_distance(metric, features[i], features[j])
+                          for j in range(start, len(features)) if i != j))
+    return sorted(range(len(features)), key=lambda idx: scores[idx], reverse=True)
+
+
+def _vectorized_sim(metric: str, features: np.ndarray) -> List[int]:
+    """ The vectorized greedy nearest neighbour similarity sort.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to sort
+
+    Returns
+    -------
+    list
+        The sorted indices
+    """
+    return PairwiseDistance(features, metric).nearest_neighbour_order()  # type:ignore
+
+
+def _vectorized_dissim(metric: str, features: np.ndarray) -> List[int]:
+    """ The vectorized dissimilarity sort.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to sort
+
+    Returns
+    -------
+    list
+        The sorted indices
+    """
+    scores = PairwiseDistance(features, metric).sum_distances(  # type:ignore
+        later_only=metric == "l1")
+    return sorted(range(len(features)), key=lambda idx: scores[idx], reverse=True)
+
+
+def _reference_group(metric: str, features: np.ndarray) -> List[int]:
+    """ The original grouping, comparing each face against every member of each group.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to group
+
+    Returns
+    -------
+    list
+        The group index for each face
+    """
+    groups: List[List[int]] = []
+    labels: List[int] = []
+    for feat in features:
+        scores = [sum(_distance(metric, feat, features[idx]) for idx in members) / len(members)
+                  for members in groups]
+        nearest = int(np.argmin(scores)) if scores else -1
+        if scores and scores[nearest] < _THRESHOLDS[metric]:
+            groups[nearest].append(len(labels))
+            labels.append(nearest)
+        else:
+            groups.append([len(labels)])
+            labels.append(len(groups) - 1)
+    return labels
+
+
+def _vectorized_group(metric: str, features: np.ndarray, linkage: str) -> List[int]:
+    """ The vectorized grouping.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to group
+    linkage: str
+        "centroid" or "average"
+
+    Returns
+    -------
+    list
+        The group index for each face
+    """
+    return PairwiseDistance(features, metric).group(_THRESHOLDS[metric],  # type:ignore
+                                                    linkage=linkage)  # type:ignore
+
+
+def _get_group_features(metric: str, size: int) -> np.ndarray:
+    """ Generate random features drawn from 50 distinct identities for grouping.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" for 256 bin histograms or "l1" for 68 point landmarks
+    size: int
+        The number of faces to generate features for
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The generated features
+    """
+    labels = np.random.randint(0, 50, size)
+    if metric == "bhattacharyya":
+        bases = np.random.randint(0, 500, (50, 256, 1))
+        return (bases[labels] + np.random.randint(0, 50, (size, 256, 1))).astype("float32")
+    bases = np.random.rand(50, 68, 2)
+    return (bases[labels] + np.random.normal(0.0, 0.02, (size, 68, 2))).astype("float32")
+
+
+def _get_features(metric: str, size: int) -> np.ndarray:
+    """ Generate random features for sorting.
+
+    Parameters
+    ----------
+    metric: str
+        "bhattacharyya" for 256 bin histograms or "l1" for 68 point landmarks
+    size: int
+        The number of faces to generate features for
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The generated features
+    """
+    if metric == "bhattacharyya":
+        return np.random.randint(0, 500, (size, 256, 1)).astype("float32")
+    return np.random.rand(size, 68, 2).astype("float32")
+
+
+def _time(func: Callable[[str, np.ndarray], List[int]],
+          metric: str,
+          features: np.ndarray) -> tuple:
+    """ Time a sort function.
+
+    Parameters
+    ----------
+    func: callable
+        The sort function to time
+    metric: str
+        "bhattacharyya" or "l1"
+    features: :class:`numpy.ndarray`
+        The features to sort
+
+    Returns
+    -------
+    tuple
+        The time taken in seconds and the sorted indices
+    """
+    start = perf_counter()
+    result = func(metric, features)
+    return perf_counter() - start, result
+
+
+def main() -> None:
+    """ Run the benchmark and print the results """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=list(_SIZES))
+    parser.add_argument("-r", "--reference-max", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'sort':>20}{'faces':>8}{'reference (s)':>15}{'vectorized (s)':>16}"
+          f"{'speedup':>9}{'match':>7}")
+    for metric, name in (("bhattacharyya", "hist"), ("l1", "face-cnn")):
+        for size in args.sizes:
+            features = _get_features(metric, size)
+            for method, reference, vectorized in (("", _reference_sim, _vectorized_sim),
+                                                  ("-dissim", _reference_dissim,
+                                                   _vectorized_dissim)):
+                vec_time, vec_order = _time(vectorized, metric, features)
+                if size <= args.reference_max:
+                    ref_time, ref_order = _time(reference, metric, features)
+                    ref_str = f"{ref_time:>15.2f}"
+                    speedup = f"{ref_time / vec_time:>9.1f}"
+                    match = f"{str(ref_order == vec_order):>7}"
+                else:
+                    ref_str, speedup, match = f"{'-':>15}", f"{'-':>9}", f"{'-':>7}"
+                print(f"{name + method:>20}{size:>8}{ref_str}{vec_time:>16.2f}{speedup}{match}")
+
+            features = _get_group_features(metric, size)
+            ref_time = ref_labels = None
+            if size <= args.reference_max:
+                ref_time, ref_labels = _time(_reference_group, metric, features)
+            for linkage in ("centroid", "average"):
+                start = perf_counter()
+                vec_labels = _vectorized_group(metric, features, linkage)
+                vec_time = perf_counter() - start
+                if ref_time is not None:
+                    ref_str = f"{ref_time:>15.2f}"
+                    speedup = f"{ref_time / vec_time:>9.1f}"
+                    match = f"{str(ref_labels == vec_labels):>7}"
+                else:
+                    ref_str, speedup, match = f"{'-':>15}", f"{'-':>9}", f"{'-':>7}"
+                print(f"{name + '-group-' + linkage:>20}{size:>8}{ref_str}{vec_time:>16.2f}"
+                      f"{speedup}{match}")
+
+
+if __name__ == "__main__":
+    main()
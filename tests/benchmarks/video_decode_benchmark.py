@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+""" Benchmark for parallel video decoding.
+
+Generates a long group of pictures test clip and times loading every frame from it through
+:class:`lib.image.ImagesLoader` with a single decoder against loading it with multiple decoders
+(the `-vd`, `--video-decoders` option of extract and convert). The video's seek index is built
+prior to timing, so the one off scan of the video is not included.
+
+Parallel decoding can only be faster than a single decoder when decoding is the bottleneck and
+there are spare CPU cores for the additional ffmpeg processes, so results depend heavily on the
+machine that the benchmark is run on.
+
+Usage::
+
+    python -m tests.benchmarks.video_decode_benchmark [-s SIZE] [-f FRAMES] [-g GOP]
+                                                      [-d DECODERS [DECODERS ...]]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+from time import perf_counter
+
+import imageio_ffmpeg as im_ffm
+
+from lib.image import ImagesLoader, VideoReader
+
+
+def _make_video(filename: str, size: str, frames: int, gop: int) -> None:
+    """ Generate an h264 test clip with a fixed key frame interval.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to save the video to
+    size: str
+        The `<width>x<height>` dimensions of the video
+    frames: int
+        The number of frames to generate
+    gop: int
+        The number of frames between key frames
+    """
+    subprocess.run([im_ffm.get_ffmpeg_exe(), "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25",
+                    "-frames:v", str(frames),
+                    "-c:v", "libx264", "-g", str(gop), "-keyint_min", str(gop),
+                    "-sc_threshold", "0", "-pix_fmt", "yuv420p", filename],
+                   check=True)
+
+
+def _time_load(filename: str, decoders: int, video_meta_data: dict) -> float:
+    """ Time loading every frame of a video.
+
+    Parameters
+    ----------
+    filename: str
+        The full path to the video
+    decoders: int
+        The number of decoders to load the video with
+    video_meta_data: dict
+        The video's seek index
+
+    Returns
+    -------
+    float
+        The number of frames loaded per second
+    """
+    loader = ImagesLoader(filename, video_meta_data=dict(video_meta_data), decoders=decoders)
+    start = perf_counter()
+    count = sum(1 for _ in loader.load())
+    elapsed = perf_counter() - start
+    assert count == len(video_meta_data["pts_time"])
+    return count / elapsed
+
+
+def main() -> None:
+    """ Run the benchmark and print the results """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--size", type=str, default="1920x1080")
+    parser.add_argument("-f", "--frames", type=int, default=1000)
+    parser.add_argument("-g", "--gop", type=int, default=250)
+    parser.add_argument("-d", "--decoders", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "video.mp4")
+        _make_video(filename, args.size, args.frames, args.gop)
+        reader = VideoReader(filename)
+        video_meta_data = reader.build_index()
+        reader.close()
+        print(f"{args.size}, {args.frames} frames, key frame every {args.gop} frames, "
+              f"{os.cpu_count()} CPUs")
+
+        print(f"{'decoders':>9}{'fps':>9}{'speedup':>9}")
+        baseline = _time_load(filename, 1, video_meta_data)
+        print(f"{1:>9}{baseline:>9.1f}{1.0:>9.2f}")
+        for decoders in args.decoders:
+            fps = _time_load(filename, decoders, video_meta_data)
+            print(f"{decoders:>9}{fps:>9.1f}{fps / baseline:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
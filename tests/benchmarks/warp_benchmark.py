@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+""" Micro-benchmark for the random warp augmentation.
+
+Compares the original per-map :func:`cv2.resize` and allocating :func:`cv2.remap` implementation
+against the vectorized, buffer re-using implementation in
+:class:`lib.training.augmentation.ImageAugmentation`.
+
+Usage::
+
+    python -m tests.benchmarks.warp_benchmark [-i ITERATIONS]
+"""
+import argparse
+import timeit
+
+import cv2
+import numexpr as ne
+import numpy as np
+
+from lib.training.augmentation import ImageAugmentation
+
+_SIZES = (64, 128, 256)
+_BATCH_SIZES = (16, 32, 64, 128, 256)
+
+
+def _reference_warp(augmenter: ImageAugmentation,
+                    batch: np.ndarray,
+                    rands: np.ndarray) -> np.ndarray:
+    """ The original random warp implementation, for comparison.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to take the constants from
+    batch: :class:`numpy.ndarray`
+        The batch of images to warp
+    rands: :class:`numpy.ndarray`
+        The random offsets to apply to the warp control grids
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The warped batch
+    """
+    size = batch.shape[1]
+    pad = int(1.25 * size)
+    slices = slice(pad // 10, -pad // 10)
+    # pylint:disable=protected-access
+    batch_maps = ne.evaluate("m + r", local_dict=dict(m=augmenter._constants.warp_maps, r=rands))
+    batch_interp = np.array([[cv2.resize(map_, (pad, pad))[slices, slices] for map_ in maps]
+                             for maps in batch_maps])
+    return np.array([cv2.remap(image, interp[0], interp[1], cv2.INTER_LINEAR)
+                     for image, interp in zip(batch, batch_interp)])
+
+
+def _vectorized_warp(augmenter: ImageAugmentation,
+                     batch: np.ndarray,
+                     out: np.ndarray) -> np.ndarray:
+    """ The vectorized random warp implementation.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to perform the warp
+    batch: :class:`numpy.ndarray`
+        The batch of images to warp
+    out: :class:`numpy.ndarray`
+        The pre-allocated output buffer
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The warped batch
+    """
+    return augmenter.warp(batch, out=out)
+
+
+def _max_map_error(augmenter: ImageAugmentation, size: int, rands: np.ndarray) -> float:
+    """ Obtain the maximum difference between the randomly warped interpolation maps generated by
+    each method.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to take the constants from
+    size: int
+        The processing size
+    rands: :class:`numpy.ndarray`
+        The random offsets to apply to the warp control grids
+
+    Returns
+    -------
+    float
+        The maximum absolute difference, in pixels, between the two sets of maps
+    """
+    pad = int(1.25 * size)
+    slices = slice(pad // 10, -pad // 10)
+    # pylint:disable=protected-access
+    batch_maps = augmenter._constants.warp_maps + rands
+    interp = augmenter._constants.warp_interpolation
+    reference = np.array([[cv2.resize(map_, (pad, pad))[slices, slices] for map_ in maps]
+                          for maps in batch_maps])
+    vectorized = interp @ batch_maps @ interp.T
+    return float(np.abs(reference - vectorized).max())
+
+
+def main() -> None:
+    """ Run the benchmark and print the results """
+    # pylint:disable=cell-var-from-loop
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'size':>6}{'batch':>7}{'reference (ms)':>16}{'vectorized (ms)':>17}"
+          f"{'speedup':>9}{'max map error':>15}")
+    for size in _SIZES:
+        for batch_size in _BATCH_SIZES:
+            augmenter = ImageAugmentation(batch_size, size, {})
+            batch = np.random.randint(0, 255, (batch_size, size, size, 3), dtype="uint8")
+            rands = np.random.normal(size=(batch_size, 2, 5, 5)).astype("float32")
+            out = np.empty_like(batch)
+
+            reference = timeit.timeit(lambda: _reference_warp(augmenter, batch, rands),
+                                      number=args.iterations) / args.iterations * 1000
+            vectorized = timeit.timeit(
+                lambda: _vectorized_warp(augmenter, batch, out),
+                number=args.iterations) / args.iterations * 1000
+            print(f"{size:>6}{batch_size:>7}{reference:>16.3f}{vectorized:>17.3f}"
+                  f"{reference / vectorized:>9.2f}{_max_map_error(augmenter, size, rands):>15.6f}")
+
+
+if __name__ == "__main__":
+    main()
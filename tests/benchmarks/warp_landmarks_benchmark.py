@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+""" Micro-benchmark for the warp to landmarks augmentation engines.
+
+Compares the time taken to warp a batch with the `griddata` and `piecewise_affine` engines of
+:class:`lib.training.augmentation.ImageAugmentation`, along with the difference between the
+interpolation maps that each engine generates.
+
+Usage::
+
+    python -m tests.benchmarks.warp_landmarks_benchmark [-i ITERATIONS]
+"""
+import argparse
+import timeit
+
+import numpy as np
+from scipy.interpolate import griddata
+
+from lib.align.aligned_face import _MEAN_FACE
+from lib.training.augmentation import ImageAugmentation
+
+_SIZES = (64, 128, 256)
+_BATCH_SIZES = (16, 64)
+_ENGINES = ("griddata", "piecewise_affine")
+
+
+def _get_landmarks(batch_size: int, size: int, rand: np.random.RandomState) -> np.ndarray:
+    """ Obtain a batch of plausible 68 point face landmarks, randomly perturbed from a mean face.
+
+    Parameters
+    ----------
+    batch_size: int
+        The number of faces to obtain landmarks for
+    size: int
+        The processing size
+    rand: :class:`numpy.random.RandomState`
+        The random state to perturb the landmarks with
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The batch of landmarks in the shape (`batch_size`, `68`, `2`)
+    """
+    jaw = np.stack([np.linspace(0.12, 0.88, 17),
+                    0.45 + 0.4 * np.sin(np.linspace(0, np.pi, 17))], axis=1)
+    mean_face = np.concatenate([jaw, _MEAN_FACE * 0.6 + 0.2]) * size
+    return mean_face[None] + rand.normal(scale=size / 64, size=(batch_size, 68, 2))
+
+
+def _map_error(augmenter: ImageAugmentation,
+               src_points: np.ndarray,
+               dst_points: np.ndarray) -> np.ndarray:
+    """ Obtain the difference between the interpolation maps of each engine for every point in
+    the batch.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to take the constants from
+    src_points: :class:`numpy.ndarray`
+        The source landmarks
+    dst_points: :class:`numpy.ndarray`
+        The destination landmarks
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The absolute difference, in pixels, between the maps for each grid point of each face
+    """
+    # pylint:disable=protected-access
+    keep = augmenter._get_landmark_warp_points(src_points, dst_points)
+    anchors = augmenter._constants.warp_lm_edge_anchors
+    grids = augmenter._constants.warp_lm_grids
+    batch_src = np.append(src_points, anchors, axis=1)
+    batch_dst = np.append(dst_points, anchors, axis=1)
+    reference = np.array([griddata(dst[mask], src[mask], (grids[0], grids[1]), method="linear")
+                          for src, dst, mask in zip(batch_src, batch_dst, keep)])
+    maps = augmenter._piecewise_affine_maps(batch_src, batch_dst, keep)
+    return np.abs(maps - reference).max(axis=-1)
+
+
+def main() -> None:
+    """ Run the benchmark and print the results """
+    # pylint:disable=cell-var-from-loop
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>6}{'batch':>7}{'griddata (ms)':>15}{'piecewise (ms)':>16}{'speedup':>9}"
+          f"{'max error (px)':>16}")
+    for size in _SIZES:
+        for batch_size in _BATCH_SIZES:
+            rand = np.random.RandomState(0)
+            batch = rand.randint(0, 255, (batch_size, size, size, 3)).astype("uint8")
+            src_points = _get_landmarks(batch_size, size, rand)
+            dst_points = _get_landmarks(batch_size, size, rand)
+            out = np.empty_like(batch)
+
+            times = {}
+            for engine in _ENGINES:
+                augmenter = ImageAugmentation(batch_size,
+                                              size,
+                                              dict(warp_landmarks_engine=engine))
+                times[engine] = timeit.timeit(
+                    lambda: augmenter.warp(batch,
+                                           to_landmarks=True,
+                                           out=out,
+                                           batch_src_points=src_points,
+                                           batch_dst_points=dst_points),
+                    number=args.iterations) / args.iterations * 1000
+
+            error = _map_error(augmenter, src_points, dst_points)
+            print(f"{size:>6}{batch_size:>7}{times['griddata']:>15.3f}"
+                  f"{times['piecewise_affine']:>16.3f}"
+                  f"{times['griddata'] / times['piecewise_affine']:>9.2f}"
+                  f"{error.max():>16.2e}")
+
+
+if __name__ == "__main__":
+    main()
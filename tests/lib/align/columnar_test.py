@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's columnar alignments storage. """
+import zlib
+
+import cv2
+import numpy as np
+
+from lib.align import Alignments
+from lib.align.columnar import ColumnarAlignmentsData, is_columnar_file
+from lib.serializer import get_serializer
+
+
+def _get_face(index, masks):
+    """ Generate a dummy face in the alignments file format.
+
+    Parameters
+    ----------
+    index: int
+        The index of the face, used to populate the bounding box
+    masks: tuple
+        The names of the masks to store for the face
+
+    Returns
+    -------
+    dict
+        The dummy face
+    """
+    mask = {name: dict(mask=zlib.compress(np.random.randint(0, 255, 64, dtype="uint8")),
+                       affine_matrix=np.random.rand(2, 3),
+                       interpolator=3,
+                       stored_size=128,
+                       stored_centering="face")
+            for name in masks}
+    return dict(x=index, w=128, y=-index, h=128,
+                landmarks_xy=np.random.rand(68, 2).astype("float32"),
+                mask=mask,
+                thumb=cv2.imencode(".jpg", np.random.randint(0, 255, (8, 8, 3), dtype="uint8"))[1])
+
+
+def _assert_equal(left, right):
+    """ Recursively assert that two alignments structures are identical, including types.
+
+    Parameters
+    ----------
+    left: object
+        The first alignments structure to compare
+    right: object
+        The second alignments structure to compare
+    """
+    assert type(left) is type(right)
+    if isinstance(left, dict):
+        assert list(left) == list(right)
+        for key, val in left.items():
+            _assert_equal(val, right[key])
+    elif isinstance(left, list):
+        assert len(left) == len(right)
+        for lval, rval in zip(left, right):
+            _assert_equal(lval, rval)
+    elif isinstance(left, np.ndarray):
+        assert left.dtype == right.dtype
+        np.testing.assert_array_equal(left, right)
+    else:
+        assert left == right
+
+
+def _get_alignments(folder):
+    """ Write a dummy standard alignments file to the given folder and load it.
+
+    Parameters
+    ----------
+    folder: str
+        The folder to write the alignments file to
+
+    Returns
+    -------
+    tuple
+        The loaded :class:`lib.align.Alignments` and the original alignments data
+    """
+    data = {}
+    for idx in range(20):
+        faces = [_get_face(idx, ("components", "extended")[:face_idx + 1])
+                 for face_idx in range(idx % 3)]
+        data[f"frame_{idx:04d}.png"] = dict(video_meta=dict(pts_time=idx / 25.,
+                                                            keyframe=idx % 5 == 0),
+                                            faces=faces)
+    data["frame_0004.png"]["faces"][0]["mask"] = {}
+    del data["frame_0007.png"]["faces"][0]["mask"]
+    data["frame_0005.png"]["faces"][0]["hash"] = "abc"
+    get_serializer("compressed").save(str(folder.join("alignments.fsa")),
+                                      dict(__meta__=dict(version=2.2), __data__=data))
+    return Alignments(str(folder), "alignments.fsa"), data
+
+
+def test_columnar_round_trip(tmpdir):
+    """ Test that alignments converted to columnar storage and back load identically and that
+    the columnar summaries match the standard summaries.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    alignments, data = _get_alignments(tmpdir)
+    summary = (alignments.faces_count, alignments.mask_summary, alignments.video_meta_data,
+               alignments.thumbnails.has_thumbnails, alignments.mask_is_valid("extended"))
+    alignments.storage = "columnar"
+    alignments.save()
+    assert is_columnar_file(alignments.file)
+
+    columnar = Alignments(str(tmpdir), "alignments.fsa")
+    assert columnar.storage == "columnar"
+    assert isinstance(columnar.data, ColumnarAlignmentsData)
+    assert (columnar.faces_count, columnar.mask_summary, columnar.video_meta_data,
+            columnar.thumbnails.has_thumbnails, columnar.mask_is_valid("extended")) == summary
+    _assert_equal(dict(columnar.data.items()), data)
+
+    columnar.storage = "standard"
+    columnar.save()
+    assert not is_columnar_file(columnar.file)
+    _assert_equal(Alignments(str(tmpdir), "alignments.fsa").data, data)
+
+
+def test_columnar_lazy_updates(tmpdir):
+    """ Test that only accessed frames are loaded from columnar storage and that changes made to
+    them are saved.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    alignments, data = _get_alignments(tmpdir)
+    alignments.storage = "columnar"
+    alignments.save()
+
+    columnar = Alignments(str(tmpdir), "alignments.fsa")
+    _assert_equal(columnar.get_faces_in_frame("frame_0002.png"), data["frame_0002.png"]["faces"])
+    assert not columnar.data._cache  # pylint:disable=protected-access
+
+    columnar.delete_face_at_index("frame_0002.png", 0)
+    columnar.add_face("new_frame.png", _get_face(99, ("components", )))
+    del columnar.data["frame_0001.png"]
+    count = columnar.faces_count
+    summary = columnar.mask_summary
+    assert count == sum(len(val["faces"]) for val in data.values()) - 1
+    columnar.backup()
+    columnar.save()
+
+    reloaded = Alignments(str(tmpdir), "alignments.fsa")
+    assert reloaded.faces_count == count
+    assert reloaded.mask_summary == summary
+    assert "frame_0001.png" not in reloaded.data
+    assert len(reloaded.get_faces_in_frame("frame_0002.png")) == 1
+    assert reloaded.get_faces_in_frame("new_frame.png")[0]["x"] == 99
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's alignments journal. """
+import os
+
+import numpy as np
+
+from lib.align import Alignments
+from lib.align.journal import AlignmentsJournal
+from lib.serializer import get_serializer
+
+
+def _get_frame(index):
+    """ Generate a dummy frame in the alignments file format.
+
+    Parameters
+    ----------
+    index: int
+        The index of the frame, used to populate the face's bounding box
+
+    Returns
+    -------
+    dict
+        The dummy frame
+    """
+    return dict(faces=[dict(x=index, w=64, y=index, h=64,
+                            landmarks_xy=np.random.rand(68, 2).astype("float32"),
+                            mask={},
+                            thumb=None)])
+
+
+def test_journal_recovery(tmpdir):
+    """ Test that frames written to a journal are recovered up to an incomplete final record and
+    are compacted into the alignments file.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    alignments_file = str(tmpdir.join("alignments.fsa"))
+    get_serializer("compressed").save(alignments_file,
+                                      dict(__meta__=dict(version=2.2),
+                                           __data__={"frame_0.png": _get_frame(0)}))
+    journal = AlignmentsJournal(alignments_file)
+    frames = {f"frame_{idx}.png": _get_frame(idx) for idx in range(1, 5)}
+    for frame_name, frame in frames.items():
+        journal.append(frame_name, frame)
+    journal.sync()
+    with open(journal.filename, "ab") as out_file:  # Simulate an interrupted write
+        out_file.write(b"\xff\x00\x00\x00\x00")
+
+    recovered = list(journal.read())
+    assert [frame_name for frame_name, _ in recovered] == list(frames)
+    np.testing.assert_array_equal(recovered[-1][1]["faces"][0]["landmarks_xy"],
+                                  frames["frame_4.png"]["faces"][0]["landmarks_xy"])
+
+    alignments = Alignments(str(tmpdir), "alignments.fsa")
+    assert alignments.open_journal() == len(frames)
+    assert not os.path.exists(journal.filename)
+
+    alignments.data["frame_5.png"] = _get_frame(5)
+    alignments.journal_frame("frame_5.png")
+    assert os.path.exists(journal.filename)
+
+    reloaded = Alignments(str(tmpdir), "alignments.fsa")
+    assert sorted(reloaded.data) == [f"frame_{idx}.png" for idx in range(5)]
+    assert reloaded.open_journal() == 1
+    assert reloaded.frames_count == 6
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's faceset manifest. """
+import os
+
+import cv2
+import numpy as np
+
+from lib.align import FacesetManifest
+from lib.image import png_write_meta
+
+
+def _write_face(folder, filename, face_index, masks=("components", )):
+    """ Write a dummy face with a Faceswap PNG header to the given folder.
+
+    Parameters
+    ----------
+    folder: str
+        The folder to write the face to
+    filename: str
+        The file name of the face
+    face_index: int
+        The face index to store in the header
+    masks: tuple, optional
+        The names of the masks to store in the header. Default: `("components", )`
+    """
+    landmarks = np.random.rand(68, 2).astype("float32") * 256
+    meta = dict(alignments=dict(x=1, y=2, w=256, h=256,
+                                landmarks_xy=landmarks.tolist(),
+                                mask={name: dict(mask=b"\0", affine_matrix=[[1., 0., 0.],
+                                                                            [0., 1., 0.]],
+                                                 interpolator=3,
+                                                 stored_size=128,
+                                                 stored_centering="face")
+                                      for name in masks}),
+                source=dict(alignments_version=2.2,
+                            original_filename=filename,
+                            face_index=face_index,
+                            source_filename="frame.png",
+                            source_is_video=False))
+    png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype="uint8"))[1].tobytes()
+    with open(os.path.join(folder, filename), "wb") as out_file:
+        out_file.write(png_write_meta(png, meta))
+
+
+def test_manifest(tmp_path):
+    """ Test that the manifest holds the header information for a folder and is incrementally
+    updated when faces are added, changed or removed.
+
+    Parameters
+    ----------
+    tmp_path: :class:`pathlib.Path`
+        pytest temporary folder fixture
+    """
+    folder = str(tmp_path)
+    for idx in range(3):
+        _write_face(folder, f"face_{idx}.png", idx)
+    with open(os.path.join(folder, "not_a_face.png"), "wb") as out_file:
+        out_file.write(cv2.imencode(".png", np.zeros((8, 8, 3), dtype="uint8"))[1].tobytes())
+
+    manifest = FacesetManifest(folder)
+    assert manifest.filenames == ["face_0.png", "face_1.png", "face_2.png", "not_a_face.png"]
+    assert manifest.get_metadata("not_a_face.png") is None
+    meta = manifest.get_metadata(os.path.join(folder, "face_1.png"))
+    assert meta is not None
+    assert meta["source"]["face_index"] == 1
+    assert meta["alignments"]["landmarks_xy"].shape == (68, 2)
+    assert meta["alignments"]["mask"] == {}
+    assert manifest.get_mask_names("face_1.png") == ["components"]
+    assert manifest.get_pose("face_1.png") is not None
+
+    os.remove(os.path.join(folder, "face_0.png"))
+    _write_face(folder, "face_3.png", 3)
+    _write_face(folder, "face_2.png", 2, masks=("components", "extended"))
+    os.utime(os.path.join(folder, "face_2.png"), ns=(0, 0))
+
+    manifest = FacesetManifest(folder)
+    assert manifest.filenames == ["face_1.png", "face_2.png", "face_3.png", "not_a_face.png"]
+    assert "face_0.png" not in manifest
+    assert manifest.get_source("face_3.png")["face_index"] == 3
+    assert manifest.get_mask_names("face_2.png") == ["components", "extended"]
+
+
+def test_manifest_scores(tmp_path):
+    """ Test that stored scores persist and are discarded when a face is changed.
+
+    Parameters
+    ----------
+    tmp_path: :class:`pathlib.Path`
+        pytest temporary folder fixture
+    """
+    folder = str(tmp_path)
+    for idx in range(3):
+        _write_face(folder, f"face_{idx}.png", idx)
+
+    manifest = FacesetManifest(folder)
+    assert manifest.get_scores("blur", ["face_0.png"]) == [None]
+    manifest.set_scores("blur", {os.path.join(folder, f"face_{idx}.png"): float(idx)
+                                 for idx in range(3)})
+
+    _write_face(folder, "face_1.png", 1)
+    os.utime(os.path.join(folder, "face_1.png"), ns=(0, 0))
+    manifest = FacesetManifest(folder)
+    assert manifest.get_scores("blur", ["face_0.png", "face_1.png", "face_2.png"]) == [0.0,
+                                                                                       None,
+                                                                                       2.0]
+    assert manifest.get_scores("hist", ["face_0.png"]) == [None]
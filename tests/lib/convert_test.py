@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's converter. """
+import os
+import sys
+import time
+from argparse import Namespace
+from dataclasses import dataclass, field
+from typing import List
+
+import cv2
+import numpy as np
+import pytest
+
+from lib.align import AlignedFace, DetectedFace
+from lib.align.aligned_face import _MEAN_FACE
+from lib.convert import Converter, PatchPool
+from lib.multithreading import has_process_support
+from plugins.extract.pipeline import ExtractMedia
+
+
+@dataclass
+class _Item:
+    """ Stand in for :class:`scripts.convert.ConvertItem` """
+    inbound: ExtractMedia
+    swapped_faces: np.ndarray
+    feed_faces: List = field(default_factory=list)
+    reference_faces: List = field(default_factory=list)
+
+
+class _Converter():
+    """ Stand in for :class:`lib.convert.Converter` which "patches" a frame by adding the sum of
+    the swapped faces and the worker's process id to it, taking longer for early frames so that
+    results complete out of order. """
+    cli_arguments = Namespace(output_scale=100)
+    output_size = 8
+
+    @classmethod
+    def patch(cls, item):
+        """ Patch the item """
+        time.sleep(0.05 if int(item.inbound.filename) < 4 else 0.0)
+        retval = item.inbound.image.astype("int32") + int(item.swapped_faces.sum())
+        return np.stack([retval, np.full_like(retval, os.getpid())])
+
+
+class _Queue(list):
+    """ Stand in for :class:`lib.queue_manager.EventQueue` """
+    def get(self):
+        """ Get from the queue """
+        return self.pop(0)
+
+    def put(self, item):
+        """ Put to the queue """
+        self.append(item)
+
+
+@pytest.mark.skipif(not has_process_support(), reason="Process based patching not supported")
+def test_patch_pool():
+    """ Test that the patch pool patches frames in multiple processes, from shared memory and
+    through the task queue, and returns them in order """
+    in_queue = _Queue()
+    expected = []
+    for idx in range(16):
+        image = np.random.randint(0, 255, (12, 16, 3), dtype="uint8")
+        # Frames with a large number of faces do not fit into a shared memory slot
+        faces = np.ones((1 if idx % 5 else 9, 8, 8, 4), dtype="float32")
+        in_queue.append(_Item(ExtractMedia(str(idx), image), faces))
+        expected.append(image.astype("int32") + int(faces.sum()))
+    in_queue.append("EOF")
+
+    out_queue = _Queue()
+    PatchPool(_Converter(), 4).process(in_queue, out_queue)
+
+    assert [filename for filename, _ in out_queue] == [str(idx) for idx in range(16)]
+    for (_, output), image in zip(out_queue, expected):
+        np.testing.assert_array_equal(output[0], image)
+    assert len(set(int(output[1, 0, 0, 0]) for _, output in out_queue) - {os.getpid()}) > 1
+
+
+def _get_landmarks(left, top, size, angle):
+    """ Generate 68 point landmarks for a face at the given location.
+
+    Parameters
+    ----------
+    left: int
+        The left location of the face in the frame
+    top: int
+        The top location of the face in the frame
+    size: int
+        The size of the face in pixels
+    angle: float
+        The rotation of the face, in degrees
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The (68, 2) landmarks for the face
+    """
+    jaw = np.linspace(np.pi, 0, 17)
+    points = np.concatenate([np.stack([0.5 + 0.55 * np.cos(jaw), 0.4 + 0.6 * np.sin(jaw)], 1),
+                             _MEAN_FACE])
+    rotation = cv2.getRotationMatrix2D((0.5, 0.5), angle, 1.0)
+    points = np.concatenate([points, np.ones((68, 1))], 1) @ rotation.T
+    return (points * size + (left, top)).astype("float32")
+
+
+@pytest.mark.parametrize("faces", [((40, 30, 50, 0), ),
+                                   ((10, 20, 60, 15), (40, 30, 50, -10)),
+                                   ((-20, 50, 70, 30), (100, 10, 40, 0))],
+                         ids=["single", "overlapping", "frame-edge"])
+def test_region_patching(faces, tmpdir, monkeypatch):
+    """ Test that patching the swapped faces within the face regions of a frame matches the
+    output from patching the full frame and leaves the source frame unchanged.
+
+    Parameters
+    ----------
+    faces: tuple
+        The (`left`, `top`, `size`, `angle`) of each face to patch
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        Monkey patching for locating the plugin configuration and forcing the full frame patching
+        path
+    """
+    # Plugin configuration defaults are located relative to the launched script
+    monkeypatch.setattr(sys, "argv", [os.path.join(os.path.dirname(__file__),
+                                                   os.pardir, os.pardir, "faceswap.py")])
+    configfile = str(tmpdir.join("convert.ini"))
+    open(configfile, "w").close()  # pylint:disable=consider-using-with
+    converter = Converter(64, 0.875, "face", False, None,
+                          Namespace(output_scale=100, mask_type="predicted",
+                                    color_adjustment="none"),
+                          configfile=configfile)
+    image = np.random.randint(0, 255, (120, 160, 3), dtype="uint8")
+    detected_faces = [DetectedFace(landmarks_xy=_get_landmarks(*face)) for face in faces]
+    swapped_faces = np.array([cv2.resize(np.random.rand(4, 4, 4).astype("float32"), (64, 64))
+                              for _ in faces])
+    swapped_faces[:, :4, :, 3] = swapped_faces[:, -4:, :, 3] = 0.0  # Predicted masks fade out
+    swapped_faces[:, :, :4, 3] = swapped_faces[:, :, -4:, 3] = 0.0  # at the face edges
+    item = _Item(ExtractMedia("0", image, detected_faces=detected_faces),
+                 swapped_faces,
+                 reference_faces=[AlignedFace(face.landmarks_xy,
+                                              image=image,
+                                              centering="face",
+                                              size=64,
+                                              coverage_ratio=0.875,
+                                              dtype="float32")
+                                  for face in detected_faces])
+    source = image.copy()
+
+    patched = converter.patch(item)
+    monkeypatch.setattr(Converter, "_roi_compatible", False)
+    expected = converter.patch(item)
+
+    np.testing.assert_array_equal(image, source)
+    assert not np.array_equal(patched, source)
+    # Moving the warp origin changes OpenCV's fixed point rounding of sample locations
+    np.testing.assert_allclose(patched, expected, rtol=0, atol=1)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's image utilities. """
+
+import os
+import subprocess
+import threading
+import time
+import zlib
+
+import cv2
+import imageio
+import imageio_ffmpeg as im_ffm
+import numpy as np
+import pytest
+
+from lib.image import (encode_png_meta, ImagesLoader, png_read_meta, png_write_meta,
+                       VideoReader)
+
+
+_META = dict(alignments=dict(x=1, w=256, y=-3, h=256,
+                             landmarks_xy=np.random.rand(68, 2).astype("float32").tolist(),
+                             mask=dict(components=dict(mask=zlib.compress(b"\0" * 1024),
+                                                       affine_matrix=[[1.1, 0.0, 2.0],
+                                                                      [0.0, 1.1, 2.0]],
+                                                       interpolator=3,
+                                                       stored_size=128,
+                                                       stored_centering="face"))),
+             source=dict(alignments_version=2.2,
+                         original_filename="frame_0.png",
+                         face_index=0,
+                         source_filename="frame.png",
+                         source_is_video=False,
+                         source_frame_dims=(720, 1280),
+                         unicode="fäcé",
+                         mixed=[1, 2.5, None, "a"],
+                         empty=[]))
+
+
+@pytest.mark.parametrize("legacy", [False, True], ids=["binary", "legacy"])
+def test_png_meta_round_trip(legacy):
+    """ Test that PNG header metadata written in either format reads back unchanged.
+
+    Parameters
+    ----------
+    legacy: bool
+        ``True`` to write the header in the legacy text format, ``False`` for the binary format
+    """
+    png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype="uint8"))[1].tobytes()
+    meta = str(_META).encode("utf-8") if legacy else _META
+    retval = png_read_meta(png_write_meta(png, meta))
+    assert retval == _META
+    assert isinstance(retval["source"]["source_frame_dims"], tuple)
+    assert isinstance(retval["alignments"]["x"], int)
+
+
+def test_png_meta_unsupported_version():
+    """ Test that a binary header from a newer version of Faceswap raises an error """
+    png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype="uint8"))[1].tobytes()
+    meta = bytearray(encode_png_meta(_META))
+    meta[4] = 255
+    with pytest.raises(ValueError):
+        png_read_meta(png_write_meta(png, bytes(meta)))
+
+
+def _make_video(tmpdir):
+    """ Generate a 60 frame test video with a key frame every 12 frames.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+
+    Returns
+    -------
+    str
+        The full path to the generated video
+    """
+    filename = str(tmpdir.join("video.mp4"))
+    subprocess.run([im_ffm.get_ffmpeg_exe(), "-loglevel", "error",
+                    "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25",
+                    "-frames:v", "60", "-g", "12", "-pix_fmt", "yuv420p", filename],
+                   check=True)
+    return filename
+
+
+def test_video_reader(tmpdir):
+    """ Test that the direct ffmpeg video reader returns the same BGR frames as imageio, collects
+    the same seek index as a video scan and returns the correct frames when seeking.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    filename = _make_video(tmpdir)
+    expected = [np.ascontiguousarray(frame[..., ::-1])
+                for frame in imageio.get_reader(filename, "ffmpeg")]
+    scan = imageio.get_reader(filename, "ffmpeg").get_frame_info()[1]
+
+    reader = VideoReader(filename)
+    frames = [(idx, frame) for idx, frame in reader.read()]
+    assert [idx for idx, _ in frames] == list(range(len(expected)))
+    for (_, frame), image in zip(frames, expected):
+        assert frame.flags.c_contiguous
+        np.testing.assert_array_equal(frame, image)
+    assert reader.video_meta_data == scan
+    reader.close()
+
+    reader = VideoReader(filename, ring_size=2, video_meta_data=scan)
+    for idx in (30, 31, 59, 5, 13, 12, 0):
+        np.testing.assert_array_equal(reader.get_frame(idx), expected[idx])
+    for idx, frame in reader.read(start=22, stop=27):
+        np.testing.assert_array_equal(frame, expected[idx])
+    with pytest.raises(IndexError):
+        reader.get_frame(len(expected))
+    reader.close()
+
+
+def test_video_reader_variable_frame_rate(tmpdir):
+    """ Test that the direct ffmpeg video reader returns the same number of frames, and the same
+    frames, as imageio for a variable frame rate video, so that frame names match existing
+    alignments.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    filename = str(tmpdir.join("vfr.mp4"))
+    # A half second gap after frame 20 and jitter on every 7th frame
+    timestamps = r"setpts=PTS+if(gte(N\,20)\,0.5/TB\,0)+if(eq(mod(N\,7)\,3)\,0.03/TB\,0)"
+    subprocess.run([im_ffm.get_ffmpeg_exe(), "-loglevel", "error",
+                    "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25",
+                    "-frames:v", "60", "-g", "12", "-pix_fmt", "yuv420p",
+                    "-vf", timestamps, "-fps_mode", "vfr", filename],
+                   check=True)
+    expected = [np.ascontiguousarray(frame[..., ::-1])
+                for frame in imageio.get_reader(filename, "ffmpeg")]
+
+    reader = VideoReader(filename)
+    frames = [frame.copy() for _, frame in reader.read()]
+    reader.close()
+    assert len(frames) == len(expected)
+    for frame, image in zip(frames, expected):
+        np.testing.assert_array_equal(frame, image)
+
+
+def test_segment_decoding(tmpdir):
+    """ Test that decoding a video in parallel segments returns the same frames, in the same order,
+    as decoding the video sequentially and honors the skip list.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    filename = _make_video(tmpdir)
+    skip_list = [0, 11, 12, 13, 40]
+    expected = list(ImagesLoader(filename, skip_list=skip_list).load())
+
+    loader = ImagesLoader(filename, skip_list=skip_list, decoders=3)
+    loader._buffer_mb = 0  # pylint:disable=protected-access  # Single frame segments
+    frames = list(loader.load())
+
+    assert [fname for fname, _ in frames] == [fname for fname, _ in expected]
+    for (_, frame), (_, image) in zip(frames, expected):
+        np.testing.assert_array_equal(frame, image)
+    assert loader.video_meta_data["keyframes"] == [0, 12, 24, 36, 48]
+
+
+@pytest.mark.parametrize("max_frames,expected", [
+    (30, [(0, 24), (24, 48), (48, None)]),
+    (5, [(0, 4), (4, 8), (8, 12), (12, 16), (16, 20), (20, 24), (24, 28), (28, 32), (32, 36),
+         (36, 40), (40, 44), (44, 48), (48, 52), (52, 56), (56, None)]),
+    (20, [(0, 12), (12, 24), (24, 36), (36, 48), (48, None)])])
+def test_get_segments(max_frames, expected):
+    """ Test that a video is split into segments of no more than the maximum number of frames,
+    merging short groups of pictures and splitting long groups of pictures evenly.
+
+    Parameters
+    ----------
+    max_frames: int
+        The maximum number of frames in a segment
+    expected: list
+        The expected (`start`, `stop`) frame indices of each segment
+    """
+    segments = ImagesLoader._get_segments([0, 12, 24, 36, 48],  # pylint:disable=protected-access
+                                          60,
+                                          max_frames)
+    assert segments == expected
+
+
+def test_segment_decoding_stopped_early(tmpdir):
+    """ Test that segment decoders blocked on full queues are released when the frames stop being
+    consumed before the end of the video.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    filename = _make_video(tmpdir)
+    loader = ImagesLoader(filename, decoders=3)
+    loader._buffer_mb = 0  # pylint:disable=protected-access  # Single frame segments
+    frames = loader._from_video_segments()  # pylint:disable=protected-access
+    next(frames)
+    time.sleep(1)  # Allow the decoders to fill their queues
+    assert [thread for thread in threading.enumerate()
+            if thread.name.startswith("ImagesLoader_decoder")]
+
+    frames.close()
+    assert not [thread for thread in threading.enumerate()
+                if thread.name.startswith("ImagesLoader_decoder")]
+
+
+@pytest.mark.parametrize("decoders", [1, 3])
+def test_frame_ranges(decoders, tmpdir):
+    """ Test that limiting a video or folder of images to frame ranges only returns frames that
+    fall within the ranges, less the skip list, in order.
+
+    Parameters
+    ----------
+    decoders: int
+        The number of video decoders to use
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    """
+    filename = _make_video(tmpdir)
+    expected = list(ImagesLoader(filename).load())
+    ranges = [(30, 33), (5, 14), (13, 20), (57, 70)]
+    indices = [idx for idx in range(60) if (5 <= idx <= 20 or 30 <= idx <= 33 or idx >= 57)
+               and idx != 16]
+
+    loader = ImagesLoader(filename, fast_count=False, skip_list=[16], decoders=decoders)
+    loader._buffer_mb = 0  # pylint:disable=protected-access  # Single frame segments
+    loader.add_frame_ranges(ranges)
+    assert loader.process_count == len(indices)
+    frames = list(loader.load())
+    assert [fname for fname, _ in frames] == [expected[idx][0] for idx in indices]
+    for (_, frame), idx in zip(frames, indices):
+        np.testing.assert_array_equal(frame, expected[idx][1])
+
+    folder = tmpdir.mkdir("frames")
+    for fname, image in expected:
+        cv2.imwrite(str(folder.join(fname)), image)
+    loader = ImagesLoader(str(folder), skip_list=[16])
+    loader.add_frame_ranges(ranges)
+    assert [os.path.basename(fname) for fname, _ in loader.load()] == [expected[idx][0]
+                                                                        for idx in indices]
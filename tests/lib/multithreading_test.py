@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's multithreading/processing utilities. """
+
+import pytest
+import numpy as np
+
+from lib.multithreading import BackgroundProcessGenerator, has_process_support
+
+
+_SPECS = [((4, 8, 8, 3), "float32"), ((4, 2), "uint8")]
+
+
+def _generator(value):
+    """ Infinite generator yielding arrays matching :data:`_SPECS` filled with the given value
+    plus a random offset, so that per-worker seeding can be checked. """
+    while True:
+        yield [np.full(_SPECS[0][0], value, dtype="float32") + np.random.randint(0, 2 ** 24),
+               np.full(_SPECS[1][0], value, dtype="uint8")]
+
+
+def _failing_generator():
+    """ Generator that raises an error on first iteration. """
+    raise ValueError("test error")
+    yield  # pylint:disable=unreachable
+
+
+@pytest.mark.skipif(not has_process_support(), reason="Process generators not supported")
+@pytest.mark.parametrize("processes", [1, 3])
+def test_background_process_generator(processes):
+    """ Test that :class:`lib.multithreading.BackgroundProcessGenerator` returns arrays of the
+    requested specification through shared memory, and that each worker is seeded with the base
+    seed plus its index, so that each worker's output is repeatable.
+
+    Parameters
+    ----------
+    processes: int
+        The number of worker processes to launch
+    """
+    seed = 5
+    expected = []
+    for idx in range(processes):
+        np.random.seed(seed + idx)
+        expected.append(list(np.random.randint(0, 2 ** 24, size=6)))
+    positions = [0] * processes
+
+    batcher = BackgroundProcessGenerator(_generator,
+                                         _SPECS,
+                                         processes,
+                                         prefetch=2,
+                                         seed=seed,
+                                         args=(7, ))
+    iterator = batcher.iterator()
+    for _ in range(6):
+        arrays = next(iterator)
+        assert len(arrays) == len(_SPECS)
+        for array, (shape, dtype) in zip(arrays, _SPECS):
+            assert array.shape == shape
+            assert array.dtype == dtype
+        assert np.all(arrays[1] == 7)
+
+        offset = int(arrays[0][0, 0, 0, 0]) - 7
+        assert np.all(arrays[0] == offset + 7)
+        # Batches from different workers interleave, but each worker's stream must be in order
+        worker = [idx for idx in range(processes) if expected[idx][positions[idx]] == offset]
+        assert len(worker) == 1
+        positions[worker[0]] += 1
+    batcher.close()
+
+
+@pytest.mark.skipif(not has_process_support(), reason="Process generators not supported")
+def test_background_process_generator_error():
+    """ Test that errors within worker processes are raised in the calling process """
+    batcher = BackgroundProcessGenerator(_failing_generator, _SPECS, 1)
+    with pytest.raises(RuntimeError, match="test error"):
+        next(batcher.iterator())
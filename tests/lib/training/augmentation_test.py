@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's training image augmentation. """
+import cv2
+import numexpr as ne
+import numpy as np
+import pytest
+from scipy.interpolate import griddata
+
+from lib.align.aligned_face import _MEAN_FACE
+from lib.training.augmentation import ImageAugmentation
+
+_BATCH_SIZE = 4
+
+
+def _get_batch(size):
+    """ Obtain a batch of random images with no black pixels, so that borders can be detected.
+
+    Parameters
+    ----------
+    size: int
+        The pixel size of the images
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The batch of images
+    """
+    return np.random.randint(1, 256, (_BATCH_SIZE, size, size, 3), dtype="uint8")
+
+
+def _get_face_landmarks(size, rand):
+    """ Obtain a batch of plausible 68 point face landmarks, randomly perturbed from a mean face.
+
+    Parameters
+    ----------
+    size: int
+        The pixel size of the images
+    rand: :class:`numpy.random.RandomState`
+        The random state to perturb the landmarks with
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The batch of landmarks in the shape (`batchsize`, `68`, `2`)
+    """
+    jaw = np.stack([np.linspace(0.12, 0.88, 17),
+                    0.45 + 0.4 * np.sin(np.linspace(0, np.pi, 17))], axis=1)
+    mean_face = np.concatenate([jaw, _MEAN_FACE * 0.6 + 0.2]) * size
+    return mean_face[None] + rand.normal(scale=size / 64, size=(_BATCH_SIZE, 68, 2))
+
+
+def _reference_warp(augmenter, batch):
+    """ The original per-image random warp implementation.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to take the constants from
+    batch: :class:`numpy.ndarray`
+        The batch of images to warp
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The warped batch
+    """
+    # pylint:disable=protected-access
+    size = batch.shape[1]
+    pad = int(1.25 * size)
+    slices = slice(pad // 10, -pad // 10)
+    rands = np.random.normal(size=(_BATCH_SIZE, 2, 5, 5),
+                             scale=augmenter._warp_scale).astype("float32")
+    batch_maps = ne.evaluate("m + r", local_dict=dict(m=augmenter._constants.warp_maps, r=rands))
+    batch_interp = np.array([[cv2.resize(map_, (pad, pad))[slices, slices] for map_ in maps]
+                             for maps in batch_maps])
+    return np.array([cv2.remap(image, interp[0], interp[1], cv2.INTER_LINEAR)
+                     for image, interp in zip(batch, batch_interp)])
+
+
+def _reference_warp_landmarks(augmenter, batch, batch_src_points, batch_dst_points):
+    """ The original per-image warp to landmarks implementation.
+
+    Parameters
+    ----------
+    augmenter: :class:`lib.training.augmentation.ImageAugmentation`
+        The augmenter to take the constants from
+    batch: :class:`numpy.ndarray`
+        The batch of images to warp
+    batch_src_points: :class:`numpy.ndarray`
+        The source landmarks
+    batch_dst_points: :class:`numpy.ndarray`
+        The destination landmarks
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The warped batch
+    """
+    # pylint:disable=protected-access
+    edge_anchors = augmenter._constants.warp_lm_edge_anchors
+    grids = augmenter._constants.warp_lm_grids
+    batch_dst = (batch_dst_points + np.random.normal(size=batch_dst_points.shape,
+                                                     scale=augmenter._warp_lm_scale))
+    face_cores = [cv2.convexHull(np.concatenate([src[17:], dst[17:]], axis=0))
+                  for src, dst in zip(batch_src_points.astype("int32"),
+                                      batch_dst.astype("int32"))]
+    batch_src = np.append(batch_src_points, edge_anchors, axis=1)
+    batch_dst = np.append(batch_dst, edge_anchors, axis=1)
+
+    rem_indices = [list(set(idx for fpl in (src, dst)
+                            for idx, (pty, ptx) in enumerate(fpl)
+                            if cv2.pointPolygonTest(face_core, (pty, ptx), False) >= 0))
+                   for src, dst, face_core in zip(batch_src[:, :18, :],
+                                                  batch_dst[:, :18, :],
+                                                  face_cores)]
+    lbatch_src = [np.delete(src, idxs, axis=0) for idxs, src in zip(rem_indices, batch_src)]
+    lbatch_dst = [np.delete(dst, idxs, axis=0) for idxs, dst in zip(rem_indices, batch_dst)]
+
+    grid_z = np.array([griddata(dst, src, (grids[0], grids[1]), method="linear")
+                       for src, dst in zip(lbatch_src, lbatch_dst)])
+    maps = grid_z.reshape(batch.shape[:3] + (2, )).astype("float32")
+    return np.array([cv2.remap(image, map_[..., 1], map_[..., 0], cv2.INTER_LINEAR)
+                     for image, map_ in zip(batch, maps)])
+
+
+@pytest.mark.parametrize("size", [64, 128])
+def test_random_warp(size):
+    """ Test that the vectorized random warp matches the original per-image implementation for a
+    fixed seed, including black borders, when writing into a re-used buffer holding stale data.
+
+    Parameters
+    ----------
+    size: int
+        The processing size
+    """
+    augmenter = ImageAugmentation(_BATCH_SIZE, size, {})
+    batch = _get_batch(size)
+
+    np.random.seed(0)
+    reference = _reference_warp(augmenter, batch)
+    np.random.seed(0)
+    out = np.full_like(batch, 7)
+    warped = augmenter.warp(batch, out=out)
+
+    assert warped is out
+    border = np.all(reference == 0, axis=-1)
+    assert np.any(border)
+    assert np.all(warped[border] == 0)
+    # Bi-linear weights are quantized by remap, so the small map differences can move a pixel
+    assert np.abs(warped.astype("int32") - reference).max() <= 8
+    assert np.mean(warped == reference) > 0.99
+
+
+def test_random_warp_landmarks():
+    """ Test that the vectorized warp to landmarks matches the original per-image implementation
+    for a fixed seed, including black borders, when writing into a re-used buffer holding stale
+    data. """
+    size = 64
+    augmenter = ImageAugmentation(_BATCH_SIZE, size, dict(warp_landmarks_engine="griddata"))
+    batch = _get_batch(size)
+    rand = np.random.RandomState(1)
+    dst_points = rand.uniform(8, size - 8, (_BATCH_SIZE, 68, 2))
+    # Shift the source landmarks so that part of each map falls outside of the source image
+    src_points = dst_points + rand.uniform(-size / 4, size / 4, (_BATCH_SIZE, 1, 2))
+
+    np.random.seed(0)
+    reference = _reference_warp_landmarks(augmenter, batch, src_points, dst_points)
+    np.random.seed(0)
+    out = np.full_like(batch, 7)
+    warped = augmenter.warp(batch,
+                            to_landmarks=True,
+                            out=out,
+                            batch_src_points=src_points,
+                            batch_dst_points=dst_points)
+
+    assert warped is out
+    assert np.any(np.all(reference == 0, axis=-1))
+    np.testing.assert_array_equal(warped, reference)
+
+
+@pytest.mark.parametrize("size", [64, 97, 128])
+def test_piecewise_affine_maps(size):
+    """ Test that the piecewise affine warp to landmarks engine matches griddata at every grid
+    point, for plausible faces and for randomly scattered landmarks which fall on and outside of
+    the grid.
+
+    Parameters
+    ----------
+    size: int
+        The processing size
+    """
+    # pylint:disable=protected-access
+    augmenter = ImageAugmentation(_BATCH_SIZE, size, {})
+    anchors = augmenter._constants.warp_lm_edge_anchors
+    grids = augmenter._constants.warp_lm_grids
+    rand = np.random.RandomState(0)
+    scattered = np.round(rand.uniform(-8, size + 8, (_BATCH_SIZE, 68, 2)))
+
+    for src_points, dst_points in ((_get_face_landmarks(size, rand),
+                                    _get_face_landmarks(size, rand)),
+                                   (scattered + rand.normal(scale=2, size=scattered.shape),
+                                    scattered)):
+        keep = augmenter._get_landmark_warp_points(src_points, dst_points)
+        batch_src = np.append(src_points, anchors, axis=1)
+        batch_dst = np.append(dst_points, anchors, axis=1)
+        reference = np.array([griddata(dst[mask], src[mask], (grids[0], grids[1]), method="linear")
+                              for src, dst, mask in zip(batch_src, batch_dst, keep)])
+
+        maps = augmenter._piecewise_affine_maps(batch_src, batch_dst, keep)
+
+        assert not np.any(np.isnan(reference))
+        np.testing.assert_allclose(maps, reference, rtol=0, atol=1e-6)
+
+
+def test_piecewise_affine_warp_landmarks():
+    """ Test that warping to landmarks with the piecewise affine engine gives the same images as
+    the griddata engine for a fixed seed. """
+    size = 64
+    batch = _get_batch(size)
+    rand = np.random.RandomState(1)
+    src_points = _get_face_landmarks(size, rand)
+    dst_points = _get_face_landmarks(size, rand)
+    warped = []
+    for engine in ("griddata", "piecewise_affine"):
+        np.random.seed(0)
+        warped.append(ImageAugmentation(_BATCH_SIZE,
+                                        size,
+                                        dict(warp_landmarks_engine=engine)).warp(
+                                            batch,
+                                            to_landmarks=True,
+                                            batch_src_points=src_points,
+                                            batch_dst_points=dst_points))
+    np.testing.assert_array_equal(warped[1], warped[0])
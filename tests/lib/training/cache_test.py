@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's training data cache. """
+import os
+
+import numpy as np
+import pytest
+
+from lib.training.cache import LandmarkIndex
+from lib.training.generator import TrainingDataGenerator
+
+
+def _get_landmarks(prefix, count, seed):
+    """ Obtain random aligned landmarks.
+
+    Parameters
+    ----------
+    prefix: str
+        The prefix for each face's file name
+    count: int
+        The number of faces to generate landmarks for
+    seed: int
+        The seed for the random landmarks
+
+    Returns
+    -------
+    dict
+        The file name as key with the (68, 2) landmarks as value
+    """
+    rand = np.random.RandomState(seed)
+    return {f"{prefix}_{idx:04d}.png": rand.uniform(0, 256, (68, 2)).astype("float32")
+            for idx in range(count)}
+
+
+def _brute_force(points, indexed, count):
+    """ Obtain the closest matches by calculating every distance directly.
+
+    Parameters
+    ----------
+    points: :class:`numpy.ndarray`
+        The landmarks to query
+    indexed: :class:`numpy.ndarray`
+        The landmarks to search
+    count: int
+        The number of matches to return
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The indices of the closest matches for each query, closest first
+    """
+    dists = np.sum((points[:, None].astype("float64") - indexed[None]) ** 2, axis=(2, 3))
+    return np.argsort(dists, axis=1)[:, :count]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 4096])
+def test_landmark_index(chunk_size):
+    """ Test that the chunked landmark index returns the same matches, in the same order, as a
+    brute force distance calculation.
+
+    Parameters
+    ----------
+    chunk_size: int
+        The number of indexed faces to compare against at once
+    """
+    landmarks = _get_landmarks("b", 50, 0)
+    queries = np.array(list(_get_landmarks("a", 20, 1).values()))
+    index = LandmarkIndex(landmarks, chunk_size=chunk_size)
+    indexed = np.array([landmarks[key] for key in index.keys])
+
+    np.testing.assert_array_equal(index.query(queries), _brute_force(queries, indexed, 10))
+    assert index.query(queries, count=100).shape == (20, 50)
+
+
+class _Cache():  # pylint:disable=too-few-public-methods
+    """ Holds the landmark attributes of :class:`lib.training.cache._Cache` that are used for
+    caching closest matches.
+
+    Parameters
+    ----------
+    landmarks: dict
+        The file name as key with the aligned landmarks as value
+    """
+    def __init__(self, landmarks):
+        self.aligned_landmarks = landmarks
+        self.landmark_index = LandmarkIndex(landmarks)
+        self.size = 256
+
+
+def _get_matches(folder, src_landmarks, dst_landmarks):
+    """ Cache the closest matches for a training data generator.
+
+    Parameters
+    ----------
+    folder: str
+        The folder that holds this side's faces
+    src_landmarks: dict
+        The landmarks for this side
+    dst_landmarks: dict
+        The landmarks for the opposite side
+
+    Returns
+    -------
+    dict
+        The closest matched file names from the opposite side for each face on this side
+    """
+    # pylint:disable=protected-access
+    generator = TrainingDataGenerator.__new__(TrainingDataGenerator)
+    generator._face_cache = _Cache(src_landmarks)
+    generator._images = [os.path.join(folder, key) for key in src_landmarks]
+    generator._cache_closest_matches(_Cache(dst_landmarks))
+    return generator._nearest_landmarks
+
+
+def test_cache_closest_matches(tmpdir, monkeypatch):
+    """ Test that closest matches are saved, re-used while neither side's faces change, and
+    re-calculated when they do. """
+    folder = str(tmpdir)
+    src_landmarks = _get_landmarks("a", 30, 0)
+    dst_landmarks = _get_landmarks("b", 40, 1)
+
+    queries = []
+    query = LandmarkIndex.query
+
+    def _query(self, points, count=10):
+        """ Record calls to the landmark index query """
+        queries.append(len(points))
+        return query(self, points, count)
+
+    monkeypatch.setattr(LandmarkIndex, "query", _query)
+
+    matches = _get_matches(folder, src_landmarks, dst_landmarks)
+    assert queries == [30]
+    assert os.path.isfile(os.path.join(folder, ".fs_wtl_matches.npz"))
+    dst_keys = sorted(dst_landmarks)
+    expected = _brute_force(np.array([src_landmarks[key] for key in sorted(src_landmarks)]),
+                            np.array([dst_landmarks[key] for key in dst_keys]),
+                            10)
+    assert matches == {key: tuple(dst_keys[idx] for idx in row)
+                       for key, row in zip(sorted(src_landmarks), expected)}
+
+    # Unchanged faces re-use the saved matches
+    assert _get_matches(folder, src_landmarks, dst_landmarks) == matches
+    assert queries == [30]
+
+    # Changed faces on the opposite side invalidate the saved matches
+    dst_landmarks["b_0000.png"] = dst_landmarks["b_0000.png"] + 1.0
+    _get_matches(folder, src_landmarks, dst_landmarks)
+    assert queries == [30, 30]
+
+    # Changed faces on this side invalidate the saved matches
+    del src_landmarks["a_0000.png"]
+    assert len(_get_matches(folder, src_landmarks, dst_landmarks)) == 29
+    assert queries == [30, 30, 29]
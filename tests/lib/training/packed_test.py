@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's packed training faceset. """
+import os
+
+import numpy as np
+import pytest
+
+from lib.align import DetectedFace
+from lib.image import encode_image, read_image
+from lib.training.cache import _Cache
+from lib.training.packed import PackedFaceset
+
+
+def _write_face(folder, index):
+    """ Write a face image, holding the minimum Faceswap PNG header, to disk.
+
+    Parameters
+    ----------
+    folder: str
+        The folder to write the face to
+    index: int
+        The index of the face, used for the filename and to seed the image
+
+    Returns
+    -------
+    str
+        The full path to the written face
+    """
+    filename = os.path.join(folder, f"face_{index:03d}.png")
+    image = np.random.RandomState(index).randint(0, 256, (16, 16, 3), dtype="uint8")
+    with open(filename, "wb") as out_file:
+        out_file.write(encode_image(image,
+                                    ".png",
+                                    metadata=dict(alignments=dict(index=index),
+                                                  source=dict(alignments_version=2.3))
+                                    ).tobytes())
+    return filename
+
+
+@pytest.fixture(name="faces")
+def faces_fixture(tmp_path):
+    """ A folder of face images with Faceswap PNG headers """
+    return [_write_face(str(tmp_path), idx) for idx in range(10)]
+
+
+def _load(filenames, monkeypatch):
+    """ Load a packed faceset, recording whether the pack was rebuilt.
+
+    Parameters
+    ----------
+    filenames: list
+        The full paths to the faces to pack
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        The pytest monkeypatch fixture
+
+    Returns
+    -------
+    packed: :class:`lib.training.packed.PackedFaceset`
+        The loaded packed faceset
+    built: bool
+        ``True`` if the pack was built from the face images. ``False`` if it was loaded
+    """
+    built = []
+    build = PackedFaceset._build  # pylint:disable=protected-access
+
+    def _build(self):
+        """ Record that the pack is being built """
+        built.append(True)
+        build(self)
+
+    monkeypatch.setattr(PackedFaceset, "_build", _build)
+    return PackedFaceset(filenames), bool(built)
+
+
+def test_fingerprint(faces, monkeypatch):
+    """ Test that an unchanged pack is re-used and that adding, removing or touching a face
+    rebuilds it """
+    folder = os.path.dirname(faces[0])
+    assert _load(faces, monkeypatch)[1]
+    assert not _load(faces, monkeypatch)[1]
+
+    faces.append(_write_face(folder, 10))
+    packed, built = _load(faces, monkeypatch)
+    assert built and packed.contains(faces)
+    assert not _load(faces, monkeypatch)[1]
+
+    os.remove(faces.pop(0))
+    packed, built = _load(faces, monkeypatch)
+    assert built and len(packed.metadata) == 10
+    assert not _load(faces, monkeypatch)[1]
+
+    stat = os.stat(faces[3])
+    os.utime(faces[3], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _load(faces, monkeypatch)[1]
+    assert not _load(faces, monkeypatch)[1]
+
+
+def test_get_batch(faces, monkeypatch):
+    """ Test that batches read from the pack match the images read from each file, in the
+    requested order, and that the metadata is held for every face """
+    packed = _load(faces, monkeypatch)[0]
+    filenames = [faces[idx] for idx in (7, 2, 2, 9, 0)]
+
+    batch = packed.get_batch(filenames)
+
+    assert isinstance(batch, np.ndarray)
+    np.testing.assert_array_equal(batch, np.array([read_image(fname) for fname in filenames]))
+    assert not packed.contains(faces + [os.path.join(os.path.dirname(faces[0]), "other.png")])
+    assert [meta["alignments"] for meta in packed.metadata.values()] == [
+        dict(index=idx) for idx in range(len(faces))]
+
+
+def _get_compressed_masks(value):
+    """ Obtain compressed training masks from a detected face.
+
+    Parameters
+    ----------
+    value: int
+        The value to fill the masks with
+
+    Returns
+    -------
+    tuple
+        The compressed masks and their shape
+    """
+    face = DetectedFace()
+    face.store_training_masks([np.full((4, 4, 1), value, dtype="uint8"),
+                               np.full((4, 4, 1), value + 1, dtype="uint8")])
+    return face.compressed_training_masks
+
+
+def test_training_masks(faces, monkeypatch):
+    """ Test that compressed training masks are re-used for the same mask signature only, that
+    only the latest signature's masks are kept and that re-used masks can be given to a detected
+    face without being decompressed """
+    masks = {os.path.basename(fname): _get_compressed_masks(idx)
+             for idx, fname in enumerate(faces)}
+    masks["face_000.png"] = None
+    packed = _load(faces, monkeypatch)[0]
+    assert packed.get_training_masks("sig_a") is None
+
+    packed.store_training_masks("sig_a", masks)
+    packed = _load(faces, monkeypatch)[0]
+    loaded = packed.get_training_masks("sig_a")
+    assert loaded == masks
+    assert packed.get_training_masks("sig_b") is None
+
+    face = DetectedFace()
+    face.store_compressed_training_masks(loaded["face_003.png"])
+    assert face.compressed_training_masks is loaded["face_003.png"]
+    np.testing.assert_array_equal(face.get_training_masks(),
+                                  np.dstack([np.full((4, 4), 3), np.full((4, 4), 4)]))
+
+    packed.store_training_masks("sig_b", {"face_001.png": masks["face_001.png"]})
+    packed = _load(faces, monkeypatch)[0]
+    assert packed.get_training_masks("sig_a") is None
+    assert packed.get_training_masks("sig_b") == {"face_001.png": masks["face_001.png"]}
+
+
+def test_cache_training_masks(faces, monkeypatch):
+    """ Test that the training data cache generates training masks for a packed faceset once, and
+    then hands the compressed masks from the pack to each face without regenerating them """
+    # pylint:disable=protected-access
+    prepared = []
+
+    def _prepare_masks(self, filename, detected_face):
+        """ Record the face and store masks filled with the face's index """
+        prepared.append(os.path.basename(filename))
+        detected_face.store_training_masks([np.full((4, 4, 1), len(prepared), dtype="uint8")])
+
+    monkeypatch.setattr(_Cache, "_load_detected_face", lambda self, fname, meta: DetectedFace())
+    monkeypatch.setattr(_Cache, "_prepare_masks", _prepare_masks)
+    config = dict(centering="face", packed_faceset=True)
+
+    cache = _Cache(faces, config, 64, 1.0)
+    assert prepared == [os.path.basename(fname) for fname in faces]
+    stored = cache._packed.get_training_masks(cache._mask_signature())
+    assert all(stored[key] is face.compressed_training_masks
+               for key, face in cache._cache.items())
+
+    cache = _Cache(faces, config, 64, 1.0)
+    assert len(prepared) == len(faces)
+    for idx, fname in enumerate(faces):
+        face = cache._cache[os.path.basename(fname)]
+        assert isinstance(face.compressed_training_masks[0], bytes)
+        np.testing.assert_array_equal(face.get_training_masks(), np.full((4, 4, 1), idx + 1))
+
+    _Cache(faces, dict(config, mask_type="other"), 64, 1.0)
+    assert len(prepared) == len(faces) * 2
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's convert writer plugins. """
+import os
+import sys
+import time
+from queue import Queue
+from threading import Thread
+
+import numpy as np
+
+from plugins.convert.writer.gif import Writer
+
+
+def _get_writer(tmpdir, monkeypatch, total_count, reorder_frames):
+    """ Obtain a gif stream writer with the given reorder window.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        Monkey patching for locating the plugin configuration
+    total_count: int
+        The total number of frames to be written
+    reorder_frames: int
+        The maximum number of frames to admit to the reorder cache
+
+    Returns
+    -------
+    :class:`plugins.convert.writer.gif.Writer`
+        The stream writer
+    """
+    # Plugin configuration defaults are located relative to the launched script
+    monkeypatch.setattr(sys, "argv", [os.path.join(os.path.dirname(__file__),
+                                                   os.pardir, os.pardir, os.pardir,
+                                                   "faceswap.py")])
+    configfile = str(tmpdir.join("convert.ini"))
+    open(configfile, "w").close()  # pylint:disable=consider-using-with
+    writer = Writer(str(tmpdir), total_count, None, configfile=configfile)
+    writer.config["reorder_frames"] = reorder_frames
+    return writer
+
+
+def test_reorder_window(tmpdir, monkeypatch):
+    """ Test that a stream writer admits frames into the pipeline up to its reorder limit, blocks
+    until the next frame in sequence is written and returns frames in order.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        Monkey patching for locating the plugin configuration
+    """
+    writer = _get_writer(tmpdir, monkeypatch, 12, 4)
+    filenames = [f"frame_{idx:04d}.png" for idx in range(1, 13)]
+    image = np.zeros((4, 4, 3), dtype="uint8")
+
+    admitted = []
+    loader = Thread(target=lambda: [admitted.append(writer.reserve(fname, image.nbytes) or fname)
+                                    for fname in filenames], daemon=True)
+    loader.start()
+    time.sleep(0.2)
+    assert admitted == filenames[:4]
+
+    writer.skip_frame(filenames[2])
+    for fname in (filenames[1], filenames[3]):  # Frames complete before the first frame
+        writer.cache_frame(fname, image)
+    assert not list(writer.from_cache())
+    time.sleep(0.2)
+    assert len(admitted) == 5  # The skipped frame released its space
+
+    writer.cache_frame(filenames[0], image)
+    written = [frame_no for frame_no, _ in writer.from_cache()]
+    for fname in filenames[4:]:
+        while fname not in admitted:
+            time.sleep(0.01)
+        writer.cache_frame(fname, image)
+        written.extend(frame_no for frame_no, _ in writer.from_cache())
+    loader.join()
+
+    assert written == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    stats = writer.reorder_stats
+    assert stats["cache_depth"] == 0
+    assert stats["peak_depth"] == 3
+    assert stats["stalls"] >= 1 and stats["stall_time"] > 0.2
+
+
+def test_reorder_window_batching(tmpdir, monkeypatch):
+    """ Test that a small reorder window does not deadlock against a consumer which holds frames
+    until it has a full batch of faces, as the predictor does, by flushing the consumer whenever
+    the loader has to wait for space.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        Monkey patching for locating the plugin configuration
+    """
+    batchsize = 4
+    filenames = [f"frame_{idx:04d}.png" for idx in range(1, 33)]
+    # One face every batchsize frames, so a full batch holds batchsize ** 2 frames
+    faces = {fname: int(idx % batchsize == batchsize - 1) for idx, fname in enumerate(filenames)}
+    writer = _get_writer(tmpdir, monkeypatch, len(filenames), 2)
+    image = np.zeros((4, 4, 3), dtype="uint8")
+    queue: Queue = Queue()
+    flushes = []
+    written = []
+
+    def load():
+        for fname in filenames:
+            writer.reserve(fname, image.nbytes, on_stall=lambda: queue.put("FLUSH"))
+            queue.put(fname)
+        queue.put("EOF")
+
+    def predict():
+        batch = []
+        faces_seen = consecutive_no_faces = 0
+        while True:
+            item = queue.get()
+            if item == "FLUSH":
+                flushes.append(len(batch))
+            elif item != "EOF":
+                batch.append(item)
+                faces_seen += faces[item]
+                consecutive_no_faces = 0 if faces[item] else consecutive_no_faces + 1
+                if faces_seen < batchsize and consecutive_no_faces < batchsize:
+                    continue
+            for fname in batch:
+                writer.cache_frame(fname, image)
+                written.extend(frame_no for frame_no, _ in writer.from_cache())
+            if item == "EOF":
+                break
+            batch = []
+            faces_seen = consecutive_no_faces = 0
+
+    threads = [Thread(target=load, daemon=True), Thread(target=predict, daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+
+    assert written == list(range(1, len(filenames) + 1))
+    assert any(flushes)
+    assert writer.reorder_stats["peak_depth"] <= 2
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's extract plugin autotuner. """
+import os
+import sys
+
+from plugins.extract.autotune import PluginTuner, TuningCache
+
+
+def _run_tuner(tuner, predict_time, wait_time=0.0):
+    """ Feed simulated batch measurements to a tuner until it completes.
+
+    Parameters
+    ----------
+    tuner: :class:`plugins.extract.autotune.PluginTuner`
+        The tuner to run
+    predict_time: python function
+        Function taking the batch size and returning the time to predict a batch of that size
+    wait_time: float, optional
+        The time spent waiting for each batch. Default: `0.0`
+    """
+    for _ in range(1000):
+        if tuner.complete:
+            return
+        batchsize = tuner.batchsize
+        if batchsize > 1:
+            tuner.record(batchsize // 2, 1.0, 0.0)  # Partial batches are not measured
+        tuner.record(batchsize, predict_time(batchsize), wait_time)
+    raise AssertionError("Tuner did not complete")
+
+
+def test_tuner_memory_limit():
+    """ Test that the tuner increases the batch size whilst throughput improves and stops when
+    the projected memory use of the next batch size would not fit. """
+    batchsize = [1]
+    tuner = PluginTuner("test",
+                        1,
+                        64,
+                        lambda: (1000 + 50 * batchsize[0], 4000 - 50 * batchsize[0]),
+                        window=4)
+
+    def predict_time(size):
+        batchsize[0] = size
+        return 0.01 + 0.001 * size
+
+    _run_tuner(tuner, predict_time)
+    assert sorted(tuner.results) == [1, 2, 4, 8, 16, 32]
+    assert tuner.batchsize == 32
+    assert tuner.queue_size == 1
+
+
+def test_tuner_throughput():
+    """ Test that the tuner keeps the best batch size when larger batches are slower and deepens
+    the queue when prediction is starved of input. """
+    tuner = PluginTuner("test", 2, 64, lambda: (0.0, 65536.0), window=4)
+    _run_tuner(tuner, lambda size: 0.001 * size * (1 + 0.1 * size), wait_time=0.01)
+    assert sorted(tuner.results) == [2, 4]
+    assert tuner.batchsize == 2
+    assert tuner.queue_size == 2
+
+
+def test_tuning_cache(tmpdir, monkeypatch):
+    """ Test that tuned values are persisted per host, backend and device.
+
+    Parameters
+    ----------
+    tmpdir: :class:`py.path.local`
+        pytest temporary folder
+    monkeypatch: :class:`pytest.MonkeyPatch`
+        Monkey patching for locating the config folder
+    """
+    # The config folder is located relative to the launched script
+    monkeypatch.setattr(sys, "argv", [str(tmpdir.join("faceswap.py"))])
+    tuner = PluginTuner("test", 4, 4, lambda: (0.0, 65536.0), window=2)
+    _run_tuner(tuner, lambda size: 0.01)
+
+    TuningCache("cpu", "No GPU").save("detect.s3fd|640", tuner)
+    assert os.path.exists(str(tmpdir.join("config", "extract_tuning.json")))
+    assert TuningCache("cpu", "No GPU").get("detect.s3fd|640") == dict(batchsize=4,
+                                                                       queue_size=1,
+                                                                       items_per_sec=400.0)
+    assert TuningCache("cpu", "No GPU").get("align.fan|256") is None
+    assert TuningCache("nvidia", "GPU 0").get("detect.s3fd|640") is None
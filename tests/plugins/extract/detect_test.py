@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's extract detector plugin base. """
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from plugins.extract.detect._base import Detector  # noqa pylint:disable=wrong-import-position
+
+# The angle that a face is found at for each image in the batch. ``None`` for no face
+_FACE_ANGLES = [0, 180, None, 90, 0, 180, 90, None]
+
+
+class _Detector(Detector):  # pylint:disable=abstract-method
+    """ A detector which finds faces for each image at the angle given in :data:`_FACE_ANGLES`.
+
+    Each feed image is filled with its index within the batch in the first channel and the
+    number of quarter turns that it has been rotated by in the second channel.
+    """
+    def __init__(self):  # pylint:disable=super-init-not-called
+        self.rotation = [0, 90, 180, 270]
+        self._rotation_buffer = None
+        self.predicted = []
+
+    def predict(self, batch):
+        """ Record the images that are predicted and return a face for each image that is at its
+        face angle. Each face holds the image's batch index and the angle it was found at. """
+        indices = [int(image[0, 0, 0]) for image in batch["feed"]]
+        angles = [int(image[0, 0, 1]) * 90 for image in batch["feed"]]
+        assert batch["filename"] == [f"{idx}.png" for idx in indices]
+        self.predicted.append(indices)
+        batch["prediction"] = [np.array([[idx, angle, 0, 0, 1.0]])
+                               if _FACE_ANGLES[idx] == angle else np.array([])
+                               for idx, angle in zip(indices, angles)]
+        return batch
+
+    def _rotate_image_by_angle(self, image, angle):
+        """ Mark the image with the angle that it has been rotated by and return a rotation
+        matrix holding the image's batch index and the angle. """
+        retval = image.copy()
+        retval[..., 1] = angle // 90
+        return retval, np.array([[image[0, 0, 0], angle, 0], [0, 0, 0]], dtype="float32")
+
+
+def test_predict_rotation():
+    """ Test that each rotation pass only predicts the images which do not yet have faces, and
+    that the predictions and rotation matrices are returned for the correct images. """
+    batch_size = len(_FACE_ANGLES)
+    feed = np.zeros((batch_size, 4, 4, 3), dtype="uint8")
+    feed[..., 0] = np.arange(batch_size)[:, None, None]
+    batch = dict(feed=feed, filename=[f"{idx}.png" for idx in range(batch_size)])
+    detector = _Detector()
+
+    for _ in range(2):  # Second run re-uses the rotation buffer
+        detector.predicted = []
+        result = detector._predict(dict(batch))  # pylint:disable=protected-access
+
+        assert detector.predicted == [list(range(batch_size)),
+                                      [1, 2, 3, 5, 6, 7],
+                                      [1, 2, 5, 7],
+                                      [2, 7]]
+        assert result["feed"] is feed
+        assert result["filename"] == batch["filename"]
+        for idx, angle in enumerate(_FACE_ANGLES):
+            if angle is None:
+                assert not result["prediction"][idx].any()
+                assert not result["rotmat"][idx].any()
+                continue
+            np.testing.assert_array_equal(result["prediction"][idx], [[idx, angle, 0, 0, 1.0]])
+            if angle == 0:
+                assert not result["rotmat"][idx].any()
+            else:
+                np.testing.assert_array_equal(result["rotmat"][idx][0], [idx, angle, 0])
+
+
+def test_predict_rotation_all_found():
+    """ Test that no further rotation passes are made once faces are found for every image. """
+    detector = _Detector()
+    feed = np.zeros((2, 4, 4, 3), dtype="uint8")
+    feed[1, ..., 0] = 4
+    batch = dict(feed=feed, filename=["0.png", "4.png"])
+
+    result = detector._predict(batch)  # pylint:disable=protected-access
+
+    assert detector.predicted == [[0, 4]]
+    assert detector._rotation_buffer is None  # pylint:disable=protected-access
+    assert [pred[0][0] for pred in result["prediction"]] == [0, 4]
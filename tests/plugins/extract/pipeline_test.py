@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's extract pipeline media objects. """
+import cv2
+import numpy as np
+import pytest
+
+from plugins.extract.pipeline import ExtractMedia
+
+
+@pytest.fixture(name="media")
+def fixture_media():
+    """ An :class:`ExtractMedia` object holding a random 4 channel image """
+    image = np.random.randint(0, 255, (32, 48, 4), dtype="uint8")
+    return ExtractMedia("test.png", image, detected_faces=[])
+
+
+@pytest.mark.parametrize("color_format", ["BGR", "RGB", "GRAY"])
+def test_get_image(media, color_format):
+    """ Test that color conversions are correct, cached, read-only and only copied on request """
+    bgr = media.image[..., :3]
+    expected = {"BGR": bgr,
+                "RGB": bgr[..., ::-1],
+                "GRAY": cv2.cvtColor(np.ascontiguousarray(bgr), cv2.COLOR_BGR2GRAY)}[color_format]
+    image = media.get_image(color_format)
+    np.testing.assert_array_equal(image, expected)
+    assert media.get_image(color_format) is image
+    assert not image.flags.writeable
+    with pytest.raises(ValueError):
+        image[0, 0] = 0
+
+    copied = media.get_image_copy(color_format)
+    np.testing.assert_array_equal(copied, expected)
+    assert copied.flags.writeable
+    assert not np.shares_memory(copied, image)
+
+
+def test_bgr_shares_frame(media):
+    """ Test that the BGR image is a view of the frame rather than a copy """
+    assert np.shares_memory(media.get_image("BGR"), media.image)
+
+
+def test_split(media):
+    """ Test that split objects share the frame and its color conversions """
+    rgb = media.get_image("RGB")
+    split = media.split([])
+    assert split.filename == media.filename
+    assert split.image is media.image
+    assert split.get_image("RGB") is rgb
+
+
+def test_release_image_cache(media):
+    """ Test that cached conversions are released and reset when the image changes """
+    rgb = media.get_image("RGB")
+    media.release_image_cache()
+    assert media.get_image("RGB") is not rgb
+
+    gray = media.get_image("GRAY")
+    media.set_image(np.zeros_like(media.image))
+    assert media.get_image("GRAY") is not gray
+    assert not media.get_image("GRAY").any()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" Tests for running Faceswap's extract plugins in worker processes. """
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+import pytest
+
+from lib.multithreading import has_process_support
+from plugins.extract.process_pool import PluginProcessPool
+
+
+@dataclass
+class _Batch:
+    """ A dataclass batch, as used by the aligners """
+    filename: List[str] = field(default_factory=list)
+    image: List[np.ndarray] = field(default_factory=list)
+    prediction: np.ndarray = field(default_factory=lambda: np.empty([]))
+
+
+class _Plugin():
+    """ A minimal plugin that sums the images in a batch in its predict stage """
+    name = "Test Plugin"
+
+    def __init__(self) -> None:
+        self.model = None
+
+    def init_model(self) -> None:
+        """ Load the 'model' """
+        self.model = 2.0
+
+    def _process_input(self, batch):
+        """ Pass the batch through """
+        return batch
+
+    def _predict(self, batch):
+        """ Multiply the sum of each image by the model """
+        images = batch.image if isinstance(batch, _Batch) else batch["image"]
+        prediction = np.array([img.sum() * self.model for img in images], dtype="float32")
+        if isinstance(batch, _Batch):
+            batch.prediction = prediction
+        else:
+            batch["prediction"] = prediction
+        return batch
+
+    def _process_output(self, batch):
+        """ Pass the batch through """
+        return batch
+
+
+@pytest.mark.skipif(not has_process_support(), reason="Process support is not available")
+def test_process_pool():
+    """ Test that batches, including arrays too large for the shared memory slots, are processed
+    in worker processes and returned in order. """
+    pool = PluginProcessPool(_Plugin(), 2)
+    batches = []
+    for idx in range(6):
+        size = 64 if idx != 3 else 2048  # Batch 3 does not fit in a slot
+        images = [np.full((size, size, 3), idx + img_idx, dtype="uint8")
+                  for img_idx in range(2)]
+        if idx % 2:
+            batches.append(_Batch(filename=[f"{idx}_0", f"{idx}_1"], image=images))
+        else:
+            batches.append(dict(filename=[f"{idx}_0", f"{idx}_1"], image=np.array(images)))
+    try:
+        for _ in range(2):  # Run 2 passes
+            thread = threading.Thread(target=lambda: ([pool.put(batch) for batch in batches],
+                                                      pool.put_eof()))
+            thread.start()
+            results = list(pool.results())
+            thread.join()
+            assert len(results) == len(batches)
+            for idx, (batch, busy, wait) in enumerate(results):
+                assert busy >= 0.0 and wait >= 0.0
+                assert isinstance(batch, type(batches[idx]))
+                fields = batch if isinstance(batch, dict) else vars(batch)
+                original = batches[idx] if isinstance(batch, dict) else vars(batches[idx])
+                assert fields["filename"] == original["filename"]
+                np.testing.assert_array_equal(np.array(fields["image"]),
+                                              np.array(original["image"]))
+                expected = [img.sum() * 2.0 for img in original["image"]]
+                np.testing.assert_allclose(fields["prediction"], expected, rtol=1e-6)
+    finally:
+        pool.close()
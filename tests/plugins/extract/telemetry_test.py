@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" Tests for Faceswap's extract pipeline telemetry. """
+import json
+import threading
+from time import sleep
+
+from lib.queue_manager import queue_manager
+from plugins.extract.telemetry import Telemetry
+
+
+def test_queue_stats():
+    """ Test that queues record their puts, gets, blocked time and occupancy. """
+    name = queue_manager.add_queue("telemetry_test_stats", maxsize=1)
+    queue = queue_manager.get_queue(name)
+    try:
+        queue.put(1)
+        thread = threading.Thread(target=lambda: (sleep(0.1), queue.get()))
+        thread.start()
+        queue.put(2)  # Blocks until the thread takes an item
+        thread.join()
+        queue.get()
+        stats = queue.stats
+        assert stats["maxsize"] == 1
+        assert stats["puts"] == 2
+        assert stats["gets"] == 2
+        assert stats["put_wait"] >= 0.05
+        assert set(stats["occupancy"]) == {0, 1}
+        assert stats["occupancy"][1] >= 0.05
+        assert 0.0 < stats["mean_occupancy"] < 1.0
+
+        queue.reset_stats()
+        assert queue.stats["puts"] == 0
+        assert queue.stats["put_wait"] == 0.0
+    finally:
+        queue_manager.del_queue(name)
+
+
+def test_telemetry_summary(tmp_path):
+    """ Test that stage summaries are calculated, the limiting stage is identified and summaries
+    are written as JSON lines. """
+    telemetry = Telemetry()
+    assert telemetry.limiting_stage is None
+    loader = telemetry.stage("images_load")
+    predict = telemetry.stage("detect_test_predict")
+    assert telemetry.stage("images_load") is loader
+
+    loader.record(1, 0.1, wait_out=0.9)
+    loader.record(1, 0.1, wait_out=0.9)
+    predict.record(3, 1.5, wait_in=0.5, capacity=4)
+    predict.record(4, 2.0, capacity=4)
+
+    summary = telemetry.summary()
+    stage = summary["stages"]["detect_test_predict"]
+    assert stage["items"] == 7
+    assert stage["batches"] == 2
+    assert stage["items_per_sec"] == 1.75
+    assert stage["utilization"] == 0.875
+    assert stage["batch_fill"] == 0.875
+    assert summary["stages"]["images_load"]["batch_fill"] is None
+    assert summary["limiting_stage"] == "detect_test_predict"
+
+    filename = str(tmp_path / "alignments_telemetry.jsonl")
+    telemetry.start(filename, 0.05)
+    sleep(0.2)
+    telemetry.stop()
+    with open(filename, "r", encoding="utf-8") as in_file:
+        lines = [json.loads(line) for line in in_file]
+    assert len(lines) >= 2
+    assert not lines[0]["final"]
+    assert lines[-1]["final"]
+    assert lines[-1]["limiting_stage"] == "detect_test_predict"
+
+    telemetry.reset()
+    assert telemetry.stage("detect_test_predict").summary()["items"] == 0
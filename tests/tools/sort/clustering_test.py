@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+""" Tests for the sort tool's memory bounded clustering. """
+from collections import defaultdict
+
+import numpy as np
+
+from tools.sort.clustering import linkage_memory, StreamingCluster
+
+
+def test_streaming_cluster():
+    """ Test that every face is output once, in the order and bin of a representative that only
+    holds faces from the same identity, and that representatives are bounded by the memory
+    limit """
+    rand = np.random.RandomState(0)
+    identities = rand.randint(0, 5, 10000)
+    predictions = (rand.normal(size=(5, 16))[identities] +
+                   rand.normal(scale=0.05, size=(10000, 16))).astype("float32")
+    clustered = []
+
+    def cluster(representatives):
+        """ Output the representatives in reverse order, each in its own bin """
+        clustered.append(len(representatives))
+        return [(idx, idx) for idx in reversed(range(len(representatives)))]
+
+    result = StreamingCluster(predictions, linkage_memory(50), cluster)()
+
+    assert 5 <= clustered[0] <= 50
+    assert sorted(idx for idx, _ in result) == list(range(10000))
+    bins = [bin_id for _, bin_id in result]
+    assert bins == sorted(bins, reverse=True)
+    members = defaultdict(set)
+    for idx, bin_id in result:
+        members[bin_id].add(identities[idx])
+    assert len(members) == clustered[0]
+    assert all(len(ids) == 1 for ids in members.values())
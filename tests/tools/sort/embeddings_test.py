@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Tests for the sort tool's batched identity encoding and encoding cache. """
+import os
+
+import numpy as np
+import pytest
+
+from tools.sort.embeddings import BatchEncoder, EmbeddingCache
+
+
+def test_embedding_cache(tmp_path):
+    """ Test that encodings are saved and loaded, and are invalidated when a face changes, a face
+    is removed or the model changes """
+    for idx in range(3):
+        (tmp_path / f"face_{idx}.png").write_bytes(b"face" * (idx + 1))
+    embeddings = np.random.rand(3, 8).astype("float32")
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    assert cache.get("face_0.png") is None
+    for idx in range(3):
+        cache.add(f"face_{idx}.png", embeddings[idx])
+    cache.add("missing.png", embeddings[0])  # Files that do not exist are not cached
+    cache.save()
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    assert len(cache) == 3
+    for idx in range(3):
+        np.testing.assert_array_equal(cache.get(f"face_{idx}.png"), embeddings[idx])
+
+    (tmp_path / "face_1.png").write_bytes(b"changed face")
+    os.remove(tmp_path / "face_2.png")
+    assert cache.get("face_1.png") is None
+    assert cache.get("face_2.png") is None
+    cache.add("face_0.png", embeddings[1])
+    cache.save()
+    assert len(EmbeddingCache(str(tmp_path), "model")) == 2
+
+    assert len(EmbeddingCache(str(tmp_path), "other_model")) == 0
+
+
+def test_batch_encoder():
+    """ Test that faces are encoded in batches of the requested size """
+    batch_sizes = []
+
+    def predict(batch):
+        batch_sizes.append(len(batch))
+        return batch.reshape(len(batch), -1).sum(axis=1, keepdims=True)
+
+    encoder = BatchEncoder(predict, 4)
+    faces = {f"face_{idx}": np.full((2, 2, 3), idx, dtype="float32") for idx in range(10)}
+    for key, face in faces.items():
+        encoder.put(key, face)
+    results = encoder.join()
+    assert batch_sizes == [4, 4, 2]
+    assert {key: float(val[0]) for key, val in results.items()} == {
+        key: float(face.sum()) for key, face in faces.items()}
+
+
+def test_batch_encoder_error():
+    """ Test that errors in the encoding thread are raised in the caller """
+    def predict(batch):
+        raise ValueError("Test error")
+
+    encoder = BatchEncoder(predict, 1)
+    with pytest.raises(ValueError):
+        for idx in range(10):
+            encoder.put(str(idx), np.zeros((2, 2, 3)))
+        encoder.join()
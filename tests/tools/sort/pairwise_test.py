@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+""" Tests for the sort tool's vectorized pairwise distance calculations. """
+import cv2
+import numpy as np
+import pytest
+
+from tools.sort.pairwise import PairwiseDistance
+
+
+def _histograms(count):
+    """ Random image histograms as generated by sort by histogram """
+    images = np.random.randint(0, 255, (count, 16, 16), dtype="uint8")
+    return np.array([cv2.calcHist([img], [0], None, [256], [0, 256]) for img in images])
+
+
+def _landmarks(count):
+    """ Random landmarks as used by sort by face-cnn """
+    return np.random.rand(count, 68, 2).astype("float32")
+
+
+def _distance(metric, feat1, feat2):
+    """ The distance between two features, as calculated by the original sort methods """
+    if metric == "bhattacharyya":
+        return cv2.compareHist(feat1, feat2, cv2.HISTCMP_BHATTACHARYYA)
+    return np.sum(np.absolute((feat2 - feat1).flatten()))
+
+
+def _reference_order(metric, features):
+    """ The original greedy nearest neighbour sort """
+    result = list(range(len(features)))
+    for i in range(len(result) - 1):
+        min_score = float("inf")
+        j_min_score = i + 1
+        for j in range(i + 1, len(result)):
+            score = _distance(metric, features[result[i]], features[result[j]])
+            if score < min_score:
+                min_score = score
+                j_min_score = j
+        result[i + 1], result[j_min_score] = result[j_min_score], result[i + 1]
+    return result
+
+
+@pytest.mark.parametrize("metric,features", [("bhattacharyya", _histograms(60)),
+                                             ("l1", _landmarks(60))])
+def test_distances(metric, features):
+    """ Test that vectorized distances match the distances of the original implementation """
+    engine = PairwiseDistance(features, metric, max_block_size=200)
+    distances = engine.distances(np.arange(len(features)))
+    expected = np.array([[_distance(metric, feat1, feat2) for feat2 in features]
+                         for feat1 in features])
+    np.testing.assert_allclose(distances, expected, atol=1e-5)
+
+    expected_totals = expected.sum(axis=1) - np.diag(expected)
+    np.testing.assert_allclose(engine.sum_distances(), expected_totals, rtol=1e-5)
+    expected_later = np.triu(expected, k=1).sum(axis=1)
+    np.testing.assert_allclose(engine.sum_distances(later_only=True), expected_later, rtol=1e-5)
+
+
+@pytest.mark.parametrize("neighbours", [None, 1, 4, 32])
+@pytest.mark.parametrize("metric,features", [("bhattacharyya", _histograms(80)),
+                                             ("l1", _landmarks(80)),
+                                             ("l1", np.random.randint(0, 3, (80, 4)))])
+def test_nearest_neighbour_order(metric, features, neighbours):
+    """ Test that the nearest neighbour order matches the original implementation, including
+    when distances are tied and when neighbour lists are exhausted """
+    engine = PairwiseDistance(features, metric, max_block_size=500)
+    assert engine.nearest_neighbour_order(neighbours=neighbours) == _reference_order(metric,
+                                                                                     features)
+
+
+def _reference_groups(metric, features, threshold):
+    """ The original grouping, comparing against every member of each group """
+    groups = []
+    labels = []
+    for feat in features:
+        scores = [np.mean([_distance(metric, feat, features[idx]) for idx in members])
+                  for members in groups]
+        nearest = int(np.argmin(scores)) if scores else -1
+        if scores and scores[nearest] < threshold:
+            groups[nearest].append(len(labels))
+            labels.append(nearest)
+        else:
+            groups.append([len(labels)])
+            labels.append(len(groups) - 1)
+    return labels
+
+
+def _reference_centroid_groups(metric, features, threshold):
+    """ Grouping against the mean of each group's members """
+    members = []
+    labels = []
+    for feat in features:
+        if metric == "bhattacharyya":
+            feat = feat / feat.sum()
+        scores = [_distance(metric, feat.astype("float32"),
+                            np.mean(group, axis=0).astype("float32")) for group in members]
+        nearest = int(np.argmin(scores)) if scores else -1
+        if scores and scores[nearest] < threshold:
+            members[nearest].append(feat)
+            labels.append(nearest)
+        else:
+            members.append([feat])
+            labels.append(len(members) - 1)
+    return labels
+
+
+def _clustered(metric):
+    """ Features drawn from 4 distinct clusters, in a random order """
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 4, 80)
+    if metric == "bhattacharyya":
+        bases = rng.integers(0, 500, (4, 256, 1))
+        return (bases[labels] + rng.integers(0, 50, (80, 256, 1))).astype("float32")
+    bases = rng.random((4, 68, 2))
+    return (bases[labels] + rng.normal(0.0, 0.01, (80, 68, 2))).astype("float32")
+
+
+@pytest.mark.parametrize("metric,threshold", [("bhattacharyya", 0.2), ("l1", 10.0)])
+def test_group(metric, threshold):
+    """ Test that grouping by average linkage matches the original grouping and grouping by
+    centroid matches grouping against the mean of each group """
+    features = _clustered(metric)
+    engine = PairwiseDistance(features, metric, max_block_size=500)
+    average = engine.group(threshold, linkage="average")
+    assert average == _reference_groups(metric, features, threshold)
+    assert max(average) + 1 == 4
+
+    centroid = engine.group(threshold, linkage="centroid")
+    assert centroid == _reference_centroid_groups(metric, features, threshold)
+    assert centroid == average
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+""" Tests for the sort tool's parallel scoring of faces. """
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from lib.multithreading import has_process_support
+from tools.sort.scoring import FileScorer
+
+
+def _score(image, alignments):
+    """ Score a face by the sum of its pixels """
+    assert alignments is None
+    return float(image.sum())
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_file_scorer(tmp_path, monkeypatch, jobs):
+    """ Test that files are scored in order and unreadable files are given a score of ``None``,
+    both in the main process and in worker processes """
+    if jobs > 1:
+        if not has_process_support():
+            pytest.skip("Process support is not available")
+        monkeypatch.setattr("tools.sort.scoring.total_cpus", lambda: jobs)
+    filenames = []
+    for idx in range(40):
+        filename = os.path.join(str(tmp_path), f"face_{idx:02d}.png")
+        cv2.imwrite(filename, np.full((8, 8, 3), idx, dtype="uint8"))
+        filenames.append(filename)
+    filenames.insert(5, os.path.join(str(tmp_path), "missing.png"))
+
+    scores = FileScorer(_score, False, jobs)(filenames, "Scoring")
+    assert scores[5] is None
+    del scores[5]
+    assert scores == [float(idx * 8 * 8 * 3) for idx in range(40)]
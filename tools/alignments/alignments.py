@@ -8,8 +8,8 @@ from typing import Any, TYPE_CHECKING
 
 from lib.utils import _video_extensions
 from .media import AlignmentData
-from .jobs import (Check, Draw, Extract, FromFaces, Rename,  # noqa pylint: disable=unused-import
-                   RemoveFaces, Sort, Spatial)
+from .jobs import (Check, ConvertStorage, Draw,  # noqa pylint: disable=unused-import
+                   Extract, FromFaces, Rename, RemoveFaces, Sort, Spatial, UpdateHeaders)
 
 
 if TYPE_CHECKING:
@@ -33,8 +33,8 @@ class Alignments():  # pylint:disable=too-few-public-methods
         logger.debug("Initializing %s: (arguments: '%s'", self.__class__.__name__, arguments)
         self._args = arguments
         job = self._args.job
-        alignment_file = self._find_alignments()
-        self.alignments = None if job == "from-faces" else AlignmentData(alignment_file)
+        self.alignments = (None if job in ("from-faces", "update-headers")
+                           else AlignmentData(self._find_alignments()))
         logger.debug("Initialized %s", self.__class__.__name__)
 
     def _find_alignments(self) -> str:
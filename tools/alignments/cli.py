@@ -53,12 +53,18 @@ class AlignmentsArgs(FaceSwapArgs):
             opts=("-j", "--job"),
             action=Radio,
             type=str,
-            choices=("draw", "extract", "from-faces", "missing-alignments", "missing-frames",
-                     "multi-faces", "no-faces", "remove-faces", "rename", "sort", "spatial"),
+            choices=("convert-storage", "draw", "extract", "from-faces", "missing-alignments",
+                     "missing-frames", "multi-faces", "no-faces", "remove-faces", "rename", "sort",
+                     "spatial", "update-headers"),
             group=_("processing"),
             required=True,
             help=_("R|Choose which action you want to perform. NB: All actions require an "
                    "alignments file (-a) to be passed in."
+                   "\nL|'convert-storage': Convert the alignments file to the storage format "
+                   "selected with the storage format option (-sf). The columnar format loads "
+                   "significantly faster for large alignments files, as each frame is only read "
+                   "from disk when it is required. The original alignments file will be backed "
+                   "up."
                    "\nL|'draw': Draw landmarks on frames in the selected folder/video. A "
                    "subfolder will be created within the frames folder to hold the output.{0}"
                    "\nL|'extract': Re-extract faces from the source frames/video based on "
@@ -87,7 +93,11 @@ class AlignmentsArgs(FaceSwapArgs):
                    "\nL|'sort': Re-index the alignments from left to right. For alignments with "
                    "multiple faces this will ensure that the left-most face is at index 0."
                    "\nL|'spatial': Perform spatial and temporal filtering to smooth alignments "
-                   "(EXPERIMENTAL!)").format(frames_dir, frames_and_faces_dir, output_opts,
+                   "(EXPERIMENTAL!)"
+                   "\nL|'update-headers': Convert the PNG headers of faces extracted with older "
+                   "versions of Faceswap to the faster binary header format. Faces are updated in "
+                   "place. You do not need to provide an alignments file path to run this job. "
+                   "{3}").format(frames_dir, frames_and_faces_dir, output_opts,
                                              faces_dir, frames_or_faces_dir)))
         argument_list.append(dict(
             opts=("-o", "--output"),
@@ -102,6 +112,21 @@ class AlignmentsArgs(FaceSwapArgs):
                    "source directory)."
                    "\nL|'move': Move the discovered items to a sub-folder within the source "
                    "directory.")))
+        argument_list.append(dict(
+            opts=("-sf", "--storage-format"),
+            action=Radio,
+            type=str,
+            choices=("columnar", "standard"),
+            dest="storage_format",
+            group=_("processing"),
+            default="columnar",
+            help=_("R|[Convert-storage only] The storage format to convert the alignments file "
+                   "to:"
+                   "\nL|'columnar': Store landmarks and bounding boxes in contiguous arrays, "
+                   "with masks and thumbnails only read from disk when they are accessed. Loads "
+                   "large alignments files significantly faster. (DEFAULT)"
+                   "\nL|'standard': The compressed alignments format, which is loaded into "
+                   "memory in its entirety.")))
         argument_list.append(dict(
             opts=("-a", "--alignments_file"),
             action=FileFullPaths,
@@ -109,13 +134,16 @@ class AlignmentsArgs(FaceSwapArgs):
             type=str,
             group=_("data"),
             # hacky solution to not require alignments file if creating alignments from faces:
-            required=not any(val in sys.argv for val in ["from-faces", "-fr", "-frames_folder"]),
+            required=not any(val in sys.argv for val in ["from-faces",
+                                                          "update-headers",
+                                                          "-fr",
+                                                          "-frames_folder"]),
             filetypes="alignments",
             help=_("Full path to the alignments file to be processed. If you have input a "
                    "'frames_dir' and don't provide this option, the process will try to find the "
                    "alignments file at the default location. All jobs require an alignments file "
                    "with the exception of 'from-faces' when the alignments file will be generated "
-                   "in the specified faces folder.")))
+                   "in the specified faces folder and 'update-headers'.")))
         argument_list.append(dict(
             opts=("-fc", "-faces_folder"),
             action=DirFullPaths,
@@ -4,6 +4,7 @@
 import logging
 import os
 import sys
+from concurrent import futures
 from datetime import datetime
 from typing import List, Tuple, TYPE_CHECKING, Optional
 
@@ -17,7 +18,7 @@ from tqdm import tqdm
 
 from lib.align import DetectedFace, _EXTRACT_RATIOS
 from lib.align.alignments import _VERSION
-from lib.image import (encode_image, generate_thumbnail, ImagesSaver,
+from lib.image import (encode_image, generate_thumbnail, ImagesSaver, read_image_meta,
                        read_image_meta_batch, update_existing_metadata)
 from plugins.extract.pipeline import Extractor, ExtractMedia
 from scripts.fsmedia import Alignments
@@ -249,6 +250,36 @@ class Check():
             os.rename(src, dst)
 
 
+class ConvertStorage():  # pylint:disable=too-few-public-methods
+    """ Convert an alignments file between the standard and columnar storage formats.
+
+    Parameters
+    ----------
+    alignments: :class:`tools.lib_alignments.media.AlignmentData`
+        The alignments data loaded from an alignments file for this conversion job
+    arguments: :class:`argparse.Namespace`
+        The :mod:`argparse` arguments as passed in from :mod:`tools.py`
+    """
+    def __init__(self, alignments: "AlignmentData", arguments: Namespace) -> None:
+        logger.debug("Initializing %s: (arguments: %s)", self.__class__.__name__, arguments)
+        self._alignments = alignments
+        self._storage = arguments.storage_format
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def process(self) -> None:
+        """ Convert the alignments file to the requested storage format and save it. The original
+        alignments file is backed up. """
+        logger.info("[CONVERT ALIGNMENTS STORAGE]")  # Tidy up cli output
+        if self._alignments.storage == self._storage:
+            logger.info("Alignments file is already in the '%s' storage format: '%s'",
+                        self._storage, self._alignments.file)
+            return
+        logger.info("Converting alignments storage from '%s' to '%s'",
+                    self._alignments.storage, self._storage)
+        self._alignments.storage = self._storage
+        self._alignments.save()
+
+
 class Draw():  # pylint:disable=too-few-public-methods
     """ Draws annotations onto original frames and saves into a sub-folder next to the original
     frames.
@@ -1307,3 +1338,72 @@ class Spatial():
             self._alignments.data[frame]["faces"][0]["landmarks_xy"] = landmarks_xy
             logger.trace("Updated: (frame: '%s', landmarks: %s)", frame, landmarks_xy)
         logger.debug("Updated alignments")
+
+
+class UpdateHeaders():  # pylint:disable=too-few-public-methods
+    """ Migrate the PNG headers of a folder of Faceswap extracted faces from the legacy text
+    format to the binary header format, which is significantly faster to read.
+
+    Faces that already hold the binary header format are left untouched, so the job can safely be
+    re-run on a partially migrated folder.
+
+    Parameters
+    ----------
+    alignments: NoneType
+        Parameter included for standard job naming convention, but not used for this process.
+    arguments: :class:`argparse.Namespace`
+        The :mod:`argparse` arguments as passed in from :mod:`tools.py`
+    """
+    def __init__(self, alignments: None, arguments: Namespace) -> None:
+        logger.debug("Initializing %s: (alignments: %s, arguments: %s)",
+                     self.__class__.__name__, alignments, arguments)
+        if not arguments.faces_dir or not os.path.isdir(arguments.faces_dir):
+            logger.error("A valid faces folder must be provided.")
+            sys.exit(0)
+        self._filelist = [os.path.join(arguments.faces_dir, fname)
+                          for fname in os.listdir(arguments.faces_dir)
+                          if os.path.splitext(fname.lower())[1] == ".png"]
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @classmethod
+    def _update_header(cls, filename: str) -> Optional[bool]:
+        """ Rewrite the header of a single face if it is stored in the legacy format.
+
+        Parameters
+        ----------
+        filename: str
+            The full path to the face to update
+
+        Returns
+        -------
+        bool or ``None``
+            ``True`` if the header was updated, ``False`` if it was already in the binary format,
+            ``None`` if the file does not contain a Faceswap header
+        """
+        meta = read_image_meta(filename)
+        if "itxt" not in meta:
+            logger.verbose("Skipping file without faceswap header: '%s'", filename)
+            return None
+        if meta["itxt_version"] != 0:
+            return False
+        logger.trace("Updating header: '%s'", filename)  # type:ignore
+        update_existing_metadata(filename, meta["itxt"])
+        return True
+
+    def process(self) -> None:
+        """ Run the job to migrate the faces' PNG headers """
+        logger.info("[UPDATE FACE HEADERS]")  # Tidy up cli output
+        if not self._filelist:
+            logger.info("No png files found in faces folder")
+            return
+        with futures.ThreadPoolExecutor() as executor:
+            results = list(tqdm(executor.map(self._update_header, self._filelist),
+                                desc="Updating Headers",
+                                total=len(self._filelist),
+                                leave=False))
+        skip_count = sum(1 for result in results if result is None)
+        logger.info("%s face header(s) updated, %s already in the latest format",
+                    sum(1 for result in results if result), results.count(False))
+        if skip_count:
+            logger.warning("%s file(s) skipped that do not contain faceswap header data",
+                           skip_count)
@@ -12,9 +12,9 @@ from tqdm import tqdm
 # TODO imageio single frame seek seems slow. Look into this
 # import imageio
 
-from lib.align import Alignments, DetectedFace, update_legacy_png_header
+from lib.align import Alignments, DetectedFace, FacesetManifest, update_legacy_png_header
 from lib.image import (count_frames, generate_thumbnail, ImagesLoader,
-                       png_write_meta, read_image, read_image_meta_batch)
+                       png_write_meta, read_image)
 from lib.utils import _image_extensions, _video_extensions, FaceswapError
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -234,8 +234,9 @@ class Faces(MediaLoader):
         Yields
         ------
         dict
-            A dictionary for each face found containing the keys returned from
-            :class:`lib.image.read_image_meta_batch`
+            A dictionary for each face found containing the `source` information from the face's
+            PNG header, as read from the folder's :class:`lib.align.FacesetManifest`, with the
+            additional key `current_filename`
         """
         logger.info("Loading file list from %s", self.folder)
 
@@ -248,12 +249,11 @@ class Faces(MediaLoader):
                         for face in os.listdir(self.folder)
                         if os.path.splitext(face)[-1] == ".png"]
 
+        manifest = FacesetManifest(self.folder)
         log_once = False
-        for fullpath, metadata in tqdm(read_image_meta_batch(filelist),
-                                       total=len(filelist),
-                                       desc="Reading Face Data"):
-
-            if "itxt" not in metadata or "source" not in metadata["itxt"]:
+        for fullpath in tqdm(filelist, desc="Reading Face Data"):
+            source = manifest.get_source(fullpath)
+            if source is None:
                 if self._alignments is None:  # Can't update legacy
                     raise FaceswapError(
                         f"The folder '{self.folder}' contains images that do not include Faceswap "
@@ -272,7 +272,7 @@ class Faces(MediaLoader):
                         "again.".format(self.folder, self._alignments.file))
                 retval = data["source"]
             else:
-                retval = metadata["itxt"]["source"]
+                retval = source
 
             retval["current_filename"] = os.path.basename(fullpath)
             yield retval
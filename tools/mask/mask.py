@@ -9,7 +9,8 @@ import cv2
 import numpy as np
 from tqdm import tqdm
 
-from lib.align import Alignments, AlignedFace, DetectedFace, update_legacy_png_header
+from lib.align import (Alignments, AlignedFace, DetectedFace, FacesetManifest,
+                       update_legacy_png_header)
 from lib.image import FacesLoader, ImagesLoader, ImagesSaver, encode_image
 
 from lib.multithreading import MultiThread
@@ -60,6 +61,7 @@ class Mask():  # pylint:disable=too-few-public-methods
 
         self._extractor = self._get_extractor(arguments.exclude_gpus)
         self._set_correct_mask_type()
+        self._set_skip_list()
         self._extractor_input_thread = self._feed_extractor()
 
         logger.debug("Initialized %s", self.__class__.__name__)
@@ -147,6 +149,31 @@ class Mask():  # pylint:disable=too-few-public-methods
         logger.debug("Updating '%s' to '%s'", self._mask_type, new_type)
         self._mask_type = new_type
 
+    def _set_skip_list(self) -> None:
+        """ When only updating missing masks from a faces folder, use the folder's
+        :class:`lib.align.FacesetManifest` to skip loading any faces that already have the
+        requested mask in the alignments file. """
+        if not self._input_is_faces or self._update_type != "missing":
+            return
+        manifest = FacesetManifest(self._loader.location)
+        skip_list = []
+        for idx, filename in enumerate(self._loader.file_list):
+            source = manifest.get_source(filename)
+            if source is None:
+                continue
+            frame_name = source["source_filename"]
+            face_index = source["face_index"]
+            alignment = self._alignments.get_faces_in_frame(frame_name)
+            if (alignment and face_index < len(alignment)
+                    and self._check_for_missing(frame_name, face_index, alignment[face_index])):
+                skip_list.append(idx)
+        if not skip_list:
+            return
+        logger.info("Skipping %s faces that already have a '%s' mask",
+                    len(skip_list), self._mask_type)
+        self._counts["face"] += len(skip_list)
+        self._loader.add_skip_list(skip_list)
+
     def _feed_extractor(self) -> MultiThread:
         """ Feed the input queue to the Extractor from a faces folder or from source frames in a
         background thread
@@ -225,7 +252,8 @@ class Mask():  # pylint:disable=too-few-public-methods
         logger.debug("args: %s", args)
         if self._update_type != "output":
             queue = cast("EventQueue", args[0])
-        for filename, image, metadata in tqdm(self._loader.load(), total=self._loader.count):
+        for filename, image, metadata in tqdm(self._loader.load(),
+                                              total=self._loader.process_count):
             if not metadata:  # Legacy faces. Update the headers
                 if not log_once:
                     logger.warning("Legacy faces discovered. These faces will be updated")
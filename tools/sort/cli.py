@@ -170,6 +170,23 @@ class SortArgs(FaceSwapArgs):
                    "\nBe careful setting a value that's too extrene in a directory "
                    "with many images, as this could result in a lot of folders being created. "
                    "Defaults: face-cnn 7.2, hist 0.3, face 0.25")))
+        argument_list.append(dict(
+            opts=('-gl', '--group-linkage'),
+            action=Radio,
+            type=str,
+            choices=("centroid", "average"),
+            dest='group_linkage',
+            group=_("group settings"),
+            default="centroid",
+            help=_("R|How faces are compared against existing groups when grouping by "
+                   "'face-cnn' and 'hist' methods."
+                   "\nL|'centroid': Compare each face against the average of the faces in each "
+                   "group. This is fast for any number of faces."
+                   "\nL|'average': Compare each face against every face in each group and use "
+                   "the average score. This is slower, as each face is compared against every "
+                   "face that has already been grouped. Grouping may be slightly more "
+                   "discriminating than 'centroid' at the same threshold."
+                   "\nDefault: centroid")))
         argument_list.append(dict(
             opts=('-fp', '--final-process'),
             action=Radio,
@@ -207,6 +224,50 @@ class SortArgs(FaceSwapArgs):
                    "left/down whereas the last folder will contain the faces looking the most to "
                    "the right/up. NB: Some bins may be empty if faces do not fit the criteria."
                    "\nDefault value: 5")))
+        argument_list.append(dict(
+            opts=('-bs', '--batch-size'),
+            action=Slider,
+            min_max=(1, 256),
+            rounding=1,
+            type=int,
+            dest='batch_size',
+            group=_("settings"),
+            default=16,
+            help=_("Integer value. The number of faces to feed through the identity model at "
+                   "once when sorting or grouping by 'face'. Higher values are faster but use "
+                   "more memory. Face encodings are cached within the input folder, so sorting "
+                   "the same faces again does not need to run the model. Default: 16")))
+        argument_list.append(dict(
+            opts=('-cm', '--cluster-memory'),
+            action=Slider,
+            min_max=(0, 256),
+            rounding=1,
+            type=int,
+            dest='cluster_memory',
+            group=_("settings"),
+            default=0,
+            help=_("Integer value. The maximum amount of RAM, in GB, to use for clustering faces "
+                   "when sorting or grouping by 'face'. If clustering all of the faces at once "
+                   "would need more RAM than this, the faces are first pre-clustered into as "
+                   "many representatives as can be clustered within this amount of RAM, and the "
+                   "representatives are then clustered. This allows very large face sets to be "
+                   "sorted, at the cost of slightly less precise ordering. 0 uses the RAM that "
+                   "is currently available. Default: 0")))
+        argument_list.append(dict(
+            opts=('-j', '--jobs'),
+            action=Slider,
+            min_max=(0, 40),
+            rounding=1,
+            type=int,
+            dest='jobs',
+            group=_("settings"),
+            default=0,
+            help=_("Integer value. The maximum number of parallel processes for loading and "
+                   "scoring faces when sorting or grouping by 'blur', 'color' and 'hist' "
+                   "methods. Setting this to 0 will use all available CPUs. Scores are stored in "
+                   "the faceset manifest within the input folder, so sorting the same faces by "
+                   "the same method again does not need to load the faces. Not supported on "
+                   "Windows, where faces are scored in a single process. Default: 0")))
         argument_list.append(dict(
             opts=('-l', '--log-changes'),
             action='store_true',
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+""" Memory bounded clustering of face identity encodings for the sorting tool.
+
+Hierarchical clustering of face encodings requires memory that grows with the square of the number
+of faces, so very large face sets cannot be clustered directly. :class:`StreamingCluster`
+pre-clusters the encodings into a bounded number of representatives with mini-batch k-means,
+streaming the encodings through the model in batches, and then hierarchically clusters the
+representatives, so that the memory required is bounded by a given budget.
+"""
+import logging
+import sys
+
+from typing import Callable, Generator, List, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+
+def linkage_memory(num_points: int) -> float:
+    """ Estimate the memory required to perform hierarchical linkage for the given number of
+    points.
+
+    Matches the estimate used by :class:`plugins.extract.recognition.vgg_face2_keras.Cluster`,
+    where the condensed distance matrix is not preserved.
+
+    Parameters
+    ----------
+    num_points: int
+        The number of points to be clustered
+
+    Returns
+    -------
+    float
+        The estimated memory required for linkage, in bytes
+    """
+    return ((num_points ** 2) * 24) / 1.8
+
+
+class StreamingCluster():
+    """ Cluster face encodings within a memory budget.
+
+    The encodings are streamed in batches through mini-batch k-means to obtain a number of
+    representatives, which is the largest number that can be hierarchically clustered within the
+    memory budget. The representatives are then clustered by the given clustering function, and
+    each face takes the position and bin of its representative. Within each representative, faces
+    are ordered by their distance from the representative.
+
+    Parameters
+    ----------
+    predictions: :class:`numpy.ndarray`
+        A stacked matrix of identity encodings of the shape (`N`, `D`) where `N` is the number of
+        faces and `D` are the number of dimensions
+    memory_limit: float
+        The maximum memory, in bytes, to use for hierarchically clustering the representatives
+    cluster: callable
+        The function to cluster the representatives with. Must accept a matrix of representatives
+        of the shape (`R`, `D`) and return a list of (`representative index`, `bin`) tuples in
+        sorted order, as returned by
+        :class:`plugins.extract.recognition.vgg_face2_keras.Cluster`
+    max_representatives: int, optional
+        The maximum number of representatives to create, regardless of the memory budget, to
+        bound the time taken for pre-clustering. Default: `20000`
+    passes: int, optional
+        The number of times to stream the encodings through the pre-clustering model.
+        Default: `2`
+    """
+    def __init__(self,
+                 predictions: np.ndarray,
+                 memory_limit: float,
+                 cluster: Callable[[np.ndarray], List[Tuple[int, int]]],
+                 max_representatives: int = 20000,
+                 passes: int = 2) -> None:
+        logger.debug("Initializing %s: (predictions: %s, memory_limit: %s, cluster: %s, "
+                     "max_representatives: %s, passes: %s)", self.__class__.__name__,
+                     predictions.shape, memory_limit, cluster, max_representatives, passes)
+        self._predictions = predictions
+        self._cluster = cluster
+        self._passes = passes
+        self._num_representatives = self._get_num_representatives(memory_limit,
+                                                                  max_representatives)
+        self._batch_size = min(len(predictions), max(2 * self._num_representatives, 4096))
+        logger.debug("Initialized %s: (num_representatives: %s, batch_size: %s)",
+                     self.__class__.__name__, self._num_representatives, self._batch_size)
+
+    def _get_num_representatives(self, memory_limit: float, max_representatives: int) -> int:
+        """ Obtain the largest number of representatives that can be hierarchically clustered
+        within the memory budget.
+
+        Parameters
+        ----------
+        memory_limit: float
+            The maximum memory, in bytes, to use for hierarchically clustering the
+            representatives
+        max_representatives: int
+            The maximum number of representatives to create
+
+        Returns
+        -------
+        int
+            The number of representatives to pre-cluster the faces into
+        """
+        retval = min(int(np.sqrt(memory_limit * 1.8 / 24)),
+                     max_representatives,
+                     len(self._predictions))
+        retval = max(retval, 2)
+        logger.debug("Number of representatives: %s (memory_limit: %sMB)",
+                     retval, int(memory_limit / (1024 * 1024)))
+        return retval
+
+    def _batches(self, desc: str) -> Generator[Tuple[int, int], None, None]:
+        """ Yield the start and end indices of each batch of encodings, with a progress bar.
+
+        Parameters
+        ----------
+        desc: str
+            The description to display in the progress bar
+
+        Yields
+        ------
+        tuple
+            The (start, end) index of each batch
+        """
+        num_faces = len(self._predictions)
+        for start in tqdm(range(0, num_faces, self._batch_size),
+                          desc=desc,
+                          file=sys.stdout,
+                          leave=False):
+            yield start, min(start + self._batch_size, num_faces)
+
+    def _fit(self) -> MiniBatchKMeans:
+        """ Stream the encodings through mini-batch k-means to obtain the representatives.
+
+        Encodings are visited in a seeded random order, so that each batch is representative of
+        the full face set and the output is repeatable. The first batch is always large enough
+        to initialize each representative from.
+
+        Returns
+        -------
+        :class:`sklearn.cluster.MiniBatchKMeans`
+            The fitted pre-clustering model
+        """
+        model = MiniBatchKMeans(n_clusters=self._num_representatives,
+                                init="random",
+                                n_init=1,
+                                batch_size=self._batch_size,
+                                random_state=0)
+        rand = np.random.RandomState(0)
+        for idx in range(self._passes):
+            order = rand.permutation(len(self._predictions))
+            for start, end in self._batches(f"Pre-clustering (pass {idx + 1}/{self._passes})"):
+                model.partial_fit(self._predictions[order[start:end]])
+        return model
+
+    def _assign(self, model: MiniBatchKMeans) -> Tuple[np.ndarray, np.ndarray]:
+        """ Assign each face to its nearest representative.
+
+        Parameters
+        ----------
+        model: :class:`sklearn.cluster.MiniBatchKMeans`
+            The fitted pre-clustering model
+
+        Returns
+        -------
+        labels: :class:`numpy.ndarray`
+            The representative index for each face
+        distances: :class:`numpy.ndarray`
+            The distance of each face from its representative
+        """
+        centers = model.cluster_centers_
+        labels = np.empty((len(self._predictions), ), dtype="int64")
+        distances = np.empty((len(self._predictions), ), dtype="float32")
+        for start, end in self._batches("Assigning"):
+            batch = self._predictions[start:end]
+            labels[start:end] = model.predict(batch)
+            distances[start:end] = np.linalg.norm(batch - centers[labels[start:end]], axis=1)
+        return labels, distances
+
+    def __call__(self) -> List[Tuple[int, int]]:
+        """ Pre-cluster the faces, cluster the representatives and expand the result back to
+        the individual faces.
+
+        Returns
+        -------
+        list
+            List of (`index`, `bin`) tuples in the order implied by clustering the
+            representatives
+        """
+        logger.info("Pre-clustering %s faces into %s representatives...",
+                    len(self._predictions), self._num_representatives)
+        model = self._fit()
+        labels, distances = self._assign(model)
+
+        # Representatives that no face was assigned to are not clustered
+        counts = np.bincount(labels, minlength=self._num_representatives)
+        used = np.flatnonzero(counts)
+        representatives = np.array(model.cluster_centers_[used], dtype="float64")
+        logger.debug("Used representatives: %s", len(used))
+
+        order = np.lexsort((distances, labels))  # Faces grouped by label, nearest first
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        retval: List[Tuple[int, int]] = []
+        for rep_idx, bin_id in self._cluster(representatives):
+            label = used[rep_idx]
+            retval.extend((int(idx), bin_id) for idx in order[bounds[label]:bounds[label + 1]])
+        return retval
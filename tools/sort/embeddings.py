@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+""" Batched identity encoding and on disk caching of identity encodings for the sorting tool.
+
+Sorting by face identity requires an encoding for every face from a recognition model.
+:class:`BatchEncoder` runs the model in a background thread on batches of faces, so that faces can
+be loaded and aligned whilst the model is running, and :class:`EmbeddingCache` stores the
+encodings alongside the faces so that re-sorting the same folder does not run the model again.
+"""
+import logging
+import os
+
+from queue import Full as QueueFull, Queue
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lib.multithreading import MultiThread
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache():
+    """ Stores the identity encodings for faces in a folder in a single file within the folder.
+
+    Encodings are stored against the face's filename, along with the file's modification time and
+    size, so that encodings for faces which have since been changed are not used.
+
+    Parameters
+    ----------
+    folder: str
+        The full path to the folder of faces that encodings are being stored for
+    model_name: str
+        The name of the model that generated the encodings. Encodings from other models are
+        discarded
+    """
+    def __init__(self, folder: str, model_name: str) -> None:
+        logger.debug("Initializing %s: (folder: '%s', model_name: '%s')",
+                     self.__class__.__name__, folder, model_name)
+        self._folder = folder
+        self._model_name = model_name
+        self._filename = os.path.join(folder, ".faceswap_embeddings.npz")
+        self._cache = self._load()
+        self._is_modified = False
+        logger.debug("Initialized %s: (cached: %s)", self.__class__.__name__, len(self._cache))
+
+    def __len__(self) -> int:
+        """ int: The number of encodings in the cache """
+        return len(self._cache)
+
+    def _load(self) -> Dict[str, Tuple[Tuple[int, int], np.ndarray]]:
+        """ Load the cached encodings from disk.
+
+        Returns
+        -------
+        dict
+            The face filename mapped to a tuple of the file's (modification time, size) when it
+            was encoded and its encoding. An empty dictionary if there is no cache file, the cache
+            file could not be read or the cache is for a different model
+        """
+        if not os.path.isfile(self._filename):
+            return {}
+        try:
+            with np.load(self._filename, allow_pickle=False) as data:
+                if str(data["model"]) != self._model_name:
+                    logger.debug("Discarding encodings for model '%s'", data["model"])
+                    return {}
+                return {str(fname): ((int(stat[0]), int(stat[1])), embedding)
+                        for fname, stat, embedding in zip(data["filenames"],
+                                                          data["stats"],
+                                                          data["embeddings"])}
+        except (OSError, ValueError, KeyError) as err:
+            logger.warning("Unable to read the face encodings cache '%s'. The cache will be "
+                           "rebuilt. Error: %s", self._filename, str(err))
+            return {}
+
+    def _stat(self, filename: str) -> Optional[Tuple[int, int]]:
+        """ Obtain the modification time and size of a face file.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the face within :attr:`_folder`
+
+        Returns
+        -------
+        tuple or ``None``
+            The (modification time in nanoseconds, size in bytes) of the file or ``None`` if the
+            file does not exist
+        """
+        try:
+            stat = os.stat(os.path.join(self._folder, filename))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, filename: str) -> Optional[np.ndarray]:
+        """ Obtain the cached encoding for a face.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the face within the folder
+
+        Returns
+        -------
+        :class:`numpy.ndarray` or ``None``
+            The cached encoding for the face, or ``None`` if the face has not been cached or the
+            file has changed since it was cached
+        """
+        cached = self._cache.get(filename)
+        if cached is None or cached[0] != self._stat(filename):
+            return None
+        return cached[1]
+
+    def add(self, filename: str, embedding: np.ndarray) -> None:
+        """ Add the encoding for a face to the cache.
+
+        Parameters
+        ----------
+        filename: str
+            The filename of the face within the folder
+        embedding: :class:`numpy.ndarray`
+            The encoding for the face
+        """
+        stat = self._stat(filename)
+        if stat is None:
+            return
+        self._cache[filename] = (stat, embedding)
+        self._is_modified = True
+
+    def save(self) -> None:
+        """ Save the cache to disk, if it has been modified, discarding any faces which no longer
+        exist in the folder. """
+        if not self._is_modified:
+            return
+        existing = {fname: val for fname, val in self._cache.items()
+                    if self._stat(fname) is not None}
+        logger.debug("Saving %s face encodings to '%s'", len(existing), self._filename)
+        filenames = list(existing)
+        tmp_file = f"{self._filename}.tmp.npz"
+        try:
+            np.savez(tmp_file,
+                     model=np.array(self._model_name),
+                     filenames=np.array(filenames, dtype="str"),
+                     stats=np.array([existing[fname][0] for fname in filenames],
+                                    dtype="int64").reshape(-1, 2),
+                     embeddings=np.array([existing[fname][1] for fname in filenames]))
+            os.replace(tmp_file, self._filename)
+        except OSError as err:
+            logger.warning("Unable to save the face encodings cache '%s'. Error: %s",
+                           self._filename, str(err))
+            return
+        self._is_modified = False
+
+
+class BatchEncoder():
+    """ Obtains encodings for faces in batches from a background thread.
+
+    Parameters
+    ----------
+    predict: callable
+        The function to obtain encodings from. Must accept a batch of faces as a 4 dimensional
+        array and return the encodings for the batch as a 2 dimensional array
+    batch_size: int
+        The number of faces to obtain encodings for in each call to `predict`
+    """
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], batch_size: int) -> None:
+        logger.debug("Initializing %s: (predict: %s, batch_size: %s)",
+                     self.__class__.__name__, predict, batch_size)
+        self._predict = predict
+        self._batch_size = batch_size
+        self._queue: Queue = Queue(maxsize=batch_size * 2)
+        self._results: Dict[str, np.ndarray] = {}
+        self._thread = MultiThread(self._run, name="BatchEncoder")
+        self._thread.start()
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    def _put(self, item: Optional[Tuple[str, np.ndarray]]) -> None:
+        """ Put an item to the queue, raising any error from the background thread rather than
+        blocking on a full queue.
+
+        Parameters
+        ----------
+        item: tuple or ``None``
+            The (key, face) to be encoded or ``None`` to indicate that there are no more faces
+        """
+        while True:
+            self._thread.check_and_raise_error()
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except QueueFull:
+                continue
+
+    def put(self, key: str, face: np.ndarray) -> None:
+        """ Queue a face for encoding.
+
+        Parameters
+        ----------
+        key: str
+            The key to store the face's encoding against
+        face: :class:`numpy.ndarray`
+            The face to be encoded. All faces must be of the same shape
+        """
+        self._put((key, face))
+
+    def _run(self) -> None:
+        """ Collect faces from the queue and encode them in batches until ``None`` is received """
+        batch: List[Tuple[str, np.ndarray]] = []
+        while True:
+            item = self._queue.get()
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) == self._batch_size):
+                keys, faces = zip(*batch)
+                logger.trace("Encoding batch: %s", len(keys))  # type:ignore
+                self._results.update(zip(keys, self._predict(np.stack(faces))))
+                batch = []
+            if item is None:
+                break
+
+    def join(self) -> Dict[str, np.ndarray]:
+        """ Encode any remaining faces and stop the background thread.
+
+        Returns
+        -------
+        dict
+            The key for each face that was put to the encoder mapped to its encoding
+        """
+        self._put(None)
+        self._thread.join()
+        logger.debug("Encoded %s faces", len(self._results))
+        return self._results
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+""" Vectorized pairwise distance calculations for the sorting tool.
+
+Sorting by similarity or dissimilarity requires the distance between every pair of faces.
+:class:`PairwiseDistance` stacks the features (histograms, landmarks etc.) for every face into a
+single matrix and calculates the distances in blocks of rows, so that memory use is bounded
+regardless of the number of faces being sorted.
+"""
+import logging
+import sys
+
+from typing import Generator, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial.distance import cdist
+from tqdm import tqdm
+
+if sys.version_info < (3, 8):
+    from typing_extensions import Literal
+else:
+    from typing import Literal
+
+logger = logging.getLogger(__name__)
+
+
+class PairwiseDistance():
+    """ Calculates the distances between every pair of a set of feature vectors.
+
+    Distances are calculated in vectorized blocks of rows, with the number of rows in each block
+    limited so that each block holds no more than `max_block_size` distances.
+
+    Parameters
+    ----------
+    features: :class:`numpy.ndarray`
+        The features to compare. The first dimension is the number of items, all other
+        dimensions are flattened into a feature vector
+    metric: ["bhattacharyya", "l1"]
+        The distance metric to use. "bhattacharyya" gives the same distance as OpenCV's
+        :func:`cv2.compareHist` with ``cv2.HISTCMP_BHATTACHARYYA`` and is for comparing
+        histograms. "l1" is the sum of the absolute differences between features
+    max_block_size: int, optional
+        The maximum number of distances to hold in memory at any one time. Default: `2 ** 24`
+    """
+    def __init__(self,
+                 features: np.ndarray,
+                 metric: Literal["bhattacharyya", "l1"],
+                 max_block_size: int = 2 ** 24) -> None:
+        logger.debug("Initializing %s: (features: %s, metric: %s, max_block_size: %s)",
+                     self.__class__.__name__, features.shape, metric, max_block_size)
+        self._metric = metric
+        self._features = self._prepare_features(features.reshape(len(features), -1))
+        self._block_rows = max(1, max_block_size // max(1, len(self._features)))
+        logger.debug("Initialized %s: (block_rows: %s)",
+                     self.__class__.__name__, self._block_rows)
+
+    def __len__(self) -> int:
+        """ int: The number of items being compared """
+        return len(self._features)
+
+    def _prepare_features(self, features: np.ndarray) -> np.ndarray:
+        """ Prepare the features for vectorized comparison.
+
+        The Bhattacharyya coefficient between two histograms is the dot product of the square
+        roots of the histograms normalized to sum to 1, so histograms are stored in this form.
+
+        Parameters
+        ----------
+        features: :class:`numpy.ndarray`
+            The 2D (items, feature) array of features
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The features prepared for :func:`distances`
+        """
+        features = features.astype("float64")
+        if self._metric == "bhattacharyya":
+            totals = features.sum(axis=1, keepdims=True)
+            totals[np.abs(totals) < np.finfo("float64").eps] = 1.0
+            features = np.sqrt(np.clip(features / totals, 0.0, None))
+        return features
+
+    def distances(self, rows: np.ndarray) -> np.ndarray:
+        """ Obtain the distances from the given items to every item.
+
+        Parameters
+        ----------
+        rows: :class:`numpy.ndarray`
+            The indices of the items to obtain distances for
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            A (`len(rows)`, `len(self)`) array of distances
+        """
+        if self._metric == "bhattacharyya":
+            coefficients = self._features[rows] @ self._features.T
+            return np.sqrt(np.clip(1.0 - coefficients, 0.0, None))
+        return cdist(self._features[rows], self._features, metric="cityblock")
+
+    def _blocks(self, description: str) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+        """ Iterate the distance matrix in blocks of rows.
+
+        Parameters
+        ----------
+        description: str
+            The description to display in the progress bar
+
+        Yields
+        ------
+        rows: :class:`numpy.ndarray`
+            The indices of the items in the block
+        distances: :class:`numpy.ndarray`
+            The distances from each item in the block to every item
+        """
+        with tqdm(desc=description, total=len(self), file=sys.stdout, leave=False) as pbar:
+            for start in range(0, len(self), self._block_rows):
+                rows = np.arange(start, min(start + self._block_rows, len(self)))
+                yield rows, self.distances(rows)
+                pbar.update(len(rows))
+
+    def sum_distances(self, later_only: bool = False) -> np.ndarray:
+        """ Obtain the total distance from each item to every other item.
+
+        Parameters
+        ----------
+        later_only: bool, optional
+            ``True`` to only total the distances to the items that come after each item,
+            ``False`` to total the distances to all other items. Default: ``False``
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The total distance for each item
+        """
+        retval = np.empty((len(self), ), dtype="float64")
+        columns = np.arange(len(self))
+        for rows, distances in self._blocks("Comparing"):
+            mask = (columns[None, :] > rows[:, None] if later_only
+                    else columns[None, :] != rows[:, None])
+            retval[rows] = np.where(mask, distances, 0.0).sum(axis=1)
+        return retval
+
+    def _nearest_neighbours(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Obtain each item's nearest neighbours, ordered by distance.
+
+        Parameters
+        ----------
+        count: int
+            The number of neighbours to obtain for each item
+
+        Returns
+        -------
+        indices: :class:`numpy.ndarray`
+            A (`len(self)`, `count`) array of the indices of each item's nearest neighbours
+        distances: :class:`numpy.ndarray`
+            A (`len(self)`, `count`) array of the distance to each of the nearest neighbours
+        """
+        indices = np.empty((len(self), count), dtype="int64")
+        distances = np.empty((len(self), count), dtype="float64")
+        for rows, block in self._blocks("Finding neighbours"):
+            block[np.arange(len(rows)), rows] = np.inf  # Exclude self
+            if count < len(self) - 1:
+                nearest = np.argpartition(block, count - 1, axis=1)[:, :count]
+            else:
+                nearest = np.tile(np.arange(len(self)), (len(rows), 1))
+            near_dists = np.take_along_axis(block, nearest, axis=1)
+            order = np.argsort(near_dists, axis=1, kind="stable")[:, :count]
+            indices[rows] = np.take_along_axis(nearest, order, axis=1)
+            distances[rows] = np.take_along_axis(near_dists, order, axis=1)
+        return indices, distances
+
+    def nearest_neighbour_order(self, neighbours: Optional[int] = 32) -> List[int]:
+        """ Order the items into a chain where each item is followed by its nearest neighbour
+        from the items that have not yet been placed.
+
+        Starting from the first item, the nearest remaining item is moved to the next position
+        in the order by swapping it with the item currently in that position. Where several
+        items are equally near, the item in the earliest position is selected.
+
+        Each item's nearest neighbours are found once up front. The distances from an item to
+        all remaining items are only calculated when every one of its nearest neighbours has
+        already been placed, or when the nearest remaining neighbour is as far away as the
+        furthest neighbour, in which case an item outside of the neighbour list may be as near.
+
+        Parameters
+        ----------
+        neighbours: int, optional
+            The number of nearest neighbours to find for each item. ``None`` to find all
+            neighbours. Default: `32`
+
+        Returns
+        -------
+        list
+            The indices of the items in chain order
+        """
+        num_items = len(self)
+        if num_items < 3:
+            return list(range(num_items))
+        count = num_items - 1 if neighbours is None else min(neighbours, num_items - 1)
+        nearest, near_dists = self._nearest_neighbours(count)
+
+        order = np.arange(num_items)  # position -> item
+        position = np.arange(num_items)  # item -> position
+        placed = np.zeros((num_items, ), dtype="bool")
+        placed[0] = True
+        scans = 0
+        for idx in tqdm(range(num_items - 1), desc="Sorting", file=sys.stdout, leave=False):
+            current = order[idx]
+            available = ~placed[nearest[current]]
+            dists = near_dists[current]
+            if available.any() and (count == num_items - 1
+                                    or dists[available.argmax()] < dists[-1]):
+                candidates = nearest[current][available & (dists == dists[available.argmax()])]
+            else:
+                scans += 1
+                distances = self.distances(np.array([current]))[0]
+                distances[placed] = np.inf
+                candidates = np.flatnonzero(distances == distances.min())
+            selected = candidates[np.argmin(position[candidates])]
+
+            swap_pos = position[selected]
+            swapped = order[idx + 1]
+            order[idx + 1], order[swap_pos] = selected, swapped
+            position[selected], position[swapped] = idx + 1, swap_pos
+            placed[selected] = True
+        logger.debug("Nearest neighbour order complete: (items: %s, neighbours: %s, "
+                     "full scans: %s)", num_items, count, scans)
+        return order.tolist()
+
+    def _centroid_distances(self, centroids: np.ndarray, feature: np.ndarray) -> np.ndarray:
+        """ Obtain the distances from a feature to group centroids.
+
+        Parameters
+        ----------
+        centroids: :class:`numpy.ndarray`
+            The (`groups`, `features`) centroids, in the same form as the prepared features
+        feature: :class:`numpy.ndarray`
+            The prepared feature to obtain distances for
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The distance from the feature to each centroid
+        """
+        if self._metric == "bhattacharyya":
+            return np.sqrt(np.clip(1.0 - centroids @ feature, 0.0, None))
+        return np.abs(centroids - feature).sum(axis=1)
+
+    def _group_centroid(self, threshold: float) -> List[int]:
+        """ Group items by their distance to the running centroid of each group.
+
+        Histogram centroids are the mean of the group's normalized histograms, landmark
+        centroids are the mean of the group's landmarks.
+
+        Parameters
+        ----------
+        threshold: float
+            The distance that an item must be within of a group's centroid to join the group
+
+        Returns
+        -------
+        list
+            The group index for each item
+        """
+        is_hist = self._metric == "bhattacharyya"
+        capacity = min(len(self), 1024)
+        sums = np.zeros((capacity, self._features.shape[1]), dtype="float64")
+        centroids = np.zeros_like(sums)
+        counts = np.zeros((capacity, ), dtype="int64")
+        labels = np.empty((len(self), ), dtype="int64")
+        num_groups = 0
+        for idx in tqdm(range(len(self)), desc="Grouping", file=sys.stdout, leave=False):
+            feature = self._features[idx]
+            group = num_groups
+            if num_groups:
+                distances = self._centroid_distances(centroids[:num_groups], feature)
+                nearest = int(distances.argmin())
+                group = nearest if distances[nearest] < threshold else num_groups
+
+            if group == num_groups:
+                num_groups += 1
+                if num_groups > len(sums):
+                    sums, centroids, counts = [np.concatenate([arr, np.zeros_like(arr)])
+                                               for arr in (sums, centroids, counts)]
+
+            sums[group] += np.square(feature) if is_hist else feature
+            counts[group] += 1
+            mean = sums[group] / counts[group]
+            centroids[group] = np.sqrt(mean) if is_hist else mean
+            labels[idx] = group
+        return labels.tolist()
+
+    def _group_average(self, threshold: float) -> List[int]:
+        """ Group items by their mean distance to every member of each group (average linkage).
+
+        Parameters
+        ----------
+        threshold: float
+            The mean distance that an item must be within of a group's members to join the group
+
+        Returns
+        -------
+        list
+            The group index for each item
+        """
+        labels = np.empty((len(self), ), dtype="int64")
+        counts: List[int] = []
+        for rows, block in self._blocks("Grouping"):
+            for idx, distances in zip(rows, block):
+                group = len(counts)
+                if counts:
+                    totals = np.bincount(labels[:idx],
+                                         weights=distances[:idx],
+                                         minlength=len(counts))
+                    scores = totals / counts
+                    nearest = int(scores.argmin())
+                    group = nearest if scores[nearest] < threshold else len(counts)
+                if group == len(counts):
+                    counts.append(0)
+                counts[group] += 1
+                labels[idx] = group
+        return labels.tolist()
+
+    def group(self,
+              threshold: float,
+              linkage: Literal["centroid", "average"] = "centroid") -> List[int]:
+        """ Assign each item, in order, to the group that it is nearest to, or to a new group if
+        it is not within the threshold distance of any existing group. Where several groups are
+        equally near, the earliest created group is selected.
+
+        Parameters
+        ----------
+        threshold: float
+            The distance that an item must be within to join an existing group
+        linkage: ["centroid", "average"], optional
+            "centroid" compares each item against the mean of each group's members, which is a
+            single vectorized comparison against all groups. "average" compares each item against
+            every member of each group and uses the mean distance. Default: "centroid"
+
+        Returns
+        -------
+        list
+            The group index for each item
+        """
+        logger.debug("Grouping: (items: %s, threshold: %s, linkage: %s)",
+                     len(self), threshold, linkage)
+        if linkage == "average":
+            retval = self._group_average(threshold)
+        else:
+            retval = self._group_centroid(threshold)
+        logger.debug("Grouped into %s groups", max(retval, default=-1) + 1)
+        return retval
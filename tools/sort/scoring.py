@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+""" Parallel scoring of faces from disk for the sorting tool.
+
+Sort methods which give each face a score that only depends on that face (such as blur, color and
+histogram) can score faces independently of each other. :class:`FileScorer` splits the files to be
+scored into chunks, and loads and scores each chunk in a pool of worker processes, so that only
+the scores need to be passed back to the main process.
+"""
+import logging
+import multiprocessing as mp
+import sys
+
+from typing import Any, Callable, List, Optional, TYPE_CHECKING
+
+import numpy as np
+from tqdm import tqdm
+
+from lib.image import read_image
+from lib.multithreading import has_process_support, total_cpus
+
+if TYPE_CHECKING:
+    from lib.align.alignments import PNGHeaderAlignmentsDict
+
+logger = logging.getLogger(__name__)
+
+ScoreFunc = Callable[[np.ndarray, Optional["PNGHeaderAlignmentsDict"]], Any]
+_WORKER: dict = {}  # The score function and loader type for worker processes
+
+
+def _init_worker(score: ScoreFunc, with_metadata: bool) -> None:
+    """ Initialize a scoring worker. Workers are forked, so the score function does not need to
+    be picklable.
+
+    Parameters
+    ----------
+    score: callable
+        The function to score each face with
+    with_metadata: bool
+        ``True`` if the Faceswap PNG header should be read with each face and the face's
+        alignments passed to the score function
+    """
+    _WORKER["score"] = score
+    _WORKER["with_metadata"] = with_metadata
+
+
+def _score_chunk(filenames: List[str]) -> List[Any]:
+    """ Load and score a chunk of files.
+
+    Parameters
+    ----------
+    filenames: list
+        The full paths to the files to be scored
+
+    Returns
+    -------
+    list
+        The score for each file. ``None`` for any files that could not be loaded
+    """
+    retval = []
+    for filename in filenames:
+        try:
+            loaded = read_image(filename,
+                                raise_error=True,
+                                with_metadata=_WORKER["with_metadata"])
+        except Exception:  # pylint:disable=broad-except
+            retval.append(None)  # Read errors are logged by read_image
+            continue
+        if _WORKER["with_metadata"]:
+            image, metadata = loaded
+            alignments = metadata.get("alignments") if metadata else None
+        else:
+            image, alignments = loaded, None
+        retval.append(_WORKER["score"](image, alignments or None))
+    return retval
+
+
+class FileScorer():
+    """ Load and score files in a pool of worker processes.
+
+    Worker processes are forked, so on systems which cannot fork processes (see
+    :func:`lib.multithreading.has_process_support`), files are scored in the main process.
+
+    Parameters
+    ----------
+    score: callable
+        The function to score each face with. Must accept the face image and the face's
+        alignments (or ``None``) and return a score that can be pickled
+    with_metadata: bool
+        ``True`` if the Faceswap PNG header should be read with each face and the face's
+        alignments passed to the score function. ``False`` to pass ``None`` for the alignments
+    jobs: int
+        The number of worker processes to use. `0` to use all available CPUs. `1` to score files
+        in the main process
+    """
+    def __init__(self, score: ScoreFunc, with_metadata: bool, jobs: int) -> None:
+        logger.debug("Initializing %s: (score: %s, with_metadata: %s, jobs: %s)",
+                     self.__class__.__name__, score, with_metadata, jobs)
+        self._score = score
+        self._with_metadata = with_metadata
+        self._jobs = self._get_jobs(jobs)
+        logger.debug("Initialized %s", self.__class__.__name__)
+
+    @classmethod
+    def _get_jobs(cls, jobs: int) -> int:
+        """ Obtain the number of worker processes to use.
+
+        Parameters
+        ----------
+        jobs: int
+            The number of processes requested. `0` for all available CPUs
+
+        Returns
+        -------
+        int
+            The number of processes to use, limited to the number of available CPUs. `1` if the
+            system does not support forked processes
+        """
+        if not has_process_support():
+            logger.debug("Process support not available. Scoring in main process")
+            return 1
+        retval = total_cpus() if jobs <= 0 else min(jobs, total_cpus())
+        logger.debug("Scoring jobs: %s (requested: %s)", retval, jobs)
+        return retval
+
+    def _chunks(self, filenames: List[str]) -> List[List[str]]:
+        """ Split the files into chunks for the workers.
+
+        Chunks are small enough to give each worker several chunks, so that work is balanced
+        between workers and progress is reported regularly.
+
+        Parameters
+        ----------
+        filenames: list
+            The full paths to the files to be scored
+
+        Returns
+        -------
+        list
+            The files split into chunks
+        """
+        size = max(1, min(256, len(filenames) // (self._jobs * 8)))
+        return [filenames[idx: idx + size] for idx in range(0, len(filenames), size)]
+
+    def __call__(self, filenames: List[str], description: str) -> List[Any]:
+        """ Score the given files.
+
+        Parameters
+        ----------
+        filenames: list
+            The full paths to the files to be scored
+        description: str
+            The description to display in the progress bar
+
+        Returns
+        -------
+        list
+            The score for each file, in the order that the files were given. ``None`` for any
+            files that could not be loaded
+        """
+        chunks = self._chunks(filenames)
+        progress = tqdm(desc=description, total=len(filenames), file=sys.stdout, leave=False)
+        retval: List[Any] = []
+        if self._jobs == 1 or len(chunks) == 1:
+            _init_worker(self._score, self._with_metadata)
+            for chunk in chunks:
+                retval.extend(_score_chunk(chunk))
+                progress.update(len(chunk))
+        else:
+            logger.debug("Scoring %s files in %s processes", len(filenames), self._jobs)
+            with mp.get_context("fork").Pool(self._jobs,
+                                             initializer=_init_worker,
+                                             initargs=(self._score, self._with_metadata)) as pool:
+                for scores in pool.imap(_score_chunk, chunks):
+                    retval.extend(scores)
+                    progress.update(len(scores))
+        progress.close()
+        _WORKER.clear()
+        return retval
@@ -8,16 +8,21 @@ import logging
 import operator
 import sys
 
-from typing import Any, cast, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
+from typing import Any, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import cv2
 import numpy as np
+import psutil
 from tqdm import tqdm
 
-from lib.align import AlignedFace, DetectedFace
-from lib.image import FacesLoader, ImagesLoader, read_image_meta_batch
+from lib.align import AlignedFace, DetectedFace, FacesetManifest
+from lib.image import FacesLoader, ImagesLoader
 from lib.utils import FaceswapError
 from plugins.extract.recognition.vgg_face2_keras import Cluster, VGGFace2 as VGGFace
+from .clustering import linkage_memory, StreamingCluster
+from .embeddings import BatchEncoder, EmbeddingCache
+from .pairwise import PairwiseDistance
+from .scoring import FileScorer
 
 if sys.version_info < (3, 8):
     from typing_extensions import Literal
@@ -68,6 +73,16 @@ class InfoLoader():
         """ int: The number of files to be processed """
         return len(self._loader.file_list)
 
+    @property
+    def file_list(self) -> List[str]:
+        """ list: The full paths to the files to be processed """
+        return self._loader.file_list
+
+    @property
+    def location(self) -> str:
+        """ str: The full path to the folder that files are loaded from """
+        return self._loader.location
+
     def _get_iterator(self) -> ImgMetaType:
         """ Obtain the iterator for the selected :attr:`info_type`.
 
@@ -119,7 +134,8 @@ class InfoLoader():
         return metadata["alignments"]
 
     def _metadata_reader(self) -> ImgMetaType:
-        """ Load metadata from saved aligned faces
+        """ Load metadata from saved aligned faces. The metadata is read from the folder's
+        :class:`lib.align.FacesetManifest` so does not include stored mask data.
 
         Yields
         ------
@@ -130,11 +146,12 @@ class InfoLoader():
         alignments: dict or ``None``
             The alignment data for the given face or ``None`` if no alignments found
         """
-        for filename, metadata in tqdm(read_image_meta_batch(self._loader.file_list),
-                                       total=self._loader.count,
-                                       desc=self._description,
-                                       leave=False):
-            alignments = self._get_alignments(metadata.get("itxt", {}))
+        manifest = FacesetManifest(self._loader.location)
+        for filename in tqdm(self._loader.file_list,
+                             total=self._loader.count,
+                             desc=self._description,
+                             leave=False):
+            alignments = self._get_alignments(manifest.get_metadata(filename) or {})
             yield filename, None, alignments
 
     def _full_data_reader(self) -> ImgMetaType:
@@ -202,6 +219,8 @@ class SortMethod():
 
         self._num_bins: int = arguments.num_bins
         self._bin_names: List[str] = []
+        self._jobs: int = arguments.jobs
+        self._score_name: Optional[str] = None
 
         self._loader_type = loader_type
         self._iterator = self._get_file_iterator(arguments.input_dir)
@@ -259,7 +278,8 @@ class SortMethod():
     def _sort_filelist(self) -> None:
         """ Call the sort method's logic to populate the :attr:`_results` attribute.
 
-        Put logic for scoring an individual frame in in :attr:`score_image` of the child
+        Put logic for scoring an individual frame in in :attr:`score_image` of the child. Sort
+        methods which set :attr:`_score_name` are instead scored by :func:`_score_files`
 
         Returns
         -------
@@ -267,13 +287,71 @@ class SortMethod():
             The sorted file. A list of tuples with the filename in the first position and score in
             the second position
         """
-        for filename, image, alignments in self._iterator():
-            self.score_image(filename, image, alignments)
+        if self._score_name is not None:
+            self._score_files()
+        else:
+            for filename, image, alignments in self._iterator():
+                self.score_image(filename, image, alignments)
 
         self.sort()
         logger.debug("sorted list: %s",
                      [r[0] if isinstance(r, (tuple, list)) else r for r in self._result])
 
+    def _score_files(self) -> None:
+        """ Populate :attr:`_result` with the score from :func:`_score` for every file.
+
+        Scores are stored in the folder's :class:`lib.align.FacesetManifest` under
+        :attr:`_score_name`, so only files that have not previously been scored by this method,
+        or have changed since they were scored, are loaded and scored. These files are scored in
+        parallel by :class:`tools.sort.scoring.FileScorer`.
+        """
+        self._log_start()
+        filenames = self._iterator.file_list
+        assert self._score_name is not None
+        manifest = FacesetManifest(self._iterator.location)
+        cached = manifest.get_scores(self._score_name, filenames)
+        missing = [fname for fname, score in zip(filenames, cached) if score is None]
+        logger.debug("Cached scores: %s, files to score: %s",
+                     len(filenames) - len(missing), len(missing))
+        scores: Dict[str, Any] = {}
+        if missing:
+            scorer = FileScorer(self._score, self.loader_type == "all", self._jobs)
+            scores = dict(zip(missing, scorer(missing, "Scoring faces")))
+            manifest.set_scores(self._score_name,
+                                {fname: score for fname, score in scores.items()
+                                 if score is not None})
+        self._result = [(fname, scores[fname] if score is None else score)
+                        for fname, score in zip(filenames, cached)
+                        if score is not None or scores[fname] is not None]
+
+    def _log_start(self) -> None:
+        """ Override to log the sort method that is being used when scoring starts """
+        return
+
+    def _score(self,
+               image: np.ndarray,
+               alignments: Optional["PNGHeaderAlignmentsDict"]) -> Union[float, np.ndarray]:
+        """ Override for sort methods which can score each face independently of every other
+        face. The method must also set :attr:`_score_name` to the name to store the scores
+        against.
+
+        Faces may be scored in worker processes, so this method must not update the state of the
+        sort method.
+
+        Parameters
+        ----------
+        image: :class:`numpy.ndarray`
+            A face image loaded from disk
+        alignments: dict or ``None``
+            The alignments dictionary for the aligned face or ``None``
+
+        Returns
+        -------
+        float or :class:`numpy.ndarray`
+            The score for the face
+        """
+        raise NotImplementedError()
+
     @classmethod
     def _get_unique_labels(cls, numbers: List[float]) -> List[str]:
         """ For a list of threshold values for displaying in the bin name, get the lowest number of
@@ -403,6 +481,24 @@ class SortMethod():
         """
         raise NotImplementedError()
 
+    def _bins_from_labels(self, labels: List[int]) -> List[List[str]]:
+        """ Create bins of filenames from the group label of each item in :attr:`_result`
+
+        Parameters
+        ----------
+        labels: list
+            The bin index for each item in :attr:`_result`
+
+        Returns
+        -------
+        list
+            List of bins of filenames
+        """
+        bins: List[List[str]] = [[] for _ in range(max(labels, default=-1) + 1)]
+        for (filename, _), label in zip(self._result, labels):
+            bins[label].append(filename)
+        return bins
+
     @classmethod
     def _mask_face(cls, image: np.ndarray, alignments: "PNGHeaderAlignmentsDict") -> np.ndarray:
         """ Function for applying the mask to an aligned face if both the face image and alignment
@@ -544,6 +640,7 @@ class SortBlur(SortMethod):
         super().__init__(arguments, loader_type="all", is_group=is_group)
         method = arguments.group_method if self._is_group else arguments.sort_method
         self._use_fft = method == "blur_fft"
+        self._score_name = "blur_fft" if self._use_fft else "blur"
 
     def estimate_blur(self, image: np.ndarray, alignments=None) -> float:
         """ Estimate the amount of blur an image has with the variance of the Laplacian.
@@ -628,14 +725,36 @@ class SortBlur(SortMethod):
             The alignments dictionary for the aligned face or ``None``
         """
         assert image is not None
+        self._log_start()
+        self._result.append((filename, self._score(image, alignments)))
+
+    def _log_start(self) -> None:
+        """ Log the blur method that is being used the first time that it is called """
         if self._log_once:
             msg = "Grouping" if self._is_group else "Sorting"
             inf = "fft_filtered " if self._use_fft else " "
             logger.info("%s by estimated %simage blur...", msg, inf)
             self._log_once = False
 
+    def _score(self,
+               image: np.ndarray,
+               alignments: Optional["PNGHeaderAlignmentsDict"]) -> float:
+        """ Score a single image for blur or blur-fft
+
+        Parameters
+        ----------
+        image: :class:`np.ndarray`
+            A face image loaded from disk
+        alignments: dict or ``None``
+            The alignments dictionary for the aligned face or ``None``
+
+        Returns
+        -------
+        float
+            The blur score for the face
+        """
         estimator = self.estimate_blur_fft if self._use_fft else self.estimate_blur
-        self._result.append((filename, estimator(image, alignments)))
+        return estimator(image, alignments)
 
     def sort(self) -> None:
         """ Sort by metric score. Order in reverse for distance sort. """
@@ -670,6 +789,7 @@ class SortColor(SortMethod):
 
         method = arguments.group_method if self._is_group else arguments.sort_method
         self._method = method.replace("color_", "")
+        self._score_name = f"color_{self._method}"
 
     def _convert_color(self, image: np.ndarray) -> np.ndarray:
         """ Helper function to convert color spaces
@@ -750,6 +870,12 @@ class SortColor(SortMethod):
         alignments: dict or ``None``
             The alignments dictionary for the aligned face or ``None``
         """
+        self._log_start()
+        assert image is not None
+        self._result.append((filename, self._score(image, alignments)))
+
+    def _log_start(self) -> None:
+        """ Log the color method that is being used the first time that it is called """
         if self._log_once:
             msg = "Grouping" if self._is_group else "Sorting"
             if self._method == "black":
@@ -758,13 +884,27 @@ class SortColor(SortMethod):
                 logger.info("%s by channel average intensity...", msg)
             self._log_once = False
 
-        assert image is not None
+    def _score(self,
+               image: np.ndarray,
+               alignments: Optional["PNGHeaderAlignmentsDict"]) -> float:
+        """ Score a single image for color
+
+        Parameters
+        ----------
+        image: :class:`np.ndarray`
+            A face image loaded from disk
+        alignments: dict or ``None``
+            Unused for color scores
+
+        Returns
+        -------
+        float
+            The color score for the face
+        """
         if self._method == "black":
-            score = np.ndarray.all(image == [0, 0, 0], axis=2).sum()/image.size*100*3
-        else:
-            channel_to_sort = self._desired_channel[self._method]
-            score = np.average(self._convert_color(image), axis=(0, 1))[channel_to_sort]
-        self._result.append((filename, score))
+            return np.ndarray.all(image == [0, 0, 0], axis=2).sum()/image.size*100*3
+        channel_to_sort = self._desired_channel[self._method]
+        return np.average(self._convert_color(image), axis=(0, 1))[channel_to_sort]
 
     def sort(self) -> None:
         """ Sort by metric score. Order in reverse for distance sort. """
@@ -803,10 +943,41 @@ class SortFace(SortMethod):
     def __init__(self, arguments: "Namespace", is_group: bool = False) -> None:
         super().__init__(arguments, loader_type="all", is_group=is_group)
         self._vgg_face = VGGFace(exclude_gpus=arguments.exclude_gpus)
-        self._vgg_face.init_model()
+        self._batch_size: int = arguments.batch_size
+        self._cache = EmbeddingCache(arguments.input_dir, self._vgg_face.name)
+        self._encoder: Optional[BatchEncoder] = None
+        self._cluster_memory: int = arguments.cluster_memory
         threshold = arguments.threshold
         self._threshold: Optional[float] = 0.25 if threshold < 0 else threshold
 
+    def _get_encoder(self) -> BatchEncoder:
+        """ Obtain the encoder for faces that are not in the cache, loading the model and
+        launching the encoder the first time it is requested.
+
+        Returns
+        -------
+        :class:`tools.sort.embeddings.BatchEncoder`
+            The batch encoder for obtaining face encodings from VGG Face 2
+        """
+        if self._encoder is None:
+            self._vgg_face.init_model()
+            self._encoder = BatchEncoder(self._vgg_face.predict, self._batch_size)
+        return self._encoder
+
+    def _collect_encodings(self) -> None:
+        """ Collect the encodings for all of the faces that were not in the cache from the
+        encoder, add them to :attr:`_result` and update the cache """
+        if self._encoder is None:
+            logger.debug("All face encodings were loaded from the cache")
+            return
+        encodings = self._encoder.join()
+        self._encoder = None
+        for filename, encoding in encodings.items():
+            self._cache.add(filename, encoding)
+        self._cache.save()
+        self._result = [(filename, encodings[filename] if encoding is None else encoding)
+                        for filename, encoding in self._result]
+
     def score_image(self,
                     filename: str,
                     image: Optional[np.ndarray],
@@ -833,30 +1004,55 @@ class SortFace(SortMethod):
                    "older faceset, then you should re-extract the faces from your source "
                    "alignments file to generate this data.")
             raise FaceswapError(msg)
-        face = AlignedFace(np.array(alignments["landmarks_xy"], dtype="float32"),
-                           image=image,
-                           centering="legacy",
-                           size=self._vgg_face.input_size,
-                           is_aligned=True).face
-        self._result.append((filename, self._vgg_face.predict(face)))
+        encoding = self._cache.get(filename)
+        if encoding is None:
+            face = AlignedFace(np.array(alignments["landmarks_xy"], dtype="float32"),
+                               image=image,
+                               centering="legacy",
+                               size=self._vgg_face.input_size,
+                               is_aligned=True).face
+            self._get_encoder().put(filename, face)
+        # Encodings from the encoder are populated when all faces have been scored
+        self._result.append((filename, encoding))
 
     def sort(self) -> None:
         """ Sort by dendogram.
 
-        Parameters
-        ----------
-        matched_list: list
-            The list of tuples with filename in first position and face encoding in the 2nd
+        Face sets which are too large to cluster within the memory limit are pre-clustered with
+        :class:`tools.sort.clustering.StreamingCluster` and the representatives are sorted.
+        """
+        self._collect_encodings()
+        preds = np.array([item[1] for item in self._result])
+        memory_limit = self._get_memory_limit()
+        if linkage_memory(len(preds)) < memory_limit:
+            logger.info("Sorting by ward linkage. This may take some time...")
+            indices = Cluster(preds, "ward", threshold=self._threshold)()
+        else:
+            logger.info("Not enough memory to cluster all faces at once. Pre-clustering faces "
+                        "before sorting by ward linkage. This may take some time...")
+            indices = StreamingCluster(
+                preds,
+                memory_limit,
+                lambda representatives: Cluster(representatives,
+                                                 "ward",
+                                                 threshold=self._threshold)())()
+        self._result = [(self._result[idx][0], float(score)) for idx, score in indices]
+
+    def _get_memory_limit(self) -> float:
+        """ Obtain the maximum memory to use for hierarchical clustering.
 
         Returns
         -------
-        list
-            The original list, sorted for this metric
+        float
+            The memory, in bytes, given by the user or the currently available system memory if
+            no limit was given
         """
-        logger.info("Sorting by ward linkage. This may take some time...")
-        preds = np.array([item[1] for item in self._result])
-        indices = Cluster(np.array(preds), "ward", threshold=self._threshold)()
-        self._result = [(self._result[idx][0], float(score)) for idx, score in indices]
+        if self._cluster_memory > 0:
+            retval = float(self._cluster_memory * 1024 ** 3)
+        else:
+            retval = float(psutil.virtual_memory().available)
+        logger.debug("Clustering memory limit: %sMB", int(retval / (1024 * 1024)))
+        return retval
 
     def binning(self) -> List[List[str]]:
         """ Group into bins by their sorted score
@@ -894,6 +1090,8 @@ class SortHistogram(SortMethod):
         method = arguments.group_method if self._is_group else arguments.sort_method
         self._is_dissim = method == "hist-dissim"
         self._threshold: float = 0.3 if arguments.threshold < 0.0 else arguments.threshold
+        self._linkage: Literal["centroid", "average"] = arguments.group_linkage
+        self._score_name = "hist"
 
     def _calc_histogram(self,
                         image: np.ndarray,
@@ -902,102 +1100,34 @@ class SortHistogram(SortMethod):
             image = self._mask_face(image, alignments)
         return cv2.calcHist([image], [0], None, [256], [0, 256])
 
+    def _get_distances(self) -> PairwiseDistance:
+        """ Obtain the pairwise distance engine for the collected histograms.
+
+        Returns
+        -------
+        :class:`tools.sort.pairwise.PairwiseDistance`
+            The engine for calculating the Bhattacharyya distances between histograms
+        """
+        return PairwiseDistance(np.array([item[1] for item in self._result]), "bhattacharyya")
+
     def _sort_dissim(self) -> None:
         """ Sort histograms by dissimilarity """
-        img_list_len = len(self._result)
-        for i in tqdm(range(0, img_list_len),
-                      desc="Comparing histograms",
-                      file=sys.stdout,
-                      leave=False):
-            score_total = 0
-            for j in range(0, img_list_len):
-                if i == j:
-                    continue
-                score_total += cv2.compareHist(self._result[i][1],
-                                               self._result[j][1],
-                                               cv2.HISTCMP_BHATTACHARYYA)
-            self._result[i][2] = score_total
-
-        self._result = sorted(self._result, key=operator.itemgetter(2), reverse=True)
+        scores = self._get_distances().sum_distances()
+        self._result = [item for item, _ in sorted(zip(self._result, scores),
+                                                   key=operator.itemgetter(1),
+                                                   reverse=True)]
 
     def _sort_sim(self) -> None:
         """ Sort histograms by similarity """
-        img_list_len = len(self._result)
-        for i in tqdm(range(0, img_list_len - 1),
-                      desc="Comparing histograms",
-                      file=sys.stdout,
-                      leave=False):
-            min_score = float("inf")
-            j_min_score = i + 1
-            for j in range(i + 1, img_list_len):
-                score = cv2.compareHist(self._result[i][1],
-                                        self._result[j][1],
-                                        cv2.HISTCMP_BHATTACHARYYA)
-                if score < min_score:
-                    min_score = score
-                    j_min_score = j
-            (self._result[i + 1], self._result[j_min_score]) = (self._result[j_min_score],
-                                                                self._result[i + 1])
-
-    @classmethod
-    def _get_avg_score(cls, image: np.ndarray, references: List[np.ndarray]) -> float:
-        """ Return the average histogram score between a face and reference images
-
-        Parameters
-        ----------
-        image: :class:`numpy.ndarray`
-            The image to test
-        references: list
-            List of reference images to test the original image against
-
-        Returns
-        -------
-        float
-            The average score between the histograms
-        """
-        scores = []
-        for img2 in references:
-            score = cv2.compareHist(image, img2, cv2.HISTCMP_BHATTACHARYYA)
-            scores.append(score)
-        return sum(scores) / len(scores)
+        order = self._get_distances().nearest_neighbour_order()
+        self._result = [self._result[idx] for idx in order]
 
     def binning(self) -> List[List[str]]:
         """ Group into bins by histogram """
         msg = "dissimilarity" if self._is_dissim else "similarity"
         logger.info("Grouping by %s...", msg)
-
-        # Groups are of the form: group_num -> reference histogram
-        reference_groups: Dict[int, List[np.ndarray]] = {}
-
-        # Bins array, where index is the group number and value is
-        # an array containing the file paths to the images in that group
-        bins: List[List[str]] = []
-
-        threshold = self._threshold
-
-        img_list_len = len(self._result)
-        reference_groups[0] = [cast(np.ndarray, self._result[0][1])]
-        bins.append([self._result[0][0]])
-
-        for i in tqdm(range(1, img_list_len),
-                      desc="Grouping",
-                      file=sys.stdout,
-                      leave=False):
-            current_key = -1
-            current_score = float("inf")
-            for key, value in reference_groups.items():
-                score = self._get_avg_score(self._result[i][1], value)
-                if score < current_score:
-                    current_key, current_score = key, score
-
-            if current_score < threshold:
-                reference_groups[cast(int, current_key)].append(self._result[i][1])
-                bins[current_key].append(self._result[i][0])
-            else:
-                reference_groups[len(reference_groups)] = [self._result[i][1]]
-                bins.append([self._result[i][0]])
-
-        return bins
+        labels = self._get_distances().group(self._threshold, linkage=self._linkage)
+        return self._bins_from_labels(labels)
 
     def score_image(self,
                     filename: str,
@@ -1014,13 +1144,35 @@ class SortHistogram(SortMethod):
         alignments: dict or ``None``
             The alignments dictionary for the aligned face or ``None``
         """
+        self._log_start()
+        assert image is not None
+        self._result.append((filename, self._score(image, alignments)))
+
+    def _log_start(self) -> None:
+        """ Log that histograms are being collected the first time that it is called """
         if self._log_once:
             msg = "Grouping" if self._is_group else "Sorting"
             logger.info("%s by histogram similarity...", msg)
             self._log_once = False
 
-        assert image is not None
-        self._result.append((filename, self._calc_histogram(image, alignments)))
+    def _score(self,
+               image: np.ndarray,
+               alignments: Optional["PNGHeaderAlignmentsDict"]) -> np.ndarray:
+        """ Collect the histogram for the given face
+
+        Parameters
+        ----------
+        image: :class:`np.ndarray`
+            A face image loaded from disk
+        alignments: dict or ``None``
+            The alignments dictionary for the aligned face or ``None``
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The histogram for the face
+        """
+        return self._calc_histogram(image, alignments)
 
     def sort(self) -> None:
         """ Sort by histogram. """
@@ -6,15 +6,20 @@ import logging
 import operator
 import sys
 
-from typing import Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
+from typing import Generator, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import numpy as np
-from tqdm import tqdm
 
 from lib.align import AlignedFace
 from lib.utils import FaceswapError
+from .pairwise import PairwiseDistance
 from .sort_methods import SortMethod
 
+if sys.version_info < (3, 8):
+    from typing_extensions import Literal
+else:
+    from typing import Literal
+
 if TYPE_CHECKING:
     from argparse import Namespace
     from lib.align.alignments import PNGHeaderAlignmentsDict
@@ -237,6 +242,7 @@ class SortFaceCNN(SortAlignedMetric):
         super().__init__(arguments, is_group=is_group)
         self._is_dissim = self._method == "face-cnn-dissim"
         self._threshold: float = 7.2 if arguments.threshold < 1.0 else arguments.threshold
+        self._linkage: Literal["centroid", "average"] = arguments.group_linkage
 
     def _get_metric(self, aligned_face: AlignedFace) -> np.ndarray:
         """ Obtain the xy aligned landmarks for the face"
@@ -261,38 +267,30 @@ class SortFaceCNN(SortAlignedMetric):
             return
         self._sort_landmarks_ssim()
 
+    def _get_distances(self) -> PairwiseDistance:
+        """ Obtain the pairwise distance engine for the collected landmarks.
+
+        Returns
+        -------
+        :class:`tools.sort.pairwise.PairwiseDistance`
+            The engine for calculating the L1 distances between landmarks
+        """
+        return PairwiseDistance(np.array([item[1] for item in self._result]), "l1")
+
     def _sort_landmarks_ssim(self) -> None:
         """ Sort landmarks by similarity """
-        img_list_len = len(self._result)
-        for i in tqdm(range(0, img_list_len - 1), desc="Comparing", file=sys.stdout, leave=False):
-            min_score = float("inf")
-            j_min_score = i + 1
-            for j in range(i + 1, img_list_len):
-                fl1 = self._result[i][1]
-                fl2 = self._result[j][1]
-                score = np.sum(np.absolute((fl2 - fl1).flatten()))
-                if score < min_score:
-                    min_score = score
-                    j_min_score = j
-            (self._result[i + 1], self._result[j_min_score]) = (self._result[j_min_score],
-                                                                self._result[i + 1])
+        order = self._get_distances().nearest_neighbour_order()
+        self._result = [self._result[idx] for idx in order]
 
     def _sort_landmarks_dissim(self) -> None:
         """ Sort landmarks by dissimilarity """
         logger.info("Comparing landmarks...")
-        img_list_len = len(self._result)
-        for i in tqdm(range(0, img_list_len - 1), desc="Comparing", file=sys.stdout, leave=False):
-            score_total = 0
-            for j in range(i + 1, img_list_len):
-                if i == j:
-                    continue
-                fl1 = self._result[i][1]
-                fl2 = self._result[j][1]
-                score_total += np.sum(np.absolute((fl2 - fl1).flatten()))
-            self._result[i][2] = score_total
+        scores = self._get_distances().sum_distances(later_only=True)
 
         logger.info("Sorting...")
-        self._result = sorted(self._result, key=operator.itemgetter(2), reverse=True)
+        self._result = [item for item, _ in sorted(zip(self._result, scores),
+                                                   key=operator.itemgetter(1),
+                                                   reverse=True)]
 
     def binning(self) -> List[List[str]]:
         """ Group into bins by CNN face similarity
@@ -305,66 +303,7 @@ class SortFaceCNN(SortAlignedMetric):
         msg = "dissimilarity" if self._is_dissim else "similarity"
         logger.info("Grouping by face-cnn %s...", msg)
 
-        # Groups are of the form: group_num -> reference faces
-        reference_groups: Dict[int, List[np.ndarray]] = {}
-
-        # Bins array, where index is the group number and value is
-        # an array containing the file paths to the images in that group.
-        bins: List[List[str]] = []
-
-        # Comparison threshold used to decide how similar
-        # faces have to be to be grouped together.
-        # It is multiplied by 1000 here to allow the cli option to use smaller
-        # numbers.
-        threshold = self._threshold * 1000
-        img_list_len = len(self._result)
-
-        for i in tqdm(range(0, img_list_len - 1),
-                      desc="Grouping",
-                      file=sys.stdout,
-                      leave=False):
-            fl1 = self._result[i][1]
-
-            current_key = -1
-            current_score = float("inf")
-
-            for key, references in reference_groups.items():
-                try:
-                    score = self._get_avg_score(fl1, references)
-                except TypeError:
-                    score = float("inf")
-                except ZeroDivisionError:
-                    score = float("inf")
-                if score < current_score:
-                    current_key, current_score = key, score
-
-            if current_score < threshold:
-                reference_groups[current_key].append(fl1[0])
-                bins[current_key].append(self._result[i][0])
-            else:
-                reference_groups[len(reference_groups)] = [self._result[i][1]]
-                bins.append([self._result[i][0]])
-
-        return bins
-
-    @classmethod
-    def _get_avg_score(cls, face: np.ndarray, references: List[np.ndarray]) -> float:
-        """ Return the average CNN similarity score between a face and reference images
-
-        Parameters
-        ----------
-        face: :class:`numpy.ndarray`
-            The face to check against reference images
-        references: list
-            List of reference arrays to compare the face against
-
-        Returns
-        -------
-        float
-            The average score between the face and the references
-        """
-        scores = []
-        for ref in references:
-            score = np.sum(np.absolute((ref - face).flatten()))
-            scores.append(score)
-        return sum(scores) / len(scores)
+        # Comparison threshold used to decide how similar faces have to be to be grouped
+        # together. It is multiplied by 1000 here to allow the cli option to use smaller numbers.
+        labels = self._get_distances().group(self._threshold * 1000, linkage=self._linkage)
+        return self._bins_from_labels(labels)